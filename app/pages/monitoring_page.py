@@ -13,7 +13,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.insert(0, project_root)
 
 from config.settings import Config
-from src.data.database import DatabaseManager
+from src.data.database import get_shared_db_manager
 from src.data.repositories import RepositoryFactory
 from src.sensors.sensor_manager import create_sensor_manager
 
@@ -125,20 +125,17 @@ def get_sensibilizacao_value(sensor_reading_value, warning_limit, critical_limit
 def load_sensors_data():
     """Carrega dados de sensores com leituras mais recentes e informações do PI AF"""
     try:
-        db_manager = DatabaseManager(Config.DATABASE_URL)
-        session = db_manager.get_session()
-        
-        repos = RepositoryFactory(session)
-        sensor_repo = repos.sensor_config()
-        reading_repo = repos.sensor_reading()
-        
-        # Obtém todos os sensores
-        all_sensors = sensor_repo.get_all()
+        # Obtém todos os sensores e a última leitura de todos numa única consulta
+        with get_shared_db_manager(Config.DATABASE_URL, read_only=True).session_scope() as session:
+            repos = RepositoryFactory(session)
+            all_sensors = repos.sensor_config().get_all()
+            latest_values = repos.sensor_reading().get_latest_values()
         
         sensor_data = []
         for sensor in all_sensors:
-            # Obtém leitura mais recente
-            latest_reading = reading_repo.get_latest(sensor.sensor_id)
+            # (timestamp, valor) da leitura mais recente, ou None
+            latest_reading = latest_values.get(sensor.sensor_id)
+            latest_value = latest_reading[1] if latest_reading else None
             
             sensor_info = {
                 'sensor_id': sensor.sensor_id,
@@ -160,8 +157,8 @@ def load_sensors_data():
                 'trat': '✓',  # Tratamento ativo
                 'grupos_votacao': sensor.grupo if sensor.grupo else 'N/A',
                 'corrente': f"{sensor.valor_ma:.2f}" if sensor.valor_ma else f"{4.5 + (sensor.sensor_id % 10) * 0.1:.2f}",  
-                'sensibilizacao': f"{latest_reading.value:.2f}" if latest_reading else f"{sensor.valor_pct:.2f}" if sensor.valor_pct else "N/A",
-                'reading_value': latest_reading.value if latest_reading else None,
+                'sensibilizacao': f"{latest_value:.2f}" if latest_reading else f"{sensor.valor_pct:.2f}" if sensor.valor_pct else "N/A",
+                'reading_value': latest_value,
                 'unit': sensor.unit,
                 'lower_ok': sensor.lower_ok_limit,
                 'lower_warning': sensor.lower_warning_limit,
@@ -170,7 +167,6 @@ def load_sensors_data():
             }
             sensor_data.append(sensor_info)
         
-        session.close()
         return pd.DataFrame(sensor_data)
         
     except Exception as e:
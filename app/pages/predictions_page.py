@@ -13,7 +13,6 @@ import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
-import numpy as np
 import logging
 from datetime import datetime, timedelta
 
@@ -282,7 +281,7 @@ def render_anomaly_tab(ml_engine, sensor_manager):
         # Recuperar histórico
         timestamps, values = ml_engine.get_sensor_history(selected_sensor_id, hours=72)
 
-        if timestamps and values:
+        if len(values):
             df_history = pd.DataFrame({
                 'Timestamp': timestamps,
                 'Value': values
@@ -290,10 +289,10 @@ def render_anomaly_tab(ml_engine, sensor_manager):
 
             # Detectar anomalias para todo o histórico
             predictions, scores = ml_engine.anomaly_detectors[selected_sensor_id].detect_ensemble(
-                np.array(values)
+                values
             ) if selected_sensor_id in ml_engine.anomaly_detectors else ([], [])
 
-            if predictions:
+            if len(predictions):
                 df_history['Anomaly'] = ['Anomalia' if p == -1 else 'Normal' for p in predictions]
                 df_history['Score'] = scores
 
@@ -421,24 +420,17 @@ def render_training_tab(ml_engine, sensor_manager):
 
             selected_ids = [sensor_options[name] for name in selected_sensors]
 
-            # Treinar anomaly detectors
-            trained_anomaly = 0
-            for idx, sensor_id in enumerate(selected_ids):
-                status_text.text(f"Treinando Anomaly Detector {idx + 1}/{len(selected_ids)}...")
-                if ml_engine.train_anomaly_detector(sensor_id):
-                    trained_anomaly += 1
-                training_progress.progress((idx + 1) / (len(selected_ids) * 2))
-
-            # Treinar forecasters
-            trained_forecaster = 0
-            for idx, sensor_id in enumerate(selected_ids):
-                status_text.text(f"Treinando Forecaster {idx + 1}/{len(selected_ids)}...")
-                if ml_engine.train_forecaster(sensor_id):
-                    trained_forecaster += 1
-                training_progress.progress(0.5 + (idx + 1) / (len(selected_ids) * 2))
+            # Treino em paralelo fora do processo do Streamlit; progresso a cada modelo
+            def on_progress(done, total, result):
+                status_text.text(f"Treinando modelos {done}/{total}...")
+                training_progress.progress(done / total)
+
+            results = ml_engine.retrain_models(selected_ids, progress=on_progress)
 
             training_progress.progress(1.0)
-            st.success(f"✓ Treino concluído!\n- Anomaly Detectors: {trained_anomaly}/{len(selected_ids)}\n- Forecasters: {trained_forecaster}/{len(selected_ids)}")
+            st.success(f"✓ Treino concluído em {results['duration_sec']}s!\n- Anomaly Detectors: {results['anomaly_trained']}/{len(selected_ids)}\n- Forecasters: {results['forecaster_trained']}/{len(selected_ids)}\n- Inalterados (modelo salvo reaproveitado): {results['unchanged']}")
+            if results['failed']:
+                st.warning(f"⚠️ {results['failed']} treinos falharam (ver logs)")
 
     st.divider()
 
@@ -14,7 +14,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.insert(0, project_root)
 
 from config.settings import Config
-from src.data.database import DatabaseManager
+from src.data.database import get_shared_db_manager
 from src.data.repositories import RepositoryFactory
 
 # Page config
@@ -89,10 +89,8 @@ st.markdown("""
 def get_sensor_data(sensor_id_af):
     """Obtém dados do sensor a partir do ID_AF"""
     try:
-        db = DatabaseManager(Config.DATABASE_URL)
-        repo = RepositoryFactory.create_repository('sensor', db)
-        sensor = repo.get_by_id_af(sensor_id_af)
-        return sensor
+        with get_shared_db_manager(Config.DATABASE_URL, read_only=True).session_scope() as session:
+            return RepositoryFactory(session).sensor_config().get_by_id_af(sensor_id_af)
     except Exception as e:
         st.error(f"Erro ao buscar sensor: {e}")
         return None
@@ -100,21 +98,21 @@ def get_sensor_data(sensor_id_af):
 def get_sensor_readings(sensor_id, hours=24):
     """Obtém leituras do sensor nos últimas N horas"""
     try:
-        db = DatabaseManager(Config.DATABASE_URL)
-        repo = RepositoryFactory.create_repository('reading', db)
-        
-        # Buscar leituras do período
+        # Buscar série do período (agregados de 10 min / 1 h em janelas longas)
         start_date = datetime.now() - timedelta(hours=hours)
-        readings = repo.get_readings_for_sensor(sensor_id, start_date, datetime.now())
+        with get_shared_db_manager(Config.DATABASE_URL, read_only=True).session_scope() as session:
+            points = RepositoryFactory(session).sensor_reading().get_series(
+                [sensor_id], start_date, datetime.now()
+            )
         
-        if readings:
+        if points:
             df = pd.DataFrame([
                 {
-                    'timestamp': r.timestamp,
-                    'value': r.value,
-                    'unit': r.unit
+                    'timestamp': p.timestamp,
+                    'value': p.value,
+                    'max_value': p.max_value
                 }
-                for r in readings
+                for p in points
             ])
             df['timestamp'] = pd.to_datetime(df['timestamp'])
             return df.sort_values('timestamp')
@@ -126,10 +124,8 @@ def get_sensor_readings(sensor_id, hours=24):
 def get_voting_groups(grupo):
     """Obtém lista de sensores no mesmo grupo de votação"""
     try:
-        db = DatabaseManager(Config.DATABASE_URL)
-        repo = RepositoryFactory.create_repository('sensor', db)
-        sensors = repo.get_by_grupo(grupo)
-        return sensors
+        with get_shared_db_manager(Config.DATABASE_URL, read_only=True).session_scope() as session:
+            return RepositoryFactory(session).sensor_config().get_by_grupo(grupo)
     except Exception as e:
         st.warning(f"Erro ao buscar grupo: {e}")
         return []
@@ -152,6 +148,16 @@ def create_historical_chart(df, title, y_label):
         fillcolor='rgba(102, 126, 234, 0.2)'
     ))
     
+    # Em janelas agregadas 'value' é a média do intervalo: o máximo mostra picos curtos
+    if (df['max_value'] > df['value']).any():
+        fig.add_trace(go.Scatter(
+            x=df['timestamp'],
+            y=df['max_value'],
+            mode='lines',
+            name='Máximo do intervalo',
+            line=dict(color='#dc3545', width=1, dash='dot')
+        ))
+    
     fig.update_layout(
         title=title,
         xaxis_title='Data/Hora',
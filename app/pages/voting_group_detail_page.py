@@ -7,6 +7,7 @@ import os
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.colors import qualitative
 from datetime import datetime, timedelta
 
 # Add project root to path
@@ -14,8 +15,8 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.insert(0, project_root)
 
 from config.settings import Config
-from src.data.database import DatabaseManager
-from src.data.repositories import RepositoryFactory
+from src.data.database import get_shared_db_manager
+from src.data.repositories import RepositoryFactory, SeriesPoint
 
 # Page config
 st.set_page_config(
@@ -94,36 +95,34 @@ st.markdown("""
 def get_voting_group_sensors(grupo):
     """Obtém todos os sensores de um grupo de votação"""
     try:
-        db = DatabaseManager(Config.DATABASE_URL)
-        repo = RepositoryFactory.create_repository('sensor', db)
-        sensors = repo.get_by_grupo(grupo)
-        return sensors
+        with get_shared_db_manager(Config.DATABASE_URL, read_only=True).session_scope() as session:
+            return RepositoryFactory(session).sensor_config().get_by_grupo(grupo)
     except Exception as e:
         st.error(f"Erro ao buscar sensores do grupo: {e}")
         return []
 
+def get_voting_group_status(grupo):
+    """Obtém o estado MooN publicado pelo scheduler (tabela voting_group_status)"""
+    try:
+        with get_shared_db_manager(Config.DATABASE_URL, read_only=True).session_scope() as session:
+            return RepositoryFactory(session).voting_group_status().get(grupo)
+    except Exception as e:
+        st.warning(f"Estado do grupo indisponível: {e}")
+        return None
+
 def get_aggregated_readings(sensor_ids, hours=24):
     """Obtém leituras agregadas de múltiplos sensores"""
     try:
-        db = DatabaseManager(Config.DATABASE_URL)
-        repo = RepositoryFactory.create_repository('reading', db)
-        
-        all_readings = []
+        # Uma consulta para o grupo inteiro; 7/30 dias usam agregados de 10 min / 1 h
         start_date = datetime.now() - timedelta(hours=hours)
+        with get_shared_db_manager(Config.DATABASE_URL, read_only=True).session_scope() as session:
+            points = RepositoryFactory(session).sensor_reading().get_series(
+                sensor_ids, start_date, datetime.now()
+            )
         
-        for sensor_id in sensor_ids:
-            readings = repo.get_readings_for_sensor(sensor_id, start_date, datetime.now())
-            if readings:
-                for r in readings:
-                    all_readings.append({
-                        'sensor_id': sensor_id,
-                        'timestamp': r.timestamp,
-                        'value': r.value,
-                        'unit': r.unit
-                    })
-        
-        if all_readings:
-            df = pd.DataFrame(all_readings)
+        if points:
+            df = pd.DataFrame(points, columns=SeriesPoint._fields)
+            df = df[['sensor_id', 'timestamp', 'value', 'max_value']]
             df['timestamp'] = pd.to_datetime(df['timestamp'])
             return df.sort_values('timestamp')
         return None
@@ -139,17 +138,33 @@ def create_group_historical_chart(df, title):
     fig = go.Figure()
     
     # Adicionar uma série para cada sensor
-    for sensor_id in df['sensor_id'].unique():
+    colors = qualitative.Plotly
+    for i, sensor_id in enumerate(df['sensor_id'].unique()):
         sensor_data = df[df['sensor_id'] == sensor_id].sort_values('timestamp')
+        color = colors[i % len(colors)]
         
         fig.add_trace(go.Scatter(
             x=sensor_data['timestamp'],
             y=sensor_data['value'],
             mode='lines',
             name=f'Sensor {sensor_id}',
-            line=dict(width=2),
+            legendgroup=str(sensor_id),
+            line=dict(width=2, color=color),
             hovertemplate='<b>%{fullData.name}</b><br>%{x}<br>Valor: %{y:.2f}<extra></extra>'
         ))
+        
+        # Em janelas agregadas 'value' é a média do intervalo: o máximo mostra picos curtos
+        if (sensor_data['max_value'] > sensor_data['value']).any():
+            fig.add_trace(go.Scatter(
+                x=sensor_data['timestamp'],
+                y=sensor_data['max_value'],
+                mode='lines',
+                name=f'Sensor {sensor_id} (máx)',
+                legendgroup=str(sensor_id),
+                showlegend=False,
+                line=dict(width=1, dash='dot', color=color),
+                hovertemplate='<b>%{fullData.name}</b><br>%{x}<br>Máximo: %{y:.2f}<extra></extra>'
+            ))
     
     fig.update_layout(
         title=title,
@@ -213,6 +228,21 @@ def main():
     
     st.markdown("---")
     
+    # Estado da votação (MooN)
+    group_status = get_voting_group_status(voting_group)
+    if group_status:
+        state_icons = {'NORMAL': '🟢', 'DEGRADED': '🟡', 'ALARM': '🟠',
+                       'INOPERATIVE': '⚫', 'TRIPPED': '🔴'}
+        st.markdown(
+            f"**Votação {group_status.votes_required}oo{group_status.members}:** "
+            f"{state_icons.get(group_status.state, '⚪')} {group_status.state} — "
+            f"{group_status.tripped} trip, {group_status.alarm} alarme, "
+            f"{group_status.faulted} falha, {group_status.bypassed} bypass "
+            f"(desde {group_status.changed_at:%d/%m/%Y %H:%M:%S})"
+        )
+    else:
+        st.caption("Estado da votação ainda não avaliado pelo scheduler.")
+    
     # Estatísticas do grupo
     col1, col2, col3, col4 = st.columns(4)
     
@@ -19,11 +19,28 @@ class Config:
     PI_SERVER_PASSWORD: str = os.getenv('PI_SERVER_PASSWORD', '')
     PI_DATA_ARCHIVE: str = os.getenv('PI_DATA_ARCHIVE', 'DEFAULT')
     PI_REQUEST_TIMEOUT: int = int(os.getenv('PI_REQUEST_TIMEOUT', '30'))
+    PI_FETCH_MAX_WORKERS: int = int(os.getenv('PI_FETCH_MAX_WORKERS', '8'))
+    PI_FETCH_TAG_TIMEOUT_SEC: float = float(os.getenv('PI_FETCH_TAG_TIMEOUT_SEC', '10'))  # < prazo do ciclo
+    PI_FETCH_CYCLE_TIMEOUT_SEC: float = float(os.getenv('PI_FETCH_CYCLE_TIMEOUT_SEC', '20'))  # 0 = sem limite
+    PI_FETCH_BULK_SIZE: int = int(os.getenv('PI_FETCH_BULK_SIZE', '0'))  # 0 = um tag por chamada
+    PI_FETCH_USE_RECORDED: bool = os.getenv('PI_FETCH_USE_RECORDED', 'true').lower() == 'true'
+    PI_FETCH_INITIAL_LOOKBACK_MIN: int = int(os.getenv('PI_FETCH_INITIAL_LOOKBACK_MIN', '60'))
+    PI_FETCH_MAX_BACKFILL_HOURS: int = int(os.getenv('PI_FETCH_MAX_BACKFILL_HOURS', '24'))
 
     # ==================== Database ====================
     DATABASE_URL: str = os.getenv('DATABASE_URL', 'sqlite:///./safeplan.db')
     DATABASE_ECHO_SQL: bool = os.getenv('DATABASE_ECHO_SQL', 'false').lower() == 'true'
     DATABASE_POOL_SIZE: int = int(os.getenv('DATABASE_POOL_SIZE', '20'))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv('DATABASE_MAX_OVERFLOW', '40'))
+    # Perfil de PRAGMAs do SQLite: performance (WAL, synchronous=NORMAL, mmap, cache) | default
+    SQLITE_PROFILE: str = os.getenv('SQLITE_PROFILE', 'performance').lower()
+    # none | monthly | daily: uma tabela de leituras por período (retenção via DROP TABLE)
+    READING_PARTITIONING: str = os.getenv('READING_PARTITIONING', 'none').lower()
+    # Validade da lista de partições em cache (partições criadas por outro processo aparecem ao expirar)
+    READING_PARTITION_CACHE_SEC: float = float(os.getenv('READING_PARTITION_CACHE_SEC', '60'))
+    # Resoluções dos agregados em segundos (cada uma múltipla da anterior; vazio = desligado)
+    READING_ROLLUP_RESOLUTIONS: str = os.getenv('READING_ROLLUP_RESOLUTIONS', '600,3600')
+    READING_ROLLUP_MIN_POINTS: int = int(os.getenv('READING_ROLLUP_MIN_POINTS', '500'))
 
     # ==================== Alerting ====================
     TEAMS_WEBHOOK_URL: str = os.getenv('TEAMS_WEBHOOK_URL', '')
@@ -31,6 +48,13 @@ class Config:
     ALERT_RETENTION_DAYS: int = int(os.getenv('ALERT_RETENTION_DAYS', '90'))
     ALERT_RETRY_MAX_ATTEMPTS: int = int(os.getenv('ALERT_RETRY_MAX_ATTEMPTS', '3'))
     ALERT_RETRY_BACKOFF_SECONDS: int = int(os.getenv('ALERT_RETRY_BACKOFF_SECONDS', '5'))
+    TEAMS_DISPATCH_WORKERS: int = int(os.getenv('TEAMS_DISPATCH_WORKERS', '4'))
+    TEAMS_DISPATCH_BATCH_SIZE: int = int(os.getenv('TEAMS_DISPATCH_BATCH_SIZE', '100'))
+    TEAMS_RATE_LIMIT_PER_MIN: int = int(os.getenv('TEAMS_RATE_LIMIT_PER_MIN', '60'))  # por webhook, 0 = sem limite
+    TEAMS_HTTP_TIMEOUT_SEC: int = int(os.getenv('TEAMS_HTTP_TIMEOUT_SEC', '10'))
+    TEAMS_COALESCE_WINDOW_SEC: int = int(os.getenv('TEAMS_COALESCE_WINDOW_SEC', '60'))  # 0 = sem espera
+    TEAMS_DIGEST_MAX_SENSORS: int = int(os.getenv('TEAMS_DIGEST_MAX_SENSORS', '10'))
+    ALERT_INDEX_REFRESH_SEC: int = int(os.getenv('ALERT_INDEX_REFRESH_SEC', '30'))  # 0 = nunca reidrata
 
     # ==================== ML Models ====================
     ML_MODEL_RETRAINING_DAY: str = os.getenv('ML_MODEL_RETRAINING_DAY', 'Sunday')
@@ -38,6 +62,32 @@ class Config:
     ANOMALY_THRESHOLD: float = float(os.getenv('ANOMALY_THRESHOLD', '0.7'))
     ML_DATA_WINDOW_DAYS: int = int(os.getenv('ML_DATA_WINDOW_DAYS', '60'))
     FORECAST_HORIZON_HOURS: int = int(os.getenv('FORECAST_HORIZON_HOURS', '24'))
+    ML_MODEL_DIR: str = os.getenv('ML_MODEL_DIR', 'models')  # Modelos treinados (ModelRegistry)
+    ML_MODEL_MAX_AGE_HOURS: float = float(os.getenv('ML_MODEL_MAX_AGE_HOURS', '168'))  # 0 = sem limite
+    ML_LOF_NEIGHBORS: int = int(os.getenv('ML_LOF_NEIGHBORS', '20'))
+    ML_LOF_ALGORITHM: str = os.getenv('ML_LOF_ALGORITHM', 'kd_tree')  # kd_tree, ball_tree, brute, auto
+    ML_ENSEMBLE_WEIGHTS: str = os.getenv('ML_ENSEMBLE_WEIGHTS', 'isolation_forest=0.5,lof=0.5')  # nome=peso; extras: zscore
+    ML_ENSEMBLE_NORMALIZATION: str = os.getenv('ML_ENSEMBLE_NORMALIZATION', 'minmax')  # minmax, rank, robust
+    ML_MODEL_REFRESH_SEC: float = float(os.getenv('ML_MODEL_REFRESH_SEC', '300'))  # Re-checa o registro de modelos
+    ML_ONLINE_SCORING: bool = os.getenv('ML_ONLINE_SCORING', 'true').lower() == 'true'  # Pontua leituras na ingestão
+    ML_TRAINING_WORKERS: int = int(os.getenv('ML_TRAINING_WORKERS', '0'))  # 0 = um por CPU
+    ML_TRAINING_TASK_TIMEOUT_SEC: float = float(os.getenv('ML_TRAINING_TASK_TIMEOUT_SEC', '600'))  # 0 = sem limite
+    ML_TRAINING_TASK_MEMORY_MB: int = int(os.getenv('ML_TRAINING_TASK_MEMORY_MB', '4096'))  # 0 = sem limite
+
+    # ==================== Voting Groups ====================
+    VOTING_DEFAULT_VOTES: int = int(os.getenv('VOTING_DEFAULT_VOTES', '2'))  # M padrão (2ooN)
+    VOTING_GROUP_VOTES: str = os.getenv('VOTING_GROUP_VOTES', '')  # JSON {"grupo": M} por grupo
+    VOTING_STALE_SEC: int = int(os.getenv('VOTING_STALE_SEC', '300'))  # Leitura mais velha = falha
+    VOTING_INDEX_REFRESH_SEC: int = int(os.getenv('VOTING_INDEX_REFRESH_SEC', '300'))
+
+    # ==================== Scheduler ====================
+    SCHEDULER_TIMEZONE: str = os.getenv('SCHEDULER_TIMEZONE', 'America/Sao_Paulo')
+    SCHEDULER_INGESTION_INTERVAL_SEC: int = int(os.getenv('SCHEDULER_INGESTION_INTERVAL_SEC', ALERT_CHECK_INTERVAL_SEC))
+    SCHEDULER_TEAMS_INTERVAL_SEC: int = int(os.getenv('SCHEDULER_TEAMS_INTERVAL_SEC', '30'))
+    SCHEDULER_RETENTION_HOUR: int = int(os.getenv('SCHEDULER_RETENTION_HOUR', '3'))
+    SCHEDULER_MISFIRE_GRACE_SEC: int = int(os.getenv('SCHEDULER_MISFIRE_GRACE_SEC', '60'))
+    SCHEDULER_JITTER_SEC: int = int(os.getenv('SCHEDULER_JITTER_SEC', '2'))
+    READING_RETENTION_DAYS: int = int(os.getenv('READING_RETENTION_DAYS', '365'))
 
     # ==================== Streaming & UI ====================
     STREAMLIT_SERVER_HEADLESS: bool = os.getenv('STREAMLIT_SERVER_HEADLESS', 'true').lower() == 'true'
@@ -66,6 +116,9 @@ class Config:
         if not cls.PI_SERVER_PASSWORD:
             errors.append("PI_SERVER_PASSWORD not configured")
 
+        if 0 < cls.PI_FETCH_CYCLE_TIMEOUT_SEC <= cls.PI_FETCH_TAG_TIMEOUT_SEC:
+            errors.append("PI_FETCH_TAG_TIMEOUT_SEC must be lower than PI_FETCH_CYCLE_TIMEOUT_SEC")
+
         # Valida Database
         if not cls.DATABASE_URL:
             errors.append("DATABASE_URL not configured")
@@ -85,24 +138,70 @@ class Config:
             'PI_SERVER': {
                 'host': cls.PI_SERVER_HOST,
                 'archive': cls.PI_DATA_ARCHIVE,
-                'timeout_sec': cls.PI_REQUEST_TIMEOUT
+                'timeout_sec': cls.PI_REQUEST_TIMEOUT,
+                'fetch_max_workers': cls.PI_FETCH_MAX_WORKERS,
+                'fetch_tag_timeout_sec': cls.PI_FETCH_TAG_TIMEOUT_SEC,
+                'fetch_cycle_timeout_sec': cls.PI_FETCH_CYCLE_TIMEOUT_SEC,
+                'fetch_bulk_size': cls.PI_FETCH_BULK_SIZE,
+                'fetch_use_recorded': cls.PI_FETCH_USE_RECORDED,
+                'fetch_initial_lookback_min': cls.PI_FETCH_INITIAL_LOOKBACK_MIN,
+                'fetch_max_backfill_hours': cls.PI_FETCH_MAX_BACKFILL_HOURS
             },
             'DATABASE': {
                 'url': cls.DATABASE_URL,
                 'pool_size': cls.DATABASE_POOL_SIZE,
-                'echo_sql': cls.DATABASE_ECHO_SQL
+                'max_overflow': cls.DATABASE_MAX_OVERFLOW,
+                'echo_sql': cls.DATABASE_ECHO_SQL,
+                'sqlite_profile': cls.SQLITE_PROFILE,
+                'reading_partitioning': cls.READING_PARTITIONING,
+                'reading_partition_cache_sec': cls.READING_PARTITION_CACHE_SEC,
+                'reading_rollup_resolutions': cls.READING_ROLLUP_RESOLUTIONS,
+                'reading_rollup_min_points': cls.READING_ROLLUP_MIN_POINTS
+            },
+            'VOTING': {
+                'default_votes': cls.VOTING_DEFAULT_VOTES,
+                'group_overrides': bool(cls.VOTING_GROUP_VOTES),
+                'stale_sec': cls.VOTING_STALE_SEC,
+                'index_refresh_sec': cls.VOTING_INDEX_REFRESH_SEC
+            },
+            'SCHEDULER': {
+                'timezone': cls.SCHEDULER_TIMEZONE,
+                'ingestion_interval_sec': cls.SCHEDULER_INGESTION_INTERVAL_SEC,
+                'teams_interval_sec': cls.SCHEDULER_TEAMS_INTERVAL_SEC,
+                'retention_hour': cls.SCHEDULER_RETENTION_HOUR,
+                'misfire_grace_sec': cls.SCHEDULER_MISFIRE_GRACE_SEC,
+                'jitter_sec': cls.SCHEDULER_JITTER_SEC,
+                'reading_retention_days': cls.READING_RETENTION_DAYS
             },
             'ALERTING': {
                 'check_interval_sec': cls.ALERT_CHECK_INTERVAL_SEC,
                 'retention_days': cls.ALERT_RETENTION_DAYS,
-                'teams_webhook_configured': bool(cls.TEAMS_WEBHOOK_URL)
+                'index_refresh_sec': cls.ALERT_INDEX_REFRESH_SEC,
+                'teams_webhook_configured': bool(cls.TEAMS_WEBHOOK_URL),
+                'teams_dispatch_workers': cls.TEAMS_DISPATCH_WORKERS,
+                'teams_dispatch_batch_size': cls.TEAMS_DISPATCH_BATCH_SIZE,
+                'teams_rate_limit_per_min': cls.TEAMS_RATE_LIMIT_PER_MIN,
+                'teams_http_timeout_sec': cls.TEAMS_HTTP_TIMEOUT_SEC,
+                'teams_coalesce_window_sec': cls.TEAMS_COALESCE_WINDOW_SEC,
+                'teams_digest_max_sensors': cls.TEAMS_DIGEST_MAX_SENSORS
             },
             'ML': {
                 'retraining_day': cls.ML_MODEL_RETRAINING_DAY,
                 'retraining_hour': cls.ML_MODEL_RETRAINING_HOUR,
                 'anomaly_threshold': cls.ANOMALY_THRESHOLD,
                 'data_window_days': cls.ML_DATA_WINDOW_DAYS,
-                'forecast_horizon_hours': cls.FORECAST_HORIZON_HOURS
+                'forecast_horizon_hours': cls.FORECAST_HORIZON_HOURS,
+                'model_dir': cls.ML_MODEL_DIR,
+                'model_max_age_hours': cls.ML_MODEL_MAX_AGE_HOURS,
+                'lof_neighbors': cls.ML_LOF_NEIGHBORS,
+                'lof_algorithm': cls.ML_LOF_ALGORITHM,
+                'ensemble_weights': cls.ML_ENSEMBLE_WEIGHTS,
+                'ensemble_normalization': cls.ML_ENSEMBLE_NORMALIZATION,
+                'model_refresh_sec': cls.ML_MODEL_REFRESH_SEC,
+                'online_scoring': cls.ML_ONLINE_SCORING,
+                'training_workers': cls.ML_TRAINING_WORKERS,
+                'training_task_timeout_sec': cls.ML_TRAINING_TASK_TIMEOUT_SEC,
+                'training_task_memory_mb': cls.ML_TRAINING_TASK_MEMORY_MB
             },
             'UI': {
                 'refresh_interval_sec': cls.DASHBOARD_REFRESH_INTERVAL_SEC
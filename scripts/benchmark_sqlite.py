@@ -0,0 +1,138 @@
+"""
+Benchmark de leitura/escrita concorrentes no SQLite por perfil de PRAGMAs.
+
+Um processo escritor grava ciclos de ingestão (uma leitura por sensor)
+enquanto processos leitores simulam o dashboard (últimas leituras + série
+de um sensor), como o scheduler e o Streamlit em produção.
+Compara o perfil 'default' (journal de rollback) com 'performance' (WAL).
+
+Usage:
+    python scripts/benchmark_sqlite.py [--sensors N] [--readers N] [--seconds S]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.data.database import DatabaseManager
+from src.data.models import SensorConfig
+from src.data.repositories import SensorReadingRepository
+
+
+def _writer(url: str, profile: str, sensors: int, stop, counts, start_ts: datetime):
+    """Processo escritor: um ciclo de ingestão (uma leitura por sensor) por iteração"""
+    db = DatabaseManager(url, sqlite_profile=profile)
+    cycle = 0
+    while not stop.is_set():
+        session = db.get_session()
+        try:
+            timestamp = start_ts + timedelta(minutes=cycle)
+            SensorReadingRepository(session).upsert_many([
+                {'sensor_id': sid, 'value': float(cycle % 50), 'timestamp': timestamp}
+                for sid in range(1, sensors + 1)
+            ])
+            with counts['writes'].get_lock():
+                counts['writes'].value += 1
+        except OperationalError:
+            session.rollback()
+            with counts['errors'].get_lock():
+                counts['errors'].value += 1
+        finally:
+            session.close()
+        cycle += 1
+
+
+def _reader(url: str, profile: str, stop, counts, latencies, start_ts: datetime):
+    """Processo leitor: consultas do dashboard em sessão somente leitura"""
+    db = DatabaseManager(url, read_only=True, sqlite_profile=profile)
+    local = []
+    while not stop.is_set():
+        session = db.get_session()
+        started = time.perf_counter()
+        try:
+            repo = SensorReadingRepository(session)
+            repo.get_latest_values()
+            repo.get_series([1], start_ts, start_ts + timedelta(hours=2))
+            local.append(time.perf_counter() - started)
+        except OperationalError:
+            with counts['errors'].get_lock():
+                counts['errors'].value += 1
+        finally:
+            session.close()
+    latencies.extend(local)
+
+
+def run_profile(profile: str, sensors: int, readers: int, seconds: float) -> dict:
+    """Executa o cenário concorrente num banco temporário com o perfil informado"""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db = DatabaseManager(url, sqlite_profile=profile)
+        db.create_all_tables()
+        session = db.get_session()
+        session.execute(insert(SensorConfig), [
+            {'internal_name': f'BENCH_{i}', 'display_name': f'Bench {i}', 'sensor_type': 'CH4_POINT',
+             'platform': 'P74', 'unit': '%LEL', 'enabled': True}
+            for i in range(sensors)
+        ])
+        session.commit()
+        session.close()
+        db.engine.dispose()
+
+        manager = mp.Manager()
+        stop = mp.Event()
+        counts = {'writes': mp.Value('i', 0), 'errors': mp.Value('i', 0)}
+        latencies = manager.list()
+        start_ts = datetime(2026, 1, 1)
+
+        processes = [mp.Process(target=_writer, args=(url, profile, sensors, stop, counts, start_ts))]
+        processes += [
+            mp.Process(target=_reader, args=(url, profile, stop, counts, latencies, start_ts))
+            for _ in range(readers)
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(seconds)
+        stop.set()
+        for process in processes:
+            process.join()
+
+        read_latencies = sorted(latencies)
+        manager.shutdown()
+
+    return {
+        'writes_per_sec': counts['writes'].value / seconds,
+        'reads_per_sec': len(read_latencies) / seconds,
+        'read_p95_ms': (read_latencies[int(len(read_latencies) * 0.95)] * 1000
+                        if read_latencies else None),
+        'errors': counts['errors'].value,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sensors', type=int, default=2000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.sensors} sensores, 1 escritor, {args.readers} leitores, {args.seconds}s por perfil")
+    for profile in ('default', 'performance'):
+        result = run_profile(profile, args.sensors, args.readers, args.seconds)
+        p95 = f"{result['read_p95_ms']:.1f}" if result['read_p95_ms'] is not None else '-'
+        print(f"  {profile:<12} escritas/s={result['writes_per_sec']:.2f} "
+              f"leituras/s={result['reads_per_sec']:.1f} p95 leitura={p95}ms "
+              f"erros={result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,7 @@ sys.path.insert(0, '/'.join(__file__.split('\\')[:-2]))
 
 from src.data.database import DatabaseManager
 from src.data.models import SensorConfig, SensorReading, AlertDefinition
+from src.data.repositories import SensorReadingRepository
 from config.settings import Config
 
 # Initialize database
@@ -180,6 +181,9 @@ def create_sample_readings():
             readings_created += 1
     
     session.commit()
+    reading_repo = SensorReadingRepository(session)
+    reading_repo.rebuild_latest()
+    reading_repo.rebuild_rollups()
     print(f"✓ {readings_created} leituras criadas com sucesso")
     session.close()
 
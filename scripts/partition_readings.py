@@ -0,0 +1,44 @@
+"""
+Script para mover as leituras da tabela sensor_readings original para as
+partições por período (READING_PARTITIONING=monthly|daily).
+
+Usage:
+    python scripts/partition_readings.py [--batch-days N]
+"""
+import argparse
+import os
+import sys
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from config.settings import Config
+from src.data.database import init_database
+from src.data.partitions import migrate_legacy
+
+
+def main():
+    """Migra sensor_readings para as partições"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-days', type=int, default=1,
+                        help='Dias de leituras por lote (um commit por lote)')
+    args = parser.parse_args()
+
+    if Config.READING_PARTITIONING == 'none':
+        print("[ERROR] Defina READING_PARTITIONING=monthly ou daily no .env")
+        return 1
+
+    db_manager = init_database(Config.DATABASE_URL)
+    session = db_manager.get_session()
+    try:
+        moved = migrate_legacy(session, db_manager.reading_partitions, args.batch_days)
+    finally:
+        session.close()
+
+    print(f"[OK] {moved} leituras migradas para partições {Config.READING_PARTITIONING}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
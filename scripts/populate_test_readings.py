@@ -12,6 +12,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.data.database import DatabaseManager
 from src.data.models import SensorConfig, SensorReading
+from src.data.repositories import SensorReadingRepository
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -83,6 +84,9 @@ def populate_test_readings(num_readings_per_sensor: int = 5, hours_back: int = 2
         
         # Commit all readings
         session.commit()
+        reading_repo = SensorReadingRepository(session)
+        reading_repo.rebuild_latest()
+        reading_repo.rebuild_rollups()
         logger.info(f"✓ Created {readings_created} test readings")
         logger.info(f"  Total: {total_sensors} sensors x {num_readings_per_sensor} readings each")
         
@@ -0,0 +1,70 @@
+"""
+Processo de longa duração que executa os jobs periódicos do SafePlan:
+ingestão do PI, avaliação de alertas, envio ao Teams, retenção e retreino.
+
+Uso:
+    python scripts/run_scheduler.py            # roda até Ctrl+C / SIGTERM
+    python scripts/run_scheduler.py --once ingestion alert_evaluation
+"""
+import os
+import sys
+import io
+import signal
+import argparse
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from config.settings import Config
+from src.data.database import init_database
+from src.scheduler.service import create_scheduler_service
+
+logging.basicConfig(
+    level=Config.LOG_LEVEL,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Inicializa o banco e executa o scheduler"""
+    parser = argparse.ArgumentParser(description='SafePlan scheduler')
+    parser.add_argument('--once', nargs='+', metavar='JOB',
+                        help='Executa os jobs informados uma única vez e sai')
+    args = parser.parse_args()
+
+    init_database(Config.DATABASE_URL)
+    service = create_scheduler_service()
+
+    if args.once:
+        for job_id in args.once:
+            result = service.run_job(job_id)
+            print(f"{job_id}: {result}")
+        return 0
+
+    def handle_signal(signum, frame):
+        logger.info(f"Sinal {signum} recebido, finalizando scheduler...")
+        service.shutdown(wait=False)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    logger.info(f"Configuração do scheduler: {Config.get_summary()['SCHEDULER']}")
+    service.run_forever()
+
+    for job_id, metrics in service.get_metrics().items():
+        logger.info(
+            f"{job_id}: {metrics['runs']} execuções, {metrics['failures']} falhas, "
+            f"média {metrics['avg_duration_sec']:.2f}s, máx {metrics['max_duration_sec']:.2f}s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
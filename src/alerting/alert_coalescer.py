@@ -0,0 +1,87 @@
+"""
+Alert Coalescer - Agrupa alertas disparados juntos (ex: vazamento de gás) para
+que cada plataforma/módulo/grupo de votação gere uma única notificação digest.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import Config
+from src.data.models import AlertHistory
+
+logger = logging.getLogger(__name__)
+
+GroupKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+class AlertCoalescer:
+    """
+    Agrupa alertas por (plataforma, módulo, grupo) e segura cada grupo até
+    que a janela de coalescência, contada a partir do primeiro alerta do
+    grupo, tenha passado.
+
+    O buffer é o próprio banco: alertas ainda sem notificação continuam
+    "não notificados" até o grupo ser liberado, então nada se perde se o
+    processo reiniciar no meio da janela.
+    """
+
+    def __init__(self, window_seconds: float = None):
+        """
+        Inicializa o coalescer.
+
+        Args:
+            window_seconds: Janela de coalescência em segundos (0 = libera imediatamente)
+        """
+        self.window_seconds = (window_seconds if window_seconds is not None
+                               else Config.TEAMS_COALESCE_WINDOW_SEC)
+
+    @staticmethod
+    def group_key(alert: AlertHistory) -> GroupKey:
+        """Retorna a chave (platform, modulo, grupo) do sensor do alerta"""
+        sensor = alert.sensor
+        if sensor is None:
+            return (None, None, None)
+        return (sensor.platform, sensor.modulo, sensor.grupo)
+
+    def group(self, alerts: List[AlertHistory]) -> Dict[GroupKey, List[AlertHistory]]:
+        """
+        Agrupa alertas pela chave do sensor, preservando a ordem de disparo.
+
+        Args:
+            alerts: Alertas a agrupar
+
+        Returns:
+            Dict chave → alertas do grupo
+        """
+        groups: Dict[GroupKey, List[AlertHistory]] = {}
+        for alert in sorted(alerts, key=lambda a: a.triggered_at or datetime.min):
+            groups.setdefault(self.group_key(alert), []).append(alert)
+        return groups
+
+    def ready_groups(self, alerts: List[AlertHistory],
+                     now: datetime = None) -> List[List[AlertHistory]]:
+        """
+        Retorna os grupos cuja janela já fechou.
+
+        Args:
+            alerts: Alertas ainda não notificados
+            now: Instante de referência (padrão: utcnow)
+
+        Returns:
+            Lista de grupos prontos para notificação (cada um com 1+ alertas)
+        """
+        now = now or datetime.utcnow()
+        window = timedelta(seconds=self.window_seconds)
+        ready = []
+        held = 0
+
+        for members in self.group(alerts).values():
+            first = members[0].triggered_at or now
+            if now - first >= window:
+                ready.append(members)
+            else:
+                held += len(members)
+
+        if held:
+            logger.debug(f"{held} alertas aguardando janela de coalescência")
+        return ready
@@ -6,13 +6,23 @@ import logging
 from datetime import datetime
 from typing import List, Optional, Dict
 from enum import Enum
+import numpy as np
+from sqlalchemy import insert, update, bindparam
 
+from config.settings import Config
+from src.alerting.alert_index import ActiveAlertIndex, IndexedAlert
 from src.data.database import get_db_manager
 from src.data.repositories import RepositoryFactory
 from src.data.models import AlertHistory, AlertDefinition
 
 logger = logging.getLogger(__name__)
 
+# Colunas de AlertHistory no formato do ActiveAlertIndex (IndexedAlert)
+_INDEX_COLUMNS = (
+    AlertHistory.alert_id, AlertHistory.sensor_id, AlertHistory.alert_def_id,
+    AlertHistory.severity_level, AlertHistory.status, AlertHistory.triggered_at
+)
+
 
 class AlertStatus(Enum):
     """Estados possíveis de um alerta"""
@@ -60,9 +70,18 @@ class AlertEngine:
     Implementa state machine: NEW → ACTIVE → ACKNOWLEDGED/RESOLVED
     """
 
-    def __init__(self):
-        """Inicializa AlertEngine"""
+    def __init__(self, alert_index: Optional[ActiveAlertIndex] = None):
+        """
+        Inicializa AlertEngine.
+
+        Args:
+            alert_index: Índice de alertas abertos (opcional, cria um novo se None).
+                         É hidratado do banco no primeiro uso.
+        """
         self.db_manager = get_db_manager()
+        if alert_index is None:
+            alert_index = ActiveAlertIndex(refresh_interval=Config.ALERT_INDEX_REFRESH_SEC)
+        self.alert_index = alert_index
 
     def evaluate_and_trigger(self, sensor_id: int, current_value: float,
                             alert_definitions: List[AlertDefinition],
@@ -87,8 +106,8 @@ class AlertEngine:
 
         try:
             repos = RepositoryFactory(session)
-            alert_def_repo = repos.alert_definition()
             alert_history_repo = repos.alert_history()
+            self.alert_index.ensure_fresh(session)
 
             # Check each alert definition
             for alert_def in alert_definitions:
@@ -139,11 +158,240 @@ class AlertEngine:
         except Exception as e:
             logger.error(f"Erro ao avaliar alertas para sensor {sensor_id}: {e}")
             session.rollback()
+            self.alert_index.invalidate()
         finally:
             session.close()
 
         return triggered_alerts
 
+    def evaluate_batch(self, latest_values: Optional[Dict[int, float]] = None,
+                       alert_definitions: Optional[List[AlertDefinition]] = None,
+                       anomaly_scores: Optional[Dict[int, float]] = None,
+                       forecast_values: Optional[Dict[int, float]] = None) -> Dict:
+        """
+        Avalia todas as definições de alerta contra os valores atuais de todos
+        os sensores numa única passada.
+
+        As condições são avaliadas de forma vetorizada (NumPy), os alertas
+        ativos são carregados com uma única consulta e criações, atualizações
+        e resoluções são gravadas numa única transação.
+
+        Definições ANOMALY/FORECAST sem score/previsão para o sensor, e
+        definições de sensores sem valor atual, não são avaliadas (os alertas
+        existentes permanecem como estão).
+
+        Args:
+            latest_values: sensor_id -> valor atual (padrão: última leitura de cada sensor)
+            alert_definitions: Definições a avaliar (padrão: todas as habilitadas)
+            anomaly_scores: sensor_id -> score de anomalia (0-1)
+            forecast_values: sensor_id -> valor predito pelo forecaster
+
+        Returns:
+            Dicionário com evaluated, created, updated, resolved e
+            triggered_alert_ids (alertas criados ou atualizados)
+        """
+        anomaly_scores = anomaly_scores or {}
+        forecast_values = forecast_values or {}
+        summary = {'evaluated': 0, 'created': 0, 'updated': 0, 'resolved': 0,
+                   'triggered_alert_ids': []}
+        session = self.db_manager.get_session()
+
+        try:
+            repos = RepositoryFactory(session)
+
+            if alert_definitions is None:
+                alert_definitions = repos.alert_definition().get_all_enabled()
+            definitions = [d for d in alert_definitions if d.enabled]
+            if not definitions:
+                return summary
+
+            if latest_values is None:
+                latest_values = {
+                    sensor_id: value
+                    for sensor_id, (_, value) in repos.sensor_reading().get_latest_values().items()
+                }
+
+            should_trigger, evaluated = self._evaluate_conditions(
+                definitions, latest_values, anomaly_scores, forecast_values
+            )
+
+            self.alert_index.ensure_fresh(session)
+
+            now = datetime.utcnow()
+            new_alerts = []
+            updates = []
+            resolved_ids = []
+
+            for i in np.flatnonzero(evaluated):
+                alert_def = definitions[i]
+                active_ids = self.alert_index.find_active(alert_def.sensor_id,
+                                                          alert_def.alert_def_id)
+
+                if should_trigger[i]:
+                    value = latest_values[alert_def.sensor_id]
+                    reason = self._trigger_reason(alert_def, value, anomaly_scores,
+                                                  forecast_values)
+                    if active_ids:
+                        # Deduplicação: atualiza o alerta já ativo
+                        updates.append({'b_alert_id': active_ids[0], 'b_value': value,
+                                        'b_notes': reason,
+                                        'b_alert_def_id': alert_def.alert_def_id,
+                                        'b_sensor_id': alert_def.sensor_id,
+                                        'b_severity': alert_def.severity_level})
+                    else:
+                        new_alerts.append({
+                            'alert_def_id': alert_def.alert_def_id,
+                            'sensor_id': alert_def.sensor_id,
+                            'sensor_value': value,
+                            'severity_level': alert_def.severity_level,
+                            'status': AlertStatus.ACTIVE.value,
+                            'triggered_at': now,
+                            'notes': reason
+                        })
+                else:
+                    resolved_ids.extend(active_ids)
+
+            table = AlertHistory.__table__
+            is_active = table.c.status == AlertStatus.ACTIVE.value
+            if updates:
+                result = session.execute(
+                    update(table)
+                    .where(table.c.alert_id == bindparam('b_alert_id'), is_active)
+                    .values(sensor_value=bindparam('b_value'), notes=bindparam('b_notes')),
+                    updates
+                )
+                if (not result.dialect.supports_sane_multi_rowcount
+                        or result.rowcount != len(updates)):
+                    # O índice pode estar até ALERT_INDEX_REFRESH_SEC atrasado: alertas
+                    # reconhecidos/resolvidos por outro processo não casam com o UPDATE
+                    # e o disparo vira um alerta novo
+                    updates, stale = self._split_stale_updates(session, updates, now)
+                    new_alerts.extend(stale)
+            if resolved_ids:
+                session.execute(
+                    update(table)
+                    .where(table.c.alert_id.in_(resolved_ids), is_active)
+                    .values(status=AlertStatus.RESOLVED.value, resolved_at=now)
+                )
+
+            created = []
+            if new_alerts:
+                created = [IndexedAlert(*row) for row in session.execute(
+                    insert(AlertHistory).returning(*_INDEX_COLUMNS), new_alerts
+                )]
+            session.commit()
+
+            for alert_id in resolved_ids:
+                self.alert_index.resolve(alert_id)
+            for alert in created:
+                self.alert_index.add(alert)
+
+            updated_ids = [u['b_alert_id'] for u in updates]
+            summary['evaluated'] = int(evaluated.sum())
+            summary['created'] = len(new_alerts)
+            summary['updated'] = len(updates)
+            summary['resolved'] = len(resolved_ids)
+            summary['triggered_alert_ids'] = [a.alert_id for a in created] + updated_ids
+
+            logger.info(
+                f"✓ Avaliação em lote: {summary['evaluated']} definições, "
+                f"{summary['created']} criados, {summary['updated']} atualizados, "
+                f"{summary['resolved']} resolvidos"
+            )
+
+        except Exception as e:
+            logger.error(f"Erro na avaliação de alertas em lote: {e}")
+            session.rollback()
+            self.alert_index.invalidate()
+        finally:
+            session.close()
+
+        return summary
+
+    def _split_stale_updates(self, session, updates: List[Dict], now: datetime) -> tuple:
+        """
+        Separa as atualizações que não casaram com um alerta ACTIVE no banco.
+
+        Returns:
+            Tuple (updates aplicadas, novos alertas para as demais)
+        """
+        ids = [u['b_alert_id'] for u in updates]
+        rows = session.query(*_INDEX_COLUMNS).filter(AlertHistory.alert_id.in_(ids)).all()
+        by_id = {row.alert_id: IndexedAlert(*row) for row in rows}
+
+        applied, stale = [], []
+        for u in updates:
+            alert = by_id.get(u['b_alert_id'])
+            if alert is not None and alert.status == AlertStatus.ACTIVE.value:
+                applied.append(u)
+                continue
+            if alert is None:
+                self.alert_index.resolve(u['b_alert_id'])
+            else:
+                self.alert_index.add(alert)
+            stale.append({
+                'alert_def_id': u['b_alert_def_id'],
+                'sensor_id': u['b_sensor_id'],
+                'sensor_value': u['b_value'],
+                'severity_level': u['b_severity'],
+                'status': AlertStatus.ACTIVE.value,
+                'triggered_at': now,
+                'notes': u['b_notes']
+            })
+        return applied, stale
+
+    def _evaluate_conditions(self, definitions: List[AlertDefinition],
+                             latest_values: Dict[int, float],
+                             anomaly_scores: Dict[int, float],
+                             forecast_values: Dict[int, float]) -> tuple:
+        """
+        Avalia as condições de todas as definições com arrays NumPy.
+
+        Returns:
+            Tuple (should_trigger, evaluated) de arrays booleanos alinhados a definitions
+        """
+        sensor_ids = [d.sensor_id for d in definitions]
+        condition = np.array([d.condition_type for d in definitions], dtype=object)
+        threshold = np.array([d.threshold_value for d in definitions], dtype=float)
+        anomaly_threshold = np.array([d.anomaly_threshold or 0.7 for d in definitions],
+                                     dtype=float)
+
+        values = np.array([latest_values.get(sid) for sid in sensor_ids], dtype=float)
+        scores = np.array([anomaly_scores.get(sid) for sid in sensor_ids], dtype=float)
+        forecasts = np.array([forecast_values.get(sid) for sid in sensor_ids], dtype=float)
+
+        is_threshold = condition == AlertCondition.THRESHOLD.value
+        is_anomaly = condition == AlertCondition.ANOMALY.value
+        is_forecast = condition == AlertCondition.FORECAST.value
+
+        # Comparações com NaN (limite ou valor ausente) são sempre False
+        with np.errstate(invalid='ignore'):
+            should_trigger = (
+                (is_threshold & (values > threshold))
+                | (is_anomaly & (scores > anomaly_threshold))
+                | (is_forecast & (forecasts > threshold))
+            )
+
+        evaluated = ~np.isnan(values) & (
+            is_threshold
+            | (is_anomaly & ~np.isnan(scores))
+            | (is_forecast & ~np.isnan(forecasts))
+        )
+        return should_trigger & evaluated, evaluated
+
+    def _trigger_reason(self, alert_def: AlertDefinition, value: float,
+                        anomaly_scores: Dict[int, float],
+                        forecast_values: Dict[int, float]) -> str:
+        """Monta a razão do disparo com as mesmas mensagens da avaliação por sensor"""
+        if alert_def.condition_type == AlertCondition.ANOMALY.value:
+            _, reason = self._check_anomaly(anomaly_scores[alert_def.sensor_id], alert_def)
+        elif alert_def.condition_type == AlertCondition.FORECAST.value:
+            _, reason = self._check_forecast(forecast_values[alert_def.sensor_id], value,
+                                             alert_def)
+        else:
+            _, reason = self._check_threshold(value, alert_def)
+        return reason
+
     def _check_threshold(self, value: float, alert_def: AlertDefinition) -> tuple:
         """
         Verifica se valor viola threshold definido.
@@ -239,16 +487,21 @@ class AlertEngine:
         Returns:
             AlertHistory object
         """
-        # Check if alert already active
-        active_alerts = alert_repo.get_active_by_sensor(sensor_id)
-
-        for active_alert in active_alerts:
-            if active_alert.alert_def_id == alert_def.alert_def_id:
+        # Check if alert already active (índice em memória, sem consulta)
+        for alert_id in self.alert_index.find_active(sensor_id, alert_def.alert_def_id):
+            active_alert = alert_repo.get_by_id(alert_id)
+            if active_alert is not None and active_alert.status == AlertStatus.ACTIVE.value:
                 # Alert already exists, just update value
                 active_alert.sensor_value = sensor_value
                 active_alert.notes = reason
                 return active_alert
 
+            # Reconhecido/resolvido por outro processo: atualiza o índice
+            if active_alert is None:
+                self.alert_index.resolve(alert_id)
+            else:
+                self.alert_index.add(active_alert)
+
         # Create new alert
         alert = alert_repo.create(
             alert_def_id=alert_def.alert_def_id,
@@ -256,6 +509,7 @@ class AlertEngine:
             sensor_value=sensor_value,
             severity_level=severity
         )
+        self.alert_index.add(alert)
 
         alert.notes = reason
         return alert
@@ -271,12 +525,10 @@ class AlertEngine:
             sensor_id: ID do sensor
         """
         try:
-            active_alerts = alert_repo.get_active_by_sensor(sensor_id)
-
-            for alert in active_alerts:
-                if alert.alert_def_id == alert_def.alert_def_id:
-                    logger.info(f"✓ Alerta resolvido: {alert.alert_id}")
-                    alert_repo.resolve(alert.alert_id)
+            for alert_id in self.alert_index.find_active(sensor_id, alert_def.alert_def_id):
+                logger.info(f"✓ Alerta resolvido: {alert_id}")
+                alert_repo.resolve(alert_id)
+                self.alert_index.resolve(alert_id)
 
         except Exception as e:
             logger.error(f"Erro ao resolver alerta: {e}")
@@ -304,6 +556,8 @@ class AlertEngine:
                 alert.notes = notes
 
             session.commit()
+            if alert:
+                self.alert_index.acknowledge(alert_id)
             logger.info(f"✓ Alerta {alert_id} reconhecido")
             return alert
 
@@ -332,6 +586,7 @@ class AlertEngine:
 
             alert = alert_repo.resolve(alert_id)
             session.commit()
+            self.alert_index.resolve(alert_id)
             logger.info(f"✓ Alerta {alert_id} resolvido")
             return alert
 
@@ -355,11 +610,7 @@ class AlertEngine:
             repos = RepositoryFactory(session)
             alert_repo = repos.alert_history()
 
-            # Get recent alerts (last 1000)
-            alerts = alert_repo.get_recent(limit=1000)
-            active = [a for a in alerts if a.status == AlertStatus.ACTIVE.value]
-
-            return active
+            return alert_repo.get_all_active()
 
         except Exception as e:
             logger.error(f"Erro ao buscar alertas ativos: {e}")
@@ -400,18 +651,37 @@ class AlertEngine:
         Retorna estatísticas de alertas.
 
         Returns:
-            Dict com contadores de alertas por severidade e status
+            Dict com contadores de alertas ativos por severidade e plataforma
+            (by_platform) e de alertas abertos por status (by_status)
         """
+        session = self.db_manager.get_session()
+
         try:
-            active_alerts = self.get_active_alerts()
+            # Uma única consulta GROUP BY, independente do volume de alertas.
+            # Não usa o índice em memória: o dashboard roda em outro processo
+            # que não vê os alertas criados pelo scheduler.
+            rows = RepositoryFactory(session).alert_history().count_by_status_severity_platform(
+                statuses=[AlertStatus.ACTIVE.value, AlertStatus.ACKNOWLEDGED.value]
+            )
 
             stats = {
-                'total_active': len(active_alerts),
-                'critical': len([a for a in active_alerts if a.severity_level == 4]),
-                'danger': len([a for a in active_alerts if a.severity_level == 3]),
-                'warning': len([a for a in active_alerts if a.severity_level == 2]),
-                'by_status': {}
+                'total_active': 0,
+                'critical': 0,
+                'danger': 0,
+                'warning': 0,
+                'by_status': {},
+                'by_platform': {}
             }
+            severity_keys = {4: 'critical', 3: 'danger', 2: 'warning'}
+
+            for status, severity, platform, count in rows:
+                stats['by_status'][status] = stats['by_status'].get(status, 0) + count
+                if status != AlertStatus.ACTIVE.value:
+                    continue
+                stats['total_active'] += count
+                if severity in severity_keys:
+                    stats[severity_keys[severity]] += count
+                stats['by_platform'][platform] = stats['by_platform'].get(platform, 0) + count
 
             return stats
 
@@ -421,8 +691,12 @@ class AlertEngine:
                 'total_active': 0,
                 'critical': 0,
                 'danger': 0,
-                'warning': 0
+                'warning': 0,
+                'by_status': {},
+                'by_platform': {}
             }
+        finally:
+            session.close()
 
 
 def create_alert_engine() -> AlertEngine:
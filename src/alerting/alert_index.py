@@ -0,0 +1,136 @@
+"""
+Índice em memória dos alertas abertos (ACTIVE / ACKNOWLEDGED).
+Permite deduplicação em O(1) sem consultar alert_history a cada disparo.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.data.models import AlertHistory
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ('ACTIVE', 'ACKNOWLEDGED')
+
+IndexedAlert = namedtuple(
+    'IndexedAlert',
+    ['alert_id', 'sensor_id', 'alert_def_id', 'severity_level', 'status', 'triggered_at']
+)
+
+
+class ActiveAlertIndex:
+    """
+    Índice dos alertas abertos por alert_id e por (sensor_id, alert_def_id).
+
+    É hidratado do banco com uma única consulta e mantido consistente pelo
+    AlertEngine a cada criação, reconhecimento e resolução. Como outros
+    processos (ex: o scheduler) também gravam alertas, o índice é
+    reidratado quando fica mais velho que refresh_interval segundos ou
+    após invalidate().
+    """
+
+    def __init__(self, refresh_interval: float = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o índice (vazio até hydrate()).
+
+        Args:
+            refresh_interval: Idade máxima em segundos antes de reidratar (0 = nunca)
+            clock: Função de relógio (substituível em testes)
+        """
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._by_id: Dict[int, IndexedAlert] = {}
+        self._active_by_key: Dict[Tuple[int, int], List[int]] = {}
+        self._hydrated_at: Optional[float] = None
+
+    def hydrate(self, session: Session):
+        """Carrega todos os alertas abertos do banco numa única consulta"""
+        rows = session.query(
+            AlertHistory.alert_id, AlertHistory.sensor_id, AlertHistory.alert_def_id,
+            AlertHistory.severity_level, AlertHistory.status, AlertHistory.triggered_at
+        ).filter(
+            AlertHistory.status.in_(OPEN_STATUSES)
+        ).order_by(AlertHistory.triggered_at.asc()).all()
+
+        with self._lock:
+            self._by_id.clear()
+            self._active_by_key.clear()
+            for row in rows:
+                self._insert(IndexedAlert(*row))
+            self._hydrated_at = self._clock()
+
+        logger.debug(f"Índice de alertas hidratado: {len(rows)} alertas abertos")
+
+    def needs_refresh(self) -> bool:
+        """True se o índice nunca foi hidratado, foi invalidado ou está velho"""
+        with self._lock:
+            if self._hydrated_at is None:
+                return True
+            if self.refresh_interval:
+                return self._clock() - self._hydrated_at > self.refresh_interval
+            return False
+
+    def ensure_fresh(self, session: Session):
+        """Reidrata o índice se needs_refresh()"""
+        if self.needs_refresh():
+            self.hydrate(session)
+
+    def invalidate(self):
+        """Força reidratação no próximo uso (ex: após rollback)"""
+        with self._lock:
+            self._hydrated_at = None
+
+    def find_active(self, sensor_id: int, alert_def_id: int) -> List[int]:
+        """Retorna os alert_ids ACTIVE de (sensor_id, alert_def_id), mais antigo primeiro"""
+        with self._lock:
+            return list(self._active_by_key.get((sensor_id, alert_def_id), ()))
+
+    def add(self, alert: AlertHistory):
+        """Registra um alerta recém-criado (ou reaberto)"""
+        entry = IndexedAlert(alert.alert_id, alert.sensor_id, alert.alert_def_id,
+                             alert.severity_level, alert.status or 'ACTIVE', alert.triggered_at)
+        with self._lock:
+            self._remove(alert.alert_id)
+            if entry.status in OPEN_STATUSES:
+                self._insert(entry)
+
+    def acknowledge(self, alert_id: int):
+        """Move um alerta para ACKNOWLEDGED (deixa de deduplicar novos disparos)"""
+        with self._lock:
+            entry = self._remove(alert_id)
+            if entry is not None:
+                self._insert(entry._replace(status='ACKNOWLEDGED'))
+
+    def resolve(self, alert_id: int):
+        """Remove um alerta resolvido do índice"""
+        with self._lock:
+            self._remove(alert_id)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def _insert(self, entry: IndexedAlert):
+        self._by_id[entry.alert_id] = entry
+        if entry.status == 'ACTIVE':
+            self._active_by_key.setdefault(
+                (entry.sensor_id, entry.alert_def_id), []
+            ).append(entry.alert_id)
+
+    def _remove(self, alert_id: int) -> Optional[IndexedAlert]:
+        entry = self._by_id.pop(alert_id, None)
+        if entry is None:
+            return None
+        if entry.status == 'ACTIVE':
+            key = (entry.sensor_id, entry.alert_def_id)
+            ids = self._active_by_key.get(key, [])
+            if alert_id in ids:
+                ids.remove(alert_id)
+            if not ids:
+                self._active_by_key.pop(key, None)
+        return entry
@@ -0,0 +1,218 @@
+"""
+Notification Dispatcher - Envia notificações da fila (outbox) notification_log.
+Desacopla a avaliação de alertas da latência do webhook do Teams.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.settings import Config
+from src.data.database import get_db_manager
+from src.data.repositories import RepositoryFactory
+from src.utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Consome a fila de notificações PENDING e envia ao webhook em paralelo.
+
+    Cada notificação é uma linha de notification_log (PENDING → SENT/FAILED).
+    Uma chamada a dispatch_pending() faz uma única tentativa por notificação
+    vencida: falhas transitórias (timeout, conexão, 429, 5xx) reagendam o
+    próximo envio com backoff exponencial em next_attempt_at, sem dormir na
+    thread do chamador. Após max_attempts a notificação é marcada FAILED.
+    """
+
+    def __init__(self, webhook_url: str = None, max_workers: int = None,
+                 batch_size: int = None, rate_limit_per_min: int = None,
+                 max_attempts: int = None, backoff_seconds: float = None,
+                 timeout: float = None, http_session: requests.Session = None,
+                 channel: str = 'TEAMS'):
+        """
+        Inicializa o dispatcher.
+
+        Args:
+            webhook_url: URL do webhook (opcional, usa Config se None)
+            max_workers: Threads de envio simultâneo
+            batch_size: Máximo de notificações por ciclo
+            rate_limit_per_min: Envios por minuto por webhook (0 = sem limite)
+            max_attempts: Tentativas antes de marcar FAILED
+            backoff_seconds: Base do backoff exponencial entre tentativas
+            timeout: Timeout HTTP em segundos
+            http_session: requests.Session compartilhada (opcional)
+            channel: Canal das notificações consumidas
+        """
+        self.webhook_url = webhook_url or Config.TEAMS_WEBHOOK_URL
+        self.max_workers = max_workers or Config.TEAMS_DISPATCH_WORKERS
+        self.batch_size = batch_size or Config.TEAMS_DISPATCH_BATCH_SIZE
+        self.max_attempts = max_attempts or Config.ALERT_RETRY_MAX_ATTEMPTS
+        self.backoff_seconds = (backoff_seconds if backoff_seconds is not None
+                                else Config.ALERT_RETRY_BACKOFF_SECONDS)
+        self.timeout = timeout or Config.TEAMS_HTTP_TIMEOUT_SEC
+        self.channel = channel
+        self.rate_limiter = RateLimiter(
+            rate_limit_per_min if rate_limit_per_min is not None
+            else Config.TEAMS_RATE_LIMIT_PER_MIN
+        )
+
+        self.http = http_session or self._create_http_session(self.max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create_http_session(pool_size: int) -> requests.Session:
+        """Cria sessão HTTP com pool de conexões keep-alive do tamanho do worker pool"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Content-Type': 'application/json'})
+        return session
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='teams-dispatch'
+                )
+            return self._executor
+
+    def dispatch_pending(self, now: datetime = None) -> Dict:
+        """
+        Envia as notificações PENDING vencidas e atualiza a fila.
+
+        Args:
+            now: Instante de referência (padrão: utcnow)
+
+        Returns:
+            Dict com sent, retried, failed e deferred (adiadas pelo rate limit)
+        """
+        now = now or datetime.utcnow()
+        summary = {'sent': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+
+        if not self.webhook_url:
+            logger.warning("Webhook Teams não configurado, fila não será processada")
+            return summary
+
+        session = get_db_manager().get_session()
+
+        try:
+            due = RepositoryFactory(session).notification_log().get_due(
+                now, limit=self.batch_size, channel=self.channel
+            )
+
+            to_send = []
+            for notification in due:
+                if not self.rate_limiter.try_acquire(self.webhook_url):
+                    summary['deferred'] = len(due) - len(to_send)
+                    break
+                to_send.append(notification)
+
+            futures = {
+                self.executor.submit(self._post, notification.message): notification
+                for notification in to_send
+            }
+
+            for future in as_completed(futures):
+                notification = futures[future]
+                status_code, error, retry_after = future.result()
+                notification.attempts = (notification.attempts or 0) + 1
+                notification.response_code = status_code
+
+                if error is None:
+                    notification.status = 'SENT'
+                    notification.sent_at = datetime.utcnow()
+                    notification.error_message = None
+                    summary['sent'] += 1
+                    continue
+
+                notification.error_message = error
+                if retry_after is None or notification.attempts >= self.max_attempts:
+                    notification.status = 'FAILED'
+                    summary['failed'] += 1
+                    logger.error(
+                        f"Notificação {notification.notification_id} falhou após "
+                        f"{notification.attempts} tentativa(s): {error}"
+                    )
+                else:
+                    delay = max(retry_after,
+                                self.backoff_seconds * (2 ** (notification.attempts - 1)))
+                    notification.next_attempt_at = now + timedelta(seconds=delay)
+                    summary['retried'] += 1
+                    logger.warning(
+                        f"Notificação {notification.notification_id} reagendada em {delay}s "
+                        f"(tentativa {notification.attempts}/{self.max_attempts}): {error}"
+                    )
+
+            session.commit()
+
+        except Exception as e:
+            logger.error(f"Erro ao processar fila de notificações: {e}")
+            session.rollback()
+        finally:
+            session.close()
+
+        if any(summary.values()):
+            logger.info(
+                f"✓ Fila Teams: {summary['sent']} enviadas, {summary['retried']} reagendadas, "
+                f"{summary['failed']} falhas, {summary['deferred']} adiadas"
+            )
+        return summary
+
+    def _post(self, message: str) -> Tuple[Optional[int], Optional[str], Optional[float]]:
+        """
+        Faz uma única tentativa de POST (executado no worker pool).
+
+        Args:
+            message: Corpo JSON já serializado
+
+        Returns:
+            Tupla (status_code, erro, retry_after). erro é None em caso de sucesso;
+            retry_after é None quando a falha não deve ser repetida.
+        """
+        try:
+            response = self.http.post(
+                self.webhook_url, data=(message or '{}').encode('utf-8'),
+                headers={'Content-Type': 'application/json'}, timeout=self.timeout
+            )
+        except requests.exceptions.Timeout:
+            return None, 'Timeout ao conectar Teams', 0
+        except requests.exceptions.ConnectionError as e:
+            return None, f'Erro de conexão com Teams: {e}', 0
+        except Exception as e:
+            return None, f'Erro ao enviar para Teams: {e}', None
+
+        if response.status_code == 200:
+            return 200, None, None
+
+        error = f'Teams retornou status {response.status_code}: {response.text[:500]}'
+        if response.status_code == 429 or response.status_code >= 500:
+            try:
+                retry_after = float(response.headers.get('Retry-After', 0))
+            except ValueError:
+                retry_after = 0
+            return response.status_code, error, retry_after
+
+        # Demais 4xx (payload inválido, webhook removido) não melhoram com retry
+        return response.status_code, error, None
+
+    def close(self):
+        """Encerra o worker pool e a sessão HTTP"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.http.close()
+
+
+def create_notification_dispatcher(webhook_url: str = None) -> NotificationDispatcher:
+    """Factory para criar instância de NotificationDispatcher"""
+    return NotificationDispatcher(webhook_url=webhook_url)
@@ -1,65 +1,140 @@
 """
 Teams Notifier - Envia notificações de alertas para Microsoft Teams via webhook.
-Implementa retry logic e logging de notificações.
+As mensagens são enfileiradas em notification_log e enviadas pelo NotificationDispatcher.
 """
 import logging
-import time
 import json
-from typing import Optional
+from collections import Counter
+from typing import List, Optional
 from datetime import datetime
 import requests
 
 from config.settings import Config
+from src.alerting.alert_coalescer import AlertCoalescer
+from src.alerting.notification_dispatcher import NotificationDispatcher
 from src.data.database import get_db_manager
 from src.data.repositories import RepositoryFactory
 from src.data.models import AlertHistory
 
 logger = logging.getLogger(__name__)
 
+SEVERITY_LABELS = {
+    1: "OK",
+    2: "⚠️ AVISO",
+    3: "🔴 PERIGO",
+    4: "🚨 CRÍTICO"
+}
+
+SEVERITY_COLORS = {
+    1: "0070C0",
+    2: "FFB900",
+    3: "D13438",
+    4: "A4373A"
+}
+
 
 class TeamsNotifier:
     """
     Envia notificações de alertas para Microsoft Teams via Incoming Webhook.
     """
 
-    def __init__(self, webhook_url: str = None):
+    def __init__(self, webhook_url: str = None,
+                 dispatcher: Optional[NotificationDispatcher] = None,
+                 coalescer: Optional[AlertCoalescer] = None):
         """
         Inicializa TeamsNotifier.
 
         Args:
             webhook_url: URL do webhook do Teams (opcional, usa Config se None)
+            dispatcher: NotificationDispatcher (opcional, criado com o mesmo webhook)
+            coalescer: AlertCoalescer (opcional, usa a janela de Config)
         """
         self.webhook_url = webhook_url or Config.TEAMS_WEBHOOK_URL
-        self.max_retries = Config.ALERT_RETRY_MAX_ATTEMPTS
-        self.retry_backoff = Config.ALERT_RETRY_BACKOFF_SECONDS
+        self.dispatcher = dispatcher or NotificationDispatcher(webhook_url=self.webhook_url)
+        self.coalescer = coalescer or AlertCoalescer()
 
         if not self.webhook_url:
             logger.warning("Teams webhook URL não configurada (TEAMS_WEBHOOK_URL)")
 
     def notify_alert(self, alert: AlertHistory) -> bool:
         """
-        Envia notificação de alerta para Teams.
+        Enfileira notificação de alerta para Teams (não bloqueia no envio HTTP).
 
         Args:
             alert: AlertHistory object
 
         Returns:
-            True se enviado com sucesso, False caso contrário
+            True se enfileirada, False caso contrário
         """
         if not self.webhook_url:
             logger.warning("Webhook Teams não configurado, pulando notificação")
             return False
 
-        # Format message
-        message = self._build_alert_message(alert)
+        return self.enqueue_alerts([alert]) == 1
 
-        # Send with retry
-        success = self._send_with_retry(message)
+    def enqueue_alerts(self, alerts: List[AlertHistory]) -> int:
+        """
+        Enfileira notificações PENDING para os alertas informados.
 
-        # Log notification
-        self._log_notification(alert, success, message)
+        Args:
+            alerts: Alertas a notificar
 
-        return success
+        Returns:
+            Número de notificações enfileiradas
+        """
+        entries = [
+            {
+                'alert_id': alert.alert_id,
+                'channel': 'TEAMS',
+                'message': json.dumps(self._build_alert_message(alert))
+            }
+            for alert in alerts
+        ]
+
+        session = get_db_manager().get_session()
+        try:
+            return RepositoryFactory(session).notification_log().enqueue_many(entries)
+        except Exception as e:
+            logger.error(f"Erro ao enfileirar notificações: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    def enqueue_groups(self, groups: List[List[AlertHistory]]) -> int:
+        """
+        Enfileira uma notificação por grupo: card individual para grupos de um
+        alerta e card digest para grupos maiores.
+
+        Args:
+            groups: Grupos de alertas (ver AlertCoalescer.ready_groups)
+
+        Returns:
+            Número de notificações enfileiradas (uma por grupo)
+        """
+        singles = [members[0] for members in groups if len(members) == 1]
+        queued = self.enqueue_alerts(singles) if singles else 0
+
+        session = get_db_manager().get_session()
+        try:
+            notif_repo = RepositoryFactory(session).notification_log()
+            for members in groups:
+                if len(members) == 1:
+                    continue
+                leader = max(members, key=lambda a: a.severity_level)
+                notif_repo.enqueue_digest(
+                    alert_id=leader.alert_id,
+                    message=json.dumps(self._build_digest_message(members)),
+                    covered_alert_ids=[a.alert_id for a in members if a is not leader]
+                )
+                queued += 1
+        except Exception as e:
+            logger.error(f"Erro ao enfileirar digest: {e}")
+            session.rollback()
+        finally:
+            session.close()
+
+        return queued
 
     def _build_alert_message(self, alert: AlertHistory) -> dict:
         """
@@ -78,21 +153,8 @@ class TeamsNotifier:
         platform = sensor.platform if sensor else "Desconhecido"
 
         # Alert info
-        severity_labels = {
-            1: "OK",
-            2: "⚠️ AVISO",
-            3: "🔴 PERIGO",
-            4: "🚨 CRÍTICO"
-        }
-        severity_label = severity_labels.get(alert.severity_level, "DESCONHECIDO")
-
-        severity_colors = {
-            1: "0070C0",
-            2: "FFB900",
-            3: "D13438",
-            4: "A4373A"
-        }
-        color = severity_colors.get(alert.severity_level, "000000")
+        severity_label = SEVERITY_LABELS.get(alert.severity_level, "DESCONHECIDO")
+        color = SEVERITY_COLORS.get(alert.severity_level, "000000")
 
         # Build Adaptive Card
         card = {
@@ -149,123 +211,99 @@ class TeamsNotifier:
 
         return card
 
-    def _send_with_retry(self, message: dict) -> bool:
+    def _build_digest_message(self, alerts: List[AlertHistory]) -> dict:
         """
-        Envia mensagem para Teams com retry logic.
+        Constrói card digest para um grupo de alertas disparados juntos.
 
         Args:
-            message: Mensagem formatada para Teams
+            alerts: Alertas do mesmo grupo (plataforma/módulo/grupo)
 
         Returns:
-            True se sucesso, False se falha após retries
-        """
-        for attempt in range(self.max_retries):
-            try:
-                headers = {'Content-Type': 'application/json'}
-
-                response = requests.post(
-                    self.webhook_url,
-                    json=message,
-                    headers=headers,
-                    timeout=10
-                )
-
-                if response.status_code == 200:
-                    logger.info(f"✓ Notificação enviada para Teams com sucesso")
-                    return True
-
-                else:
-                    logger.warning(
-                        f"Teams retornou status {response.status_code}: {response.text}"
-                    )
-
-            except requests.exceptions.Timeout:
-                logger.warning(f"Timeout ao conectar Teams (tentativa {attempt + 1}/{self.max_retries})")
-
-            except requests.exceptions.ConnectionError as e:
-                logger.warning(
-                    f"Erro de conexão com Teams (tentativa {attempt + 1}/{self.max_retries}): {e}"
-                )
-
-            except Exception as e:
-                logger.error(f"Erro ao enviar para Teams: {e}")
-
-            # Retry with backoff
-            if attempt < self.max_retries - 1:
-                wait_time = self.retry_backoff * (2 ** attempt)  # Exponential backoff
-                logger.info(f"Agendando retry em {wait_time}s...")
-                time.sleep(wait_time)
-
-        logger.error(f"Falha ao enviar notificação para Teams após {self.max_retries} tentativas")
-        return False
-
-    def _log_notification(self, alert: AlertHistory, success: bool, message: dict):
-        """
-        Registra tentativa de notificação no banco de dados.
-
-        Args:
-            alert: AlertHistory
-            success: Se envio foi bem-sucedido
-            message: Mensagem que foi tentada
+            Dict com formato de MessageCard para Teams
         """
-        try:
-            session = get_db_manager().get_session()
-            repos = RepositoryFactory(session)
-            notif_repo = repos.notification_log()
-
-            notification = notif_repo.create(
-                alert_id=alert.alert_id,
-                channel='TEAMS',
-                message=json.dumps(message),
-                status='SENT' if success else 'FAILED'
-            )
-
-            if success:
-                notif_repo.mark_sent(notification.notification_id, response_code=200)
-            else:
-                notif_repo.mark_failed(notification.notification_id, error_message="Falha após retries")
-
-            session.close()
-
-        except Exception as e:
-            logger.error(f"Erro ao registrar log de notificação: {e}")
+        platform, modulo, grupo = AlertCoalescer.group_key(alerts[0])
+        worst = max(a.severity_level for a in alerts)
+        worst_label = SEVERITY_LABELS.get(worst, "DESCONHECIDO")
+        location = " / ".join(part for part in (platform, modulo, grupo) if part) or "Desconhecido"
+
+        by_severity = Counter(a.severity_level for a in alerts)
+        severity_summary = ", ".join(
+            f"{SEVERITY_LABELS.get(level, level)}: {count}"
+            for level, count in sorted(by_severity.items(), reverse=True)
+        )
+
+        names = []
+        for alert in sorted(alerts, key=lambda a: -a.severity_level):
+            sensor = alert.sensor
+            name = sensor.display_name if sensor else f"Sensor {alert.sensor_id}"
+            if name not in names:
+                names.append(name)
+        max_names = Config.TEAMS_DIGEST_MAX_SENSORS
+        sensors_text = ", ".join(names[:max_names])
+        if len(names) > max_names:
+            sensors_text += f" e mais {len(names) - max_names}"
+
+        first = min(a.triggered_at for a in alerts)
+        last = max(a.triggered_at for a in alerts)
+
+        return {
+            "@type": "MessageCard",
+            "@context": "https://schema.org/extensions",
+            "summary": f"{worst_label} - {len(alerts)} alertas em {location}",
+            "themeColor": SEVERITY_COLORS.get(worst, "000000"),
+            "sections": [
+                {
+                    "activityTitle": f"{worst_label} - SafePlan Digest ({len(alerts)} alertas)",
+                    "activitySubtitle": f"Local: {location}",
+                    "facts": [
+                        {"name": "Plataforma:", "value": platform or "Desconhecido"},
+                        {"name": "Módulo:", "value": modulo or "N/A"},
+                        {"name": "Grupo:", "value": grupo or "N/A"},
+                        {"name": "Alertas:", "value": str(len(alerts))},
+                        {"name": "Pior Severidade:", "value": worst_label},
+                        {"name": "Por Severidade:", "value": severity_summary},
+                        {"name": "Sensores:", "value": sensors_text},
+                        {"name": "Período:", "value": f"{first.strftime('%d/%m/%Y %H:%M:%S')} - "
+                                                      f"{last.strftime('%H:%M:%S')}"}
+                    ],
+                    "markdown": True
+                }
+            ],
+            "potentialAction": [
+                {
+                    "@type": "OpenUri",
+                    "name": "Ver Dashboard",
+                    "targets": [
+                        {
+                            "os": "default",
+                            "uri": "http://localhost:8501"
+                        }
+                    ]
+                }
+            ]
+        }
 
     def notify_critical_alerts(self) -> int:
         """
-        Envia notificações para todos os alertas críticos/perigo ainda não notificados.
+        Agrupa os alertas críticos/perigo ainda não notificados, enfileira um
+        card (individual ou digest) por grupo cuja janela de coalescência
+        fechou e processa a fila.
 
         Returns:
-            Número de notificações enviadas
+            Número de notificações enviadas neste ciclo
         """
         try:
             session = get_db_manager().get_session()
-            repos = RepositoryFactory(session)
-            alert_repo = repos.alert_history()
-            notif_repo = repos.notification_log()
-
-            # Get recent critical alerts
-            recent_alerts = alert_repo.get_recent(limit=500)
-            critical_alerts = [
-                a for a in recent_alerts
-                if a.severity_level >= 3 and a.status == 'ACTIVE'
-            ]
-
-            notified_count = 0
-
-            for alert in critical_alerts:
-                # Check if already notified
-                notifications = notif_repo.get_by_alert(alert.alert_id)
-
-                if notifications:
-                    # Already notified, skip
-                    continue
+            try:
+                alerts = RepositoryFactory(session).alert_history().get_unnotified(min_severity=3)
+                queued = self.enqueue_groups(self.coalescer.ready_groups(alerts))
+            finally:
+                session.close()
 
-                # Send notification
-                if self.notify_alert(alert):
-                    notified_count += 1
+            if queued:
+                logger.info(f"✓ {queued} notificações enfileiradas para Teams")
 
-            session.close()
-            return notified_count
+            return self.dispatcher.dispatch_pending()['sent']
 
         except Exception as e:
             logger.error(f"Erro ao enviar notificações críticas: {e}")
@@ -3,9 +3,65 @@ Database connection and session management for SQLite backend.
 Handles database initialization, connection pooling, and session lifecycle.
 """
 import os
-from sqlalchemy import create_engine, event, text
+import re
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from sqlalchemy import create_engine, event, text, inspect
 from sqlalchemy.orm import sessionmaker, Session
-from src.data.models import Base
+from src.data.models import Base, SensorReading, AlertHistory, NotificationLog
+from src.data.partitions import register_partition_manager
+
+logger = logging.getLogger(__name__)
+
+# Perfis de PRAGMA do SQLite. 'performance' usa WAL para que os leitores do
+# dashboard não bloqueiem (nem sejam bloqueados pelo) escritor da ingestão;
+# 'default' mantém o journal de rollback padrão (apenas foreign_keys).
+SQLITE_PROFILES = {
+    'default': {},
+    'performance': {
+        'busy_timeout': 5000,      # ms de espera por lock antes de "database is locked"
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',   # seguro com WAL; fsync só no checkpoint
+        'mmap_size': 268435456,    # 256 MB
+        'cache_size': -65536,      # 64 MB (negativo = KiB)
+        'temp_store': 'MEMORY',
+    },
+}
+
+_PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def sqlite_pragmas(profile: str = None) -> Dict[str, object]:
+    """
+    Resolve os PRAGMAs de um perfil, com sobreposição por variável de ambiente
+    (SQLITE_BUSY_TIMEOUT, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE, SQLITE_TEMP_STORE).
+
+    Args:
+        profile: Nome do perfil (padrão: SQLITE_PROFILE ou 'performance')
+
+    Returns:
+        Dicionário pragma -> valor, na ordem de aplicação
+
+    Raises:
+        ValueError: Se o perfil ou algum valor for inválido
+    """
+    profile = (profile or os.getenv('SQLITE_PROFILE', 'performance')).lower()
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Perfil SQLite desconhecido: {profile}")
+
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in SQLITE_PROFILES['performance']:
+        value = os.getenv(f'SQLITE_{name.upper()}')
+        if value:
+            pragmas[name] = value
+
+    for name, value in pragmas.items():
+        if not _PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f"Valor inválido para PRAGMA {name}: {value}")
+    return pragmas
 
 
 class DatabaseManager:
@@ -14,25 +70,46 @@ class DatabaseManager:
     Fornece métodos para criar sessões e executar operações.
     """
 
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None, reading_partitioning: str = None,
+                 read_only: bool = False, sqlite_profile: str = None):
         """
         Inicializa DatabaseManager com URL do banco de dados.
 
         Args:
             database_url: URL de conexão SQLite (ex: sqlite:///./safeplan.db)
                          Se None, usa variável de ambiente DATABASE_URL
+            reading_partitioning: Particionamento de sensor_readings ('none',
+                         'monthly' ou 'daily'). Se None, usa READING_PARTITIONING
+            read_only: Conexões somente leitura (PRAGMA query_only), para sessões
+                         do dashboard que não devem disputar o lock de escrita
+            sqlite_profile: Perfil de PRAGMAs do SQLite (padrão: SQLITE_PROFILE)
         """
         if database_url is None:
             database_url = os.getenv('DATABASE_URL', 'sqlite:///./safeplan.db')
+        if reading_partitioning is None:
+            reading_partitioning = os.getenv('READING_PARTITIONING', 'none').lower()
 
         self.database_url = database_url
+        self.read_only = read_only
+        self.sqlite_pragmas = (sqlite_pragmas(sqlite_profile)
+                               if database_url.startswith('sqlite:') else {})
         self.engine = None
         self.SessionLocal = None
         self._init_engine()
+        self.reading_partitions = register_partition_manager(
+            self.engine, reading_partitioning,
+            cache_ttl=float(os.getenv('READING_PARTITION_CACHE_SEC', '60'))
+        )
 
     def _init_engine(self):
         """Inicializa SQLAlchemy engine com SQLite"""
         # Para SQLite em arquivo
+        echo = os.getenv('DATABASE_ECHO_SQL', 'false').lower() == 'true'
+        pool_args = {
+            'pool_size': int(os.getenv('DATABASE_POOL_SIZE', '20')),
+            'max_overflow': int(os.getenv('DATABASE_MAX_OVERFLOW', '40'))
+        }
+
         if self.database_url.startswith('sqlite:///'):
             # Cria arquivo do DB se não existir
             db_file = self.database_url.replace('sqlite:///', '')
@@ -40,26 +117,35 @@ class DatabaseManager:
             if db_dir and not os.path.exists(db_dir):
                 os.makedirs(db_dir, exist_ok=True)
 
+            # Banco em memória usa um pool de conexão única por thread (sem pool_size)
+            if db_file == ':memory:':
+                pool_args = {}
+
             self.engine = create_engine(
                 self.database_url,
                 connect_args={"check_same_thread": False},
-                echo=os.getenv('DATABASE_ECHO_SQL', 'false').lower() == 'true'
+                echo=echo,
+                **pool_args
             )
         else:
             # Para outros databases (PostgreSQL, etc)
             self.engine = create_engine(
                 self.database_url,
-                echo=os.getenv('DATABASE_ECHO_SQL', 'false').lower() == 'true',
-                pool_size=20,
-                max_overflow=40
+                echo=echo,
+                pool_pre_ping=True,
+                **pool_args
             )
 
-        # Configura eventos Foreign Key para SQLite
+        # Configura Foreign Keys e o perfil de PRAGMAs em cada conexão SQLite
         if self.database_url.startswith('sqlite:'):
             @event.listens_for(self.engine, 'connect')
             def set_sqlite_pragma(dbapi_conn, connection_record):
                 cursor = dbapi_conn.cursor()
                 cursor.execute('PRAGMA foreign_keys=ON')
+                for name, value in self.sqlite_pragmas.items():
+                    cursor.execute(f'PRAGMA {name}={value}')
+                if self.read_only:
+                    cursor.execute('PRAGMA query_only=ON')
                 cursor.close()
 
         # Cria sessionmaker
@@ -75,6 +161,111 @@ class DatabaseManager:
         Deve ser executado uma vez durante inicialização.
         """
         Base.metadata.create_all(bind=self.engine)
+        self._apply_schema_upgrades()
+
+    def _apply_schema_upgrades(self):
+        """
+        Aplica ajustes de schema em bancos criados por versões anteriores.
+        create_all() não altera tabelas existentes, então índices novos
+        precisam ser criados aqui de forma idempotente.
+        """
+        self._ensure_reading_unique_index()
+        self._ensure_alert_status_index()
+        self._ensure_notification_outbox_columns()
+        self._ensure_sensor_latest()
+        self._ensure_reading_rollups()
+
+    def _ensure_reading_rollups(self):
+        """
+        Popula sensor_reading_rollups a partir das leituras em bancos criados
+        antes da tabela (somente quando ela está vazia e há leituras).
+        """
+        from src.data.repositories import SensorReadingRepository
+
+        with self.engine.connect() as conn:
+            if conn.execute(text("SELECT 1 FROM sensor_reading_rollups LIMIT 1")).first():
+                return
+            if not conn.execute(text("SELECT 1 FROM sensor_latest LIMIT 1")).first():
+                return
+
+        session = self.get_session()
+        try:
+            count = SensorReadingRepository(session).rebuild_rollups()
+        finally:
+            session.close()
+        logger.info(f"✓ sensor_reading_rollups populada com {count} intervalos")
+
+    def _ensure_sensor_latest(self):
+        """
+        Popula sensor_latest a partir de sensor_readings em bancos criados
+        antes da tabela (somente quando ela está vazia e há leituras).
+        """
+        from src.data.repositories import SensorReadingRepository
+
+        with self.engine.connect() as conn:
+            if conn.execute(text("SELECT 1 FROM sensor_latest LIMIT 1")).first():
+                return
+            if not conn.execute(text("SELECT 1 FROM sensor_readings LIMIT 1")).first():
+                return
+
+        session = self.get_session()
+        try:
+            count = SensorReadingRepository(session).rebuild_latest()
+        finally:
+            session.close()
+        logger.info(f"✓ sensor_latest populada com {count} sensores")
+
+    def _ensure_notification_outbox_columns(self):
+        """
+        Adiciona as colunas da fila de notificações (attempts, next_attempt_at,
+        created_at, digest_id) e seus índices em bancos criados antes do outbox.
+        """
+        existing = {col['name'] for col in inspect(self.engine).get_columns('notification_log')}
+        missing = {
+            'created_at': 'DATETIME',
+            'attempts': 'INTEGER DEFAULT 0',
+            'next_attempt_at': 'DATETIME',
+            'digest_id': 'INTEGER'
+        }
+
+        with self.engine.begin() as conn:
+            for name, ddl in missing.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE notification_log ADD COLUMN {name} {ddl}"))
+                    logger.info(f"✓ Coluna notification_log.{name} criada")
+
+        for index in NotificationLog.__table__.indexes:
+            index.create(bind=self.engine, checkfirst=True)
+
+    def _ensure_alert_status_index(self):
+        """Garante o índice (status, severity_level) usado pelas estatísticas de alertas"""
+        for index in AlertHistory.__table__.indexes:
+            if index.name == 'idx_alert_history_status_severity':
+                index.create(bind=self.engine, checkfirst=True)
+
+    def _ensure_reading_unique_index(self):
+        """
+        Garante o índice único (sensor_id, timestamp) em sensor_readings.
+        Leituras duplicadas existentes são removidas antes (mantém a mais antiga).
+        """
+        index_name = 'uq_sensor_readings_sensor_timestamp'
+        existing = {ix['name'] for ix in inspect(self.engine).get_indexes('sensor_readings')}
+        if index_name in existing:
+            return
+
+        with self.engine.begin() as conn:
+            removed = conn.execute(text(
+                "DELETE FROM sensor_readings WHERE reading_id NOT IN ("
+                "SELECT MIN(reading_id) FROM sensor_readings GROUP BY sensor_id, timestamp)"
+            )).rowcount
+            if removed:
+                logger.warning(f"{removed} leituras duplicadas removidas de sensor_readings")
+
+            for index in SensorReading.__table__.indexes:
+                if index.name == index_name:
+                    index.create(bind=conn)
+
+        logger.info(f"✓ Índice {index_name} criado")
 
     def drop_all_tables(self):
         """
@@ -93,6 +284,25 @@ class DatabaseManager:
         """
         return self.SessionLocal()
 
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """
+        Context manager de sessão: reverte em caso de erro e sempre fecha,
+        devolvendo a conexão ao pool. Os repositórios fazem seus próprios commits.
+
+        Usage:
+            with db_manager.session_scope() as session:
+                sensors = RepositoryFactory(session).sensor_config().get_all()
+        """
+        session = self.get_session()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
     def close_session(self, session: Session):
         """
         Fecha uma sessão do banco de dados.
@@ -122,20 +332,25 @@ class DatabaseManager:
 # Global database manager instance
 _db_manager = None
 
+# Gerenciadores compartilhados no processo, por (url, read_only)
+_shared_managers: Dict[tuple, DatabaseManager] = {}
+_shared_lock = threading.Lock()
+
 
-def init_database(database_url: str = None) -> DatabaseManager:
+def init_database(database_url: str = None, reading_partitioning: str = None) -> DatabaseManager:
     """
     Inicializa o gerenciador de banco de dados global.
     Deve ser chamado uma vez na inicialização da aplicação.
 
     Args:
         database_url: URL de conexão SQLite (opcional)
+        reading_partitioning: 'none', 'monthly' ou 'daily' (opcional)
 
     Returns:
         DatabaseManager instance
     """
     global _db_manager
-    _db_manager = DatabaseManager(database_url)
+    _db_manager = DatabaseManager(database_url, reading_partitioning)
     _db_manager.create_all_tables()
     return _db_manager
 
@@ -158,6 +373,43 @@ def get_db_manager() -> DatabaseManager:
     return _db_manager
 
 
+def get_shared_db_manager(database_url: str = None, read_only: bool = False) -> DatabaseManager:
+    """
+    Retorna um DatabaseManager único por processo para a URL, reaproveitando
+    engine e pool entre chamadas (ex: a cada rerun das páginas do Streamlit).
+    Se o gerenciador global (init_database) usa a mesma URL, ele é reutilizado.
+
+    Args:
+        database_url: URL do banco (padrão: DATABASE_URL)
+        read_only: Conexões somente leitura (sessões do dashboard)
+
+    Returns:
+        DatabaseManager instance
+    """
+    database_url = database_url or os.getenv('DATABASE_URL', 'sqlite:///./safeplan.db')
+
+    with _shared_lock:
+        if not read_only and _db_manager is not None and _db_manager.database_url == database_url:
+            return _db_manager
+
+        key = (database_url, read_only)
+        manager = _shared_managers.get(key)
+        if manager is None:
+            manager = DatabaseManager(database_url, read_only=read_only)
+            _shared_managers[key] = manager
+        return manager
+
+
+def session_scope():
+    """
+    Context manager de sessão do gerenciador global (ver DatabaseManager.session_scope).
+
+    Raises:
+        RuntimeError: Se database não foi inicializado
+    """
+    return get_db_manager().session_scope()
+
+
 def get_db_session() -> Session:
     """
     Convenience function para obter nova sessão de banco.
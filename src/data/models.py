@@ -61,7 +61,7 @@ class SensorReading(Base):
     __table_args__ = (
         Index('idx_sensor_readings_sensor_id', 'sensor_id'),
         Index('idx_sensor_readings_timestamp', 'timestamp'),
-        Index('idx_sensor_timestamp', 'sensor_id', 'timestamp'),
+        Index('uq_sensor_readings_sensor_timestamp', 'sensor_id', 'timestamp', unique=True),
     )
 
     reading_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -79,6 +79,44 @@ class SensorReading(Base):
         return f"<SensorReading sensor_id={self.sensor_id} value={self.value} at {self.timestamp}>"
 
 
+class SensorLatest(Base):
+    """Última leitura de cada sensor, mantida na mesma transação da ingestão"""
+    __tablename__ = 'sensor_latest'
+
+    sensor_id = Column(Integer, ForeignKey('sensor_config.sensor_id', ondelete='CASCADE'), primary_key=True)
+    timestamp = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=False)
+    unit = Column(String(20), nullable=True)
+    data_quality = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SensorLatest sensor_id={self.sensor_id} value={self.value} at {self.timestamp}>"
+
+
+class SensorReadingRollup(Base):
+    """Agregados de leituras por intervalo (ex: 10 min, 1 h), mantidos na ingestão"""
+    __tablename__ = 'sensor_reading_rollups'
+
+    sensor_id = Column(Integer, ForeignKey('sensor_config.sensor_id', ondelete='CASCADE'), primary_key=True)
+    resolution = Column(Integer, primary_key=True)  # Tamanho do intervalo em segundos
+    bucket_start = Column(DateTime, primary_key=True)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    sum_value = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+
+    @property
+    def avg_value(self) -> float:
+        return self.sum_value / self.count if self.count else None
+
+    def __repr__(self):
+        return (f"<SensorReadingRollup sensor_id={self.sensor_id} {self.resolution}s "
+                f"at {self.bucket_start} n={self.count}>")
+
+
 class AlertDefinition(Base):
     """Definições de alertas (regras de triggering)"""
     __tablename__ = 'alert_definitions'
@@ -106,6 +144,7 @@ class AlertHistory(Base):
     __table_args__ = (
         Index('idx_alert_history_sensor_id', 'sensor_id'),
         Index('idx_alert_history_timestamp', 'triggered_at'),
+        Index('idx_alert_history_status_severity', 'status', 'severity_level'),
     )
 
     alert_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -156,12 +195,20 @@ class MLPrediction(Base):
 class NotificationLog(Base):
     """Log de notificações enviadas (Teams, etc.)"""
     __tablename__ = 'notification_log'
+    __table_args__ = (
+        Index('idx_notification_log_status_next', 'status', 'next_attempt_at'),
+        Index('idx_notification_log_alert_id', 'alert_id'),
+    )
 
     notification_id = Column(Integer, primary_key=True, autoincrement=True)
     alert_id = Column(Integer, ForeignKey('alert_history.alert_id'), nullable=False)
     channel = Column(String(20), default='TEAMS')
     message = Column(Text, nullable=True)
-    status = Column(String(20), default='PENDING')  # PENDING, SENT, FAILED
+    status = Column(String(20), default='PENDING')  # PENDING, SENT, FAILED, COALESCED
+    digest_id = Column(Integer, nullable=True)  # notification_id do digest que cobriu este alerta
+    created_at = Column(DateTime, default=datetime.utcnow)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)  # NULL = imediatamente
     sent_at = Column(DateTime, nullable=True)
     response_code = Column(Integer, nullable=True)
     error_message = Column(Text, nullable=True)
@@ -171,3 +218,24 @@ class NotificationLog(Base):
 
     def __repr__(self):
         return f"<NotificationLog alert_id={self.alert_id} status={self.status}>"
+
+
+class VotingGroupStatus(Base):
+    """Estado publicado de cada grupo de votação (MooN), mantido pelo VotingGroupEngine"""
+    __tablename__ = 'voting_group_status'
+    __table_args__ = (
+        Index('idx_voting_group_status_state', 'state'),
+    )
+
+    grupo = Column(String(100), primary_key=True)
+    state = Column(String(20), nullable=False)  # NORMAL, ALARM, DEGRADED, INOPERATIVE, TRIPPED
+    votes_required = Column(Integer, nullable=False)  # M de MooN
+    members = Column(Integer, nullable=False)         # N de MooN
+    tripped = Column(Integer, default=0)
+    alarm = Column(Integer, default=0)
+    faulted = Column(Integer, default=0)
+    bypassed = Column(Integer, default=0)
+    changed_at = Column(DateTime, default=datetime.utcnow)  # Última mudança de estado/contagens
+
+    def __repr__(self):
+        return f"<VotingGroupStatus grupo={self.grupo} {self.votes_required}oo{self.members} state={self.state}>"
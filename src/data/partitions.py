@@ -0,0 +1,316 @@
+"""
+Particionamento temporal de sensor_readings.
+Cada período (mês ou dia) vive numa tabela própria (sensor_readings_pYYYYMM ou
+sensor_readings_pYYYYMMDD): consultas por intervalo leem apenas as partições
+que cobrem o intervalo e a retenção remove partições inteiras com DROP TABLE.
+"""
+import logging
+import re
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column, Integer, Float, String, DateTime, ForeignKey, Index, MetaData, Table, event, inspect
+)
+from sqlalchemy.engine import Connection, Engine
+
+from src.data.models import SensorConfig, SensorReading
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = 'sensor_readings_p'
+GRANULARITIES = ('none', 'monthly', 'daily')
+
+_NAME_PATTERN = re.compile(rf'^{PARTITION_PREFIX}(\d{{6}}|\d{{8}})$')
+
+# Gerenciadores registrados por engine (repositórios só conhecem a sessão)
+_managers: 'weakref.WeakKeyDictionary[Engine, ReadingPartitionManager]' = weakref.WeakKeyDictionary()
+
+
+def _next_period(start: datetime, granularity: str) -> datetime:
+    """Início do período seguinte a `start` (limite exclusivo da partição)"""
+    if granularity == 'daily':
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return datetime(start.year + 1, 1, 1)
+    return datetime(start.year, start.month + 1, 1)
+
+
+class ReadingPartitionManager:
+    """
+    Gerencia as partições de leituras de uma engine.
+
+    As partições têm o mesmo schema de sensor_readings, com o índice único
+    (sensor_id, timestamp) próprio; a faixa de tempo de cada uma é dada pelo
+    nome. A tabela sensor_readings original continua sendo lida (dados
+    anteriores ao particionamento) até ser migrada com migrate_legacy().
+    O layout funciona igual no SQLite e no PostgreSQL.
+
+    A lista de partições fica em cache por cache_ttl segundos, para que
+    leituras e gravações não consultem o catálogo a cada instrução. Criar ou
+    remover partições invalida o cache (também no rollback da transação);
+    partições criadas por outro processo aparecem ao expirar o cache.
+    """
+
+    def __init__(self, granularity: str = 'monthly', cache_ttl: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o gerenciador.
+
+        Args:
+            granularity: 'monthly' ou 'daily'
+            cache_ttl: Validade em segundos da lista de partições (0 = sem cache)
+            clock: Função de relógio (substituível em testes)
+
+        Raises:
+            ValueError: Se a granularidade for inválida
+        """
+        if granularity not in GRANULARITIES[1:]:
+            raise ValueError(f"Granularidade de partição inválida: {granularity}")
+
+        self.granularity = granularity
+        self.cache_ttl = cache_ttl
+        self._clock = clock
+        self._metadata = MetaData()
+        self._tables: Dict[str, Table] = {}
+        self._lock = threading.Lock()
+        self._cached: Optional[List[Tuple[str, datetime, datetime]]] = None
+        self._cached_at = 0.0
+
+    # ----------------------------------------------------------- períodos
+
+    def period_start(self, timestamp: datetime) -> datetime:
+        """Início do período que contém o timestamp"""
+        if self.granularity == 'daily':
+            return datetime(timestamp.year, timestamp.month, timestamp.day)
+        return datetime(timestamp.year, timestamp.month, 1)
+
+    def period_end(self, start: datetime) -> datetime:
+        """Início do período seguinte (limite exclusivo da partição)"""
+        return _next_period(start, self.granularity)
+
+    def partition_name(self, timestamp: datetime) -> str:
+        """Nome da partição que armazena o timestamp"""
+        fmt = '%Y%m%d' if self.granularity == 'daily' else '%Y%m'
+        return f"{PARTITION_PREFIX}{timestamp.strftime(fmt)}"
+
+    @staticmethod
+    def parse_partition_name(name: str) -> Optional[Tuple[datetime, str]]:
+        """
+        Extrai (início, granularidade) do nome de uma partição.
+
+        Returns:
+            Tupla (início do período, 'monthly'/'daily') ou None se não for partição
+        """
+        match = _NAME_PATTERN.match(name)
+        if not match:
+            return None
+        suffix = match.group(1)
+        if len(suffix) == 8:
+            return datetime.strptime(suffix, '%Y%m%d'), 'daily'
+        return datetime.strptime(suffix, '%Y%m'), 'monthly'
+
+    # ------------------------------------------------------------- tabelas
+
+    def table(self, name: str) -> Table:
+        """Retorna (e memoriza) o objeto Table de uma partição"""
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None:
+                table = Table(
+                    name, self._metadata,
+                    Column('reading_id', Integer, primary_key=True, autoincrement=True),
+                    Column('sensor_id', Integer, ForeignKey(SensorConfig.__table__.c.sensor_id),
+                           nullable=False),
+                    Column('value', Float, nullable=False),
+                    Column('timestamp', DateTime, nullable=False),
+                    Column('unit', String(20), nullable=True),
+                    Column('data_quality', Integer, default=0),
+                    Column('fetched_at', DateTime, default=datetime.utcnow),
+                    Index(f'uq_{name}_sensor_timestamp', 'sensor_id', 'timestamp', unique=True),
+                )
+                self._tables[name] = table
+            return table
+
+    def list_partitions(self, bind, refresh: bool = False) -> List[Tuple[str, datetime, datetime]]:
+        """
+        Lista as partições existentes em ordem cronológica.
+
+        Args:
+            bind: Engine ou conexão; use a conexão da sessão para enxergar
+                  partições criadas na transação corrente
+            refresh: Ignora o cache e consulta o catálogo
+
+        Returns:
+            Lista de tuplas (nome, início, fim exclusivo)
+        """
+        with self._lock:
+            if (not refresh and self._cached is not None
+                    and self._clock() - self._cached_at <= self.cache_ttl):
+                return list(self._cached)
+
+        partitions = []
+        for name in inspect(bind).get_table_names():
+            parsed = self.parse_partition_name(name)
+            if parsed is not None:
+                start, granularity = parsed
+                partitions.append((name, start, _next_period(start, granularity)))
+        partitions.sort(key=lambda p: p[1])
+
+        with self._lock:
+            if self.cache_ttl:
+                self._cached, self._cached_at = partitions, self._clock()
+        return list(partitions)
+
+    def invalidate(self):
+        """Descarta a lista de partições em cache"""
+        with self._lock:
+            self._cached = None
+
+    def _invalidate_on_rollback(self, conn: Connection):
+        """DDL desfeito no rollback não pode continuar no cache"""
+        event.listen(conn, 'rollback', lambda *_: self.invalidate(), once=True)
+
+    def partitions_for_range(self, bind, start: Optional[datetime],
+                             end: Optional[datetime]) -> List[Table]:
+        """
+        Partições que se sobrepõem ao intervalo fechado [start, end].
+
+        Args:
+            bind: Engine ou conexão a inspecionar
+            start: Início do intervalo (None = sem limite)
+            end: Fim do intervalo (None = sem limite)
+
+        Returns:
+            Tabelas das partições, em ordem cronológica
+        """
+        return [
+            self.table(name)
+            for name, p_start, p_end in self.list_partitions(bind)
+            if (start is None or p_end > start) and (end is None or p_start <= end)
+        ]
+
+    def ensure_partitions(self, timestamps: Iterable[datetime], conn: Connection) -> List[str]:
+        """
+        Cria as partições que faltam para os timestamps informados.
+
+        A criação usa a conexão da sessão, então faz parte da mesma transação
+        da carga: um rollback desfaz também a partição vazia.
+
+        Args:
+            timestamps: Timestamps das leituras a gravar
+            conn: Conexão da sessão corrente
+
+        Returns:
+            Nomes das partições criadas
+        """
+        needed = {self.partition_name(ts) for ts in timestamps}
+        existing = {name for name, _, _ in self.list_partitions(conn)}
+        if needed - existing:
+            # Confirma no catálogo antes de criar (cache pode estar atrasado)
+            existing = {name for name, _, _ in self.list_partitions(conn, refresh=True)}
+        created = sorted(needed - existing)
+        for name in created:
+            self.table(name).create(bind=conn, checkfirst=True)
+            logger.info(f"✓ Partição {name} criada")
+        if created:
+            self.invalidate()
+            self._invalidate_on_rollback(conn)
+        return created
+
+    def drop_before(self, before: datetime, conn: Connection) -> List[str]:
+        """
+        Remove (DROP TABLE) as partições inteiramente anteriores a `before`.
+
+        Args:
+            before: Limite da retenção
+            conn: Conexão da sessão corrente
+
+        Returns:
+            Nomes das partições removidas
+        """
+        dropped = []
+        for name, _, end in self.list_partitions(conn, refresh=True):
+            if end <= before:
+                self.table(name).drop(bind=conn)
+                dropped.append(name)
+        if dropped:
+            self.invalidate()
+            self._invalidate_on_rollback(conn)
+            logger.info(f"✓ {len(dropped)} partições de leituras removidas: {', '.join(dropped)}")
+        return dropped
+
+    def split_by_partition(self, readings: List[dict]) -> Dict[str, List[dict]]:
+        """Agrupa leituras (dicts com timestamp) pela partição de destino"""
+        groups: Dict[str, List[dict]] = {}
+        for reading in readings:
+            groups.setdefault(self.partition_name(reading['timestamp']), []).append(reading)
+        return groups
+
+
+def register_partition_manager(engine: Engine, granularity: str,
+                               cache_ttl: float = 60.0) -> Optional[ReadingPartitionManager]:
+    """
+    Registra o particionamento de uma engine.
+
+    Args:
+        engine: Engine do banco
+        granularity: 'none', 'monthly' ou 'daily'
+        cache_ttl: Validade em segundos da lista de partições em cache
+
+    Returns:
+        Gerenciador registrado, ou None quando o particionamento está desligado
+    """
+    if not granularity or granularity == 'none':
+        _managers.pop(engine, None)
+        return None
+    manager = ReadingPartitionManager(granularity, cache_ttl=cache_ttl)
+    _managers[engine] = manager
+    return manager
+
+
+def get_partition_manager(engine: Engine) -> Optional[ReadingPartitionManager]:
+    """Retorna o gerenciador de partições da engine (None = sem particionamento)"""
+    return _managers.get(engine)
+
+
+def migrate_legacy(session, manager: ReadingPartitionManager, batch_days: int = 1) -> int:
+    """
+    Move as leituras da tabela sensor_readings original para as partições,
+    em lotes de batch_days dias (um commit por lote).
+
+    Args:
+        session: Sessão do banco
+        manager: Gerenciador de partições
+        batch_days: Tamanho de cada lote em dias
+
+    Returns:
+        Número de leituras migradas
+    """
+    from src.data.repositories import SensorReadingRepository
+
+    legacy = SensorReading.__table__
+    columns = ['sensor_id', 'value', 'timestamp', 'unit', 'data_quality', 'fetched_at']
+    repo = SensorReadingRepository(session, partitions=manager)
+    moved = 0
+
+    while True:
+        first = session.query(legacy.c.timestamp).order_by(legacy.c.timestamp).limit(1).scalar()
+        if first is None:
+            break
+        until = datetime(first.year, first.month, first.day) + timedelta(days=batch_days)
+
+        rows = [dict(row._mapping) for row in session.execute(
+            legacy.select().with_only_columns(*[legacy.c[c] for c in columns])
+            .where(legacy.c.timestamp < until)
+        )]
+        repo.write_partitions(rows, on_conflict='update', skip_legacy=False)
+        session.execute(legacy.delete().where(legacy.c.timestamp < until))
+        session.commit()
+        moved += len(rows)
+        logger.info(f"✓ {moved} leituras migradas para partições (até {until})")
+
+    return moved
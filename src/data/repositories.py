@@ -2,18 +2,94 @@
 Data Access Objects (DAO) - Repository pattern for database operations.
 Abstrai lógica de persistência e permite operações CRUD tipadas.
 """
-from typing import List, Optional, Generic, TypeVar, Type
-from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from collections import namedtuple
+from typing import Dict, List, Optional, Generic, TypeVar, Type, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, joinedload
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    String, and_, or_, insert, literal, select, union_all, func, exists, type_coerce
+)
+from sqlalchemy.dialects import postgresql, sqlite
 
+from config.settings import Config
 from src.data.models import (
-    SensorConfig, SensorReading, AlertDefinition, AlertHistory,
-    MLPrediction, NotificationLog
+    SensorConfig, SensorReading, SensorLatest, SensorReadingRollup, AlertDefinition,
+    AlertHistory, MLPrediction, NotificationLog, VotingGroupStatus
 )
+from src.data.partitions import ReadingPartitionManager, get_partition_manager
 
 T = TypeVar('T')
 
+# Ponto de série temporal: leitura bruta (min = max = value, count = 1) ou intervalo agregado
+SeriesPoint = namedtuple(
+    'SeriesPoint', ['sensor_id', 'timestamp', 'value', 'min_value', 'max_value', 'count']
+)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def rollup_bucket(timestamp: datetime, resolution: int) -> datetime:
+    """Início do intervalo de `resolution` segundos que contém o timestamp"""
+    seconds = int((timestamp - _EPOCH).total_seconds()) // resolution * resolution
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def _bucket_runs(touched: Dict[int, set], resolution: int,
+                 chunk_size: int) -> List[Tuple[datetime, datetime, List[int]]]:
+    """
+    Agrupa os intervalos tocados em faixas contíguas [início, fim) por sensor e
+    junta os sensores com a mesma faixa, em lotes de até chunk_size sensores.
+    Num ciclo normal todos caem numa faixa só; um sensor que recupera 24 h de
+    atraso ganha a sua, sem arrastar os demais para o mesmo intervalo.
+
+    Args:
+        touched: sensor_id -> timestamps (ou inícios de intervalo) tocados
+        resolution: Resolução das faixas em segundos
+        chunk_size: Máximo de sensores por faixa (limita o IN (...))
+    """
+    step = timedelta(seconds=resolution)
+    groups: Dict[tuple, List[int]] = {}
+    for sensor_id, timestamps in touched.items():
+        buckets = sorted({rollup_bucket(timestamp, resolution) for timestamp in timestamps})
+        start = previous = buckets[0]
+        for bucket in buckets[1:]:
+            if bucket != previous + step:
+                groups.setdefault((start, previous + step), []).append(sensor_id)
+                start = bucket
+            previous = bucket
+        groups.setdefault((start, previous + step), []).append(sensor_id)
+    return [
+        (start, end, sensor_ids[i:i + chunk_size])
+        for (start, end), sensor_ids in groups.items()
+        for i in range(0, len(sensor_ids), chunk_size)
+    ]
+
+
+def parse_rollup_resolutions(raw: str) -> List[int]:
+    """
+    Converte READING_ROLLUP_RESOLUTIONS (ex: "600,3600") em lista ordenada.
+
+    Raises:
+        ValueError: Se uma resolução não for múltipla da anterior
+    """
+    resolutions = sorted({int(part) for part in (raw or '').split(',') if part.strip()})
+    for fine, coarse in zip(resolutions, resolutions[1:]):
+        if coarse % fine:
+            raise ValueError(f"Resolução {coarse}s não é múltipla de {fine}s")
+    return resolutions
+
+
+def _dialect_insert(session: Session, table):
+    """Retorna o INSERT do dialeto da sessão (suporta ON CONFLICT no SQLite e PostgreSQL)"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    raise NotImplementedError(f"upsert não suportado para o dialeto {dialect}")
+
 
 class BaseRepository(Generic[T]):
     """Base repository com operações CRUD genéricas"""
@@ -141,6 +217,23 @@ class SensorConfigRepository:
             SensorConfig.enabled == True
         ).all()
 
+    def get_voting_members(self) -> List[tuple]:
+        """
+        Retorna os membros de todos os grupos de votação numa única consulta,
+        incluindo sensores desabilitados (contam como bypass).
+
+        Returns:
+            Lista de tuplas (sensor_id, grupo, enabled, lower_ok_limit,
+            upper_warning_limit, upper_critical_limit)
+        """
+        return [tuple(row) for row in self.session.query(
+            SensorConfig.sensor_id, SensorConfig.grupo, SensorConfig.enabled,
+            SensorConfig.lower_ok_limit, SensorConfig.upper_warning_limit,
+            SensorConfig.upper_critical_limit
+        ).filter(
+            SensorConfig.grupo.isnot(None), SensorConfig.grupo != ''
+        ).order_by(SensorConfig.grupo, SensorConfig.sensor_id).all()]
+
     def get_all_enabled(self) -> List[SensorConfig]:
         """Retorna todos os sensores habilitados"""
         return self.session.query(SensorConfig).filter(
@@ -174,14 +267,43 @@ class SensorConfigRepository:
 
 
 class SensorReadingRepository:
-    """Repository para SensorReading (time-series)"""
-
-    def __init__(self, session: Session):
+    """
+    Repository para SensorReading (time-series).
+
+    Com particionamento ligado (READING_PARTITIONING), gravações vão para a
+    partição do período de cada leitura e consultas por intervalo leem só as
+    partições que o cobrem, além da tabela sensor_readings original.
+    """
+
+    READING_COLUMNS = ('reading_id', 'sensor_id', 'value', 'timestamp', 'unit',
+                       'data_quality', 'fetched_at')
+    # Sensores por IN (...) nas leituras multi-sensor (abaixo do limite de
+    # 999 parâmetros de SQLite antigos)
+    SENSOR_CHUNK_SIZE = 500
+
+    def __init__(self, session: Session, partitions: ReadingPartitionManager = None):
+        """
+        Args:
+            session: Sessão do banco
+            partitions: Gerenciador de partições (padrão: o registrado para a engine)
+        """
         self.session = session
+        self.partitions = (partitions if partitions is not None
+                           else get_partition_manager(session.get_bind()))
+        self.rollups = SensorReadingRollupRepository(session)
 
     def create(self, sensor_id: int, value: float, timestamp: datetime,
                unit: str = None, data_quality: int = 0) -> SensorReading:
         """Cria nova leitura de sensor"""
+        if self.partitions is not None:
+            row = {'sensor_id': sensor_id, 'value': value, 'timestamp': timestamp,
+                   'unit': unit, 'data_quality': data_quality, 'fetched_at': datetime.utcnow()}
+            self.write_partitions([row])
+            self._upsert_latest([row])
+            self._refresh_rollups([row])
+            self.session.commit()
+            return SensorReading(**row)
+
         reading = SensorReading(
             sensor_id=sensor_id,
             value=value,
@@ -190,26 +312,627 @@ class SensorReadingRepository:
             data_quality=data_quality
         )
         self.session.add(reading)
+        self.session.flush()
+        row = {'sensor_id': sensor_id, 'value': value, 'timestamp': timestamp,
+               'unit': unit, 'data_quality': data_quality}
+        self._upsert_latest([row])
+        self._refresh_rollups([row])
         self.session.commit()
         self.session.refresh(reading)
         return reading
 
+    def bulk_create(self, readings: List[dict]) -> int:
+        """
+        Insere várias leituras num único executemany e um único commit.
+        Evita o commit + refresh por linha de create() no ciclo de ingestão.
+
+        Args:
+            readings: Lista de dicts com sensor_id, value, timestamp, unit, data_quality
+
+        Returns:
+            Número de leituras inseridas
+        """
+        if not readings:
+            return 0
+
+        if self.partitions is not None:
+            self.write_partitions(readings)
+        else:
+            self.session.execute(insert(SensorReading), readings)
+        self._upsert_latest(readings)
+        self._refresh_rollups(readings)
+        self.session.commit()
+        return len(readings)
+
+    def upsert_many(self, readings: List[dict], update: bool = False) -> int:
+        """
+        Insere leituras de forma idempotente pela chave única (sensor_id, timestamp).
+        Usa INSERT ... ON CONFLICT no SQLite e no PostgreSQL, então reprocessar
+        uma janela sobreposta não duplica linhas.
+
+        Args:
+            readings: Lista de dicts com sensor_id, value, timestamp, unit, data_quality
+            update: Se True, sobrescreve valor/unidade/qualidade de leituras existentes
+                    (DO UPDATE); se False, ignora as já existentes (DO NOTHING)
+
+        Returns:
+            Número de linhas inseridas ou atualizadas (quando o driver informa)
+        """
+        if not readings:
+            return 0
+
+        if self.partitions is not None:
+            count = self.write_partitions(readings, on_conflict='update' if update else 'nothing')
+        else:
+            count = self._insert(SensorReading.__table__, readings,
+                                 on_conflict='update' if update else 'nothing')
+        self._upsert_latest(readings, replace_equal=update)
+        self._refresh_rollups(readings)
+        self.session.commit()
+        return count
+
+    def _insert(self, table, readings: List[dict], on_conflict: str = None) -> int:
+        """
+        Executa o INSERT (executemany) de leituras numa tabela de leituras.
+
+        Args:
+            table: sensor_readings ou uma partição
+            readings: Lista de dicts de leituras
+            on_conflict: None (INSERT simples), 'nothing' ou 'update'
+
+        Returns:
+            Número de linhas inseridas ou atualizadas (quando o driver informa)
+        """
+        if on_conflict is None:
+            self.session.execute(insert(table), readings)
+            return len(readings)
+
+        stmt = _dialect_insert(self.session, table)
+        conflict_keys = ['sensor_id', 'timestamp']
+        if on_conflict == 'update':
+            stmt = stmt.on_conflict_do_update(
+                index_elements=conflict_keys,
+                set_={
+                    'value': stmt.excluded.value,
+                    'unit': stmt.excluded.unit,
+                    'data_quality': stmt.excluded.data_quality,
+                    'fetched_at': stmt.excluded.fetched_at,
+                }
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict_keys)
+
+        result = self.session.execute(stmt, readings)
+        return result.rowcount if result.rowcount >= 0 else len(readings)
+
+    def write_partitions(self, readings: List[dict], on_conflict: str = None,
+                         skip_legacy: bool = True) -> int:
+        """
+        Grava leituras nas partições dos seus períodos (criando as que faltam),
+        na transação corrente. Um executemany por partição envolvida.
+
+        Até migrate_legacy(), uma (sensor_id, timestamp) já presente na
+        sensor_readings original é gravada lá: o ON CONFLICT da partição não
+        enxerga a tabela legada e a leitura ficaria duplicada.
+
+        Args:
+            readings: Lista de dicts com sensor_id, value, timestamp, unit, data_quality
+            on_conflict: None (INSERT simples), 'nothing' ou 'update'
+            skip_legacy: Se False, grava tudo nas partições (usado por migrate_legacy)
+
+        Returns:
+            Número de linhas inseridas ou atualizadas
+        """
+        count = 0
+        if skip_legacy:
+            readings, legacy_rows = self._split_legacy(readings)
+            if legacy_rows:
+                count += self._insert(SensorReading.__table__, legacy_rows, on_conflict)
+        if not readings:
+            return count
+
+        self.partitions.ensure_partitions(
+            (r['timestamp'] for r in readings), self.session.connection()
+        )
+        return count + sum(
+            self._insert(self.partitions.table(name), rows, on_conflict)
+            for name, rows in self.partitions.split_by_partition(readings).items()
+        )
+
+    def _split_legacy(self, readings: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        Separa as leituras cuja chave já existe na sensor_readings original.
+        Só leituras até o MAX(timestamp) legado (índice) são procuradas, então
+        o ciclo normal, mais novo que qualquer dado legado, não faz outra consulta.
+
+        Returns:
+            Tupla (leituras para as partições, leituras para a tabela legada)
+        """
+        legacy = SensorReading.__table__
+        newest = self.session.execute(select(func.max(legacy.c.timestamp))).scalar()
+        candidates = [r for r in readings if newest is not None and r['timestamp'] <= newest]
+        if not candidates:
+            return readings, []
+
+        first = min(r['timestamp'] for r in candidates)
+        ids = sorted({r['sensor_id'] for r in candidates})
+        existing = set()
+        for i in range(0, len(ids), self.SENSOR_CHUNK_SIZE):
+            existing.update(tuple(row) for row in self.session.execute(
+                select(legacy.c.sensor_id, legacy.c.timestamp).where(
+                    legacy.c.sensor_id.in_(ids[i:i + self.SENSOR_CHUNK_SIZE]),
+                    legacy.c.timestamp >= first,
+                    legacy.c.timestamp <= newest
+                )
+            ))
+        if not existing:
+            return readings, []
+        return ([r for r in readings if (r['sensor_id'], r['timestamp']) not in existing],
+                [r for r in readings if (r['sensor_id'], r['timestamp']) in existing])
+
+    def _reading_tables(self, start: datetime = None, end: datetime = None) -> list:
+        """
+        Tabelas que podem conter leituras em [start, end]: sensor_readings e,
+        com particionamento, somente as partições que se sobrepõem ao intervalo.
+        """
+        tables = [SensorReading.__table__]
+        if self.partitions is not None:
+            tables += self.partitions.partitions_for_range(self.session.connection(), start, end)
+        return tables
+
+    def _select_readings(self, table, sensor_id: int = None, start: datetime = None,
+                         end: datetime = None, data_quality: int = None):
+        """SELECT das colunas de leitura de uma tabela com os filtros informados"""
+        stmt = select(*[table.c[column] for column in self.READING_COLUMNS])
+        if sensor_id is not None:
+            stmt = stmt.where(table.c.sensor_id == sensor_id)
+        if start is not None:
+            stmt = stmt.where(table.c.timestamp >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.timestamp <= end)
+        if data_quality is not None:
+            stmt = stmt.where(table.c.data_quality == data_quality)
+        return stmt
+
+    def _fetch_raw(self, start: datetime, end: datetime,
+                   sensor_ids: List[int] = None) -> List[tuple]:
+        """
+        Tuplas (sensor_id, timestamp, value) em [start, end), de todas as tabelas
+        envolvidas. Uma (sensor_id, timestamp) presente no legado e numa partição
+        entra uma vez, com o valor da partição, para não contar em dobro nos agregados.
+        """
+        tables = self._reading_tables(start, end)
+        selects = []
+        for priority, table in enumerate(tables):
+            stmt = select(table.c.sensor_id, table.c.timestamp, table.c.value,
+                          literal(min(priority, 1)).label('source')).where(
+                table.c.timestamp >= start,
+                table.c.timestamp < end
+            )
+            if sensor_ids is not None:
+                stmt = stmt.where(table.c.sensor_id.in_(sensor_ids))
+            selects.append(stmt)
+        stmt = selects[0] if len(selects) == 1 else union_all(*selects)
+
+        rows: Dict[tuple, float] = {}
+        for sensor_id, timestamp, value, source in self.session.execute(stmt):
+            if source or (sensor_id, timestamp) not in rows:
+                rows[(sensor_id, timestamp)] = value
+        return [(sensor_id, timestamp, value) for (sensor_id, timestamp), value in rows.items()]
+
+    def _refresh_rollups(self, readings: List[dict]):
+        """
+        Recalcula, na transação corrente, os intervalos agregados tocados pelo lote.
+        Relê apenas os intervalos da resolução mais fina que contêm leituras de
+        cada sensor (faixas por sensor, nunca o intervalo do lote inteiro), então
+        reprocessar uma janela (upsert idempotente) não duplica contagens.
+        """
+        if not readings or not self.rollups.resolutions:
+            return
+        touched: Dict[int, set] = {}
+        for reading in readings:
+            touched.setdefault(reading['sensor_id'], set()).add(reading['timestamp'])
+
+        raw = []
+        for start, end, sensor_ids in _bucket_runs(touched, self.rollups.resolutions[0],
+                                                   self.SENSOR_CHUNK_SIZE):
+            raw += self._fetch_raw(start, end, sensor_ids)
+        self.rollups.refresh(raw)
+
+    def rebuild_rollups(self) -> int:
+        """
+        Recalcula todos os agregados a partir das leituras brutas, um dia por
+        transação. Usado na migração de bancos existentes e após cargas feitas
+        fora do repositório.
+
+        Returns:
+            Número de intervalos gravados
+        """
+        if not self.rollups.resolutions:
+            return 0
+
+        readings = self._all_readings()
+        first, last = self.session.execute(
+            select(func.min(readings.c.timestamp), func.max(readings.c.timestamp))
+        ).one()
+        if first is None:
+            return 0
+
+        coarsest = self.rollups.resolutions[-1]
+        step = timedelta(seconds=max(86400 // coarsest, 1) * coarsest)
+        window_start = rollup_bucket(first, coarsest)
+        written = 0
+        while window_start <= last:
+            window_end = window_start + step
+            raw = self._fetch_raw(window_start, window_end)
+            if raw:
+                written += self.rollups.refresh(raw)
+            self.session.commit()
+            window_start = window_end
+        return written
+
+    def _select_columns(self, sensor_ids: List[int], start: datetime, end: datetime,
+                        data_quality: int = None):
+        """
+        SELECT sensor_id, timestamp, value (Core, sem ORM) nas tabelas do intervalo,
+        ordenado por sensor e tempo. No SQLite o timestamp vem como texto ISO,
+        sem o conversor de DateTime por linha; o NumPy faz a conversão em lote.
+
+        Com partições, cada linha leva também a origem (0 = sensor_readings
+        legada, 1 = partição), com a partição primeiro em caso de empate:
+        até migrate_legacy() a mesma (sensor_id, timestamp) pode existir nos dois.
+        """
+        as_text = self.session.get_bind().dialect.name == 'sqlite'
+        tables = self._reading_tables(start, end)
+        selects = []
+        for priority, table in enumerate(tables):
+            timestamp = (type_coerce(table.c.timestamp, String) if as_text
+                         else table.c.timestamp).label('timestamp')
+            columns = [table.c.sensor_id, timestamp, table.c.value]
+            if len(tables) > 1:
+                columns.append(literal(min(priority, 1)).label('source'))
+            stmt = select(*columns).where(
+                table.c.sensor_id.in_(sensor_ids),
+                table.c.timestamp >= start,
+                table.c.timestamp <= end
+            )
+            if data_quality is not None:
+                stmt = stmt.where(table.c.data_quality == data_quality)
+            selects.append(stmt)
+
+        if len(selects) == 1:
+            stmt = selects[0]
+            return stmt.order_by(stmt.selected_columns.sensor_id, stmt.selected_columns.timestamp)
+        stmt = union_all(*selects)
+        return stmt.order_by(stmt.selected_columns.sensor_id, stmt.selected_columns.timestamp,
+                             stmt.selected_columns.source.desc())
+
+    def _fetch_columns(self, sensor_ids: List[int], start: datetime, end: datetime,
+                       data_quality: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Executa _select_columns e devolve (sensor_ids, timestamps, values) como
+        arrays contíguos, uma linha por (sensor_id, timestamp)
+        """
+        rows = self.session.execute(
+            self._select_columns(sensor_ids, start, end, data_quality)
+        ).all()
+        if not rows:
+            return (np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[us]'),
+                    np.empty(0, dtype=np.float64))
+
+        sensor_col, timestamp_col, value_col = list(zip(*rows))[:3]
+        sensor_col = np.array(sensor_col, dtype=np.int64)
+        timestamp_col = np.array(timestamp_col, dtype='datetime64[us]')
+        value_col = np.array(value_col, dtype=np.float64)
+        if len(rows[0]) > 3:
+            # Duplicata legado/partição: fica a primeira (partição) de cada chave
+            keep = np.ones(len(rows), dtype=bool)
+            keep[1:] = ((sensor_col[1:] != sensor_col[:-1])
+                        | (timestamp_col[1:] != timestamp_col[:-1]))
+            if not keep.all():
+                sensor_col, timestamp_col, value_col = (
+                    sensor_col[keep], timestamp_col[keep], value_col[keep])
+        return sensor_col, timestamp_col, value_col
+
+    def get_arrays(self, sensor_id: int, start: datetime, end: datetime,
+                   data_quality: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Leituras de um sensor como arrays NumPy, sem hidratar objetos ORM.
+
+        Args:
+            sensor_id: ID do sensor
+            start: Início do intervalo (inclusive)
+            end: Fim do intervalo (inclusive)
+            data_quality: Filtra pela qualidade (ex: 0 = apenas dados bons)
+
+        Returns:
+            Tupla (timestamps datetime64[us], values float64) em ordem cronológica
+        """
+        _, timestamps, values = self._fetch_columns([sensor_id], start, end, data_quality)
+        return timestamps, values
+
+    def get_frame(self, sensor_ids: List[int], start: datetime, end: datetime,
+                  data_quality: int = None) -> pd.DataFrame:
+        """
+        Leituras de vários sensores como DataFrame (formato longo).
+
+        Uma consulta com IN (...) por lote de SENSOR_CHUNK_SIZE sensores, então
+        grupos grandes não estouram o limite de parâmetros do SQLite.
+
+        Args:
+            sensor_ids: Sensores a consultar
+            start: Início do intervalo (inclusive)
+            end: Fim do intervalo (inclusive)
+            data_quality: Filtra pela qualidade (ex: 0 = apenas dados bons)
+
+        Returns:
+            DataFrame com colunas sensor_id, timestamp e value, ordenado por sensor e tempo
+        """
+        ids = sorted(set(sensor_ids))
+        chunks = [
+            self._fetch_columns(ids[i:i + self.SENSOR_CHUNK_SIZE], start, end, data_quality)
+            for i in range(0, len(ids), self.SENSOR_CHUNK_SIZE)
+        ] or [self._fetch_columns([], start, end, data_quality)]
+        sensor_col, timestamp_col, value_col = (
+            np.concatenate(columns) for columns in zip(*chunks)
+        )
+        return pd.DataFrame({'sensor_id': sensor_col, 'timestamp': timestamp_col,
+                             'value': value_col})
+
+    def get_readings_for_sensors(self, sensor_ids: List[int], start: datetime, end: datetime,
+                                 data_quality: int = None, wide: bool = False) -> pd.DataFrame:
+        """
+        Leituras de um grupo de sensores (ex: grupo de votação) num único round trip.
+
+        Args:
+            sensor_ids: Sensores do grupo
+            start: Início do intervalo (inclusive)
+            end: Fim do intervalo (inclusive)
+            data_quality: Filtra pela qualidade (ex: 0 = apenas dados bons)
+            wide: Se True, pivota para uma coluna por sensor alinhada por timestamp
+                  (NaN onde o sensor não tem leitura naquele instante)
+
+        Returns:
+            DataFrame longo (sensor_id, timestamp, value) ou largo (índice timestamp,
+            colunas na ordem de sensor_ids)
+        """
+        frame = self.get_frame(sensor_ids, start, end, data_quality)
+        if not wide:
+            return frame
+        return frame.pivot(index='timestamp', columns='sensor_id', values='value').reindex(
+            columns=list(dict.fromkeys(sensor_ids))
+        )
+
+    def get_series(self, sensor_ids: List[int], start: datetime, end: datetime,
+                   min_points: int = None) -> List[SeriesPoint]:
+        """
+        Série temporal de um ou mais sensores para gráficos.
+
+        Usa a resolução agregada mais grossa que ainda rende min_points pontos
+        no intervalo (ex: 30 dias → intervalos de 1 h); intervalos curtos, ou
+        sem agregados, leem as leituras brutas.
+
+        Args:
+            sensor_ids: Sensores da série
+            start: Início do intervalo
+            end: Fim do intervalo
+            min_points: Pontos mínimos desejados (padrão: READING_ROLLUP_MIN_POINTS)
+
+        Returns:
+            Lista de SeriesPoint ordenada por sensor e tempo (value = média do intervalo)
+        """
+        if not sensor_ids:
+            return []
+
+        resolution = self.rollups.choose_resolution(start, end, min_points)
+        if resolution is not None:
+            points = self.rollups.get_points(sensor_ids, resolution, start, end)
+            if points:
+                return points
+
+        selects = [
+            select(table.c.sensor_id, table.c.timestamp, table.c.value).where(
+                table.c.sensor_id.in_(sensor_ids),
+                table.c.timestamp >= start,
+                table.c.timestamp <= end
+            )
+            for table in self._reading_tables(start, end)
+        ]
+        stmt = selects[0] if len(selects) == 1 else union_all(*selects)
+        stmt = stmt.order_by(stmt.selected_columns.sensor_id, stmt.selected_columns.timestamp)
+        return [SeriesPoint(sensor_id, timestamp, value, value, value, 1)
+                for sensor_id, timestamp, value in self.session.execute(stmt)]
+
+    def _all_readings(self):
+        """Selectable com todas as leituras (UNION ALL das partições, se houver)"""
+        tables = self._reading_tables()
+        if len(tables) == 1:
+            return tables[0]
+        return union_all(*[self._select_readings(table) for table in tables]).subquery()
+
+    def drop_partitions_before(self, before_date: datetime) -> List[str]:
+        """
+        Remove as partições inteiramente anteriores à data (DROP TABLE, sem
+        DELETE linha a linha). Sem particionamento não faz nada.
+
+        Args:
+            before_date: Limite da retenção
+
+        Returns:
+            Nomes das partições removidas
+        """
+        if self.partitions is None:
+            return []
+        dropped = self.partitions.drop_before(before_date, self.session.connection())
+        self.session.commit()
+        return dropped
+
+    def _upsert_latest(self, readings: List[dict], replace_equal: bool = True):
+        """
+        Atualiza sensor_latest com a leitura mais recente de cada sensor do lote,
+        na transação corrente. Leituras mais antigas que a já registrada
+        (ex: backfill) não regridem o valor.
+
+        Args:
+            readings: Leituras do lote (dicts com sensor_id, value, timestamp, ...)
+            replace_equal: Se True, substitui também leituras com o mesmo timestamp
+        """
+        newest = {}
+        for reading in readings:
+            current = newest.get(reading['sensor_id'])
+            if current is None or reading['timestamp'] > current['timestamp']:
+                newest[reading['sensor_id']] = reading
+        if not newest:
+            return
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                'sensor_id': sensor_id,
+                'timestamp': reading['timestamp'],
+                'value': reading['value'],
+                'unit': reading.get('unit'),
+                'data_quality': reading.get('data_quality', 0),
+                'updated_at': now
+            }
+            for sensor_id, reading in newest.items()
+        ]
+
+        table = SensorLatest.__table__
+        stmt = _dialect_insert(self.session, table)
+        is_newer = (stmt.excluded.timestamp >= table.c.timestamp if replace_equal
+                    else stmt.excluded.timestamp > table.c.timestamp)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['sensor_id'],
+            set_={column: stmt.excluded[column]
+                  for column in ('timestamp', 'value', 'unit', 'data_quality', 'updated_at')},
+            where=is_newer
+        )
+        self.session.execute(stmt, rows)
+
+    def rebuild_latest(self) -> int:
+        """
+        Recalcula sensor_latest a partir de sensor_readings (uma consulta
+        INSERT ... SELECT). Usado na migração de bancos existentes e após
+        cargas feitas fora do repositório. Leituras órfãs (sensor removido)
+        são ignoradas.
+
+        Returns:
+            Número de sensores com última leitura registrada
+        """
+        readings = self._all_readings()
+        latest = select(
+            readings.c.sensor_id.label('sensor_id'),
+            func.max(readings.c.timestamp).label('timestamp')
+        ).group_by(readings.c.sensor_id).subquery()
+
+        source = select(
+            readings.c.sensor_id, readings.c.timestamp, readings.c.value,
+            readings.c.unit, readings.c.data_quality, func.current_timestamp()
+        ).join(
+            latest,
+            and_(
+                readings.c.sensor_id == latest.c.sensor_id,
+                readings.c.timestamp == latest.c.timestamp
+            )
+        ).join(SensorConfig, SensorConfig.sensor_id == readings.c.sensor_id)
+
+        self.session.query(SensorLatest).delete(synchronize_session=False)
+        self.session.execute(insert(SensorLatest).from_select(
+            ['sensor_id', 'timestamp', 'value', 'unit', 'data_quality', 'updated_at'],
+            source
+        ))
+        self.session.commit()
+        return self.session.query(func.count(SensorLatest.sensor_id)).scalar()
+
     def get_latest(self, sensor_id: int) -> Optional[SensorReading]:
         """Retorna última leitura de um sensor"""
+        if self.partitions is not None:
+            recent = self.get_recent(sensor_id, limit=1)
+            return recent[0] if recent else None
         return self.session.query(SensorReading).filter(
             SensorReading.sensor_id == sensor_id
         ).order_by(SensorReading.timestamp.desc()).first()
 
-    def get_by_time_range(self, sensor_id: int, start: datetime,
-                          end: datetime) -> List[SensorReading]:
-        """Retorna leituras em intervalo de tempo"""
-        return self.session.query(SensorReading).filter(
-            and_(
-                SensorReading.sensor_id == sensor_id,
-                SensorReading.timestamp >= start,
-                SensorReading.timestamp <= end
+    def get_latest_timestamps(self, sensor_ids: Optional[List[int]] = None) -> Dict[int, datetime]:
+        """
+        Retorna o timestamp da leitura mais recente de cada sensor numa única
+        consulta à tabela sensor_latest.
+
+        Args:
+            sensor_ids: Restringe a estes sensores (padrão: todos)
+
+        Returns:
+            Dicionário sensor_id -> timestamp; sensores sem leituras ficam de fora
+        """
+        query = self.session.query(SensorLatest.sensor_id, SensorLatest.timestamp)
+        if sensor_ids is not None:
+            query = query.filter(SensorLatest.sensor_id.in_(sensor_ids))
+        return dict(query.all())
+
+    def get_latest_values(self, sensor_ids: Optional[List[int]] = None) -> Dict[int, tuple]:
+        """
+        Retorna a leitura mais recente de cada sensor numa única consulta à
+        tabela sensor_latest (uma linha por sensor, sem varrer sensor_readings).
+
+        Args:
+            sensor_ids: Restringe a estes sensores (padrão: todos)
+
+        Returns:
+            Dicionário sensor_id -> (timestamp, value)
+        """
+        query = self.session.query(
+            SensorLatest.sensor_id, SensorLatest.timestamp, SensorLatest.value
+        )
+        if sensor_ids is not None:
+            query = query.filter(SensorLatest.sensor_id.in_(sensor_ids))
+        return {sensor_id: (timestamp, value) for sensor_id, timestamp, value in query.all()}
+
+    def get_by_time_range(self, sensor_id: int, start: datetime, end: datetime,
+                          data_quality: int = None) -> List[SensorReading]:
+        """
+        Retorna leituras em intervalo de tempo, em ordem cronológica.
+
+        Com particionamento, consulta só as partições que cobrem [start, end]
+        (UNION ALL numa única instrução) e devolve objetos SensorReading
+        transientes, fora da sessão.
+
+        Args:
+            sensor_id: ID do sensor
+            start: Início do intervalo (inclusive)
+            end: Fim do intervalo (inclusive)
+            data_quality: Filtra pela qualidade (ex: 0 = apenas dados bons)
+        """
+        if self.partitions is None:
+            query = self.session.query(SensorReading).filter(
+                and_(
+                    SensorReading.sensor_id == sensor_id,
+                    SensorReading.timestamp >= start,
+                    SensorReading.timestamp <= end
+                )
             )
-        ).order_by(SensorReading.timestamp.asc()).all()
+            if data_quality is not None:
+                query = query.filter(SensorReading.data_quality == data_quality)
+            return query.order_by(SensorReading.timestamp.asc()).all()
+
+        stmt = union_all(*[
+            self._select_readings(table, sensor_id, start, end, data_quality)
+            for table in self._reading_tables(start, end)
+        ])
+        stmt = stmt.order_by(stmt.selected_columns.timestamp)
+        return [SensorReading(**row._mapping) for row in self.session.execute(stmt)]
+
+    def count_in_range(self, sensor_id: int, start: datetime, end: datetime = None,
+                       data_quality: int = None) -> int:
+        """Conta leituras de um sensor no intervalo (somando as partições envolvidas)"""
+        return sum(
+            self.session.execute(
+                select(func.count()).select_from(
+                    self._select_readings(table, sensor_id, start, end, data_quality).subquery()
+                )
+            ).scalar()
+            for table in self._reading_tables(start, end)
+        )
 
     def get_readings_for_sensor(self, sensor_id: int, start: datetime,
                                  end: datetime) -> List[SensorReading]:
@@ -218,19 +941,222 @@ class SensorReadingRepository:
 
     def get_recent(self, sensor_id: int, limit: int = 100) -> List[SensorReading]:
         """Retorna últimas N leituras de um sensor"""
-        return self.session.query(SensorReading).filter(
-            SensorReading.sensor_id == sensor_id
-        ).order_by(SensorReading.timestamp.desc()).limit(limit).all()
+        if self.partitions is None:
+            return self.session.query(SensorReading).filter(
+                SensorReading.sensor_id == sensor_id
+            ).order_by(SensorReading.timestamp.desc()).limit(limit).all()
+
+        def fetch(table) -> List[SensorReading]:
+            stmt = self._select_readings(table, sensor_id).order_by(
+                table.c.timestamp.desc()
+            ).limit(limit)
+            return [SensorReading(**row._mapping) for row in self.session.execute(stmt)]
+
+        # Partições da mais nova para a mais antiga, parando quando as N mais
+        # recentes já encontradas são todas mais novas que a próxima partição
+        readings = fetch(SensorReading.__table__)
+        partitions = self.partitions.list_partitions(self.session.connection())
+        for name, _, end in reversed(partitions):
+            readings = sorted(readings, key=lambda r: r.timestamp, reverse=True)[:limit]
+            if len(readings) >= limit and readings[-1].timestamp >= end:
+                break
+            readings += fetch(self.partitions.table(name))
+        return sorted(readings, key=lambda r: r.timestamp, reverse=True)[:limit]
 
     def delete_older_than(self, before_date: datetime) -> int:
-        """Delete leituras antigas (data retention policy)"""
-        count = self.session.query(SensorReading).filter(
-            SensorReading.timestamp < before_date
-        ).delete()
+        """
+        Delete leituras antigas (data retention policy).
+
+        Com particionamento, partições inteiramente expiradas são removidas
+        com DROP TABLE e só a partição de fronteira sofre DELETE. Agregados
+        de intervalos encerrados antes da data saem junto.
+
+        Returns:
+            Número de leituras removidas por DELETE (partições removidas não entram)
+        """
+        self.rollups.delete_older_than(before_date)
+        if self.partitions is None:
+            count = self.session.query(SensorReading).filter(
+                SensorReading.timestamp < before_date
+            ).delete()
+            self.session.commit()
+            return count
+
+        self.drop_partitions_before(before_date)
+        count = 0
+        for table in self._reading_tables(None, before_date):
+            count += self.session.execute(
+                table.delete().where(table.c.timestamp < before_date)
+            ).rowcount
         self.session.commit()
         return count
 
 
+class SensorReadingRollupRepository:
+    """
+    Repository para SensorReadingRollup (agregados por intervalo).
+
+    As resoluções são mantidas em cascata: a mais fina é recalculada a partir
+    das leituras brutas e cada resolução seguinte a partir da anterior, então
+    o trabalho por ciclo de ingestão é proporcional aos intervalos tocados.
+    """
+
+    # Máximo de sensores por IN (...) (limite de parâmetros do SQLite)
+    SENSOR_CHUNK_SIZE = 500
+
+    def __init__(self, session: Session, resolutions: List[int] = None):
+        """
+        Args:
+            session: Sessão do banco
+            resolutions: Resoluções em segundos, cada uma múltipla da anterior
+                         (padrão: READING_ROLLUP_RESOLUTIONS)
+        """
+        self.session = session
+        self.resolutions = (resolutions if resolutions is not None
+                            else parse_rollup_resolutions(Config.READING_ROLLUP_RESOLUTIONS))
+
+    def refresh(self, raw_rows: List[tuple]) -> int:
+        """
+        Recalcula, em todas as resoluções, os intervalos que contêm raw_rows.
+        Cada resolução mais grossa relê só as faixas tocadas de cada sensor.
+
+        Args:
+            raw_rows: Tuplas (sensor_id, timestamp, value) com todas as leituras
+                      dos intervalos da resolução mais fina a recalcular
+
+        Returns:
+            Número de intervalos gravados
+        """
+        if not self.resolutions or not raw_rows:
+            return 0
+
+        rows = self._aggregate_raw(raw_rows, self.resolutions[0])
+        self.upsert_many(rows)
+        written = len(rows)
+
+        touched: Dict[int, set] = {}
+        for row in rows:
+            touched.setdefault(row['sensor_id'], set()).add(row['bucket_start'])
+
+        table = SensorReadingRollup.__table__
+        for fine, coarse in zip(self.resolutions, self.resolutions[1:]):
+            fine_rows = []
+            for start, end, sensor_ids in _bucket_runs(touched, coarse, self.SENSOR_CHUNK_SIZE):
+                fine_rows += self.session.execute(
+                    select(table).where(
+                        table.c.resolution == fine,
+                        table.c.bucket_start >= start,
+                        table.c.bucket_start < end,
+                        table.c.sensor_id.in_(sensor_ids)
+                    )
+                ).all()
+            rows = self._combine(fine_rows, coarse)
+            self.upsert_many(rows)
+            written += len(rows)
+
+        return written
+
+    @staticmethod
+    def _aggregate_raw(raw_rows: List[tuple], resolution: int) -> List[dict]:
+        """Agrega leituras brutas (sensor_id, timestamp, value) em intervalos"""
+        buckets: Dict[tuple, dict] = {}
+        for sensor_id, timestamp, value in raw_rows:
+            key = (sensor_id, rollup_bucket(timestamp, resolution))
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = {
+                    'sensor_id': sensor_id, 'resolution': resolution, 'bucket_start': key[1],
+                    'min_value': value, 'max_value': value, 'sum_value': value, 'count': 1,
+                    'last_value': value, 'last_timestamp': timestamp
+                }
+                continue
+            agg['min_value'] = min(agg['min_value'], value)
+            agg['max_value'] = max(agg['max_value'], value)
+            agg['sum_value'] += value
+            agg['count'] += 1
+            if timestamp >= agg['last_timestamp']:
+                agg['last_value'], agg['last_timestamp'] = value, timestamp
+        return list(buckets.values())
+
+    @staticmethod
+    def _combine(fine_rows: list, resolution: int) -> List[dict]:
+        """Agrega intervalos de uma resolução fina em intervalos de `resolution`"""
+        buckets: Dict[tuple, dict] = {}
+        for row in fine_rows:
+            key = (row.sensor_id, rollup_bucket(row.bucket_start, resolution))
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = {
+                    'sensor_id': row.sensor_id, 'resolution': resolution, 'bucket_start': key[1],
+                    'min_value': row.min_value, 'max_value': row.max_value,
+                    'sum_value': row.sum_value, 'count': row.count,
+                    'last_value': row.last_value, 'last_timestamp': row.last_timestamp
+                }
+                continue
+            agg['min_value'] = min(agg['min_value'], row.min_value)
+            agg['max_value'] = max(agg['max_value'], row.max_value)
+            agg['sum_value'] += row.sum_value
+            agg['count'] += row.count
+            if row.last_timestamp >= agg['last_timestamp']:
+                agg['last_value'], agg['last_timestamp'] = row.last_value, row.last_timestamp
+        return list(buckets.values())
+
+    def upsert_many(self, rows: List[dict]):
+        """Grava intervalos substituindo os existentes (na transação corrente)"""
+        if not rows:
+            return
+        stmt = _dialect_insert(self.session, SensorReadingRollup.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['sensor_id', 'resolution', 'bucket_start'],
+            set_={column: stmt.excluded[column]
+                  for column in ('min_value', 'max_value', 'sum_value', 'count',
+                                 'last_value', 'last_timestamp')}
+        )
+        self.session.execute(stmt, rows)
+
+    def choose_resolution(self, start: datetime, end: datetime,
+                          min_points: int = None) -> Optional[int]:
+        """
+        Escolhe a resolução mais grossa que ainda rende min_points pontos no intervalo.
+
+        Returns:
+            Resolução em segundos, ou None quando as leituras brutas são necessárias
+        """
+        min_points = min_points or Config.READING_ROLLUP_MIN_POINTS
+        span = (end - start).total_seconds()
+        candidates = [r for r in self.resolutions if span / r >= min_points]
+        return max(candidates) if candidates else None
+
+    def get_points(self, sensor_ids: List[int], resolution: int, start: datetime,
+                   end: datetime) -> List[SeriesPoint]:
+        """Retorna os intervalos de uma resolução que cobrem [start, end], por sensor e tempo"""
+        table = SensorReadingRollup.__table__
+        rows = self.session.execute(
+            select(table).where(
+                table.c.sensor_id.in_(sensor_ids),
+                table.c.resolution == resolution,
+                table.c.bucket_start >= rollup_bucket(start, resolution),
+                table.c.bucket_start <= end
+            ).order_by(table.c.sensor_id, table.c.bucket_start)
+        ).all()
+        return [
+            SeriesPoint(row.sensor_id, row.bucket_start, row.sum_value / row.count,
+                        row.min_value, row.max_value, row.count)
+            for row in rows
+        ]
+
+    def delete_older_than(self, before_date: datetime) -> int:
+        """Remove intervalos que terminam antes da data (sem commit)"""
+        table = SensorReadingRollup.__table__
+        return sum(
+            self.session.execute(table.delete().where(
+                table.c.resolution == resolution,
+                table.c.bucket_start < before_date - timedelta(seconds=resolution)
+            )).rowcount
+            for resolution in self.resolutions
+        )
+
+
 class AlertDefinitionRepository:
     """Repository para AlertDefinition"""
 
@@ -298,6 +1224,64 @@ class AlertHistoryRepository:
             )
         ).all()
 
+    def get_by_id(self, alert_id: int) -> Optional[AlertHistory]:
+        """Retorna alerta pelo ID"""
+        return self.session.get(AlertHistory, alert_id)
+
+    def get_all_active(self, sensor_ids: Optional[List[int]] = None) -> List[AlertHistory]:
+        """
+        Retorna todos os alertas ativos numa única consulta.
+
+        Args:
+            sensor_ids: Restringe a estes sensores (padrão: todos)
+        """
+        query = self.session.query(AlertHistory).filter(AlertHistory.status == 'ACTIVE')
+        if sensor_ids is not None:
+            query = query.filter(AlertHistory.sensor_id.in_(sensor_ids))
+        return query.order_by(AlertHistory.triggered_at.asc()).all()
+
+    def count_by_status_severity_platform(
+            self, statuses: Optional[List[str]] = None) -> List[Tuple[str, int, str, int]]:
+        """
+        Conta alertas agrupados por status, severidade e plataforma numa única consulta.
+
+        Args:
+            statuses: Restringe a estes status (padrão: todos)
+
+        Returns:
+            Lista de tuplas (status, severity_level, platform, count)
+        """
+        query = self.session.query(
+            AlertHistory.status, AlertHistory.severity_level, SensorConfig.platform,
+            func.count(AlertHistory.alert_id)
+        ).join(SensorConfig, SensorConfig.sensor_id == AlertHistory.sensor_id)
+        if statuses is not None:
+            query = query.filter(AlertHistory.status.in_(statuses))
+        return [tuple(row) for row in query.group_by(
+            AlertHistory.status, AlertHistory.severity_level, SensorConfig.platform
+        ).all()]
+
+    def get_unnotified(self, min_severity: int = 3,
+                       channel: str = 'TEAMS') -> List[AlertHistory]:
+        """
+        Retorna alertas ativos sem nenhuma notificação no canal, com o sensor já carregado.
+
+        Args:
+            min_severity: Severidade mínima
+            channel: Canal de notificação
+        """
+        notified = exists().where(
+            NotificationLog.alert_id == AlertHistory.alert_id,
+            NotificationLog.channel == channel
+        )
+        return self.session.query(AlertHistory).options(
+            joinedload(AlertHistory.sensor)
+        ).filter(
+            AlertHistory.status == 'ACTIVE',
+            AlertHistory.severity_level >= min_severity,
+            ~notified
+        ).order_by(AlertHistory.triggered_at.asc()).all()
+
     def get_recent(self, limit: int = 100) -> List[AlertHistory]:
         """Retorna alertas recentes"""
         return self.session.query(AlertHistory).order_by(
@@ -328,6 +1312,28 @@ class AlertHistoryRepository:
             self.session.refresh(alert)
         return alert
 
+    def delete_resolved_older_than(self, before_date: datetime) -> int:
+        """
+        Remove alertas resolvidos antes de before_date (política de retenção),
+        junto com os respectivos logs de notificação.
+
+        Returns:
+            Número de alertas removidos
+        """
+        old_alerts = self.session.query(AlertHistory.alert_id).filter(
+            AlertHistory.status == 'RESOLVED',
+            AlertHistory.resolved_at < before_date
+        )
+        self.session.query(NotificationLog).filter(
+            NotificationLog.alert_id.in_(old_alerts.scalar_subquery())
+        ).delete(synchronize_session=False)
+        count = self.session.query(AlertHistory).filter(
+            AlertHistory.status == 'RESOLVED',
+            AlertHistory.resolved_at < before_date
+        ).delete(synchronize_session=False)
+        self.session.commit()
+        return count
+
 
 class MLPredictionRepository:
     """Repository para MLPrediction"""
@@ -356,6 +1362,22 @@ class MLPredictionRepository:
         self.session.refresh(prediction)
         return prediction
 
+    def bulk_create(self, predictions: List[dict]) -> int:
+        """
+        Insere várias predições num único executemany e um único commit.
+
+        Args:
+            predictions: Lista de dicts com as colunas de MLPrediction
+
+        Returns:
+            Número de predições inseridas
+        """
+        if not predictions:
+            return 0
+        self.session.execute(insert(MLPrediction), predictions)
+        self.session.commit()
+        return len(predictions)
+
     def get_latest_forecast(self, sensor_id: int) -> Optional[MLPrediction]:
         """Retorna última previsão de um sensor"""
         return self.session.query(MLPrediction).filter(
@@ -426,6 +1448,71 @@ class NotificationLogRepository:
             NotificationLog.status == 'PENDING'
         ).limit(limit).all()
 
+    def enqueue_many(self, entries: List[Dict]) -> int:
+        """
+        Insere notificações PENDING na fila (outbox) num único executemany.
+
+        Args:
+            entries: Lista de dicts com alert_id, channel e message
+
+        Returns:
+            Número de notificações enfileiradas
+        """
+        if not entries:
+            return 0
+        now = datetime.utcnow()
+        rows = [{'status': 'PENDING', 'attempts': 0, 'created_at': now, **entry}
+                for entry in entries]
+        self.session.execute(insert(NotificationLog), rows)
+        self.session.commit()
+        return len(rows)
+
+    def enqueue_digest(self, alert_id: int, message: str, covered_alert_ids: List[int],
+                       channel: str = 'TEAMS') -> NotificationLog:
+        """
+        Enfileira uma notificação digest e marca os demais alertas do grupo como COALESCED.
+
+        Args:
+            alert_id: Alerta principal do digest (recebe a notificação PENDING)
+            message: Corpo JSON do digest
+            covered_alert_ids: Outros alertas cobertos pelo digest
+            channel: Canal de notificação
+
+        Returns:
+            NotificationLog do digest
+        """
+        now = datetime.utcnow()
+        digest = NotificationLog(alert_id=alert_id, channel=channel, message=message,
+                                 status='PENDING', attempts=0, created_at=now)
+        self.session.add(digest)
+        self.session.flush()
+
+        if covered_alert_ids:
+            self.session.execute(insert(NotificationLog), [
+                {'alert_id': covered_id, 'channel': channel, 'status': 'COALESCED',
+                 'digest_id': digest.notification_id, 'attempts': 0, 'created_at': now}
+                for covered_id in covered_alert_ids
+            ])
+        self.session.commit()
+        return digest
+
+    def get_due(self, now: datetime, limit: int = 100,
+                channel: str = 'TEAMS') -> List[NotificationLog]:
+        """
+        Retorna notificações PENDING cujo próximo envio já venceu, mais antigas primeiro.
+
+        Args:
+            now: Instante de referência
+            limit: Máximo de notificações
+            channel: Canal de notificação
+        """
+        return self.session.query(NotificationLog).filter(
+            NotificationLog.status == 'PENDING',
+            NotificationLog.channel == channel,
+            or_(NotificationLog.next_attempt_at.is_(None),
+                NotificationLog.next_attempt_at <= now)
+        ).order_by(NotificationLog.notification_id.asc()).limit(limit).all()
+
     def get_by_alert(self, alert_id: int) -> List[NotificationLog]:
         """Retorna todas as notificações de um alerta"""
         return self.session.query(NotificationLog).filter(
@@ -433,6 +1520,59 @@ class NotificationLogRepository:
         ).all()
 
 
+class VotingGroupStatusRepository:
+    """Repository para VotingGroupStatus"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def upsert_many(self, states: List[Dict]) -> int:
+        """
+        Insere ou atualiza estados de grupos pela chave grupo (INSERT ... ON CONFLICT).
+
+        Args:
+            states: Lista de dicts com as colunas de VotingGroupStatus
+
+        Returns:
+            Número de grupos gravados
+        """
+        if not states:
+            return 0
+
+        stmt = _dialect_insert(self.session, VotingGroupStatus.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['grupo'],
+            set_={column: stmt.excluded[column] for column in states[0] if column != 'grupo'}
+        )
+        self.session.execute(stmt, states)
+        self.session.commit()
+        return len(states)
+
+    def delete_missing(self, grupos: List[str]) -> int:
+        """Remove estados de grupos que não existem mais na configuração"""
+        deleted = self.session.query(VotingGroupStatus).filter(
+            ~VotingGroupStatus.grupo.in_(grupos)
+        ).delete(synchronize_session=False)
+        self.session.commit()
+        return deleted
+
+    def get(self, grupo: str) -> Optional[VotingGroupStatus]:
+        """Retorna o estado de um grupo"""
+        return self.session.get(VotingGroupStatus, grupo)
+
+    def get_all(self, states: Optional[List[str]] = None) -> List[VotingGroupStatus]:
+        """
+        Retorna o estado de todos os grupos numa única consulta.
+
+        Args:
+            states: Restringe a estes estados (padrão: todos)
+        """
+        query = self.session.query(VotingGroupStatus)
+        if states is not None:
+            query = query.filter(VotingGroupStatus.state.in_(states))
+        return query.order_by(VotingGroupStatus.grupo).all()
+
+
 class RepositoryFactory:
     """Factory para criar repositórios com sessão gerenciada"""
 
@@ -457,9 +1597,17 @@ class RepositoryFactory:
     def notification_log(self) -> NotificationLogRepository:
         return NotificationLogRepository(self.session)
 
+    def voting_group_status(self) -> VotingGroupStatusRepository:
+        return VotingGroupStatusRepository(self.session)
+
     @staticmethod
     def create_repository(repo_type: str, db):
-        """Factory static method para criar repositórios diretamente"""
+        """
+        Factory static method para criar repositórios diretamente.
+
+        A sessão criada pertence ao chamador, que deve fechá-la (repo.session.close());
+        prefira RepositoryFactory(session) dentro de db.session_scope().
+        """
         session = db.get_session()
         factory = RepositoryFactory(session)
         
@@ -475,6 +1623,8 @@ class RepositoryFactory:
             return factory.ml_prediction()
         elif repo_type == 'notification':
             return factory.notification_log()
+        elif repo_type == 'voting_group':
+            return factory.voting_group_status()
         else:
             raise ValueError(f"Tipo de repositório desconhecido: {repo_type}")
 
@@ -1,7 +1,9 @@
 """Machine Learning module - anomaly detection and forecasting"""
 from src.ml.anomaly_detector import AnomalyDetector, create_anomaly_detector
 from src.ml.forecaster import TimeSeriesForecaster, create_forecaster
+from src.ml.model_registry import ModelRegistry, create_model_registry
 from src.ml.ml_engine import MLEngine, create_ml_engine
+from src.ml.training import TrainingOrchestrator, create_training_orchestrator
 from src.ml.repositories import (
     PredictionRepository,
     SensorReadingsRepository,
@@ -16,8 +18,12 @@ __all__ = [
     'create_anomaly_detector',
     'TimeSeriesForecaster',
     'create_forecaster',
+    'ModelRegistry',
+    'create_model_registry',
     'MLEngine',
     'create_ml_engine',
+    'TrainingOrchestrator',
+    'create_training_orchestrator',
     'PredictionRepository',
     'SensorReadingsRepository',
     'ModelTrainingRepository',
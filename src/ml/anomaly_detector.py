@@ -3,15 +3,77 @@ Machine Learning - Anomaly Detection
 Detecta anomalias em leituras de sensores usando Isolation Forest e Local Outlier Factor
 """
 import logging
-from typing import List, Tuple, Optional, Dict
+from typing import Callable, List, Tuple, Optional, Dict
 import numpy as np
 import pandas as pd
+from scipy.stats import rankdata
 from sklearn.ensemble import IsolationForest
 from sklearn.neighbors import LocalOutlierFactor
 from sklearn.preprocessing import StandardScaler
 
+from config.settings import Config
+
 logger = logging.getLogger(__name__)
 
+ENSEMBLE_NORMALIZATIONS = ('minmax', 'rank', 'robust')
+_BUILTIN_DETECTORS = ('isolation_forest', 'lof')
+
+
+def normalize_scores(scores: np.ndarray, method: str = 'minmax') -> np.ndarray:
+    """
+    Normaliza scores de anomalia para 0-1 ao longo do último eixo (por janela).
+
+    - minmax: (s - min) / (max - min)
+    - rank: posição do ponto na janela (empates ficam com o menor posto),
+      insensível à escala e a outliers extremos
+    - robust: distância acima da mediana em IQRs, z / (1 + z); 0.5 = um IQR
+      acima da mediana, pontos na mediana ou abaixo valem 0
+
+    Args:
+        scores: Array 1D ou 2D (n_janelas, n_pontos), maior = mais anômalo
+        method: 'minmax', 'rank' ou 'robust'
+
+    Returns:
+        Array de mesmo formato com scores 0-1
+
+    Raises:
+        ValueError: Se o método for inválido
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if method == 'minmax':
+        low = scores.min(axis=-1, keepdims=True)
+        high = scores.max(axis=-1, keepdims=True)
+        return (scores - low) / (high - low + 1e-8)
+    if method == 'rank':
+        ranks = rankdata(scores, method='min', axis=-1)
+        return (ranks - 1) / max(scores.shape[-1] - 1, 1)
+    if method == 'robust':
+        q25, median, q75 = np.percentile(scores, [25, 50, 75], axis=-1, keepdims=True)
+        z = np.maximum(scores - median, 0) / (q75 - q25 + 1e-8)
+        return z / (1 + z)
+    raise ValueError(f"Normalização inválida: {method}")
+
+
+def zscore_scores(data_scaled: np.ndarray) -> np.ndarray:
+    """Detector extra: |z| em relação aos dados de treino (maior feature por ponto)"""
+    return np.abs(data_scaled).max(axis=1)
+
+
+def parse_ensemble_weights(spec: str) -> Dict[str, float]:
+    """
+    Interpreta pesos do ensemble no formato 'isolation_forest=0.5,lof=0.5'.
+
+    Raises:
+        ValueError: Se algum item não tiver o formato nome=peso
+    """
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, sep, weight = item.partition('=')
+        if not sep:
+            raise ValueError(f"Peso de ensemble inválido: {item}")
+        weights[name.strip()] = float(weight)
+    return weights
+
 
 class AnomalyDetector:
     """
@@ -19,27 +81,56 @@ class AnomalyDetector:
     
     Métodos:
     - Isolation Forest: Detecção baseada em isolamento de pontos
-    - Local Outlier Factor: Detecção baseada em densidade local
+    - Local Outlier Factor: Detecção baseada em densidade local, em modo
+      novelty (treinado uma vez em fit(); a detecção só consulta vizinhos)
+    - Detectores extras (z-score embutido, ou via add_detector()), usados
+      no ensemble conforme ensemble_weights
     """
 
-    def __init__(self, contamination: float = 0.1):
+    def __init__(self, contamination: float = 0.1, n_neighbors: int = None,
+                 algorithm: str = None, ensemble_weights: Dict[str, float] = None,
+                 normalization: str = None):
         """
         Inicializa o detector de anomalias.
         
         Args:
             contamination: Taxa esperada de anomalias (0.0 - 1.0)
+            n_neighbors: Vizinhos do LOF (padrão: ML_LOF_NEIGHBORS)
+            algorithm: Índice de vizinhos do LOF: 'kd_tree', 'ball_tree',
+                       'brute' ou 'auto' (padrão: ML_LOF_ALGORITHM)
+            ensemble_weights: Peso de cada detector no ensemble
+                              (padrão: ML_ENSEMBLE_WEIGHTS)
+            normalization: Normalização dos scores no ensemble: 'minmax',
+                           'rank' ou 'robust' (padrão: ML_ENSEMBLE_NORMALIZATION)
         """
         self.contamination = contamination
+        self.n_neighbors = n_neighbors or Config.ML_LOF_NEIGHBORS
+        self.algorithm = algorithm or Config.ML_LOF_ALGORITHM
+        self.ensemble_weights = dict(ensemble_weights if ensemble_weights is not None
+                                     else parse_ensemble_weights(Config.ML_ENSEMBLE_WEIGHTS))
+        self.normalization = normalization or Config.ML_ENSEMBLE_NORMALIZATION
+        if self.normalization not in ENSEMBLE_NORMALIZATIONS:
+            raise ValueError(f"Normalização inválida: {self.normalization}")
+        # Detectores extras do ensemble (nome -> scorer); ver add_detector()
+        self.extra_detectors: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+            'zscore': zscore_scores
+        }
         self.isolation_forest = IsolationForest(
             contamination=contamination,
             random_state=42,
             n_estimators=100
         )
+        # Modo novelty: pontua dados novos contra os dados de treino
         self.lof = LocalOutlierFactor(
-            n_neighbors=20,
-            contamination=contamination
+            n_neighbors=self.n_neighbors,
+            algorithm=self.algorithm,
+            contamination=contamination,
+            novelty=True
         )
         self.scaler = StandardScaler()
+        # Faixa (min, max) dos scores de treino de cada algoritmo, usada para
+        # normalizar os scores online de forma comparável entre chamadas
+        self.score_reference: Optional[Dict[str, Tuple[float, float]]] = None
         self.is_fitted = False
         logger.info(f"✓ AnomalyDetector inicializado com contamination={contamination}")
 
@@ -65,6 +156,13 @@ class AnomalyDetector:
             self.isolation_forest.fit(data_scaled)
             self.lof.fit(data_scaled)
 
+            if_train = -self.isolation_forest.score_samples(data_scaled)
+            lof_train = -self.lof.negative_outlier_factor_
+            self.score_reference = {
+                'isolation_forest': (float(if_train.min()), float(if_train.max())),
+                'lof': (float(lof_train.min()), float(lof_train.max())),
+            }
+
             self.is_fitted = True
             logger.info(f"✓ AnomalyDetector treinado com {len(data)} amostras")
 
@@ -97,9 +195,10 @@ class AnomalyDetector:
 
             data_scaled = self.scaler.transform(data)
 
-            # Predições: -1 = anomalia, 1 = normal
-            predictions = self.isolation_forest.predict(data_scaled)
+            # Predições (-1 = anomalia, 1 = normal) pelo mesmo corte do predict(),
+            # sem percorrer as árvores duas vezes
             scores = self.isolation_forest.score_samples(data_scaled)
+            predictions = np.where(scores < self.isolation_forest.offset_, -1, 1)
 
             # Inverter scores para que valores maiores = mais anômalo
             anomaly_scores = -scores
@@ -120,7 +219,7 @@ class AnomalyDetector:
         Returns:
             Tuple contendo:
             - Índices dos pontos anômalos (-1) ou normais (1)
-            - Scores LOF (quanto maior, mais anômalo)
+            - Scores LOF (quanto maior, mais anômalo; ~1 = densidade dos dados de treino)
         """
         if not self.is_fitted:
             logger.warning("⚠️ Modelo não foi treinado. Treinando com dados fornecidos...")
@@ -135,9 +234,11 @@ class AnomalyDetector:
 
             data_scaled = self.scaler.transform(data)
 
-            # Predições: -1 = anomalia, 1 = normal
-            predictions = self.lof.fit_predict(data_scaled)
-            scores = self.lof.negative_outlier_factor_
+            # Sem refit: uma única consulta de vizinhos nos dados de treino.
+            # Predições (-1 = anomalia, 1 = normal) pelo mesmo corte do predict()
+            raw_scores = self.lof.score_samples(data_scaled)
+            predictions = np.where(raw_scores < self.lof.offset_, -1, 1)
+            scores = -raw_scores
 
             return predictions.tolist(), scores.tolist()
 
@@ -145,37 +246,56 @@ class AnomalyDetector:
             logger.error(f"❌ Erro na detecção (LOF): {e}")
             raise
 
-    def detect_ensemble(self, data: np.ndarray, threshold: float = 0.5) -> Tuple[List[int], List[float]]:
+    def detect_ensemble(self, data: np.ndarray, threshold: float = 0.5,
+                        weights: Dict[str, float] = None,
+                        normalization: str = None) -> Tuple[np.ndarray, np.ndarray]:
         """
         Detecta anomalias usando ensemble de múltiplos algoritmos.
-        
+
+        Os scores de cada detector são normalizados por janela (ver
+        normalize_scores) e combinados por média ponderada, tudo em NumPy.
+        Um array 2D (n_janelas, n_pontos) é pontuado numa única chamada: os
+        modelos avaliam todos os pontos de uma vez e a normalização é feita
+        por linha. As janelas devem vir do mesmo sensor ou de sensores que
+        compartilham este detector.
+
         Args:
-            data: Array com valores a analisar
+            data: Array 1D (uma janela) ou 2D (n_janelas, n_pontos)
             threshold: Threshold para votação de anomalias (0.0-1.0)
-            
+            weights: Peso por detector (padrão: self.ensemble_weights)
+            normalization: 'minmax', 'rank' ou 'robust' (padrão: self.normalization)
+
         Returns:
-            Tuple contendo:
+            Tuple contendo (arrays com o formato das janelas):
             - Predições ensemble (-1 = anomalia, 1 = normal)
-            - Scores de confiança da anomalia
+            - Scores de confiança da anomalia (0-1)
+
+        Raises:
+            ValueError: Se um peso citar detector desconhecido ou a normalização for inválida
         """
-        try:
-            if_pred, if_scores = self.detect_isolation_forest(data)
-            lof_pred, lof_scores = self.detect_lof(data)
+        weights = self._resolve_weights(weights if weights is not None else self.ensemble_weights)
+        normalization = normalization or self.normalization
+        if normalization not in ENSEMBLE_NORMALIZATIONS:
+            raise ValueError(f"Normalização inválida: {normalization}")
+
+        data = np.asarray(data, dtype=np.float64)
+        if not self.is_fitted:
+            logger.warning("⚠️ Modelo não foi treinado. Treinando com dados fornecidos...")
+            self.fit(data.reshape(-1, 1) if data.ndim == 2 and data.shape[1] > 1 else data)
 
-            # Normalizar scores para 0-1
-            if_scores_norm = [(s - min(if_scores)) / (max(if_scores) - min(if_scores) + 1e-8)
-                               for s in if_scores]
-            lof_scores_norm = [(s - min(lof_scores)) / (max(lof_scores) - min(lof_scores) + 1e-8)
-                                for s in lof_scores]
+        try:
+            samples, shape = self._as_samples(data)
+            raw = self._raw_scores(self.scaler.transform(samples), weights)
 
-            # Média dos scores normalizados
-            ensemble_scores = [(if_scores_norm[i] + lof_scores_norm[i]) / 2
-                               for i in range(len(if_scores_norm))]
+            ensemble_scores = np.zeros(shape)
+            for name, weight in weights.items():
+                ensemble_scores += weight * normalize_scores(raw[name].reshape(shape), normalization)
 
             # Predições baseadas no threshold
-            ensemble_pred = [-1 if score >= threshold else 1 for score in ensemble_scores]
+            ensemble_pred = np.where(ensemble_scores >= threshold, -1, 1)
 
-            logger.info(f"✓ Ensemble detection concluído: {ensemble_pred.count(-1)} anomalias detectadas")
+            logger.info(f"✓ Ensemble detection concluído: "
+                        f"{np.count_nonzero(ensemble_pred == -1)} anomalias detectadas")
 
             return ensemble_pred, ensemble_scores
 
@@ -183,6 +303,101 @@ class AnomalyDetector:
             logger.error(f"❌ Erro na detecção ensemble: {e}")
             raise
 
+    def add_detector(self, name: str, scorer: Callable[[np.ndarray], np.ndarray],
+                     weight: float = 1.0) -> None:
+        """
+        Adiciona um detector extra ao ensemble.
+
+        Args:
+            name: Nome do detector (chave em ensemble_weights)
+            scorer: Função que recebe os pontos normalizados pelo scaler
+                    (n_pontos, n_features) e retorna um score por ponto,
+                    maior = mais anômalo. Deve ser uma função de módulo para
+                    que o detector continue serializável pelo ModelRegistry
+            weight: Peso do detector no ensemble (0 = calculado só se pedido)
+        """
+        if name in _BUILTIN_DETECTORS:
+            raise ValueError(f"Detector {name} já faz parte do ensemble")
+        self.extra_detectors[name] = scorer
+        self.ensemble_weights[name] = weight
+
+    def _resolve_weights(self, weights: Dict[str, float]) -> Dict[str, float]:
+        """Pesos positivos normalizados para somar 1"""
+        unknown = set(weights) - set(_BUILTIN_DETECTORS) - set(self.extra_detectors)
+        if unknown:
+            raise ValueError(f"Detectores desconhecidos no ensemble: {', '.join(sorted(unknown))}")
+        active = {name: float(w) for name, w in weights.items() if w > 0}
+        total = sum(active.values())
+        if not total:
+            raise ValueError("Ensemble sem detectores com peso positivo")
+        return {name: w / total for name, w in active.items()}
+
+    def _as_samples(self, data: np.ndarray) -> Tuple[np.ndarray, Tuple[int, ...]]:
+        """
+        Converte a entrada em (pontos, n_features) para os modelos.
+
+        Returns:
+            Tuple com os pontos e o formato dos scores (n_pontos,) ou (n_janelas, n_pontos)
+        """
+        n_features = self.scaler.n_features_in_
+        if data.ndim == 1:
+            return data.reshape(-1, 1), data.shape
+        if data.ndim == 2 and data.shape[1] == n_features:
+            return data, data.shape[:1]
+        if data.ndim == 2 and n_features == 1:
+            return data.reshape(-1, 1), data.shape
+        raise ValueError(f"Formato de dados inválido para o detector: {data.shape}")
+
+    def _raw_scores(self, data_scaled: np.ndarray, names) -> Dict[str, np.ndarray]:
+        """Scores brutos (maior = mais anômalo) dos detectores pedidos, uma passada cada"""
+        scores = {}
+        for name in names:
+            if name == 'isolation_forest':
+                scores[name] = -self.isolation_forest.score_samples(data_scaled)
+            elif name == 'lof':
+                scores[name] = -self.lof.score_samples(data_scaled)
+            else:
+                scores[name] = np.asarray(self.extra_detectors[name](data_scaled), dtype=np.float64)
+        return scores
+
+    def score_online(self, data: np.ndarray, threshold: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pontua apenas pontos novos contra os modelos já treinados.
+
+        Não retreina nem precisa da janela histórica: o custo é proporcional
+        ao número de pontos novos. Scores de Isolation Forest e LOF (novelty)
+        são normalizados pela faixa observada no treino, então um mesmo valor
+        tem o mesmo score em chamadas diferentes.
+
+        Args:
+            data: Array com os valores novos
+            threshold: Score a partir do qual o ponto é anomalia (0.0-1.0)
+
+        Returns:
+            Tuple contendo:
+            - Predições (-1 = anomalia, 1 = normal)
+            - Scores de anomalia 0-1 (acima de 1 = além do pior ponto do treino)
+
+        Raises:
+            ValueError: Se o detector não foi treinado
+        """
+        if not self.is_fitted or self.score_reference is None:
+            raise ValueError("Modelo não foi treinado. Execute fit() antes do scoring online.")
+
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        data_scaled = self.scaler.transform(data)
+
+        raw = self._raw_scores(data_scaled, self.score_reference)
+        normalized = [
+            np.maximum(raw[name] - low, 0) / (high - low + 1e-8)
+            for name, (low, high) in self.score_reference.items()
+        ]
+        scores = np.mean(normalized, axis=0)
+        predictions = np.where(scores >= threshold, -1, 1)
+        return predictions, scores
+
     def calculate_anomaly_threshold(self, data: np.ndarray, percentile: float = 95) -> float:
         """
         Calcula um threshold de anomalia baseado em percentil dos dados históricos.
@@ -219,8 +434,9 @@ class AnomalyDetector:
 
             summary = {
                 'total_points': len(data),
-                'total_anomalies': predictions.count(-1),
-                'anomaly_percentage': (predictions.count(-1) / len(data) * 100) if data else 0,
+                'total_anomalies': int(np.count_nonzero(predictions == -1)),
+                'anomaly_percentage': (np.count_nonzero(predictions == -1) / len(data) * 100
+                                       if len(data) else 0),
                 'avg_anomaly_score': np.mean(scores),
                 'max_anomaly_score': np.max(scores),
                 'min_anomaly_score': np.min(scores),
@@ -238,6 +454,10 @@ class AnomalyDetector:
             raise
 
 
-def create_anomaly_detector(contamination: float = 0.1) -> AnomalyDetector:
+def create_anomaly_detector(contamination: float = 0.1, n_neighbors: int = None,
+                            algorithm: str = None, ensemble_weights: Dict[str, float] = None,
+                            normalization: str = None) -> AnomalyDetector:
     """Factory para criar instância de AnomalyDetector"""
-    return AnomalyDetector(contamination=contamination)
+    return AnomalyDetector(contamination=contamination, n_neighbors=n_neighbors,
+                           algorithm=algorithm, ensemble_weights=ensemble_weights,
+                           normalization=normalization)
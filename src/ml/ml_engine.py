@@ -3,14 +3,21 @@ Machine Learning - Main Engine
 Orquestra operações de machine learning: detecção de anomalias e forecasting
 """
 import logging
+import time
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
+import pandas as pd
 
 from src.ml.anomaly_detector import AnomalyDetector
 from src.ml.forecaster import TimeSeriesForecaster
-from src.data.database import DatabaseManager
-from src.data.models import SensorReading, MLPrediction, SensorConfig
+from src.ml.model_registry import (
+    ANOMALY_DETECTOR, FORECASTER, ModelRegistry, create_model_registry, data_fingerprint
+)
+from src.ml.training import TrainingOrchestrator
+from src.data.database import DatabaseManager, get_shared_db_manager
+from src.data.repositories import RepositoryFactory, SensorReadingRepository
+from src.data.models import MLPrediction, SensorConfig
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
@@ -25,57 +32,61 @@ class MLEngine:
     - Realização de predições
     - Persistência de resultados
     - Monitoramento de qualidade dos modelos
+
+    Modelos treinados são salvos no ModelRegistry e carregados sob demanda:
+    um processo novo usa o modelo do disco em vez de retreinar.
     """
 
-    def __init__(self):
-        """Inicializa o ML Engine"""
+    def __init__(self, db_manager: DatabaseManager = None, registry: ModelRegistry = None):
+        """
+        Inicializa o ML Engine.
+
+        Args:
+            db_manager: Gerenciador de banco (padrão: o compartilhado do processo)
+            registry: Registro de modelos (padrão: ML_MODEL_DIR)
+        """
         self.anomaly_detectors = {}  # sensor_id -> AnomalyDetector
         self.forecasters = {}         # sensor_id -> TimeSeriesForecaster
-        self.db = DatabaseManager(Config.DATABASE_URL)
+        self.db = db_manager if db_manager is not None else get_shared_db_manager(Config.DATABASE_URL)
+        self.registry = registry if registry is not None else create_model_registry()
+        self.latest_scores = {}       # sensor_id -> último resultado do scoring online
+        self._missing_detectors = set()  # sensores sem detector salvo, até a próxima checagem
+        self._model_versions = {}        # (tipo, sensor_id) -> trained_at do modelo em memória
+        self._registry_checked_at = time.monotonic()
         logger.info("✓ MLEngine inicializado")
 
     def get_sensor_history(
         self,
         sensor_id: int,
         hours: int = 72
-    ) -> Tuple[List[datetime], List[float]]:
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Recupera histórico de leituras de um sensor.
+        Recupera histórico de leituras de um sensor (SELECT colunar, sem objetos ORM).
         
         Args:
             sensor_id: ID do sensor
             hours: Número de horas históricas a recuperar
             
         Returns:
-            Tuple com (timestamps, values)
+            Tuple com (timestamps datetime64, values float64); arrays vazios se não houver dados
         """
         try:
-            session = self.db.get_session()
             cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+            with self.db.session_scope() as session:
+                timestamps, values = SensorReadingRepository(session).get_arrays(
+                    sensor_id, cutoff_time, datetime.utcnow(),
+                    data_quality=0  # Apenas dados com boa qualidade
+                )
 
-            readings = session.query(SensorReading).filter(
-                SensorReading.sensor_id == sensor_id,
-                SensorReading.timestamp >= cutoff_time,
-                SensorReading.data_quality == 0  # Apenas dados com boa qualidade
-            ).order_by(SensorReading.timestamp).all()
-
-            if not readings:
+            if not len(values):
                 logger.warning(f"⚠️ Nenhuma leitura para sensor {sensor_id}")
-                session.close()
-                return [], []
-
-            timestamps = [r.timestamp for r in readings]
-            values = [r.value for r in readings]
-
-            logger.info(f"✓ {len(readings)} leituras recuperadas para sensor {sensor_id}")
-            session.close()
+            else:
+                logger.info(f"✓ {len(values)} leituras recuperadas para sensor {sensor_id}")
             return timestamps, values
 
         except Exception as e:
             logger.error(f"❌ Erro ao recuperar histórico: {e}")
-            if session:
-                session.close()
-            return [], []
+            return np.empty(0, dtype='datetime64[us]'), np.empty(0)
 
     def train_anomaly_detector(
         self,
@@ -101,11 +112,14 @@ class MLEngine:
                 logger.warning(f"⚠️ Dados insuficientes para treino: {len(values)} < 30")
                 return False
 
-            # Criar e treinar detector
-            detector = AnomalyDetector(contamination=contamination)
-            detector.fit(np.array(values))
+            # Mesmos dados do modelo salvo: reaproveitar em vez de retreinar
+            detector = self._load_if_same_data(ANOMALY_DETECTOR, sensor_id, timestamps, values)
+            if detector is None:
+                detector = AnomalyDetector(contamination=contamination)
+                detector.fit(values)
+                self.registry.save(ANOMALY_DETECTOR, sensor_id, detector, timestamps, values)
 
-            self.anomaly_detectors[sensor_id] = detector
+            self._cache_model(ANOMALY_DETECTOR, sensor_id, detector)
             logger.info(f"✓ Anomaly detector treinado para sensor {sensor_id}")
             return True
 
@@ -135,11 +149,13 @@ class MLEngine:
                 logger.warning(f"⚠️ Dados insuficientes para forecasting: {len(values)} < 50")
                 return False
 
-            # Criar e treinar forecaster
-            forecaster = TimeSeriesForecaster(interval_width=0.95)
-            forecaster.fit(timestamps, values)
+            forecaster = self._load_if_same_data(FORECASTER, sensor_id, timestamps, values)
+            if forecaster is None:
+                forecaster = TimeSeriesForecaster(interval_width=0.95)
+                forecaster.fit(timestamps, values)
+                self.registry.save(FORECASTER, sensor_id, forecaster, timestamps, values)
 
-            self.forecasters[sensor_id] = forecaster
+            self._cache_model(FORECASTER, sensor_id, forecaster)
             logger.info(f"✓ Forecaster treinado para sensor {sensor_id}")
             return True
 
@@ -147,9 +163,70 @@ class MLEngine:
             logger.error(f"❌ Erro ao treinar forecaster: {e}")
             return False
 
+    def _load_if_same_data(self, kind: str, sensor_id: int, timestamps: np.ndarray,
+                           values: np.ndarray):
+        """Modelo salvo válido treinado exatamente com estes dados, ou None"""
+        meta = self.registry.metadata(kind, sensor_id)
+        if meta is None or meta.get('data_hash') != data_fingerprint(timestamps, values):
+            return None
+        return self.registry.load(kind, sensor_id)
+
+    def _get_model(self, kind: str, sensor_id: int):
+        """
+        Modelo de um sensor: memória → disco (ModelRegistry) → treino.
+
+        Returns:
+            Modelo pronto, ou None se não há dados suficientes para treinar
+        """
+        self._check_registry()
+        cache = self.anomaly_detectors if kind == ANOMALY_DETECTOR else self.forecasters
+        if sensor_id not in cache:
+            model = self.registry.load(kind, sensor_id)
+            if model is not None:
+                self._cache_model(kind, sensor_id, model)
+            elif kind == ANOMALY_DETECTOR:
+                self.train_anomaly_detector(sensor_id)
+            else:
+                self.train_forecaster(sensor_id)
+        return cache.get(sensor_id)
+
+    def _cache_model(self, kind: str, sensor_id: int, model):
+        """Guarda o modelo em memória junto com a versão (trained_at) do registro"""
+        meta = self.registry.metadata(kind, sensor_id)
+        self._model_versions[(kind, sensor_id)] = meta.get('trained_at') if meta else None
+        cache = self.anomaly_detectors if kind == ANOMALY_DETECTOR else self.forecasters
+        cache[sensor_id] = model
+
+    def refresh_from_registry(self):
+        """
+        Sincroniza os modelos em memória com o ModelRegistry, que outros
+        processos também gravam (ex: aba de treino do dashboard). Modelos
+        substituídos, removidos ou vencidos saem da memória e são recarregados
+        no próximo uso; sensores sem modelo voltam a ser procurados no disco.
+        """
+        for kind, cache in ((ANOMALY_DETECTOR, self.anomaly_detectors),
+                            (FORECASTER, self.forecasters)):
+            for sensor_id in list(cache):
+                meta = self.registry.metadata(kind, sensor_id)
+                if (meta is None or self.registry.is_stale(meta)
+                        or meta.get('trained_at') != self._model_versions.get((kind, sensor_id))):
+                    cache.pop(sensor_id, None)
+                    self._model_versions.pop((kind, sensor_id), None)
+        self._missing_detectors.clear()
+        self._registry_checked_at = time.monotonic()
+
+    def _check_registry(self):
+        """Executa refresh_from_registry a cada ML_MODEL_REFRESH_SEC"""
+        if time.monotonic() - self._registry_checked_at >= Config.ML_MODEL_REFRESH_SEC:
+            self.refresh_from_registry()
+
     def detect_anomalies(self, sensor_id: int) -> Dict:
         """
         Detecta anomalias na leitura mais recente de um sensor.
+
+        Pontua só a última leitura contra o modelo já treinado (scoring
+        online); média e desvio históricos vêm do scaler do treino, então
+        a janela de 72 h não é relida.
         
         Args:
             sensor_id: ID do sensor
@@ -158,32 +235,36 @@ class MLEngine:
             Dicionário com resultados da detecção
         """
         try:
-            # Treinar se não está treinado
-            if sensor_id not in self.anomaly_detectors:
-                if not self.train_anomaly_detector(sensor_id):
-                    return {'error': 'Dados insuficientes'}
-
-            detector = self.anomaly_detectors[sensor_id]
-
-            # Recuperar dados recentes
-            timestamps, values = self.get_sensor_history(sensor_id, hours=72)
-
-            if not values:
+            # Carregar do disco ou treinar se ainda não está em memória
+            detector = self._get_model(ANOMALY_DETECTOR, sensor_id)
+            if detector is None:
+                return {'error': 'Dados insuficientes'}
+
+            # Últimas leituras boas (tendência usa as 10 mais recentes)
+            with self.db.session_scope() as session:
+                recent = [
+                    (r.timestamp, r.value)
+                    for r in SensorReadingRepository(session).get_recent(sensor_id, limit=10)
+                    if r.data_quality in (0, None)
+                ]
+
+            if not recent:
                 return {'error': 'Sem dados'}
 
-            # Detectar anomalias
-            predictions, scores = detector.detect_ensemble(np.array(values))
-            is_anomaly = predictions[-1] == -1
+            timestamp, value = recent[0]
+            values = np.array([v for _, v in recent])
+            predictions, scores = detector.score_online([value], Config.ANOMALY_THRESHOLD)
+            is_anomaly = bool(predictions[-1] == -1)
 
             result = {
                 'sensor_id': sensor_id,
-                'timestamp': timestamps[-1] if timestamps else datetime.utcnow(),
-                'value': values[-1],
+                'timestamp': timestamp,
+                'value': float(value),
                 'is_anomaly': is_anomaly,
                 'anomaly_score': float(scores[-1]),
-                'historical_average': float(np.mean(values)),
-                'historical_std': float(np.std(values)),
-                'recent_trend': 'increasing' if values[-1] > np.mean(values[-10:]) else 'decreasing'
+                'historical_average': float(detector.scaler.mean_[0]),
+                'historical_std': float(detector.scaler.scale_[0]),
+                'recent_trend': 'increasing' if value > np.mean(values) else 'decreasing'
             }
 
             logger.info(f"✓ Anomalias detectadas para sensor {sensor_id}: {is_anomaly}")
@@ -193,6 +274,75 @@ class MLEngine:
             logger.error(f"❌ Erro ao detectar anomalias: {e}")
             return {'error': str(e)}
 
+    def score_new_readings(self, readings: pd.DataFrame) -> Dict:
+        """
+        Pontua as leituras recém-ingeridas contra os detectores já treinados.
+
+        Listener do pipeline de ingestão (DataFetcher.add_readings_listener):
+        o custo por ciclo é proporcional às leituras novas, não à janela
+        histórica. Sensores sem modelo salvo são ignorados (o treino fica com
+        o retreino agendado) e só voltam a ser procurados no disco a cada
+        ML_MODEL_REFRESH_SEC (refresh_from_registry) ou após um retreino.
+        Pontos anômalos são gravados em ml_predictions.
+
+        Args:
+            readings: DataFrame com sensor_id, timestamp, value (e data_quality)
+
+        Returns:
+            Dict com scored, anomalies e sensors_without_model
+        """
+        if 'data_quality' in readings:
+            readings = readings[readings['data_quality'] == 0]
+        # O lote do listener não vem ordenado: latest_scores deve ser a leitura mais recente
+        readings = readings.sort_values('timestamp', kind='stable')
+        self._check_registry()
+        scored_at = datetime.utcnow()
+
+        summary = {'scored': 0, 'anomalies': 0, 'sensors_without_model': 0}
+        anomalies = []
+        for sensor_id, group in readings.groupby('sensor_id', sort=False):
+            sensor_id = int(sensor_id)
+            detector = self.anomaly_detectors.get(sensor_id)
+            if detector is None and sensor_id not in self._missing_detectors:
+                detector = self.registry.load(ANOMALY_DETECTOR, sensor_id)
+                if detector is None:
+                    self._missing_detectors.add(sensor_id)
+                else:
+                    self._cache_model(ANOMALY_DETECTOR, sensor_id, detector)
+            if detector is None:
+                summary['sensors_without_model'] += 1
+                continue
+
+            values = group['value'].to_numpy(dtype=np.float64)
+            timestamps = pd.DatetimeIndex(group['timestamp'])
+            predictions, scores = detector.score_online(values, Config.ANOMALY_THRESHOLD)
+            summary['scored'] += len(values)
+
+            for i in np.flatnonzero(predictions == -1):
+                anomalies.append({
+                    'sensor_id': sensor_id,
+                    'model_type': 'ANOMALY_DETECTOR',
+                    'prediction_timestamp': timestamps[i].to_pydatetime(),
+                    'anomaly_score': float(scores[i]),
+                    'is_anomaly': True,
+                })
+            self.latest_scores[sensor_id] = {
+                'timestamp': timestamps[-1].to_pydatetime(),
+                'value': float(values[-1]),
+                'anomaly_score': float(scores[-1]),
+                'is_anomaly': bool(predictions[-1] == -1),
+                'scored_at': scored_at,
+            }
+
+        if anomalies:
+            with self.db.session_scope() as session:
+                RepositoryFactory(session).ml_prediction().bulk_create(anomalies)
+        summary['anomalies'] = len(anomalies)
+
+        logger.info(f"✓ Scoring online: {summary['scored']} leituras, {summary['anomalies']} anomalias, "
+                    f"{summary['sensors_without_model']} sensores sem modelo")
+        return summary
+
     def forecast_sensor(self, sensor_id: int, periods: int = 24) -> Dict:
         """
         Realiza forecast para um sensor.
@@ -205,12 +355,10 @@ class MLEngine:
             Dicionário com previsões
         """
         try:
-            # Treinar se não está treinado
-            if sensor_id not in self.forecasters:
-                if not self.train_forecaster(sensor_id):
-                    return {'error': 'Dados insuficientes'}
-
-            forecaster = self.forecasters[sensor_id]
+            # Carregar do disco ou treinar se ainda não está em memória
+            forecaster = self._get_model(FORECASTER, sensor_id)
+            if forecaster is None:
+                return {'error': 'Dados insuficientes'}
 
             # Realizar forecast
             forecast = forecaster.forecast(periods)
@@ -260,31 +408,27 @@ class MLEngine:
             ID da predição salva, ou None em caso de erro
         """
         try:
-            session = self.db.get_session()
-            prediction = MLPrediction(
-                sensor_id=sensor_id,
-                model_type=model_type,
-                prediction_timestamp=prediction_timestamp,
-                forecasted_value=forecasted_value,
-                confidence_interval_low=confidence_low,
-                confidence_interval_high=confidence_high,
-                anomaly_score=anomaly_score,
-                is_anomaly=is_anomaly
-            )
-
-            session.add(prediction)
-            session.commit()
-
-            pred_id = prediction.prediction_id
+            with self.db.session_scope() as session:
+                prediction = MLPrediction(
+                    sensor_id=sensor_id,
+                    model_type=model_type,
+                    prediction_timestamp=prediction_timestamp,
+                    forecasted_value=forecasted_value,
+                    confidence_interval_low=confidence_low,
+                    confidence_interval_high=confidence_high,
+                    anomaly_score=anomaly_score,
+                    is_anomaly=is_anomaly
+                )
+
+                session.add(prediction)
+                session.commit()
+                pred_id = prediction.prediction_id
+
             logger.info(f"✓ Predição salva para sensor {sensor_id} (ID: {pred_id})")
-            session.close()
             return pred_id
 
         except Exception as e:
             logger.error(f"❌ Erro ao salvar predição: {e}")
-            if session:
-                session.rollback()
-                session.close()
             return None
 
     def get_predictions(
@@ -305,11 +449,11 @@ class MLEngine:
             Lista de predições
         """
         try:
-            session = self.db.get_session()
-            predictions = session.query(MLPrediction).filter(
-                MLPrediction.sensor_id == sensor_id,
-                MLPrediction.model_type == model_type
-            ).order_by(MLPrediction.created_at.desc()).limit(limit).all()
+            with self.db.session_scope() as session:
+                predictions = session.query(MLPrediction).filter(
+                    MLPrediction.sensor_id == sensor_id,
+                    MLPrediction.model_type == model_type
+                ).order_by(MLPrediction.created_at.desc()).limit(limit).all()
 
             result = [
                 {
@@ -326,13 +470,38 @@ class MLEngine:
             ]
 
             logger.info(f"✓ {len(result)} predições recuperadas para sensor {sensor_id}")
-            session.close()
             return result
 
         except Exception as e:
             logger.error(f"❌ Erro ao recuperar predições: {e}")
             return []
 
+    def retrain_models(self, sensor_ids: List[int], progress=None) -> Dict:
+        """
+        Retreina os modelos dos sensores em paralelo (TrainingOrchestrator).
+
+        Os modelos novos vão para o ModelRegistry; os que estavam em memória
+        (e os sensores marcados sem modelo) são descartados e recarregados do
+        disco no próximo uso.
+
+        Args:
+            sensor_ids: Sensores a retreinar
+            progress: Callback (concluídos, total, TrainingResult) a cada modelo
+
+        Returns:
+            Dicionário com resultados do retreino
+        """
+        results = TrainingOrchestrator(db_manager=self.db, registry=self.registry).run(
+            sensor_ids, progress=progress
+        )
+        for sensor_id in sensor_ids:
+            self.anomaly_detectors.pop(sensor_id, None)
+            self.forecasters.pop(sensor_id, None)
+        self._missing_detectors.difference_update(sensor_ids)
+
+        results['timestamp'] = datetime.utcnow()
+        return results
+
     def retrain_all_models(self) -> Dict:
         """
         Retreina todos os modelos para todos os sensores.
@@ -341,28 +510,12 @@ class MLEngine:
             Dicionário com resultados do retreino
         """
         try:
-            session = self.db.get_session()
-            sensors = session.query(SensorConfig).filter(
-                SensorConfig.enabled == True
-            ).all()
-            session.close()
+            with self.db.session_scope() as session:
+                sensor_ids = [sensor_id for (sensor_id,) in session.query(SensorConfig.sensor_id).filter(
+                    SensorConfig.enabled == True
+                )]
 
-            results = {
-                'anomaly_trained': 0,
-                'forecaster_trained': 0,
-                'total_sensors': len(sensors),
-                'timestamp': datetime.utcnow()
-            }
-
-            for sensor in sensors:
-                if self.train_anomaly_detector(sensor.sensor_id):
-                    results['anomaly_trained'] += 1
-
-                if self.train_forecaster(sensor.sensor_id):
-                    results['forecaster_trained'] += 1
-
-            logger.info(f"✓ Retreino concluído: {results['anomaly_trained']} anomaly, {results['forecaster_trained']} forecaster")
-            return results
+            return self.retrain_models(sensor_ids)
 
         except Exception as e:
             logger.error(f"❌ Erro ao retreinar modelos: {e}")
@@ -375,11 +528,10 @@ class MLEngine:
         Returns:
             Dicionário com status
         """
-        session = self.db.get_session()
-        sensors = session.query(SensorConfig).filter(
-            SensorConfig.enabled == True
-        ).count()
-        session.close()
+        with self.db.session_scope() as session:
+            sensors = session.query(SensorConfig).filter(
+                SensorConfig.enabled == True
+            ).count()
 
         return {
             'anomaly_detectors_trained': len(self.anomaly_detectors),
@@ -387,6 +539,7 @@ class MLEngine:
             'total_sensors': sensors,
             'coverage_anomaly': f"{(len(self.anomaly_detectors) / sensors * 100):.1f}%" if sensors else "0%",
             'coverage_forecaster': f"{(len(self.forecasters) / sensors * 100):.1f}%" if sensors else "0%",
+            'models_persisted': len(self.registry.list_models()),
             'timestamp': datetime.utcnow()
         }
 
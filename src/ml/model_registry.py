@@ -0,0 +1,260 @@
+"""
+Machine Learning - Model Registry
+Persiste modelos treinados em disco para que o MLEngine não retreine a cada
+início de processo (restart do Streamlit, novo MLEngine, scheduler)
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import prophet
+import sklearn
+from prophet.serialize import model_from_json, model_to_json
+
+from config.settings import Config
+from src.ml.anomaly_detector import AnomalyDetector
+from src.ml.forecaster import TimeSeriesForecaster
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_DETECTOR = 'anomaly_detector'
+FORECASTER = 'forecaster'
+
+# Incrementar quando o formato dos artefatos mudar (modelos antigos passam a ser retreinados)
+# 2: AnomalyDetector com LOF novelty e faixa de scores para o scoring online
+# 3: LOF único em modo novelty (detect_lof sem refit)
+# 4: AnomalyDetector com pesos, normalização e detectores extras do ensemble
+REGISTRY_FORMAT_VERSION = 4
+
+_LIBRARY_VERSIONS = {
+    ANOMALY_DETECTOR: f"scikit-learn {sklearn.__version__}",
+    FORECASTER: f"prophet {prophet.__version__}",
+}
+
+
+def data_fingerprint(timestamps: np.ndarray, values: np.ndarray) -> str:
+    """
+    Hash dos dados de treino (timestamps + valores).
+
+    Args:
+        timestamps: Timestamps da janela de treino
+        values: Valores da janela de treino
+
+    Returns:
+        Hash SHA-256 (16 primeiros hex)
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(timestamps, dtype='datetime64[us]').tobytes())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class ModelRegistry:
+    """
+    Registro de modelos treinados, um par de arquivos por (tipo, sensor):
+
+    - {base_dir}/{tipo}/sensor_{id}.joblib: artefato (Prophet vai como JSON,
+      formato estável entre versões, dentro do payload)
+    - {base_dir}/{tipo}/sensor_{id}.json: metadados (janela de treino, hash
+      dos dados, versões, data do treino)
+
+    Modelos mais velhos que max_age_hours, de outra versão do formato ou da
+    biblioteca são considerados obsoletos e não são carregados.
+    """
+
+    def __init__(self, base_dir: str = None, max_age_hours: float = None):
+        """
+        Inicializa o registro.
+
+        Args:
+            base_dir: Diretório dos modelos (padrão: ML_MODEL_DIR)
+            max_age_hours: Idade máxima de um modelo (padrão: ML_MODEL_MAX_AGE_HOURS, 0 = sem limite)
+        """
+        self.base_dir = base_dir or Config.ML_MODEL_DIR
+        self.max_age_hours = (max_age_hours if max_age_hours is not None
+                              else Config.ML_MODEL_MAX_AGE_HOURS)
+        self._lock = threading.Lock()
+
+    def _paths(self, kind: str, sensor_id: int) -> Tuple[str, str]:
+        if kind not in _LIBRARY_VERSIONS:
+            raise ValueError(f"Tipo de modelo inválido: {kind}")
+        stem = os.path.join(self.base_dir, kind, f"sensor_{sensor_id}")
+        return f"{stem}.joblib", f"{stem}.json"
+
+    # ------------------------------------------------------------ metadados
+
+    def metadata(self, kind: str, sensor_id: int) -> Optional[Dict]:
+        """Metadados do modelo salvo, ou None se não houver"""
+        _, meta_path = self._paths(kind, sensor_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Metadados ilegíveis em {meta_path}: {e}")
+            return None
+
+    def is_stale(self, meta: Dict, now: datetime = None) -> bool:
+        """
+        Verifica se um modelo salvo deve ser retreinado.
+
+        Args:
+            meta: Metadados do modelo
+            now: Referência de tempo (padrão: agora, UTC)
+
+        Returns:
+            True se o formato/biblioteca mudou ou o modelo passou da idade máxima
+        """
+        if meta.get('format_version') != REGISTRY_FORMAT_VERSION:
+            return True
+        if meta.get('library_version') != _LIBRARY_VERSIONS.get(meta.get('kind')):
+            return True
+        if self.max_age_hours:
+            trained_at = datetime.fromisoformat(meta['trained_at'])
+            return (now or datetime.utcnow()) - trained_at > timedelta(hours=self.max_age_hours)
+        return False
+
+    def list_models(self) -> List[Dict]:
+        """Metadados de todos os modelos salvos"""
+        models = []
+        for kind in _LIBRARY_VERSIONS:
+            directory = os.path.join(self.base_dir, kind)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if name.startswith('sensor_') and name.endswith('.json'):
+                    meta = self.metadata(kind, int(name[len('sensor_'):-len('.json')]))
+                    if meta is not None:
+                        models.append(meta)
+        return models
+
+    # ---------------------------------------------------- gravação / leitura
+
+    def save(self, kind: str, sensor_id: int, model, timestamps: np.ndarray,
+             values: np.ndarray) -> Dict:
+        """
+        Salva um modelo treinado.
+
+        A gravação é atômica (arquivo temporário + os.replace), então um
+        processo lendo ao mesmo tempo vê o modelo antigo ou o novo, nunca
+        um arquivo pela metade.
+
+        Args:
+            kind: ANOMALY_DETECTOR ou FORECASTER
+            sensor_id: ID do sensor
+            model: AnomalyDetector ou TimeSeriesForecaster treinado
+            timestamps: Timestamps usados no treino
+            values: Valores usados no treino
+
+        Returns:
+            Metadados gravados
+        """
+        model_path, meta_path = self._paths(kind, sensor_id)
+        meta = {
+            'sensor_id': sensor_id,
+            'kind': kind,
+            'format_version': REGISTRY_FORMAT_VERSION,
+            'library_version': _LIBRARY_VERSIONS[kind],
+            'trained_at': datetime.utcnow().isoformat(),
+            'window_start': timestamps[0].item().isoformat() if len(timestamps) else None,
+            'window_end': timestamps[-1].item().isoformat() if len(timestamps) else None,
+            'n_samples': int(len(values)),
+            'data_hash': data_fingerprint(timestamps, values),
+        }
+        payload = self._to_payload(kind, model)
+
+        with self._lock:
+            os.makedirs(os.path.dirname(model_path), exist_ok=True)
+            joblib.dump(payload, f"{model_path}.tmp")
+            os.replace(f"{model_path}.tmp", model_path)
+            with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(f"{meta_path}.tmp", meta_path)
+
+        logger.info(f"✓ Modelo {kind} salvo para sensor {sensor_id} ({meta['n_samples']} amostras)")
+        return meta
+
+    def load(self, kind: str, sensor_id: int, allow_stale: bool = False):
+        """
+        Carrega um modelo salvo.
+
+        Args:
+            kind: ANOMALY_DETECTOR ou FORECASTER
+            sensor_id: ID do sensor
+            allow_stale: Carregar mesmo se obsoleto
+
+        Returns:
+            Modelo pronto para uso, ou None se não houver modelo válido
+        """
+        meta = self.metadata(kind, sensor_id)
+        if meta is None:
+            return None
+        if not allow_stale and self.is_stale(meta):
+            logger.info(f"ℹ️ Modelo {kind} do sensor {sensor_id} obsoleto; será retreinado")
+            return None
+
+        model_path, _ = self._paths(kind, sensor_id)
+        try:
+            model = self._from_payload(kind, joblib.load(model_path))
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao carregar modelo {kind} do sensor {sensor_id}: {e}")
+            return None
+
+        logger.info(f"✓ Modelo {kind} carregado do disco para sensor {sensor_id}")
+        return model
+
+    def delete(self, kind: str, sensor_id: int) -> bool:
+        """Remove o modelo salvo; retorna True se existia"""
+        removed = False
+        with self._lock:
+            for path in self._paths(kind, sensor_id):
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed = True
+        return removed
+
+    # ------------------------------------------------------- serialização
+
+    @staticmethod
+    def _to_payload(kind: str, model) -> Dict:
+        if kind == ANOMALY_DETECTOR:
+            return {'detector': model}
+        return {
+            'interval_width': model.interval_width,
+            'yearly_seasonality': model.yearly_seasonality,
+            'weekly_seasonality': model.weekly_seasonality,
+            'daily_seasonality': model.daily_seasonality,
+            'training_data': model.training_data,
+            'model_json': model_to_json(model.model),
+        }
+
+    @staticmethod
+    def _from_payload(kind: str, payload: Dict):
+        if kind == ANOMALY_DETECTOR:
+            detector = payload['detector']
+            if not isinstance(detector, AnomalyDetector):
+                raise TypeError(f"Artefato não é um AnomalyDetector: {type(detector).__name__}")
+            return detector
+
+        forecaster = TimeSeriesForecaster(
+            interval_width=payload['interval_width'],
+            yearly_seasonality=payload['yearly_seasonality'],
+            weekly_seasonality=payload['weekly_seasonality'],
+            daily_seasonality=payload['daily_seasonality']
+        )
+        forecaster.model = model_from_json(payload['model_json'])
+        forecaster.training_data = payload['training_data']
+        forecaster.is_fitted = True
+        return forecaster
+
+
+def create_model_registry(base_dir: str = None) -> ModelRegistry:
+    """Factory para criar instância de ModelRegistry"""
+    return ModelRegistry(base_dir)
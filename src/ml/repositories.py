@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 from src.data.models import MLPrediction, SensorReading, SensorConfig
+from src.data.repositories import SensorReadingRepository
 
 logger = logging.getLogger(__name__)
 
@@ -195,11 +196,10 @@ class SensorReadingsRepository:
         try:
             cutoff_time = datetime.utcnow() - timedelta(hours=hours)
 
-            readings = self.session.query(SensorReading).filter(
-                SensorReading.sensor_id == sensor_id,
-                SensorReading.timestamp >= cutoff_time,
-                SensorReading.data_quality == 0  # Apenas dados bons
-            ).order_by(SensorReading.timestamp).all()
+            readings = SensorReadingRepository(self.session).get_by_time_range(
+                sensor_id, cutoff_time, datetime.utcnow(),
+                data_quality=0  # Apenas dados bons
+            )
 
             logger.info(f"✓ {len(readings)} leituras recentes encontradas")
             return readings
@@ -255,13 +255,12 @@ class ModelTrainingRepository:
             ).all()
 
             # Filtrar por quantidade de dados
+            reading_repo = SensorReadingRepository(self.session)
             trainable = []
             for sensor in sensors:
-                reading_count = self.session.query(SensorReading).filter(
-                    SensorReading.sensor_id == sensor.sensor_id,
-                    SensorReading.timestamp >= cutoff_time,
-                    SensorReading.data_quality == 0
-                ).count()
+                reading_count = reading_repo.count_in_range(
+                    sensor.sensor_id, cutoff_time, data_quality=0
+                )
 
                 if reading_count >= 50:
                     trainable.append(sensor)
@@ -0,0 +1,329 @@
+"""
+Machine Learning - Training Orchestrator
+Treina os modelos da frota em paralelo num pool de processos, com limites
+de tempo e memória por tarefa, gravando os resultados no ModelRegistry
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import Config
+from src.data.database import DatabaseManager, get_shared_db_manager
+from src.data.repositories import SensorReadingRepository
+from src.ml.anomaly_detector import AnomalyDetector
+from src.ml.forecaster import TimeSeriesForecaster
+from src.ml.model_registry import (
+    ANOMALY_DETECTOR, FORECASTER, ModelRegistry, create_model_registry, data_fingerprint
+)
+
+try:
+    import resource
+except ImportError:  # Windows: sem limite de memória por processo
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Janela histórica (horas) e mínimo de leituras de cada tipo de modelo
+TRAINING_WINDOW_HOURS = {ANOMALY_DETECTOR: 168, FORECASTER: 72}
+MIN_SAMPLES = {ANOMALY_DETECTOR: 30, FORECASTER: 50}
+
+# status: 'trained', 'unchanged' (dados iguais aos do modelo salvo), 'skipped'
+# (dados insuficientes) ou 'failed'
+TrainingResult = namedtuple(
+    'TrainingResult', ['sensor_id', 'kind', 'status', 'n_samples', 'duration_sec', 'error']
+)
+
+# Timeout por tarefa dentro do processo worker (definido por _init_worker)
+_task_timeout: Optional[float] = None
+
+
+class TrainingTimeout(Exception):
+    """Tarefa de treino excedeu ML_TRAINING_TASK_TIMEOUT_SEC"""
+
+
+def _init_worker(memory_limit_mb: int, task_timeout: float):
+    """Inicializador dos processos do pool: aplica os limites de memória e tempo"""
+    global _task_timeout
+    _task_timeout = task_timeout or None
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _on_timeout(signum, frame):
+    raise TrainingTimeout()
+
+
+@contextmanager
+def _task_limits():
+    """Interrompe a tarefa com TrainingTimeout após _task_timeout segundos (POSIX)"""
+    if not _task_timeout or not hasattr(signal, 'setitimer'):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, _task_timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _train_task(kind: str, sensor_id: int, timestamps: np.ndarray, values: np.ndarray,
+                registry_dir: str, contamination: float) -> TrainingResult:
+    """
+    Treina um modelo e grava no registro (executa no processo worker).
+
+    Só o resultado volta ao processo principal; o modelo treinado vai
+    direto para o disco.
+    """
+    started = time.monotonic()
+    error = None
+    try:
+        with _task_limits():
+            if kind == ANOMALY_DETECTOR:
+                model = AnomalyDetector(contamination=contamination)
+                model.fit(values)
+            else:
+                model = TimeSeriesForecaster(interval_width=0.95)
+                model.fit(timestamps, values)
+            ModelRegistry(registry_dir).save(kind, sensor_id, model, timestamps, values)
+    except TrainingTimeout:
+        error = f"timeout de {_task_timeout}s"
+    except MemoryError:
+        error = "limite de memória excedido"
+    except Exception as e:
+        error = str(e)
+
+    return TrainingResult(sensor_id, kind, 'failed' if error else 'trained', len(values),
+                          time.monotonic() - started, error)
+
+
+class TrainingOrchestrator:
+    """
+    Treina detectores de anomalia e forecasters de muitos sensores em paralelo.
+
+    - Os dados de treino são lidos em bloco (uma consulta por lote de
+      sensores, via get_frame) no processo principal
+    - As tarefas (um modelo de um sensor) rodam num ProcessPoolExecutor,
+      cada uma com limite de tempo e de memória
+    - Cada worker grava o modelo no ModelRegistry; os resultados são
+      devolvidos à medida que terminam (progresso em tempo real)
+    """
+
+    # Sensores por leitura em bloco; limita a memória do processo principal
+    DATA_BATCH_SIZE = 50
+
+    def __init__(self, db_manager: DatabaseManager = None, registry: ModelRegistry = None,
+                 max_workers: int = None, task_timeout: float = None,
+                 memory_limit_mb: int = None, contamination: float = 0.1):
+        """
+        Inicializa o orquestrador.
+
+        Args:
+            db_manager: Gerenciador de banco (padrão: o compartilhado do processo)
+            registry: Registro onde os modelos são gravados (padrão: ML_MODEL_DIR)
+            max_workers: Processos de treino (padrão: ML_TRAINING_WORKERS, 0 = um por CPU);
+                         1 treina no próprio processo, sem pool e sem limites
+            task_timeout: Limite de tempo por tarefa em segundos (padrão: ML_TRAINING_TASK_TIMEOUT_SEC)
+            memory_limit_mb: Limite de memória por worker (padrão: ML_TRAINING_TASK_MEMORY_MB)
+            contamination: Taxa de contaminação dos detectores de anomalia
+        """
+        self.db = db_manager if db_manager is not None else get_shared_db_manager(Config.DATABASE_URL)
+        self.registry = registry if registry is not None else create_model_registry()
+        self.max_workers = (max_workers if max_workers is not None
+                            else Config.ML_TRAINING_WORKERS) or os.cpu_count() or 1
+        self.task_timeout = (task_timeout if task_timeout is not None
+                             else Config.ML_TRAINING_TASK_TIMEOUT_SEC)
+        self.memory_limit_mb = (memory_limit_mb if memory_limit_mb is not None
+                                else Config.ML_TRAINING_TASK_MEMORY_MB)
+        self.contamination = contamination
+
+    def load_training_data(self, sensor_ids: List[int],
+                           now: datetime = None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Lê numa consulta o histórico de treino de vários sensores.
+
+        Args:
+            sensor_ids: Sensores do lote
+            now: Fim da janela (padrão: utcnow)
+
+        Returns:
+            Dict sensor_id -> (timestamps, values) da maior janela de treino
+        """
+        now = now or datetime.utcnow()
+        start = now - timedelta(hours=max(TRAINING_WINDOW_HOURS.values()))
+        with self.db.session_scope() as session:
+            frame = SensorReadingRepository(session).get_frame(sensor_ids, start, now,
+                                                               data_quality=0)
+
+        sensor_col = frame['sensor_id'].to_numpy()
+        timestamps = frame['timestamp'].to_numpy(dtype='datetime64[us]')
+        values = frame['value'].to_numpy(dtype=np.float64)
+
+        # Frame ordenado por sensor: cada sensor é uma fatia contígua
+        data = {sensor_id: (timestamps[:0], values[:0]) for sensor_id in sensor_ids}
+        boundaries = np.flatnonzero(np.diff(sensor_col)) + 1
+        for lo, hi in zip(np.r_[0, boundaries], np.r_[boundaries, len(sensor_col)]):
+            if hi > lo:
+                data[int(sensor_col[lo])] = (timestamps[lo:hi], values[lo:hi])
+        return data
+
+    def _tasks(self, data: Dict[int, Tuple[np.ndarray, np.ndarray]], kinds: Tuple[str, ...],
+               now: datetime) -> Iterator:
+        """Tarefas a submeter; sensores sem dados ou com dados inalterados viram resultados diretos"""
+        for sensor_id, (timestamps, values) in data.items():
+            for kind in kinds:
+                cut = np.searchsorted(
+                    timestamps,
+                    np.datetime64(now - timedelta(hours=TRAINING_WINDOW_HOURS[kind]), 'us')
+                )
+                ts, vals = timestamps[cut:], values[cut:]
+                if len(vals) < MIN_SAMPLES[kind]:
+                    yield TrainingResult(sensor_id, kind, 'skipped', len(vals), 0.0,
+                                         f"dados insuficientes: {len(vals)} < {MIN_SAMPLES[kind]}")
+                    continue
+
+                meta = self.registry.metadata(kind, sensor_id)
+                if (meta is not None and not self.registry.is_stale(meta)
+                        and meta.get('data_hash') == data_fingerprint(ts, vals)):
+                    yield TrainingResult(sensor_id, kind, 'unchanged', len(vals), 0.0, None)
+                    continue
+
+                yield (kind, sensor_id, ts, vals, self.registry.base_dir, self.contamination)
+
+    def iter_train(self, sensor_ids: List[int],
+                   kinds: Tuple[str, ...] = (ANOMALY_DETECTOR, FORECASTER)) -> Iterator[TrainingResult]:
+        """
+        Treina os modelos dos sensores e devolve cada resultado ao terminar.
+
+        Os lotes de dados são lidos sob demanda: o próximo lote só é
+        carregado quando restam no máximo max_workers tarefas na fila.
+        Se um worker morre abruptamente, as tarefas em voo viram 'failed' e o
+        pool é recriado para as seguintes.
+
+        Args:
+            sensor_ids: Sensores a treinar
+            kinds: Tipos de modelo a treinar
+
+        Yields:
+            TrainingResult de cada (sensor, tipo)
+        """
+        now = datetime.utcnow()
+        batches = [sensor_ids[i:i + self.DATA_BATCH_SIZE]
+                   for i in range(0, len(sensor_ids), self.DATA_BATCH_SIZE)]
+
+        if self.max_workers == 1:
+            for batch in batches:
+                for task in self._tasks(self.load_training_data(batch, now), kinds, now):
+                    yield task if isinstance(task, TrainingResult) else _train_task(*task)
+            return
+
+        def start_pool() -> ProcessPoolExecutor:
+            # spawn: o pool pode ser criado a partir de processos com threads
+            # (Streamlit, APScheduler) sem herdar locks de um fork
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb, self.task_timeout)
+            )
+
+        executor = start_pool()
+        pending = {}
+
+        def drain(limit: int) -> Iterator[TrainingResult]:
+            while len(pending) > limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, sensor_id, n_samples = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:  # ex: worker morto pelo sistema (BrokenProcessPool)
+                        yield TrainingResult(sensor_id, kind, 'failed', n_samples, 0.0, str(e))
+
+        try:
+            for batch in batches:
+                for task in self._tasks(self.load_training_data(batch, now), kinds, now):
+                    if isinstance(task, TrainingResult):
+                        yield task
+                        continue
+                    kind, sensor_id, _, values = task[:4]
+                    try:
+                        future = executor.submit(_train_task, *task)
+                    except BrokenProcessPool:
+                        # Um worker morreu (ex: limite de memória): as tarefas em voo
+                        # falham no drain e o restante da frota segue num pool novo
+                        logger.warning("⚠️ Pool de treino quebrado; recriando os workers")
+                        executor.shutdown(wait=False)
+                        executor = start_pool()
+                        future = executor.submit(_train_task, *task)
+                    pending[future] = (kind, sensor_id, len(values))
+                yield from drain(self.max_workers)
+            yield from drain(0)
+        finally:
+            # Cancela à mão o que ainda não começou (shutdown(cancel_futures=) exige 3.9)
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def run(self, sensor_ids: List[int],
+            kinds: Tuple[str, ...] = (ANOMALY_DETECTOR, FORECASTER),
+            progress: Callable[[int, int, TrainingResult], None] = None) -> Dict:
+        """
+        Treina todos os modelos e resume os resultados.
+
+        Args:
+            sensor_ids: Sensores a treinar
+            kinds: Tipos de modelo a treinar
+            progress: Callback chamado a cada resultado com (concluídos, total, resultado)
+
+        Returns:
+            Dict com contagens por tipo/status, falhas e duração
+        """
+        started = time.monotonic()
+        total = len(sensor_ids) * len(kinds)
+        summary = {
+            'anomaly_trained': 0,
+            'forecaster_trained': 0,
+            'unchanged': 0,
+            'skipped': 0,
+            'failed': 0,
+            'total_sensors': len(sensor_ids),
+        }
+
+        for done, result in enumerate(self.iter_train(sensor_ids, kinds), start=1):
+            if result.status == 'trained':
+                key = 'anomaly_trained' if result.kind == ANOMALY_DETECTOR else 'forecaster_trained'
+                summary[key] += 1
+            else:
+                summary[result.status] += 1
+                if result.status == 'failed':
+                    logger.warning(f"⚠️ Treino {result.kind} falhou para sensor "
+                                   f"{result.sensor_id}: {result.error}")
+            if progress is not None:
+                progress(done, total, result)
+
+        summary['duration_sec'] = round(time.monotonic() - started, 1)
+        logger.info(
+            f"✓ Treino concluído em {summary['duration_sec']}s com {self.max_workers} workers: "
+            f"{summary['anomaly_trained']} anomaly, {summary['forecaster_trained']} forecaster, "
+            f"{summary['unchanged']} inalterados, {summary['failed']} falhas"
+        )
+        return summary
+
+
+def create_training_orchestrator(db_manager: DatabaseManager = None,
+                                 registry: ModelRegistry = None) -> TrainingOrchestrator:
+    """Factory para criar instância de TrainingOrchestrator"""
+    return TrainingOrchestrator(db_manager=db_manager, registry=registry)
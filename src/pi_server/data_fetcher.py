@@ -3,8 +3,10 @@ Data fetcher para buscar dados do PI Server e persistir no banco de dados.
 Responsável pelo pipeline de ingestão de dados.
 """
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
+import numpy as np
 import pandas as pd
 
 from config.settings import Config
@@ -20,19 +22,58 @@ class DataFetcher:
     Busca dados do PI Server e persiste no banco de dados SQLite.
     """
 
-    def __init__(self, pi_client: Optional[PIServerClient] = None):
+    def __init__(self, pi_client: Optional[PIServerClient] = None,
+                 max_workers: Optional[int] = None,
+                 bulk_size: Optional[int] = None):
         """
         Inicializa DataFetcher.
 
         Args:
             pi_client: PIServerClient instance (opcional, usa global se None)
+            max_workers: Máximo de tags buscados em paralelo no PI
+                         (padrão: Config.PI_FETCH_MAX_WORKERS)
+            bulk_size: Tags por chamada em lote (PIPointList); 0 busca um tag
+                       por chamada (padrão: Config.PI_FETCH_BULK_SIZE)
         """
         self.pi_client = pi_client or get_pi_client()
+        self.max_workers = max_workers or Config.PI_FETCH_MAX_WORKERS
+        self.bulk_size = Config.PI_FETCH_BULK_SIZE if bulk_size is None else bulk_size
         self.db_manager = None
+        self.last_cycle_stats = {}
+        # Timestamp da última leitura gravada por sensor (high-water mark)
+        self.high_water_marks: Dict[int, datetime] = {}
+        # Consumidores das leituras gravadas em cada ciclo (ex: scoring online de anomalias)
+        self.readings_listeners: List[Callable[[pd.DataFrame], None]] = []
+
+    def add_readings_listener(self, listener: Callable[[pd.DataFrame], None]):
+        """
+        Registra uma função chamada após cada ciclo com as leituras novas gravadas.
+
+        Args:
+            listener: Recebe o DataFrame do ciclo (sensor_id, value, timestamp,
+                      unit, data_quality), ordenado por sensor e timestamp.
+                      Exceções são logadas e não interrompem a ingestão.
+        """
+        self.readings_listeners.append(listener)
 
     def fetch_latest_readings(self, sensors: List[tuple]) -> int:
         """
-        Busca últimas leituras de sensores do PI Server e persiste no banco.
+        Busca as leituras novas de sensores do PI Server e persiste no banco.
+
+        Cada sensor tem um high-water mark (timestamp da última leitura gravada),
+        reconstruído do banco com um único MAX(timestamp) ... GROUP BY na
+        primeira vez que o sensor aparece. Cada ciclo pede ao PI apenas
+        (hwm, agora], com valores armazenados quando disponíveis e interpolados
+        como alternativa, de modo que lacunas após uma indisponibilidade são
+        preenchidas automaticamente (limitadas a PI_FETCH_MAX_BACKFILL_HOURS).
+
+        Os tags são buscados em paralelo (pool limitado a max_workers), um por
+        chamada ou em lotes de bulk_size tags, e as
+        leituras de todos os sensores são validadas de forma vetorizada e
+        gravadas num único insert em lote, com um único commit por ciclo.
+        As métricas do ciclo ficam disponíveis em ``last_cycle_stats``: ``failed``
+        conta os sensores cujo tag não pôde ser lido e ``empty`` os que não
+        tinham leituras novas na janela.
 
         Args:
             sensors: Lista de tuplas (sensor_id, internal_name, pi_server_tag, unit)
@@ -47,97 +88,279 @@ class DataFetcher:
                     logger.error("Falha ao reconectar ao PI Server")
                     return 0
 
-            session = get_db_manager().get_session()
-            repos = RepositoryFactory(session)
-            reading_repo = repos.sensor_reading()
-
-            inserted_count = 0
+            cycle_start = time.perf_counter()
             failed_count = 0
+            empty_count = 0
+            frames = []
 
-            # Get last reading timestamp from database
             now = datetime.utcnow()
-            start_time = now - timedelta(hours=1)  # Busca último 1 hora
 
+            # Um mesmo tag pode alimentar mais de um sensor
+            sensors_by_tag = {}
             for sensor_id, internal_name, pi_tag, unit in sensors:
-                try:
-                    if not pi_tag:
-                        logger.debug(f"Tag PI não configurada para {internal_name}, pulando...")
-                        continue
-
-                    logger.debug(f"Buscando dados para {internal_name} ({pi_tag})...")
+                if not pi_tag:
+                    logger.debug(f"Tag PI não configurada para {internal_name}, pulando...")
+                    continue
+                sensors_by_tag.setdefault(pi_tag, []).append((sensor_id, unit))
 
-                    # Fetch interpolated data (1 minute interval = latest value)
+            self._load_high_water_marks(
+                [sensor_id for tag_sensors in sensors_by_tag.values()
+                 for sensor_id, _ in tag_sensors]
+            )
+            start_by_tag = {
+                pi_tag: self._window_start([sensor_id for sensor_id, _ in tag_sensors], now)
+                for pi_tag, tag_sensors in sensors_by_tag.items()
+            }
+
+            def fetch(pi_tag):
+                df = None
+                if Config.PI_FETCH_USE_RECORDED:
+                    df = self.pi_client.get_raw_data(pi_tag, start_by_tag[pi_tag], now)
+                if df is None:
                     df = self.pi_client.get_interpolated_data(
                         tag=pi_tag,
-                        start_date=start_time,
+                        start_date=start_by_tag[pi_tag],
                         end_date=now,
                         interval='1m',
                         numeric_only=False
                     )
-
-                    if df is None or df.empty:
-                        logger.warning(f"Nenhum dado retornado para {pi_tag}")
-                        failed_count += 1
-                        continue
-
-                    # Process and insert latest readings
-                    # Keep only last 5 minutes of data to avoid duplicates
-                    df['timestamp'] = pd.to_datetime(df['timestamp'])
-                    df = df.sort_values('timestamp').tail(5)
-
-                    for idx, row in df.iterrows():
-                        try:
-                            # Parse timestamp and value
-                            timestamp = row['timestamp']
-                            raw_value = row[pi_tag]
-
-                            # Convert to float
-                            try:
-                                value = float(raw_value)
-                            except (ValueError, TypeError):
-                                logger.warning(f"Valor inválido para {pi_tag}: {raw_value}")
-                                continue
-
-                            # Check for outliers (basic validation)
-                            if not self._is_valid_value(value):
-                                logger.warning(f"Valor de outlier para {pi_tag}: {value}")
-                                continue
-
-                            # Insert into database
-                            reading = reading_repo.create(
-                                sensor_id=sensor_id,
-                                value=value,
-                                timestamp=timestamp,
-                                unit=unit,
-                                data_quality=0
-                            )
-
-                            inserted_count += 1
-                            logger.debug(f"  ✓ Inserido: {value} {unit} em {timestamp}")
-
-                        except Exception as e:
-                            logger.error(f"Erro ao processar leitura de {pi_tag}: {e}")
-                            failed_count += 1
-                            continue
-
-                except Exception as e:
-                    logger.error(f"Erro ao buscar dados para {internal_name}: {e}")
-                    failed_count += 1
+                return df
+
+            if self.bulk_size > 0:
+                fetched = self._iter_bulk(list(sensors_by_tag), start_by_tag, now, '1m')
+            else:
+                fetched = self.pi_client.iter_concurrent(
+                    list(sensors_by_tag), fetch, max_workers=self.max_workers)
+
+            for pi_tag, df in fetched:
+                if df is None:
+                    logger.debug(f"Falha ao buscar {pi_tag}")
+                    failed_count += len(sensors_by_tag[pi_tag])
+                    continue
+                if df.empty:
+                    logger.debug(f"Nenhum dado novo retornado para {pi_tag}")
+                    empty_count += len(sensors_by_tag[pi_tag])
                     continue
 
-            session.close()
+                for sensor_id, unit in sensors_by_tag[pi_tag]:
+                    frames.append((sensor_id, pi_tag, unit, df))
 
-            logger.info(
-                f"Fetch completo: {inserted_count} inseridos, "
-                f"{failed_count} falhas de {len(sensors)} sensores"
-            )
+            fetch_seconds = time.perf_counter() - cycle_start
 
-            return inserted_count
+            readings = self._prepare_readings(frames)
+            readings = self._drop_already_ingested(readings)
+            inserted_count = self._write_readings(readings)
+            if inserted_count is not None:
+                self._advance_high_water_marks(readings)
+                self._notify_listeners(readings)
+
+            self._record_cycle_stats(len(sensors), inserted_count or 0, failed_count,
+                                     empty_count, fetch_seconds, time.perf_counter() - cycle_start)
+
+            return inserted_count or 0
 
         except Exception as e:
             logger.error(f"Erro crítico em fetch_latest_readings: {e}")
             return 0
 
+    def _load_high_water_marks(self, sensor_ids: List[int]):
+        """
+        Carrega do banco os high-water marks dos sensores ainda desconhecidos,
+        com uma única consulta agrupada.
+        """
+        unknown = [sid for sid in sensor_ids if sid not in self.high_water_marks]
+        if not unknown:
+            return
+
+        session = get_db_manager().get_session()
+        try:
+            reading_repo = RepositoryFactory(session).sensor_reading()
+            latest = reading_repo.get_latest_timestamps(unknown)
+        finally:
+            session.close()
+
+        for sensor_id in unknown:
+            # None = sensor sem leituras, usa a janela inicial
+            self.high_water_marks[sensor_id] = latest.get(sensor_id)
+
+    def _window_start(self, sensor_ids: List[int], now: datetime) -> datetime:
+        """
+        Início da janela de busca de um tag: o menor high-water mark entre os
+        sensores do tag, limitado ao backfill máximo configurado.
+        """
+        marks = [self.high_water_marks.get(sid) for sid in sensor_ids]
+        oldest_allowed = now - timedelta(hours=Config.PI_FETCH_MAX_BACKFILL_HOURS)
+
+        if any(mark is None for mark in marks):
+            start = now - timedelta(minutes=Config.PI_FETCH_INITIAL_LOOKBACK_MIN)
+        else:
+            start = min(marks)
+
+        return max(start, oldest_allowed)
+
+    def _drop_already_ingested(self, readings: pd.DataFrame) -> pd.DataFrame:
+        """Descarta leituras com timestamp <= high-water mark do sensor"""
+        if readings.empty or not self.high_water_marks:
+            return readings
+
+        marks = readings['sensor_id'].map(self.high_water_marks)
+        marks = pd.to_datetime(marks)
+        keep = marks.isna() | (readings['timestamp'] > marks)
+        return readings[keep].reset_index(drop=True)
+
+    def _advance_high_water_marks(self, readings: pd.DataFrame):
+        """Avança os high-water marks com as leituras gravadas no ciclo"""
+        if readings.empty:
+            return
+
+        for sensor_id, latest in readings.groupby('sensor_id')['timestamp'].max().items():
+            latest = latest.to_pydatetime()
+            current = self.high_water_marks.get(sensor_id)
+            if current is None or latest > current:
+                self.high_water_marks[sensor_id] = latest
+
+    def _iter_bulk(self, tags: List[str], start_by_tag: Dict[str, datetime],
+                   end_time: datetime, interval: str):
+        """
+        Busca os tags em lotes de bulk_size (uma chamada PIPointList por lote,
+        lotes em paralelo) e devolve (tag, df) para cada tag, como iter_concurrent.
+        Cada lote começa no menor início de janela entre os seus tags.
+        """
+        chunks = {
+            f'lote_{i // self.bulk_size}': tags[i:i + self.bulk_size]
+            for i in range(0, len(tags), self.bulk_size)
+        }
+
+        def fetch_chunk(chunk_name):
+            start_time = min(start_by_tag[tag] for tag in chunks[chunk_name])
+            return self.pi_client.get_interpolated_data_bulk(
+                chunks[chunk_name], start_time, end_time, interval, numeric_only=False
+            )
+
+        for chunk_name, wide in self.pi_client.iter_concurrent(
+                list(chunks), fetch_chunk, max_workers=self.max_workers):
+            for pi_tag in chunks[chunk_name]:
+                if wide is None or pi_tag not in wide.columns:
+                    yield pi_tag, None
+                else:
+                    # Sem dados do tag nas linhas do lote, o alinhamento deixa NaN
+                    yield pi_tag, wide[['timestamp', pi_tag]].dropna(subset=[pi_tag])
+
+    def _prepare_readings(self, frames: List[tuple], tail: Optional[int] = None) -> pd.DataFrame:
+        """
+        Converte os DataFrames retornados pelo PI em linhas prontas para inserção.
+        Todas as tags do ciclo são concatenadas e validadas de uma vez:
+        timestamps inválidos, valores não numéricos, NaN e infinitos são
+        descartados sem iterar linha a linha.
+
+        Args:
+            frames: Lista de tuplas (sensor_id, pi_tag, unit, df), onde df tem a
+                    coluna 'timestamp' e a coluna de valor (nome da tag ou 'valor')
+            tail: Se informado, mantém apenas as N leituras mais recentes por sensor
+
+        Returns:
+            DataFrame com colunas sensor_id, value, timestamp, unit, data_quality
+        """
+        columns = ['sensor_id', 'value', 'timestamp', 'unit', 'data_quality']
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        sensor_ids, units, raw_timestamps, raw_values = [], [], [], []
+        for sensor_id, pi_tag, unit, df in frames:
+            value_column = pi_tag if pi_tag in df.columns else 'valor'
+            sensor_ids.append(np.full(len(df), sensor_id))
+            units.append(np.full(len(df), unit, dtype=object))
+            raw_timestamps.append(df['timestamp'].to_numpy())
+            raw_values.append(df[value_column].to_numpy())
+
+        readings = pd.DataFrame({
+            'sensor_id': np.concatenate(sensor_ids),
+            'value': pd.to_numeric(pd.Series(np.concatenate(raw_values)), errors='coerce'),
+            'timestamp': pd.to_datetime(pd.Series(np.concatenate(raw_timestamps)),
+                                        errors='coerce'),
+            'unit': np.concatenate(units),
+        })
+        readings['value'] = readings['value'].astype(float)
+
+        valid = readings['timestamp'].notna() & np.isfinite(readings['value'])
+        invalid_count = int((~valid).sum())
+        if invalid_count:
+            logger.warning(f"{invalid_count} valores inválidos descartados no lote")
+
+        readings = readings[valid].sort_values(['sensor_id', 'timestamp'], kind='stable')
+        readings = readings.drop_duplicates(['sensor_id', 'timestamp'], keep='last')
+        if tail is not None:
+            readings = readings.groupby('sensor_id', sort=False).tail(tail)
+
+        readings['data_quality'] = 0
+        return readings[columns].reset_index(drop=True)
+
+    def _write_readings(self, readings: pd.DataFrame) -> Optional[int]:
+        """
+        Grava as leituras preparadas do ciclo numa única transação.
+        Leituras já existentes (mesmo sensor_id e timestamp) são ignoradas.
+
+        Args:
+            readings: DataFrame produzido por _prepare_readings
+
+        Returns:
+            Número de leituras novas gravadas, ou None se a gravação falhou
+        """
+        if readings.empty:
+            return 0
+
+        records = readings.to_dict('records')
+
+        session = get_db_manager().get_session()
+        try:
+            reading_repo = RepositoryFactory(session).sensor_reading()
+            return reading_repo.upsert_many(records)
+        except Exception as e:
+            logger.error(f"Erro ao gravar lote de leituras: {e}")
+            session.rollback()
+            return None
+        finally:
+            session.close()
+
+    def _notify_listeners(self, readings: pd.DataFrame):
+        """Entrega as leituras gravadas no ciclo aos listeners registrados"""
+        if readings.empty:
+            return
+        for listener in self.readings_listeners:
+            try:
+                listener(readings)
+            except Exception as e:
+                logger.error(f"Erro no listener de leituras {getattr(listener, '__name__', listener)}: {e}")
+
+    def _record_cycle_stats(self, sensor_count: int, inserted_count: int, failed_count: int,
+                            empty_count: int, fetch_seconds: float, total_seconds: float):
+        """Registra e loga as métricas do ciclo de ingestão"""
+        rows_per_sec = inserted_count / total_seconds if total_seconds > 0 else 0.0
+
+        self.last_cycle_stats = {
+            'sensors': sensor_count,
+            'inserted': inserted_count,
+            'failed': failed_count,
+            'empty': empty_count,
+            'fetch_seconds': fetch_seconds,
+            'write_seconds': total_seconds - fetch_seconds,
+            'total_seconds': total_seconds,
+            'rows_per_sec': rows_per_sec,
+        }
+
+        logger.info(
+            f"Fetch completo: {inserted_count} inseridos, "
+            f"{failed_count} falhas, {empty_count} sem dados novos de {sensor_count} sensores "
+            f"em {total_seconds:.2f}s ({rows_per_sec:.0f} linhas/s)"
+        )
+
+        budget = Config.ALERT_CHECK_INTERVAL_SEC
+        if total_seconds > budget * 0.8:
+            logger.warning(
+                f"Ciclo de ingestão levou {total_seconds:.1f}s "
+                f"(orçamento de {budget}s por ciclo)"
+            )
+
     def fetch_historical_data(self, sensor_id: int, pi_tag: str, days_back: int = 30) -> int:
         """
         Busca dados históricos de um sensor e persiste no banco.
@@ -157,10 +380,6 @@ class DataFetcher:
                     logger.error("Falha ao conectar ao PI Server")
                     return 0
 
-            session = get_db_manager().get_session()
-            repos = RepositoryFactory(session)
-            reading_repo = repos.sensor_reading()
-
             now = datetime.utcnow()
             start_time = now - timedelta(days=days_back)
 
@@ -177,50 +396,11 @@ class DataFetcher:
 
             if df is None or df.empty:
                 logger.warning(f"Nenhum dado histórico para {pi_tag}")
-                session.close()
                 return 0
 
-            inserted_count = 0
-
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
-
-            for idx, row in df.iterrows():
-                try:
-                    timestamp = row['timestamp']
-                    raw_value = row[pi_tag]
-
-                    try:
-                        value = float(raw_value)
-                    except (ValueError, TypeError):
-                        continue
-
-                    if not self._is_valid_value(value):
-                        continue
-
-                    # Check if reading already exists (avoid duplicates)
-                    existing = session.query(
-                        'SELECT 1 FROM sensor_readings WHERE sensor_id=? AND timestamp=?',
-                        (sensor_id, timestamp)
-                    )
-                    if existing:
-                        continue
-
-                    reading = reading_repo.create(
-                        sensor_id=sensor_id,
-                        value=value,
-                        timestamp=timestamp,
-                        unit=None,
-                        data_quality=0
-                    )
-
-                    inserted_count += 1
-
-                except Exception as e:
-                    logger.debug(f"Erro ao processar leitura histórica: {e}")
-                    continue
-
-            session.close()
+            # Leituras já existentes são ignoradas pelo upsert
+            readings = self._prepare_readings([(sensor_id, pi_tag, None, df)])
+            inserted_count = self._write_readings(readings) or 0
 
             logger.info(f"✓ Histórico de {pi_tag}: {inserted_count} registros inseridos")
             return inserted_count
@@ -229,32 +409,6 @@ class DataFetcher:
             logger.error(f"Erro ao buscar histórico para {pi_tag}: {e}")
             return 0
 
-    def _is_valid_value(self, value: float) -> bool:
-        """
-        Valida se o valor é plausível (não é outlier óbvio).
-
-        Args:
-            value: Valor do sensor
-
-        Returns:
-            True se valor parece válido
-        """
-        # Basic validation: não é NaN, inf, ou número muito grande
-        if pd.isna(value) or pd.isnull(value):
-            return False
-
-        if not isinstance(value, (int, float)):
-            return False
-
-        # Check for inf
-        try:
-            if float(value) == float('inf') or float(value) == float('-inf'):
-                return False
-        except (ValueError, OverflowError):
-            return False
-
-        return True
-
     def get_sensor_list(self) -> List[tuple]:
         """
         Retorna lista de sensores habilitados para fetch.
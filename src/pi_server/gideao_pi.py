@@ -11,6 +11,8 @@ import clr
 import pandas as pd
 import logging
 
+from src.utils.cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
 #%% Configurações e referecias
@@ -41,11 +43,20 @@ from OSIsoft.AF.Asset import *
 from OSIsoft.AF.Data import *
 from OSIsoft.AF.Time import *
 from OSIsoft.AF.UnitsOfMeasure import *
+from System import String
+from System.Collections.Generic import List
 
 attrUM = PICommonPointAttributes.EngineeringUnits
+tamanhoPagina = dataConfig.get('tamanho_pagina_bulk', 1000)
 conexoes_pi = []
 conexoes_af = []
 
+# Handles resolvidos (PIPoint / AFAttribute) por servidor + tag ou caminho AF
+cacheHandles = TTLCache(
+    maxsize=dataConfig.get('cache_handles_tamanho', 20000),
+    ttl=dataConfig.get('cache_handles_ttl_seg', 3600)
+)
+
 #%% Métodos
 
 def getServidor(nome, tipo="PI"):
@@ -230,27 +241,80 @@ def pathToAtributoAF(DB, caminho_piAF):
     attribute = element.Attributes.get_Item(atributo)
     return attribute
 
+def chaveCache(servidorOUdb, tagOUAttr):
+    """Chave do cache de handles: (nome do servidor/database, tag ou caminho AF)"""
+    return (str(servidorOUdb.get_Name()).lower(), tagOUAttr.lower())
+
+def getPIPoint(servidor_pi, tag):
+    """Resolve um tag PI usando o cache de handles (PIPoint.FindPIPoint em caso de miss)"""
+    return cacheHandles.get_or_load(
+        chaveCache(servidor_pi, tag),
+        lambda: PIPoint.FindPIPoint(servidor_pi, tag)
+    )
+
+def getAtributoAF(DB, caminho_piAF):
+    """Resolve um caminho AF usando o cache de handles (pathToAtributoAF em caso de miss)"""
+    return cacheHandles.get_or_load(
+        chaveCache(DB, caminho_piAF),
+        lambda: pathToAtributoAF(DB, caminho_piAF)
+    )
+
+def invalidaCache(servidorOUdb=None, tagOUAttr=None):
+    r"""
+    Definição
+    ----------
+    Remove handles resolvidos do cache (ex: após renomear ou excluir um tag ou elemento AF).
+
+    Parameters
+    ----------
+    servidorOUdb : OSIsoft.AF.PI.PIServer / OSIsoft.AF.AFDatabase, optional
+        Se informado sem tagOUAttr, remove todos os handles do servidor/database.
+    tagOUAttr : TYPE String, optional
+        Tag PI ou caminho AF a remover.
+
+    Returns
+    -------
+    TYPE int
+        DESCRIPTION número de handles removidos. Sem argumentos, limpa o cache inteiro.
+    """
+    if servidorOUdb is None:
+        return cacheHandles.invalidate()
+    if tagOUAttr is None:
+        nome = str(servidorOUdb.get_Name()).lower()
+        return cacheHandles.invalidate(predicate=lambda chave: chave[0] == nome)
+    return cacheHandles.invalidate(chaveCache(servidorOUdb, tagOUAttr))
+
+def invalidaCacheLista(servidorOUdb, itens):
+    """Remove do cache os handles de um lote de tags/caminhos AF (ex: após falha numa leitura em lote)"""
+    return sum(cacheHandles.invalidate(chaveCache(servidorOUdb, item)) for item in itens)
+
+def getEstatisticasCache():
+    """Retorna tamanho, acertos, falhas e expirações do cache de handles"""
+    return cacheHandles.stats()
+
 def getValorCorrentePI(servidor_pi, tag, isNumeric):
     """Obtém valor corrente de um tag PI"""
     valor = None
     try:
-        pt = PIPoint.FindPIPoint(servidor_pi, tag)
+        pt = getPIPoint(servidor_pi, tag)
         current_value = pt.CurrentValue()
         valor = current_value.Value
         valor = converteNumero(valor, isNumeric)
     except Exception as e:
         logger.error(f'Erro ao obter valor de {tag}: {e}')
+        invalidaCache(servidor_pi, tag)
         valor = None
     return str(valor)
 
 def getAFAttributeValue(DB, caminho_piAF, isNumeric):
     """Obtém valor de um atributo AF"""
     try:
-        attribute = pathToAtributoAF(DB, caminho_piAF)
+        attribute = getAtributoAF(DB, caminho_piAF)
         valor=str(attribute.GetValue())
         valor = converteNumero(valor, isNumeric)
     except Exception as e:
         logger.error(f'Erro ao obter valor AF: {e}')
+        invalidaCache(DB, caminho_piAF)
         valor =  None
     return valor
 
@@ -273,11 +337,22 @@ def getValorCorrente(servidorOUdb, tagOUAttr, isNumeric=False):
     -------
     TYPE String
         DESCRIPTION Valor snapshot do PI.
+    TYPE pandas dataframe
+        DESCRIPTION Se tagOUAttr for uma lista: dataframe com colunas tag, timestamp e valor,
+        obtido com uma única chamada em lote (PIPointList / AFAttributeList).
     """
     try:
         if servidorOUdb:
             tipo = identificaTipo(servidorOUdb)
-            if tipo == 'PI':
+            if isinstance(tagOUAttr, (list, tuple)):
+                if tipo == 'PI':
+                    valor = getCurrentPIList(servidorOUdb, tagOUAttr, isNumeric)
+                elif tipo == 'AF':
+                    valor = getCurrentAFList(servidorOUdb, tagOUAttr, isNumeric)
+                else:
+                    logger.error('tipo nao identificado')
+                    valor = None
+            elif tipo == 'PI':
                 valor = getValorCorrentePI(servidorOUdb, tagOUAttr, isNumeric)
             elif tipo == 'AF':
                 valor = getAFAttributeValue(servidorOUdb, tagOUAttr, isNumeric)
@@ -295,12 +370,13 @@ def getRecordedPI(servidor_pi, tag, inicio, fim, isNumeric):
     """Obtém valores armazenados do PI"""
     timerange = AFTimeRange(inicio, fim)
     try:
-        pt = PIPoint.FindPIPoint(servidor_pi, tag)
+        pt = getPIPoint(servidor_pi, tag)
         recorded = pt.RecordedValues(timerange, AFBoundaryType.Inside, "", False)
         data = list(map(lambda x: (x.Timestamp.LocalTime.ToString(),converteNumero(str(x.Value),isNumeric)), recorded))
         dfValor = pd.DataFrame(data, columns=['timestamp','valor'])
     except Exception as e:
         logger.error(f'Erro em getRecordedPI: {e}')
+        invalidaCache(servidor_pi, tag)
         dfValor = None
     return dfValor
 
@@ -310,12 +386,13 @@ def getRecordedAF(DB, caminho_piAF, inicio, fim, isNumeric):
     tr.StartTime = AFTime(inicio)
     tr.EndTime = AFTime(fim)
     try:
-        attribute = pathToAtributoAF(DB, caminho_piAF)
+        attribute = getAtributoAF(DB, caminho_piAF)
         recorded =attribute.Data.RecordedValues(tr, AFBoundaryType.Inside, None,'', False,0)
         data = list(map(lambda x: (x.Timestamp.LocalTime.ToString(),converteNumero(str(x.Value),isNumeric)), recorded))
         dfValor = pd.DataFrame(data, columns=['timestamp','valor'])
     except Exception as e:
         logger.error(f'Erro em getRecordedAF: {e}')
+        invalidaCache(DB, caminho_piAF)
         dfValor=None
     return dfValor
 
@@ -362,12 +439,13 @@ def getInterpolatedPI(servidor_pi, tag, inicio, fim, intervalo, isNumeric):
     timerange = AFTimeRange(inicio, fim)
     span = AFTimeSpan.Parse(intervalo)
     try:
-        pt = PIPoint.FindPIPoint(servidor_pi, tag)
+        pt = getPIPoint(servidor_pi, tag)
         interpolated = pt.InterpolatedValues(timerange, span, "", False)
         data = list(map(lambda x: (x.Timestamp.LocalTime.ToString(),converteNumero(str(x.Value),isNumeric)), interpolated))
         dfValor = pd.DataFrame(data, columns=['timestamp','valor'])
     except Exception as e:
         logger.error(f'Erro em getInterpolatedPI: {e}')
+        invalidaCache(servidor_pi, tag)
         dfValor = None
     return dfValor
 
@@ -378,12 +456,13 @@ def getInterpolatedAF(DB, caminho_piAF, inicio, fim, intervalo, isNumeric):
     tr.EndTime = AFTime(fim)
     span = AFTimeSpan.Parse(intervalo)
     try:
-        attribute = pathToAtributoAF(DB, caminho_piAF)
+        attribute = getAtributoAF(DB, caminho_piAF)
         recorded = attribute.Data.InterpolatedValues(tr, span, None,'', False)
         data = list(map(lambda x: (x.Timestamp.LocalTime.ToString(),converteNumero(str(x.Value),isNumeric)), recorded))
         dfValor = pd.DataFrame(data, columns=['timestamp','valor'])
     except Exception as e:
         logger.error(f'Erro em getInterpolatedAF: {e}')
+        invalidaCache(DB, caminho_piAF)
         dfValor=None
     return dfValor
 
@@ -412,11 +491,20 @@ def getValoresInterpolados(servidorOUdb, tagOUAttr, inicio, fim, intervalo, isNu
     -------
     TYPE Pandas dataframe
         DESCRIPTION dataframe com o timestamp e valores aquisitados.
+        Se tagOUAttr for uma lista, retorna um único dataframe largo (coluna timestamp
+        e uma coluna por tag/atributo), obtido com chamadas em lote paginadas.
     """
     valor=None
     try:
         tipo = identificaTipo(servidorOUdb)
-        if tipo == 'PI':
+        if isinstance(tagOUAttr, (list, tuple)):
+            if tipo == 'PI':
+                valor = getInterpolatedPIList(servidorOUdb, tagOUAttr, inicio, fim, intervalo, isNumeric)
+            elif tipo == 'AF':
+                valor = getInterpolatedAFList(servidorOUdb, tagOUAttr, inicio, fim, intervalo, isNumeric)
+            else:
+                logger.error('tipo nao identificado')
+        elif tipo == 'PI':
             valor = getInterpolatedPI(servidorOUdb, tagOUAttr, inicio, fim, intervalo, isNumeric)
         elif tipo == 'AF':
             valor = getInterpolatedAF(servidorOUdb, tagOUAttr, inicio, fim, intervalo, isNumeric)
@@ -426,11 +514,162 @@ def getValoresInterpolados(servidorOUdb, tagOUAttr, inicio, fim, intervalo, isNu
         logger.error(f'Erro em getValoresInterpolados: {e}')
     return valor
 
+#%% Métodos em lote (PIPointList / AFAttributeList)
+
+def listaNet(itens):
+    """Converte uma lista Python em List<String> do .NET"""
+    lista = List[String]()
+    for item in itens:
+        lista.Add(item)
+    return lista
+
+def getPIPointList(servidor_pi, tags):
+    """
+    Resolve vários tags PI: os que estão no cache de handles são reaproveitados
+    e os demais são resolvidos numa única chamada (PIPoint.FindPIPoints).
+    Retorna o PIPointList e um dicionário nome do ponto (minúsculo) -> tag solicitado.
+    Erros do SDK são propagados; quem chama invalida os handles do lote.
+    """
+    pontos = []
+    naoResolvidos = []
+    for tag in tags:
+        pt = cacheHandles.get(chaveCache(servidor_pi, tag))
+        if pt is None:
+            naoResolvidos.append(tag)
+        else:
+            pontos.append(pt)
+
+    if naoResolvidos:
+        encontrados = {}
+        for pt in PIPoint.FindPIPoints(servidor_pi, listaNet(naoResolvidos), None):
+            cacheHandles.put(chaveCache(servidor_pi, pt.Name), pt)
+            encontrados[pt.Name.lower()] = pt
+        pontos.extend(encontrados.values())
+        faltantes = [tag for tag in naoResolvidos if tag.lower() not in encontrados]
+        if faltantes:
+            logger.warning(f'{len(faltantes)} tags nao encontrados no PI: {faltantes[:10]}')
+
+    nomes = {tag.lower(): tag for tag in tags}
+    return PIPointList(pontos), nomes
+
+def getAFAttributeList(DB, caminhos_piAF):
+    """
+    Resolve vários atributos AF e monta um AFAttributeList.
+    Retorna a lista e um dicionário ID do atributo -> caminho solicitado.
+    """
+    atributos = []
+    caminhos = {}
+    for caminho in caminhos_piAF:
+        try:
+            attribute = getAtributoAF(DB, caminho)
+            atributos.append(attribute)
+            caminhos[str(attribute.ID)] = caminho
+        except Exception as e:
+            logger.error(f'Erro ao resolver atributo AF {caminho}: {e}')
+    return AFAttributeList(atributos), caminhos
+
+def getPaginacao():
+    """Configuração de paginação das chamadas em lote"""
+    return PIPagingConfiguration(PIPageType.TagCount, tamanhoPagina)
+
+def valoresParaDataFrameLargo(listaValores, chave, isNumeric):
+    """
+    Converte o resultado de uma chamada em lote (IEnumerable<AFValues>) num
+    dataframe largo: coluna timestamp e uma coluna por tag/atributo.
+    """
+    colunas = {}
+    for valores in listaValores:
+        nome = chave(valores)
+        colunas[nome] = pd.Series(
+            [converteNumero(str(x.Value), isNumeric) for x in valores],
+            index=[x.Timestamp.LocalTime.ToString() for x in valores],
+            dtype=object
+        )
+    if not colunas:
+        return pd.DataFrame(columns=['timestamp'])
+    dfValor = pd.DataFrame(colunas)
+    dfValor.index.name = 'timestamp'
+    return dfValor.reset_index()
+
+def getCurrentPIList(servidor_pi, tags, isNumeric):
+    """Obtém o valor corrente de vários tags PI com uma chamada PIPointList.CurrentValue"""
+    try:
+        pontos, nomes = getPIPointList(servidor_pi, tags)
+        resultados = pontos.CurrentValue()
+        data = [
+            (nomes.get(x.PIPoint.Name.lower(), x.PIPoint.Name),
+             x.Timestamp.LocalTime.ToString(),
+             converteNumero(str(x.Value), isNumeric))
+            for x in resultados
+        ]
+        dfValor = pd.DataFrame(data, columns=['tag', 'timestamp', 'valor'])
+    except Exception as e:
+        logger.error(f'Erro em getCurrentPIList: {e}')
+        invalidaCacheLista(servidor_pi, tags)
+        dfValor = None
+    return dfValor
+
+def getCurrentAFList(DB, caminhos_piAF, isNumeric):
+    """Obtém o valor corrente de vários atributos AF com uma chamada AFAttributeList.GetValue"""
+    try:
+        atributos, caminhos = getAFAttributeList(DB, caminhos_piAF)
+        resultados = atributos.GetValue()
+        data = [
+            (caminhos.get(str(x.Attribute.ID)),
+             x.Timestamp.LocalTime.ToString(),
+             converteNumero(str(x.Value), isNumeric))
+            for x in resultados
+        ]
+        dfValor = pd.DataFrame(data, columns=['tag', 'timestamp', 'valor'])
+    except Exception as e:
+        logger.error(f'Erro em getCurrentAFList: {e}')
+        invalidaCacheLista(DB, caminhos_piAF)
+        dfValor = None
+    return dfValor
+
+def getInterpolatedPIList(servidor_pi, tags, inicio, fim, intervalo, isNumeric):
+    """Obtém valores interpolados de vários tags PI com PIPointList.InterpolatedValues"""
+    timerange = AFTimeRange(inicio, fim)
+    span = AFTimeSpan.Parse(intervalo)
+    try:
+        pontos, nomes = getPIPointList(servidor_pi, tags)
+        interpolated = pontos.InterpolatedValues(timerange, span, "", False, getPaginacao())
+        dfValor = valoresParaDataFrameLargo(
+            interpolated,
+            lambda valores: nomes.get(valores.PIPoint.Name.lower(), valores.PIPoint.Name),
+            isNumeric
+        )
+    except Exception as e:
+        logger.error(f'Erro em getInterpolatedPIList: {e}')
+        invalidaCacheLista(servidor_pi, tags)
+        dfValor = None
+    return dfValor
+
+def getInterpolatedAFList(DB, caminhos_piAF, inicio, fim, intervalo, isNumeric):
+    """Obtém valores interpolados de vários atributos AF com AFAttributeList.Data.InterpolatedValues"""
+    tr = AFTimeRange()
+    tr.StartTime = AFTime(inicio)
+    tr.EndTime = AFTime(fim)
+    span = AFTimeSpan.Parse(intervalo)
+    try:
+        atributos, caminhos = getAFAttributeList(DB, caminhos_piAF)
+        interpolated = atributos.Data.InterpolatedValues(tr, span, "", False, getPaginacao())
+        dfValor = valoresParaDataFrameLargo(
+            interpolated,
+            lambda valores: caminhos.get(str(valores.Attribute.ID)),
+            isNumeric
+        )
+    except Exception as e:
+        logger.error(f'Erro em getInterpolatedAFList: {e}')
+        invalidaCacheLista(DB, caminhos_piAF)
+        dfValor = None
+    return dfValor
+
 def getUMPI(servidor_pi, tag):
     """Obtém unidade de medida do PI"""
     valor= ''
     try:
-        pt = PIPoint.FindPIPoint(servidor_pi, tag)
+        pt = getPIPoint(servidor_pi, tag)
         pt.LoadAttributes(None)
         um = pt.GetAttribute(attrUM)
         valor = um
@@ -443,7 +682,7 @@ def getUMAF(DB, caminho_piAF):
     """Obtém unidade de medida do AF"""
     valor = ''
     try:
-        attribute = pathToAtributoAF(DB, caminho_piAF)
+        attribute = getAtributoAF(DB, caminho_piAF)
         valor = attribute.DefaultUOM.ToString()
     except Exception as e:
         logger.error(f'Erro em getUMAF: {e}')
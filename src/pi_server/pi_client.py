@@ -3,8 +3,12 @@ PI Server client wrapper around gideaoPI library.
 Handles connection, authentication, and error handling for PI Server access.
 """
 import logging
-from typing import Optional, List, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Set, Tuple, Callable, Iterator, Any
 from datetime import datetime
+import pandas as pd
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
@@ -36,6 +40,11 @@ class PIServerClient:
 
         self.servidor = None
         self._connected = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_workers = 0
+        self._executor_lock = threading.Lock()
+        self._stuck: Set = set()      # tags que excederam tag_timeout, ainda ocupando o pool
+        self._abandoned: Set = set()  # threads presas de um pool já substituído
 
     def connect(self) -> bool:
         """
@@ -83,7 +92,8 @@ class PIServerClient:
             numeric_only: Se True, retorna apenas valores numéricos
 
         Returns:
-            Dictionary com dados interpolados ou None se erro
+            DataFrame com dados interpolados (vazio se não há valores no intervalo)
+            ou None se erro
         """
         try:
             if not self._connected:
@@ -92,18 +102,9 @@ class PIServerClient:
                     return None
 
             import gideaoPI as gp
-            import pandas as pd
 
-            # Convert datetime to string format se necessário
-            if isinstance(start_date, datetime):
-                start_str = start_date.strftime('%m/%d/%Y')
-            else:
-                start_str = start_date
-
-            if isinstance(end_date, datetime):
-                end_str = end_date.strftime('%m/%d/%Y')
-            else:
-                end_str = end_date
+            start_str = self._format_time(start_date)
+            end_str = self._format_time(end_date)
 
             logger.debug(f"Buscando dados de {tag} de {start_str} a {end_str}")
 
@@ -117,10 +118,14 @@ class PIServerClient:
                 numeric_only
             )
 
-            if df is None or df.empty:
+            if df is None:
                 logger.warning(f"Nenhum dado retornado para tag: {tag}")
                 return None
 
+            if df.empty:
+                logger.debug(f"Sem valores interpolados no intervalo para {tag}")
+                return df
+
             logger.debug(f"✓ Dados obtidos para {tag}: {len(df)} registros")
             return df
 
@@ -128,6 +133,56 @@ class PIServerClient:
             logger.error(f"Erro ao buscar dados interpolados para {tag}: {e}")
             return None
 
+    def get_interpolated_data_bulk(self, tags: List[str], start_date: datetime,
+                                   end_date: datetime, interval: str = '10m',
+                                   numeric_only: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Busca dados interpolados de vários tags numa única chamada em lote
+        (PIPoint.FindPIPoints + PIPointList.InterpolatedValues).
+
+        Args:
+            tags: Lista de nomes de tags
+            start_date: Data/hora de início
+            end_date: Data/hora de fim
+            interval: Intervalo de interpolação (ex: '10m', '1h')
+            numeric_only: Se True, converte estados digitais em 0/1
+
+        Returns:
+            DataFrame largo (coluna 'timestamp' e uma coluna por tag encontrado,
+            sem linhas se não há valores no intervalo) ou None se erro
+        """
+        try:
+            if not self._connected:
+                if not self.connect():
+                    return None
+
+            import gideaoPI as gp
+
+            start_str = self._format_time(start_date)
+            end_str = self._format_time(end_date)
+
+            logger.debug(f"Buscando dados de {len(tags)} tags em lote de {start_str} a {end_str}")
+
+            df = gp.getValoresInterpolados(
+                self.servidor,
+                list(tags),
+                start_str,
+                end_str,
+                interval,
+                numeric_only
+            )
+
+            if df is None:
+                logger.warning(f"Nenhum dado retornado para o lote de {len(tags)} tags")
+                return None
+
+            logger.debug(f"✓ Dados obtidos em lote: {len(df.columns) - 1}/{len(tags)} tags")
+            return df
+
+        except Exception as e:
+            logger.error(f"Erro ao buscar dados interpolados em lote: {e}")
+            return None
+
     def get_raw_data(self, tag: str, start_date: datetime, end_date: datetime) -> Optional[dict]:
         """
         Busca dados brutos (não interpolados) de um tag.
@@ -138,7 +193,7 @@ class PIServerClient:
             end_date: Data/hora de fim
 
         Returns:
-            DataFrame com dados brutos ou None se erro
+            DataFrame com dados brutos (vazio se não há valores no intervalo) ou None se erro
         """
         try:
             if not self._connected:
@@ -147,25 +202,22 @@ class PIServerClient:
 
             import gideaoPI as gp
 
-            if isinstance(start_date, datetime):
-                start_str = start_date.strftime('%m/%d/%Y')
-            else:
-                start_str = start_date
-
-            if isinstance(end_date, datetime):
-                end_str = end_date.strftime('%m/%d/%Y')
-            else:
-                end_str = end_date
+            start_str = self._format_time(start_date)
+            end_str = self._format_time(end_date)
 
             logger.debug(f"Buscando dados brutos de {tag} de {start_str} a {end_str}")
 
             # Call gideaoPI for raw data
-            df = gp.getValores(self.servidor, tag, start_str, end_str)
+            df = gp.getValoresArmazenados(self.servidor, tag, start_str, end_str)
 
-            if df is None or df.empty:
+            if df is None:
                 logger.warning(f"Nenhum dado bruto retornado para tag: {tag}")
                 return None
 
+            if df.empty:
+                logger.debug(f"Sem valores armazenados no intervalo para {tag}")
+                return df
+
             logger.debug(f"✓ Dados brutos obtidos para {tag}: {len(df)} registros")
             return df
 
@@ -210,8 +262,8 @@ class PIServerClient:
             df = gp.getValoresInterpolados(
                 self.servidor,
                 tag,
-                start.strftime('%m/%d/%Y'),
-                now.strftime('%m/%d/%Y'),
+                self._format_time(start),
+                self._format_time(now),
                 '1m',
                 False
             )
@@ -228,7 +280,8 @@ class PIServerClient:
             return None
 
     def get_multiple_tags(self, tags: List[str], start_date: datetime,
-                         end_date: datetime, interval: str = '10m') -> Optional[dict]:
+                         end_date: datetime, interval: str = '10m',
+                         max_workers: int = None) -> Optional[dict]:
         """
         Busca dados de múltiplos tags simultaneamente.
 
@@ -237,6 +290,8 @@ class PIServerClient:
             start_date: Data/hora de início
             end_date: Data/hora de fim
             interval: Intervalo de interpolação
+            max_workers: Máximo de requisições simultâneas ao PI
+                         (padrão: Config.PI_FETCH_MAX_WORKERS)
 
         Returns:
             Dictionary com DataFrames para cada tag ou None se erro
@@ -246,21 +301,18 @@ class PIServerClient:
                 if not self.connect():
                     return None
 
-            import pandas as pd
-
             result = {}
 
-            for tag in tags:
-                logger.debug(f"Buscando {tag}...")
-
-                df = self.get_interpolated_data(
+            def fetch(tag):
+                return self.get_interpolated_data(
                     tag, start_date, end_date, interval, numeric_only=False
                 )
 
-                if df is not None:
-                    result[tag] = df
-                else:
+            for tag, df in self.iter_concurrent(tags, fetch, max_workers=max_workers):
+                if df is None:
                     logger.warning(f"Falha ao buscar {tag}")
+                elif not df.empty:
+                    result[tag] = df
 
             if not result:
                 logger.error("Nenhum dado obtido para os tags solicitados")
@@ -273,10 +325,151 @@ class PIServerClient:
             logger.error(f"Erro ao buscar múltiplos tags: {e}")
             return None
 
+    def iter_concurrent(self, tags: List[str], fetch: Callable[[str], Any],
+                        max_workers: int = None, tag_timeout: float = None,
+                        cycle_timeout: float = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Executa fetch(tag) para vários tags num pool de threads limitado e
+        devolve (tag, resultado) à medida que cada tag termina.
+
+        O tempo de um ciclo passa a escalar com len(tags) / max_workers em vez
+        da soma das latências de cada tag. Um tag que excede tag_timeout é
+        devolvido com resultado None; a thread continua até o PI responder,
+        mas o ciclo não espera por ela. Ao fim de cycle_timeout os tags que
+        ainda não começaram (por exemplo, atrás de threads presas no PI) são
+        cancelados e devolvidos com None, então o ciclo nunca bloqueia além
+        desse prazo.
+
+        O pool é do cliente e reaproveitado entre ciclos, com no máximo
+        Config.PI_FETCH_MAX_WORKERS threads (ou o max_workers da primeira
+        chamada, se maior). Uma thread presa no PI continua ocupando o pool;
+        quando metade dele está presa, _get_executor o troca por um novo (ver
+        lá o limite de threads abandonadas).
+
+        Args:
+            tags: Lista de nomes de tags
+            fetch: Função que busca os dados de um tag
+            max_workers: Máximo de requisições simultâneas (padrão: Config.PI_FETCH_MAX_WORKERS)
+            tag_timeout: Timeout por tag em segundos (padrão: Config.PI_FETCH_TAG_TIMEOUT_SEC, 0 = sem limite)
+            cycle_timeout: Prazo total em segundos (padrão: Config.PI_FETCH_CYCLE_TIMEOUT_SEC, 0 = sem limite)
+
+        Yields:
+            Tuplas (tag, resultado); resultado é None em caso de erro ou timeout
+        """
+        max_workers = max_workers or Config.PI_FETCH_MAX_WORKERS
+        executor = self._get_executor(max_workers)
+        max_workers = min(max_workers, self._executor_workers)
+        tag_timeout = tag_timeout if tag_timeout is not None else Config.PI_FETCH_TAG_TIMEOUT_SEC
+        cycle_timeout = (cycle_timeout if cycle_timeout is not None
+                         else Config.PI_FETCH_CYCLE_TIMEOUT_SEC)
+        poll_interval = min([0.5] + [t for t in (tag_timeout, cycle_timeout) if t])
+        deadline = time.monotonic() + cycle_timeout if cycle_timeout else None
+
+        started = {}
+
+        def run(tag):
+            started[tag] = time.monotonic()
+            return fetch(tag)
+
+        queue = list(reversed(tags))
+        pending = {}
+
+        try:
+            while queue or pending:
+                # Janela deslizante: no máximo max_workers tags em andamento
+                while queue and len(pending) < max_workers:
+                    tag = queue.pop()
+                    pending[executor.submit(run, tag)] = tag
+
+                done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    tag = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Erro ao buscar {tag}: {e}")
+                        result = None
+                    yield tag, result
+
+                now = time.monotonic()
+                if tag_timeout:
+                    for future, tag in list(pending.items()):
+                        tag_started = started.get(tag)
+                        if tag_started is not None and now - tag_started > tag_timeout:
+                            del pending[future]
+                            with self._executor_lock:
+                                self._stuck.add(future)
+                            logger.warning(f"Timeout de {tag_timeout}s ao buscar {tag}")
+                            yield tag, None
+
+                if deadline is not None and now > deadline and (queue or pending):
+                    expired = list(pending.values()) + list(reversed(queue))
+                    for future in pending:
+                        future.cancel()
+                    pending.clear()
+                    queue.clear()
+                    logger.warning(f"⚠️ Prazo do ciclo ({cycle_timeout}s) esgotado; "
+                                   f"{len(expired)} tags sem resposta")
+                    for tag in expired:
+                        yield tag, None
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _get_executor(self, max_workers: int) -> ThreadPoolExecutor:
+        """
+        Pool de threads do cliente, criado na primeira busca concorrente.
+
+        Threads do ThreadPoolExecutor não podem ser interrompidas: uma chamada
+        ao PI que excedeu tag_timeout segue ocupando o pool até responder.
+        Quando metade do pool está presa, ele é trocado por um novo e as
+        threads presas terminam sozinhas. Só um pool com threads presas é
+        abandonado por vez (até elas terminarem), então no máximo um pool de
+        threads vaza; depois disso o ciclo roda com o pool reduzido.
+        """
+        with self._executor_lock:
+            self._stuck = {future for future in self._stuck if not future.done()}
+            self._abandoned = {future for future in self._abandoned if not future.done()}
+            if self._executor is not None and 2 * len(self._stuck) >= self._executor_workers:
+                if self._abandoned:
+                    logger.warning(f"⚠️ {len(self._stuck)}/{self._executor_workers} threads "
+                                   f"presas no PI; pool reduzido até o PI responder")
+                else:
+                    logger.warning(f"⚠️ {len(self._stuck)}/{self._executor_workers} threads "
+                                   f"presas no PI; substituindo o pool")
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                    self._abandoned, self._stuck = self._stuck, set()
+            if self._executor is None:
+                self._executor_workers = max(max_workers, Config.PI_FETCH_MAX_WORKERS)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._executor_workers, thread_name_prefix='pi-fetch'
+                )
+            return self._executor
+
+    @staticmethod
+    def _format_time(value) -> str:
+        """
+        Formata datetime no formato de tempo aceito pelo AFTime (data e hora).
+        Strings (ex: '*-1h') são repassadas sem alteração.
+        """
+        if isinstance(value, datetime):
+            return value.strftime('%m/%d/%Y %H:%M:%S')
+        return value
+
     def disconnect(self):
         """Desconecta do PI Server"""
         try:
             self._connected = False
+            with self._executor_lock:
+                if self._executor is not None:
+                    # Threads presas no PI não impedem o desligamento; tags ainda na
+                    # fila já foram cancelados pelo iter_concurrent que os submeteu
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                    self._stuck, self._abandoned = set(), set()
             logger.info("Desconectado do PI Server")
         except Exception as e:
             logger.error(f"Erro ao desconectar: {e}")
@@ -0,0 +1,148 @@
+"""
+Jobs periódicos do SafePlan: ingestão, avaliação de alertas, envio ao Teams,
+retenção de dados e retreino de modelos.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from config.settings import Config
+from src.data.database import get_db_manager
+from src.data.repositories import RepositoryFactory
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerJobs:
+    """
+    Agrupa os jobs executados pelo SchedulerService.
+
+    Os componentes (DataFetcher, AlertEngine, TeamsNotifier, MLEngine,
+    VotingGroupEngine) são criados na primeira execução e reaproveitados nas
+    seguintes, de modo que estado entre ciclos (ex: high-water marks da
+    ingestão, índice dos grupos de votação) persiste no processo.
+    """
+
+    def __init__(self, data_fetcher=None, alert_engine=None, teams_notifier=None,
+                 ml_engine=None, voting_engine=None):
+        """
+        Inicializa os jobs.
+
+        Args:
+            data_fetcher: DataFetcher (opcional, criado sob demanda)
+            alert_engine: AlertEngine (opcional, criado sob demanda)
+            teams_notifier: TeamsNotifier (opcional, criado sob demanda)
+            ml_engine: MLEngine (opcional, criado sob demanda)
+            voting_engine: VotingGroupEngine (opcional, criado sob demanda)
+        """
+        self._data_fetcher = data_fetcher
+        self._alert_engine = alert_engine
+        self._teams_notifier = teams_notifier
+        self._ml_engine = ml_engine
+        self._voting_engine = voting_engine
+
+    @property
+    def data_fetcher(self):
+        if self._data_fetcher is None:
+            from src.pi_server.data_fetcher import create_data_fetcher
+            self._data_fetcher = create_data_fetcher()
+            if Config.ML_ONLINE_SCORING:
+                # Cada ciclo pontua só as leituras novas contra os modelos já treinados
+                self._data_fetcher.add_readings_listener(self.ml_engine.score_new_readings)
+        return self._data_fetcher
+
+    @property
+    def alert_engine(self):
+        if self._alert_engine is None:
+            from src.alerting.alert_engine import create_alert_engine
+            self._alert_engine = create_alert_engine()
+        return self._alert_engine
+
+    @property
+    def teams_notifier(self):
+        if self._teams_notifier is None:
+            from src.alerting.teams_notifier import create_teams_notifier
+            self._teams_notifier = create_teams_notifier()
+        return self._teams_notifier
+
+    @property
+    def ml_engine(self):
+        if self._ml_engine is None:
+            from src.ml.ml_engine import create_ml_engine
+            self._ml_engine = create_ml_engine()
+        return self._ml_engine
+
+    @property
+    def voting_engine(self):
+        if self._voting_engine is None:
+            from src.sensors.voting_group_engine import create_voting_group_engine
+            self._voting_engine = create_voting_group_engine()
+        return self._voting_engine
+
+    def ingest_readings(self) -> Dict:
+        """Busca as leituras novas de todos os sensores habilitados no PI"""
+        sensors = self.data_fetcher.get_sensor_list()
+        inserted = self.data_fetcher.fetch_latest_readings(sensors) if sensors else 0
+        return {'sensors': len(sensors), 'inserted': inserted}
+
+    def evaluate_alerts(self) -> Dict:
+        """
+        Avalia todas as definições de alerta habilitadas contra a última leitura de cada sensor.
+
+        Definições ANOMALY usam os scores do scoring online da última ingestão
+        (MLEngine.latest_scores, com ML_ONLINE_SCORING ligado). Scores de mais
+        de dois ciclos de ingestão ficam de fora: um sensor que parou de
+        reportar não mantém o alerta aceso com o último score. Definições
+        FORECAST não são avaliadas aqui: o ciclo não gera previsões, e o
+        AlertEngine ignora definições sem valor predito.
+        """
+        anomaly_scores = {}
+        if Config.ML_ONLINE_SCORING:
+            cutoff = datetime.utcnow() - timedelta(seconds=2 * Config.SCHEDULER_INGESTION_INTERVAL_SEC)
+            anomaly_scores = {
+                sensor_id: score['anomaly_score']
+                for sensor_id, score in list(self.ml_engine.latest_scores.items())
+                if score['scored_at'] >= cutoff
+            }
+        result = self.alert_engine.evaluate_batch(anomaly_scores=anomaly_scores)
+        return {
+            'definitions_evaluated': result['evaluated'],
+            'alerts_triggered': len(result['triggered_alert_ids']),
+            'alerts_resolved': result['resolved']
+        }
+
+    def evaluate_voting_groups(self) -> Dict:
+        """Avalia a votação MooN de todos os grupos e publica os estados alterados"""
+        return self.voting_engine.run_cycle()
+
+    def dispatch_notifications(self) -> Dict:
+        """Envia ao Teams os alertas críticos ainda não notificados"""
+        if not self.teams_notifier.webhook_url:
+            return {'sent': 0, 'skipped': 'webhook não configurado'}
+        return {'sent': self.teams_notifier.notify_critical_alerts()}
+
+    def apply_retention(self, now: Optional[datetime] = None) -> Dict:
+        """Remove leituras e alertas resolvidos mais antigos que a retenção configurada"""
+        now = now or datetime.utcnow()
+        session = get_db_manager().get_session()
+        try:
+            repos = RepositoryFactory(session)
+            reading_repo = repos.sensor_reading()
+            reading_cutoff = now - timedelta(days=Config.READING_RETENTION_DAYS)
+            # Partições inteiramente expiradas saem com DROP TABLE, antes do DELETE
+            partitions_dropped = reading_repo.drop_partitions_before(reading_cutoff)
+            readings_deleted = reading_repo.delete_older_than(reading_cutoff)
+            alerts_deleted = repos.alert_history().delete_resolved_older_than(
+                now - timedelta(days=Config.ALERT_RETENTION_DAYS)
+            )
+        finally:
+            session.close()
+
+        result = {'readings_deleted': readings_deleted, 'alerts_deleted': alerts_deleted}
+        if reading_repo.partitions is not None:
+            result['partitions_dropped'] = len(partitions_dropped)
+        return result
+
+    def retrain_models(self) -> Dict:
+        """Retreina os modelos de ML de todos os sensores habilitados"""
+        return self.ml_engine.retrain_all_models()
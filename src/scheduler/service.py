@@ -0,0 +1,276 @@
+"""
+Scheduler Service - processo de longa duração que executa os jobs periódicos
+do SafePlan (ingestão, alertas, Teams, retenção e retreino) via APScheduler,
+sem depender de interações na interface Streamlit.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from config.settings import Config
+from src.scheduler.jobs import SchedulerJobs
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerService:
+    """
+    Agenda e executa os jobs periódicos com:
+    - prevenção de sobreposição (max_instances=1 e lock por job)
+    - tratamento de execuções perdidas (coalesce + misfire_grace_time)
+    - jitter para não alinhar todos os jobs no mesmo instante
+    - métricas de duração por job
+    """
+
+    def __init__(self, jobs: Optional[SchedulerJobs] = None,
+                 scheduler: Optional[BackgroundScheduler] = None):
+        """
+        Inicializa SchedulerService.
+
+        Args:
+            jobs: SchedulerJobs (opcional, cria um novo se None)
+            scheduler: Scheduler do APScheduler (opcional, BackgroundScheduler se None)
+        """
+        self.jobs = jobs or SchedulerJobs()
+        self.scheduler = scheduler or BackgroundScheduler(
+            timezone=Config.SCHEDULER_TIMEZONE,
+            job_defaults={
+                'coalesce': True,
+                'max_instances': 1,
+                'misfire_grace_time': Config.SCHEDULER_MISFIRE_GRACE_SEC
+            }
+        )
+        self.scheduler.add_listener(self._on_job_skipped,
+                                    EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._budgets: Dict[str, Optional[float]] = {}
+        self._metrics: Dict[str, Dict] = {}
+        self._metrics_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def add_interval_job(self, job_id: str, func: Callable, seconds: float,
+                         jitter: Optional[int] = None):
+        """
+        Agenda um job a cada `seconds` segundos.
+
+        Args:
+            job_id: Identificador do job
+            func: Função sem argumentos a executar
+            seconds: Intervalo entre execuções
+            jitter: Atraso aleatório máximo em segundos (padrão: Config.SCHEDULER_JITTER_SEC)
+        """
+        trigger = IntervalTrigger(
+            seconds=seconds,
+            jitter=Config.SCHEDULER_JITTER_SEC if jitter is None else jitter
+        )
+        self._add_job(job_id, func, trigger, budget=seconds)
+
+    def add_cron_job(self, job_id: str, func: Callable, jitter: Optional[int] = None,
+                     **cron_fields):
+        """
+        Agenda um job com expressão cron (ex: day_of_week='sun', hour=2, minute=0).
+
+        Args:
+            job_id: Identificador do job
+            func: Função sem argumentos a executar
+            jitter: Atraso aleatório máximo em segundos (padrão: Config.SCHEDULER_JITTER_SEC)
+            **cron_fields: Campos aceitos por CronTrigger
+        """
+        trigger = CronTrigger(
+            timezone=Config.SCHEDULER_TIMEZONE,
+            jitter=Config.SCHEDULER_JITTER_SEC if jitter is None else jitter,
+            **cron_fields
+        )
+        self._add_job(job_id, func, trigger, budget=None)
+
+    def register_default_jobs(self):
+        """Agenda os jobs padrão do SafePlan a partir de Config"""
+        day_of_week, hour, minute = parse_retraining_schedule(
+            Config.ML_MODEL_RETRAINING_DAY, Config.ML_MODEL_RETRAINING_HOUR
+        )
+
+        self.add_interval_job('ingestion', self.jobs.ingest_readings,
+                              Config.SCHEDULER_INGESTION_INTERVAL_SEC)
+        self.add_interval_job('alert_evaluation', self.jobs.evaluate_alerts,
+                              Config.ALERT_CHECK_INTERVAL_SEC)
+        self.add_interval_job('voting_groups', self.jobs.evaluate_voting_groups,
+                              Config.ALERT_CHECK_INTERVAL_SEC)
+        self.add_interval_job('teams_dispatch', self.jobs.dispatch_notifications,
+                              Config.SCHEDULER_TEAMS_INTERVAL_SEC)
+        self.add_cron_job('retention', self.jobs.apply_retention,
+                          hour=Config.SCHEDULER_RETENTION_HOUR, minute=0, jitter=300)
+        self.add_cron_job('retraining', self.jobs.retrain_models,
+                          day_of_week=day_of_week, hour=hour, minute=minute, jitter=300)
+
+        logger.info(f"✓ {len(self._locks)} jobs agendados: {', '.join(self._locks)}")
+
+    def run_job(self, job_id: str):
+        """
+        Executa um job imediatamente (fora do agendamento), respeitando o lock
+        de sobreposição.
+
+        Returns:
+            Resultado do job, ou None se já estava em execução ou falhou
+        """
+        job = self.scheduler.get_job(job_id)
+        if job is None:
+            raise KeyError(f"Job não registrado: {job_id}")
+        return job.func()
+
+    def start(self):
+        """Inicia o scheduler em background"""
+        self._stop_event.clear()
+        self.scheduler.start()
+        logger.info("✓ Scheduler iniciado")
+
+    def shutdown(self, wait: bool = True):
+        """Para o scheduler, aguardando os jobs em execução se wait=True"""
+        self._stop_event.set()
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=wait)
+        logger.info("Scheduler finalizado")
+
+    def run_forever(self):
+        """Inicia o scheduler e bloqueia até shutdown() ser chamado"""
+        self.start()
+        try:
+            while not self._stop_event.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """
+        Retorna métricas por job: execuções, falhas, sobreposições evitadas,
+        execuções perdidas e duração (última, média e máxima).
+        """
+        with self._metrics_lock:
+            metrics = {job_id: dict(m) for job_id, m in self._metrics.items()}
+
+        for job_id, m in metrics.items():
+            m['avg_duration_sec'] = m['total_duration_sec'] / m['runs'] if m['runs'] else 0.0
+            job = self.scheduler.get_job(job_id)
+            m['next_run_at'] = getattr(job, 'next_run_time', None)
+        return metrics
+
+    def _add_job(self, job_id: str, func: Callable, trigger, budget: Optional[float]):
+        """Registra o job com o wrapper de lock e métricas"""
+        self._locks[job_id] = threading.Lock()
+        self._budgets[job_id] = budget
+        with self._metrics_lock:
+            self._metrics[job_id] = {
+                'runs': 0,
+                'failures': 0,
+                'overlaps_skipped': 0,
+                'misfires': 0,
+                'last_duration_sec': None,
+                'max_duration_sec': 0.0,
+                'total_duration_sec': 0.0,
+                'last_run_at': None,
+                'last_result': None,
+                'last_error': None
+            }
+
+        self.scheduler.add_job(
+            self._wrap(job_id, func),
+            trigger=trigger,
+            id=job_id,
+            name=job_id,
+            replace_existing=True
+        )
+
+    def _wrap(self, job_id: str, func: Callable) -> Callable:
+        """Envolve o job com lock de sobreposição e medição de duração"""
+
+        def run():
+            lock = self._locks[job_id]
+            if not lock.acquire(blocking=False):
+                logger.warning(f"Job {job_id} ainda em execução, pulando esta rodada")
+                self._update_metrics(job_id, overlaps_skipped=1)
+                return None
+
+            started_at = datetime.utcnow()
+            start = time.perf_counter()
+            result = None
+            error = None
+            try:
+                result = func()
+                return result
+            except Exception as e:
+                error = str(e)
+                logger.error(f"❌ Job {job_id} falhou: {e}")
+                return None
+            finally:
+                duration = time.perf_counter() - start
+                lock.release()
+                self._record_run(job_id, started_at, duration, result, error)
+
+        run.__name__ = f"{job_id}_job"
+        return run
+
+    def _record_run(self, job_id: str, started_at: datetime, duration: float,
+                    result, error: Optional[str]):
+        """Atualiza métricas e loga a execução do job"""
+        with self._metrics_lock:
+            m = self._metrics[job_id]
+            m['runs'] += 1
+            m['failures'] += 1 if error else 0
+            m['last_duration_sec'] = duration
+            m['max_duration_sec'] = max(m['max_duration_sec'], duration)
+            m['total_duration_sec'] += duration
+            m['last_run_at'] = started_at
+            m['last_result'] = result
+            m['last_error'] = error
+
+        if not error:
+            logger.info(f"✓ Job {job_id} concluído em {duration:.2f}s: {result}")
+
+        budget = self._budgets.get(job_id)
+        if budget and duration > budget:
+            logger.warning(f"Job {job_id} levou {duration:.1f}s, acima do intervalo de {budget}s")
+
+    def _update_metrics(self, job_id: str, **increments):
+        with self._metrics_lock:
+            m = self._metrics.get(job_id)
+            if m is None:
+                return
+            for key, value in increments.items():
+                m[key] += value
+
+    def _on_job_skipped(self, event):
+        """Listener do APScheduler para execuções perdidas ou bloqueadas por max_instances"""
+        if event.code == EVENT_JOB_MISSED:
+            logger.warning(f"Job {event.job_id} perdeu a execução de {event.scheduled_run_time}")
+            self._update_metrics(event.job_id, misfires=1)
+        else:
+            logger.warning(f"Job {event.job_id} ainda em execução (max_instances)")
+            self._update_metrics(event.job_id, overlaps_skipped=1)
+
+
+def parse_retraining_schedule(day: str, hour: str) -> tuple:
+    """
+    Converte ML_MODEL_RETRAINING_DAY/HOUR (ex: 'Sunday', '02:00') em campos cron.
+
+    Returns:
+        Tupla (day_of_week, hour, minute), ex: ('sun', 2, 0)
+    """
+    day_of_week = day.strip()[:3].lower()
+    hour_part, _, minute_part = hour.strip().partition(':')
+    return day_of_week, int(hour_part), int(minute_part or 0)
+
+
+def create_scheduler_service() -> SchedulerService:
+    """Factory para criar SchedulerService com os jobs padrão registrados"""
+    service = SchedulerService()
+    service.register_default_jobs()
+    return service
@@ -389,7 +389,10 @@ class SensorManager:
             if not sensor:
                 return {}
 
-            latest_reading = reading_repo.get_latest(sensor_id)
+            # Busca por chave primária em sensor_latest (sem ORDER BY em sensor_readings)
+            latest_timestamp, latest_value = reading_repo.get_latest_values(
+                [sensor_id]
+            ).get(sensor_id, (None, None))
 
             status = {
                 'sensor_id': sensor.sensor_id,
@@ -399,8 +402,8 @@ class SensorManager:
                 'platform': sensor.platform,
                 'unit': sensor.unit,
                 'enabled': sensor.enabled,
-                'latest_value': latest_reading.value if latest_reading else None,
-                'latest_timestamp': latest_reading.timestamp if latest_reading else None,
+                'latest_value': latest_value,
+                'latest_timestamp': latest_timestamp,
                 'thresholds': {
                     'lower_ok_limit': sensor.lower_ok_limit,
                     'lower_warning_limit': sensor.lower_warning_limit,
@@ -0,0 +1,305 @@
+"""
+Voting Group Engine - Avalia a lógica de votação MooN dos grupos (SensorConfig.grupo).
+Calcula trips, alarmes, falhas, bypass e degradação de toda a frota em operações vetorizadas.
+"""
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import Config
+from src.data.database import get_db_manager
+from src.data.repositories import RepositoryFactory
+
+logger = logging.getLogger(__name__)
+
+GROUP_STATES = ('NORMAL', 'DEGRADED', 'ALARM', 'INOPERATIVE', 'TRIPPED')
+
+GroupState = namedtuple(
+    'GroupState',
+    ['grupo', 'state', 'votes_required', 'members', 'tripped', 'alarm', 'faulted', 'bypassed']
+)
+
+
+def parse_group_votes(raw: str) -> Dict[str, int]:
+    """
+    Converte VOTING_GROUP_VOTES (JSON {"grupo": M}) em dicionário.
+
+    Args:
+        raw: String JSON (vazia = sem exceções)
+
+    Returns:
+        Dicionário grupo -> votos necessários
+    """
+    if not raw:
+        return {}
+    try:
+        return {str(grupo): int(votes) for grupo, votes in json.loads(raw).items()}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"VOTING_GROUP_VOTES inválido, ignorando: {e}")
+        return {}
+
+
+class VotingGroupEngine:
+    """
+    Avalia todos os grupos de votação a partir da última leitura de cada membro.
+
+    O índice grupo → membros (limites, bypass) é montado uma vez em arrays
+    NumPy e reconstruído a cada refresh_interval segundos. A cada ciclo
+    apenas os valores mais recentes mudam: a classificação dos membros e as
+    contagens por grupo (np.bincount) são vetorizadas, então a frota inteira
+    é avaliada em milissegundos. Somente grupos cujo estado mudou são
+    publicados em voting_group_status.
+
+    Classificação de cada membro (em ordem de prioridade):
+        BYPASS  sensor desabilitado na configuração
+        FAULT   sem leitura, leitura mais velha que stale_seconds ou abaixo de lower_ok_limit
+        TRIP    valor >= upper_critical_limit (ou upper_warning_limit se não houver crítico)
+        ALARM   valor >= upper_warning_limit
+        OK
+
+    Estado do grupo (M votos de N membros):
+        TRIPPED      trips >= M
+        INOPERATIVE  membros disponíveis (N - bypass - falha) < M
+        ALARM        algum membro em trip/alarme sem atingir M
+        DEGRADED     algum membro em bypass ou falha
+        NORMAL
+    """
+
+    def __init__(self, default_votes: int = None, group_votes: Dict[str, int] = None,
+                 stale_seconds: float = None, refresh_interval: float = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o engine (índice vazio até o primeiro uso).
+
+        Args:
+            default_votes: M padrão dos grupos (ex: 2 para 2ooN)
+            group_votes: M por grupo, sobrepõe o padrão
+            stale_seconds: Idade máxima de leitura antes de contar como falha
+            refresh_interval: Segundos até reconstruir o índice de membros (0 = nunca)
+            clock: Função de relógio do refresh (substituível em testes)
+        """
+        self.default_votes = default_votes or Config.VOTING_DEFAULT_VOTES
+        self.group_votes = (group_votes if group_votes is not None
+                            else parse_group_votes(Config.VOTING_GROUP_VOTES))
+        self.stale_seconds = (stale_seconds if stale_seconds is not None
+                              else Config.VOTING_STALE_SEC)
+        self.refresh_interval = (refresh_interval if refresh_interval is not None
+                                 else Config.VOTING_INDEX_REFRESH_SEC)
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._indexed_at: Optional[float] = None
+
+        self.groups: List[str] = []
+        self._position: Dict[int, int] = {}
+        self._states: Dict[str, GroupState] = {}
+        self._empty_index()
+
+    def _empty_index(self):
+        self._sensor_ids = np.empty(0, dtype=np.int64)
+        self._codes = np.empty(0, dtype=np.int64)
+        self._bypass = np.empty(0, dtype=bool)
+        self._lower = np.empty(0)
+        self._alarm_limit = np.empty(0)
+        self._trip_limit = np.empty(0)
+        self._values = np.empty(0)
+        self._timestamps = np.empty(0)
+        self._votes = np.empty(0, dtype=np.int64)
+        self._members = np.empty(0, dtype=np.int64)
+
+    def build_index(self, session):
+        """
+        Monta o índice grupo → membros numa única consulta a sensor_config.
+        Valores já conhecidos de sensores que continuam no índice são preservados.
+        """
+        rows = RepositoryFactory(session).sensor_config().get_voting_members()
+
+        with self._lock:
+            previous = {sid: (self._values[pos], self._timestamps[pos])
+                        for sid, pos in self._position.items()}
+
+            groups = sorted({row[1] for row in rows})
+            group_code = {grupo: code for code, grupo in enumerate(groups)}
+            as_float = lambda v: np.nan if v is None else float(v)
+
+            self.groups = groups
+            self._sensor_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            self._codes = np.array([group_code[row[1]] for row in rows], dtype=np.int64)
+            self._bypass = np.array([not row[2] for row in rows], dtype=bool)
+            self._lower = np.array([as_float(row[3]) for row in rows])
+            self._alarm_limit = np.array([as_float(row[4]) for row in rows])
+            critical = np.array([as_float(row[5]) for row in rows])
+            self._trip_limit = np.where(np.isnan(critical), self._alarm_limit, critical)
+            self._position = {int(sid): pos for pos, sid in enumerate(self._sensor_ids)}
+
+            self._values = np.full(len(rows), np.nan)
+            self._timestamps = np.full(len(rows), np.nan)
+            for sid, (value, ts) in previous.items():
+                pos = self._position.get(sid)
+                if pos is not None:
+                    self._values[pos] = value
+                    self._timestamps[pos] = ts
+
+            self._members = np.bincount(self._codes, minlength=len(groups))
+            requested = np.array([self.group_votes.get(g, self.default_votes) for g in groups],
+                                 dtype=np.int64)
+            self._votes = np.clip(requested, 1, np.maximum(self._members, 1))
+            self._states = {g: s for g, s in self._states.items() if g in group_code}
+            self._indexed_at = self._clock()
+
+        logger.info(f"✓ Índice de votação: {len(groups)} grupos, {len(rows)} sensores")
+
+    def needs_refresh(self) -> bool:
+        """True se o índice nunca foi montado, foi invalidado ou está velho"""
+        with self._lock:
+            if self._indexed_at is None:
+                return True
+            if self.refresh_interval:
+                return self._clock() - self._indexed_at > self.refresh_interval
+            return False
+
+    def invalidate(self):
+        """Força reconstrução do índice no próximo ciclo (ex: após alterar sensores)"""
+        with self._lock:
+            self._indexed_at = None
+
+    def update_values(self, latest_values: Dict[int, Tuple[datetime, float]]) -> int:
+        """
+        Atualiza a última leitura dos membros informados.
+
+        Args:
+            latest_values: Dicionário sensor_id -> (timestamp, valor)
+
+        Returns:
+            Número de membros atualizados (sensores fora de grupos são ignorados)
+        """
+        updated = 0
+        with self._lock:
+            for sensor_id, (timestamp, value) in latest_values.items():
+                pos = self._position.get(sensor_id)
+                if pos is None:
+                    continue
+                self._values[pos] = np.nan if value is None else value
+                self._timestamps[pos] = timestamp.timestamp() if timestamp else np.nan
+                updated += 1
+        return updated
+
+    def evaluate(self, now: datetime = None) -> Dict[str, GroupState]:
+        """
+        Avalia todos os grupos com os valores atuais do índice.
+
+        Args:
+            now: Instante de referência para leituras velhas (padrão: utcnow)
+
+        Returns:
+            Dicionário grupo -> GroupState
+        """
+        now = now or datetime.utcnow()
+
+        with self._lock:
+            n_groups = len(self.groups)
+            values = self._values
+
+            with np.errstate(invalid='ignore'):
+                fresh = self._timestamps >= now.timestamp() - self.stale_seconds
+                fault = ~self._bypass & (~fresh | np.isnan(values) | (values < self._lower))
+                valid = ~self._bypass & ~fault
+                trip = valid & (values >= self._trip_limit)
+                alarm = valid & ~trip & (values >= self._alarm_limit)
+
+            count = lambda mask: np.bincount(self._codes[mask], minlength=n_groups)
+            tripped, alarmed = count(trip), count(alarm)
+            faulted, bypassed = count(fault), count(self._bypass)
+            available = self._members - faulted - bypassed
+
+            state_codes = np.select(
+                [tripped >= self._votes,
+                 available < self._votes,
+                 (tripped + alarmed) > 0,
+                 (faulted + bypassed) > 0],
+                [4, 3, 2, 1],
+                default=0
+            )
+
+            self._states = {
+                grupo: GroupState(grupo, GROUP_STATES[state_codes[i]], int(self._votes[i]),
+                                  int(self._members[i]), int(tripped[i]), int(alarmed[i]),
+                                  int(faulted[i]), int(bypassed[i]))
+                for i, grupo in enumerate(self.groups)
+            }
+            return dict(self._states)
+
+    def run_cycle(self, now: datetime = None) -> Dict:
+        """
+        Ciclo completo: reconstrói o índice se necessário, lê a última leitura
+        de todos os membros numa consulta, avalia e publica os grupos alterados.
+
+        Args:
+            now: Instante de referência (padrão: utcnow)
+
+        Returns:
+            Dict com groups, changed e contagem por estado
+        """
+        now = now or datetime.utcnow()
+        session = get_db_manager().get_session()
+
+        try:
+            repos = RepositoryFactory(session)
+            if self.needs_refresh():
+                self.build_index(session)
+                repos.voting_group_status().delete_missing(self.groups)
+
+            with self._lock:
+                previous = dict(self._states)
+
+            # Sem filtro IN: a frota inteira cabe numa consulta e evita o limite
+            # de parâmetros do SQLite; sensores fora de grupos são ignorados
+            self.update_values(repos.sensor_reading().get_latest_values())
+            states = self.evaluate(now)
+
+            changed = [state for grupo, state in states.items()
+                       if previous.get(grupo) != state]
+            repos.voting_group_status().upsert_many(
+                [dict(state._asdict(), changed_at=now) for state in changed]
+            )
+
+        except Exception as e:
+            logger.error(f"Erro ao avaliar grupos de votação: {e}")
+            session.rollback()
+            self.invalidate()
+            raise
+        finally:
+            session.close()
+
+        by_state = self.count_by_state()
+        if changed:
+            logger.info(f"✓ Grupos de votação: {len(changed)} alterados, {by_state}")
+        return {'groups': len(states), 'changed': len(changed), 'by_state': by_state}
+
+    def get_state(self, grupo: str) -> Optional[GroupState]:
+        """Retorna o último estado avaliado de um grupo (sem consulta)"""
+        with self._lock:
+            return self._states.get(grupo)
+
+    def get_states(self, states: List[str] = None) -> List[GroupState]:
+        """Retorna os grupos avaliados, opcionalmente filtrados por estado"""
+        with self._lock:
+            return [s for s in self._states.values() if states is None or s.state in states]
+
+    def count_by_state(self) -> Dict[str, int]:
+        """Contagem de grupos por estado"""
+        with self._lock:
+            counts = {}
+            for state in self._states.values():
+                counts[state.state] = counts.get(state.state, 0) + 1
+            return counts
+
+
+def create_voting_group_engine() -> VotingGroupEngine:
+    """Factory para criar instância de VotingGroupEngine"""
+    return VotingGroupEngine()
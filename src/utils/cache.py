@@ -0,0 +1,145 @@
+"""
+Cache LRU com expiração por tempo (TTL), seguro para uso entre threads.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Cache LRU com TTL por entrada, invalidação explícita e contadores de acerto.
+
+    Quando o cache atinge maxsize, a entrada usada há mais tempo é descartada.
+    Entradas mais antigas que ttl segundos são tratadas como ausentes.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o cache.
+
+        Args:
+            maxsize: Número máximo de entradas
+            ttl: Tempo de vida de cada entrada em segundos (0 = sem expiração)
+            clock: Função de relógio (substituível em testes)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retorna o valor da chave ou default se ausente/expirada.
+
+        Args:
+            key: Chave buscada
+            default: Valor retornado em caso de miss
+
+        Returns:
+            Valor em cache ou default
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is self._MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Grava o valor da chave, descartando a entrada LRU se necessário"""
+        with self._lock:
+            self._data[key] = (value, self._clock())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Retorna o valor em cache ou chama loader() e guarda o resultado.
+        Exceções do loader são propagadas e nada é guardado.
+
+        Args:
+            key: Chave buscada
+            loader: Função que resolve o valor em caso de miss
+
+        Returns:
+            Valor em cache ou recém-carregado
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not self._MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # A resolução (RPC) roda fora do lock para não serializar as threads
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None,
+                   predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """
+        Remove entradas do cache.
+
+        Args:
+            key: Remove apenas esta chave
+            predicate: Remove as chaves para as quais predicate(chave) é True
+            (sem key nem predicate, limpa o cache inteiro)
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._lock:
+            if key is not None:
+                return 1 if self._data.pop(key, None) is not None else 0
+            if predicate is not None:
+                keys = [k for k in self._data if predicate(k)]
+            else:
+                keys = list(self._data)
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def stats(self) -> dict:
+        """Retorna contadores de uso do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_sec': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _lookup(self, key: Hashable) -> Any:
+        """Busca a chave (com o lock já adquirido), expirando-a se vencida"""
+        entry = self._data.get(key)
+        if entry is None:
+            return self._MISSING
+        value, stored_at = entry
+        if self.ttl and self._clock() - stored_at > self.ttl:
+            del self._data[key]
+            self.expirations += 1
+            return self._MISSING
+        self._data.move_to_end(key)
+        return value
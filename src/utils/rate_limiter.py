@@ -0,0 +1,57 @@
+"""
+Rate limiter token bucket por chave (ex: URL de webhook), seguro para uso entre threads.
+"""
+import threading
+import time
+from typing import Callable, Dict, Hashable, List
+
+
+class RateLimiter:
+    """
+    Token bucket independente por chave.
+
+    Cada chave recebe `rate` tokens por `per` segundos, acumulando até `burst`.
+    try_acquire() nunca bloqueia: retorna False quando não há token e o
+    chamador decide adiar o trabalho.
+    """
+
+    def __init__(self, rate: float, per: float = 60.0, burst: int = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o rate limiter.
+
+        Args:
+            rate: Número de eventos permitidos por janela (0 = sem limite)
+            per: Tamanho da janela em segundos
+            burst: Máximo de tokens acumulados (padrão: rate)
+            clock: Função de relógio (substituível em testes)
+        """
+        self.rate = rate
+        self.per = per
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[Hashable, List[float]] = {}
+
+    def try_acquire(self, key: Hashable) -> bool:
+        """
+        Consome um token da chave, se disponível.
+
+        Args:
+            key: Chave do bucket (ex: URL do webhook)
+
+        Returns:
+            True se o evento pode prosseguir agora
+        """
+        if not self.rate:
+            return True
+
+        with self._lock:
+            now = self._clock()
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate / self.per)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = [tokens, now]
+            return allowed
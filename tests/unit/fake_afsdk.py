@@ -0,0 +1,266 @@
+"""
+Camada .NET falsa (clr, System, OSIsoft.AF.*) para testar gideao_pi sem o AF SDK.
+
+Cada servidor/database fake guarda séries fixas e conta as chamadas feitas ao
+SDK em ``chamadas``, para os testes verificarem quantos RPCs foram feitos.
+"""
+import importlib
+import sys
+import types
+from collections import Counter
+
+chamadas = Counter()
+
+
+class AFTime:
+    def __init__(self, texto=None):
+        self.texto = texto
+        self.LocalTime = self
+
+    def ToString(self):
+        return str(self.texto)
+
+
+class AFTimeRange:
+    def __init__(self, inicio=None, fim=None):
+        self.StartTime = inicio
+        self.EndTime = fim
+
+
+class AFTimeSpan:
+    @staticmethod
+    def Parse(texto):
+        return texto
+
+
+class AFBoundaryType:
+    Inside = 'Inside'
+
+
+class PIPageType:
+    TagCount = 'TagCount'
+
+
+class PIPagingConfiguration:
+    def __init__(self, tipo, tamanho):
+        self.tipo = tipo
+        self.tamanho = tamanho
+
+
+class PICommonPointAttributes:
+    EngineeringUnits = 'engunits'
+
+
+class AFValue:
+    def __init__(self, timestamp, valor, pi_point=None, attribute=None):
+        self.Timestamp = AFTime(timestamp)
+        self.Value = valor
+        self.PIPoint = pi_point
+        self.Attribute = attribute
+
+
+class AFValues(list):
+    PIPoint = None
+    Attribute = None
+
+
+def _serie(serie, pi_point=None, attribute=None):
+    valores = AFValues(AFValue(ts, v, pi_point, attribute) for ts, v in serie)
+    valores.PIPoint = pi_point
+    valores.Attribute = attribute
+    return valores
+
+
+class PIServer:
+    """Servidor PI fake; séries por tag: {tag: [(timestamp, valor), ...]}"""
+
+    def __init__(self, nome, series):
+        self.nome = nome
+        self.series = series
+
+    def get_Name(self):
+        return self.nome
+
+
+class PIPoint:
+    def __init__(self, servidor, nome):
+        self.servidor = servidor
+        self.Name = nome
+
+    @staticmethod
+    def FindPIPoint(servidor, tag):
+        chamadas['FindPIPoint'] += 1
+        if tag not in servidor.series:
+            raise KeyError(tag)
+        return PIPoint(servidor, tag)
+
+    @staticmethod
+    def FindPIPoints(servidor, nomes, atributos):
+        chamadas['FindPIPoints'] += 1
+        return [PIPoint(servidor, nome) for nome in nomes if nome in servidor.series]
+
+    def CurrentValue(self):
+        chamadas['PIPoint.CurrentValue'] += 1
+        ts, valor = self.servidor.series[self.Name][-1]
+        return AFValue(ts, valor, self)
+
+    def InterpolatedValues(self, timerange, span, filtro, incluir):
+        chamadas['PIPoint.InterpolatedValues'] += 1
+        return _serie(self.servidor.series[self.Name], pi_point=self)
+
+    def RecordedValues(self, timerange, limite, filtro, incluir):
+        chamadas['PIPoint.RecordedValues'] += 1
+        return _serie(self.servidor.series[self.Name], pi_point=self)
+
+
+class PIPointList(list):
+    def CurrentValue(self):
+        chamadas['PIPointList.CurrentValue'] += 1
+        return [AFValue(*pt.servidor.series[pt.Name][-1], pi_point=pt) for pt in self]
+
+    def InterpolatedValues(self, timerange, span, filtro, incluir, paginacao):
+        chamadas['PIPointList.InterpolatedValues'] += 1
+        return [_serie(pt.servidor.series[pt.Name], pi_point=pt) for pt in self]
+
+
+class AFNamedCollection(dict):
+    def get_Item(self, nome):
+        chamadas['get_Item'] += 1
+        return self[nome]
+
+
+class AFAttributeData:
+    def __init__(self, attribute):
+        self.attribute = attribute
+
+    def InterpolatedValues(self, timerange, span, uom, filtro, incluir):
+        chamadas['AFAttribute.InterpolatedValues'] += 1
+        return _serie(self.attribute.serie, attribute=self.attribute)
+
+
+class AFAttribute:
+    def __init__(self, nome, serie):
+        self.Name = nome
+        self.ID = f'attr-{id(self)}'
+        self.serie = serie
+        self.Data = AFAttributeData(self)
+
+    def GetValue(self):
+        chamadas['AFAttribute.GetValue'] += 1
+        return self.serie[-1][1]
+
+
+class AFElement:
+    def __init__(self, nome):
+        self.Name = nome
+        self.Elements = AFNamedCollection()
+        self.Attributes = AFNamedCollection()
+
+
+class AFDatabase:
+    r"""
+    Database AF fake; séries por caminho completo:
+    {'\\SRV\DB\Buzios\P74\S1|Valor': [(timestamp, valor), ...]}
+    """
+
+    def __init__(self, nome, series):
+        self.nome = nome
+        self.Elements = AFNamedCollection()
+        for caminho, serie in series.items():
+            elementos, atributo = caminho.lstrip('\\').split('|')
+            colecao = self.Elements
+            for nome_elemento in elementos.split('\\')[2:]:
+                element = colecao.setdefault(nome_elemento, AFElement(nome_elemento))
+                colecao = element.Elements
+            element.Attributes[atributo] = AFAttribute(atributo, serie)
+
+    def get_Name(self):
+        return self.nome
+
+
+class AFAttributeListData:
+    def __init__(self, atributos):
+        self.atributos = atributos
+
+    def InterpolatedValues(self, timerange, span, filtro, incluir, paginacao):
+        chamadas['AFAttributeList.InterpolatedValues'] += 1
+        return [_serie(attr.serie, attribute=attr) for attr in self.atributos]
+
+
+class AFAttributeList(list):
+    def __init__(self, atributos=()):
+        super().__init__(atributos)
+        self.Data = AFAttributeListData(self)
+
+    def GetValue(self):
+        chamadas['AFAttributeList.GetValue'] += 1
+        return [AFValue(*attr.serie[-1], attribute=attr) for attr in self]
+
+
+class _NetList(list):
+    def Add(self, item):
+        self.append(item)
+
+
+class _GenericList:
+    def __getitem__(self, tipo):
+        return _NetList
+
+
+def install():
+    """
+    Registra os módulos fake em sys.modules e (re)importa gideao_pi sobre eles.
+
+    Returns:
+        Módulo src.pi_server.gideao_pi carregado com a camada fake
+    """
+    clr = types.ModuleType('clr')
+    clr.AddReference = lambda nome: None
+
+    system = types.ModuleType('System')
+    system.String = str
+    generic = types.ModuleType('System.Collections.Generic')
+    generic.List = _GenericList()
+
+    af = types.ModuleType('OSIsoft.AF')
+    af.PISystems = object
+    af.AFDatabase = AFDatabase
+    af_pi = types.ModuleType('OSIsoft.AF.PI')
+    for cls in (PIServer, PIPoint, PIPointList, PIPagingConfiguration, PIPageType,
+                PICommonPointAttributes):
+        setattr(af_pi, cls.__name__, cls)
+    af_asset = types.ModuleType('OSIsoft.AF.Asset')
+    for cls in (AFValue, AFValues, AFAttribute, AFElement, AFAttributeList):
+        setattr(af_asset, cls.__name__, cls)
+    af_data = types.ModuleType('OSIsoft.AF.Data')
+    af_data.AFBoundaryType = AFBoundaryType
+    af_time = types.ModuleType('OSIsoft.AF.Time')
+    for cls in (AFTime, AFTimeRange, AFTimeSpan):
+        setattr(af_time, cls.__name__, cls)
+    af_uom = types.ModuleType('OSIsoft.AF.UnitsOfMeasure')
+
+    sys.modules.update({
+        'clr': clr,
+        'System': system,
+        'System.Collections': types.ModuleType('System.Collections'),
+        'System.Collections.Generic': generic,
+        'OSIsoft': types.ModuleType('OSIsoft'),
+        'OSIsoft.AF': af,
+        'OSIsoft.AF.PI': af_pi,
+        'OSIsoft.AF.Asset': af_asset,
+        'OSIsoft.AF.Data': af_data,
+        'OSIsoft.AF.Time': af_time,
+        'OSIsoft.AF.UnitsOfMeasure': af_uom,
+    })
+    sys.modules.pop('src.pi_server.gideao_pi', None)
+    chamadas.clear()
+    return importlib.import_module('src.pi_server.gideao_pi')
+
+
+def uninstall():
+    """Remove os módulos fake e o gideao_pi importado sobre eles"""
+    for nome in ['clr', 'System', 'System.Collections', 'System.Collections.Generic',
+                 'OSIsoft', 'OSIsoft.AF', 'OSIsoft.AF.PI', 'OSIsoft.AF.Asset',
+                 'OSIsoft.AF.Data', 'OSIsoft.AF.Time', 'OSIsoft.AF.UnitsOfMeasure',
+                 'src.pi_server.gideao_pi']:
+        sys.modules.pop(nome, None)
@@ -0,0 +1,485 @@
+"""
+Unit tests para o Alert Engine.
+"""
+import unittest
+import os
+import sys
+import itertools
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.alerting.alert_engine import AlertEngine
+from src.alerting.alert_coalescer import AlertCoalescer
+from src.alerting.alert_index import ActiveAlertIndex
+from src.alerting.notification_dispatcher import NotificationDispatcher
+from src.alerting.teams_notifier import TeamsNotifier
+from src.data.database import init_database
+from src.data.models import AlertHistory, NotificationLog
+from src.data.repositories import RepositoryFactory
+
+
+class TestEvaluateBatch(unittest.TestCase):
+    """Testes para a avaliação de alertas em lote"""
+
+    SENSORS = 50
+
+    def setUp(self):
+        """Cria BD em memória com sensores, definições e leituras"""
+        self.db_manager = init_database('sqlite:///:memory:')
+        self.session = self.db_manager.get_session()
+        repos = RepositoryFactory(self.session)
+        sensor_repo = repos.sensor_config()
+        alert_def_repo = repos.alert_definition()
+        reading_repo = repos.sensor_reading()
+
+        now = datetime.utcnow()
+        self.sensor_ids = []
+        for i in range(self.SENSORS):
+            sensor = sensor_repo.create(
+                internal_name=f'BATCH_{i}',
+                display_name=f'Batch {i}',
+                sensor_type='CH4_POINT',
+                platform='P74',
+                unit='ppm'
+            )
+            self.sensor_ids.append(sensor.sensor_id)
+            alert_def_repo.create(sensor_id=sensor.sensor_id, condition_type='THRESHOLD',
+                                  severity_level=3, threshold_value=10.0)
+            alert_def_repo.create(sensor_id=sensor.sensor_id, condition_type='ANOMALY',
+                                  severity_level=2, anomaly_threshold=0.8)
+            # Leitura antiga acima do limite e leitura atual: pares acima, ímpares abaixo
+            reading_repo.create(sensor_id=sensor.sensor_id, value=99.0,
+                                timestamp=now - timedelta(minutes=5))
+            reading_repo.create(sensor_id=sensor.sensor_id,
+                                value=20.0 if i % 2 == 0 else 5.0, timestamp=now)
+
+        self.engine = AlertEngine()
+
+    def tearDown(self):
+        self.session.close()
+
+    def _count_statements(self, func):
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = self.db_manager.engine
+        event.listen(engine, 'before_cursor_execute', before_execute)
+        try:
+            result = func()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_execute)
+        return result, statements
+
+    def test_thresholds_trigger_on_latest_value(self):
+        """Somente sensores cuja última leitura excede o limite disparam"""
+        result = self.engine.evaluate_batch()
+
+        # Definições ANOMALY sem score não são avaliadas
+        self.assertEqual(result['evaluated'], self.SENSORS)
+        self.assertEqual(result['created'], self.SENSORS // 2)
+        self.assertEqual(len(result['triggered_alert_ids']), self.SENSORS // 2)
+
+        active = self.session.query(AlertHistory).filter_by(status='ACTIVE').all()
+        self.assertEqual({a.sensor_id for a in active}, set(self.sensor_ids[::2]))
+        self.assertTrue(all(a.notes.startswith('Valor 20.0 excede') for a in active))
+
+    def test_batch_is_constant_number_of_queries(self):
+        """A avaliação da frota inteira não depende do número de sensores"""
+        _, statements = self._count_statements(self.engine.evaluate_batch)
+
+        # definições + últimas leituras + alertas ativos + insert em lote (RETURNING)
+        self.assertLessEqual(len(statements), 5)
+
+    def test_dedup_and_resolve(self):
+        """Segunda passada atualiza alertas ativos e resolve os normalizados"""
+        self.engine.evaluate_batch()
+
+        values = {sid: 50.0 for sid in self.sensor_ids}
+        values[self.sensor_ids[0]] = 1.0
+        result = self.engine.evaluate_batch(latest_values=values)
+
+        # ímpares passam a disparar, pares continuam ativos e o sensor 0 normaliza
+        self.assertEqual(result['created'], self.SENSORS // 2)
+        self.assertEqual(result['updated'], self.SENSORS // 2 - 1)
+        self.assertEqual(result['resolved'], 1)
+
+        self.session.expire_all()
+        active = self.session.query(AlertHistory).filter_by(status='ACTIVE').count()
+        self.assertEqual(active, self.SENSORS - 1)
+
+        result = self.engine.evaluate_batch(latest_values={sid: 1.0 for sid in self.sensor_ids})
+        self.assertEqual(result['resolved'], self.SENSORS - 1)
+
+    def test_anomaly_scores(self):
+        """Scores de anomalia são avaliados contra o limite de cada definição"""
+        scores = {self.sensor_ids[1]: 0.95, self.sensor_ids[3]: 0.5}
+        result = self.engine.evaluate_batch(anomaly_scores=scores)
+
+        self.assertEqual(result['evaluated'], self.SENSORS + 2)
+        alert = self.session.query(AlertHistory).filter_by(
+            sensor_id=self.sensor_ids[1]).one()
+        self.assertEqual(alert.severity_level, 2)
+        self.assertIn('Anomalia detectada', alert.notes)
+
+    def test_matches_per_sensor_evaluation(self):
+        """O lote produz os mesmos alertas que evaluate_and_trigger sensor a sensor"""
+        repos = RepositoryFactory(self.session)
+        definitions = [d for d in repos.alert_definition().get_all_enabled()
+                       if d.condition_type == 'THRESHOLD']
+        for alert_def in definitions:
+            latest = repos.sensor_reading().get_latest(alert_def.sensor_id)
+            self.engine.evaluate_and_trigger(alert_def.sensor_id, latest.value, [alert_def])
+        per_sensor = {(a.sensor_id, a.alert_def_id)
+                      for a in self.session.query(AlertHistory).filter_by(status='ACTIVE')}
+
+        result = self.engine.evaluate_batch(alert_definitions=definitions)
+
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(result['updated'], len(per_sensor))
+
+
+class TestActiveAlertIndex(unittest.TestCase):
+    """Testes para o índice de alertas abertos usado pelo AlertEngine"""
+
+    def setUp(self):
+        """Cria BD em memória com um sensor e uma definição de limite"""
+        self.db_manager = init_database('sqlite:///:memory:')
+        self.session = self.db_manager.get_session()
+        repos = RepositoryFactory(self.session)
+        self.sensor = repos.sensor_config().create(
+            internal_name='INDEX_SENSOR',
+            display_name='Index Sensor',
+            sensor_type='CH4_POINT',
+            platform='P74',
+            unit='ppm'
+        )
+        self.alert_def = repos.alert_definition().create(
+            sensor_id=self.sensor.sensor_id, condition_type='THRESHOLD',
+            severity_level=4, threshold_value=10.0
+        )
+        self.clock = [0.0]
+        self.engine = AlertEngine(
+            alert_index=ActiveAlertIndex(refresh_interval=30, clock=lambda: self.clock[0])
+        )
+
+    def tearDown(self):
+        self.session.close()
+
+    def _add_alert(self, status='ACTIVE', triggered_at=None, severity=4):
+        alert = AlertHistory(
+            alert_def_id=self.alert_def.alert_def_id, sensor_id=self.sensor.sensor_id,
+            sensor_value=50.0, severity_level=severity, status=status,
+            triggered_at=triggered_at or datetime.utcnow()
+        )
+        self.session.add(alert)
+        self.session.commit()
+        return alert
+
+    def _trigger(self, value):
+        """Avalia o sensor e retorna os IDs ativos segundo o índice"""
+        self.engine.evaluate_and_trigger(self.sensor.sensor_id, value, [self.alert_def])
+        return self.engine.alert_index.find_active(self.sensor.sensor_id,
+                                                   self.alert_def.alert_def_id)
+
+    def test_hydrate_and_counters(self):
+        """O índice é hidratado numa consulta e alimenta as estatísticas"""
+        self._add_alert()
+        self._add_alert(status='ACKNOWLEDGED', severity=3)
+        self._add_alert(status='RESOLVED')
+
+        stats = self.engine.get_alert_statistics()
+
+        self.assertEqual(stats['total_active'], 1)
+        self.assertEqual(stats['critical'], 1)
+        self.assertEqual(stats['by_status'], {'ACTIVE': 1, 'ACKNOWLEDGED': 1})
+
+    def test_dedup_uses_index(self):
+        """Disparos repetidos atualizam o mesmo alerta sem duplicar"""
+        first = self._trigger(50.0)
+        second = self._trigger(60.0)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(self.session.query(AlertHistory).count(), 1)
+
+    def test_acknowledge_and_resolve_keep_index_consistent(self):
+        """Reconhecer e resolver atualizam o índice sem reidratar"""
+        [alert_id] = self._trigger(50.0)
+
+        self.engine.acknowledge_alert(alert_id, 'operador')
+        self.assertEqual(self.engine.get_alert_statistics()['by_status'], {'ACKNOWLEDGED': 1})
+
+        # Alerta reconhecido não deduplica: novo disparo abre outro alerta
+        [new_id] = self._trigger(50.0)
+        self.assertNotEqual(new_id, alert_id)
+
+        self.engine.resolve_alert(new_id)
+        self._trigger(1.0)
+        self.assertEqual(self.engine.get_alert_statistics()['total_active'], 0)
+        self.assertEqual(len(self.engine.alert_index), 1)
+
+    def test_get_active_alerts_includes_old_alerts(self):
+        """Alertas ativos antigos não são escondidos por alertas recentes resolvidos"""
+        now = datetime.utcnow()
+        old = self._add_alert(triggered_at=now - timedelta(days=30))
+        self.session.add_all([
+            AlertHistory(alert_def_id=self.alert_def.alert_def_id,
+                         sensor_id=self.sensor.sensor_id, sensor_value=1.0,
+                         severity_level=4, status='RESOLVED',
+                         triggered_at=now - timedelta(minutes=i))
+            for i in range(1100)
+        ])
+        self.session.commit()
+
+        active = self.engine.get_active_alerts()
+
+        self.assertEqual([a.alert_id for a in active], [old.alert_id])
+
+    def test_refresh_after_external_write(self):
+        """Alertas gravados por outro processo aparecem após o refresh_interval"""
+        index = self.engine.alert_index
+        index.ensure_fresh(self.session)
+        self._add_alert()
+        index.ensure_fresh(self.session)
+        self.assertEqual(len(index), 0)
+
+        self.clock[0] += 31
+        index.ensure_fresh(self.session)
+        self.assertEqual(len(index), 1)
+
+    def test_statistics_single_group_by_query(self):
+        """As estatísticas vêm de uma consulta agregada, com quebra por plataforma"""
+        other = RepositoryFactory(self.session).sensor_config().create(
+            internal_name='INDEX_SENSOR_2', display_name='Index Sensor 2',
+            sensor_type='H2S', platform='P75', unit='ppm'
+        )
+        for _ in range(3):
+            self._add_alert()
+        self._add_alert(severity=2)
+        self._add_alert(status='ACKNOWLEDGED')
+        self.session.add(AlertHistory(
+            alert_def_id=self.alert_def.alert_def_id, sensor_id=other.sensor_id,
+            sensor_value=50.0, severity_level=3, status='ACTIVE'
+        ))
+        self.session.commit()
+
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(self.db_manager.engine, 'before_cursor_execute', before_execute)
+        try:
+            stats = self.engine.get_alert_statistics()
+        finally:
+            event.remove(self.db_manager.engine, 'before_cursor_execute', before_execute)
+
+        self.assertEqual(len(statements), 1)
+        self.assertIn('GROUP BY', statements[0])
+        self.assertEqual(stats['total_active'], 5)
+        self.assertEqual((stats['critical'], stats['danger'], stats['warning']), (3, 1, 1))
+        self.assertEqual(stats['by_status'], {'ACTIVE': 5, 'ACKNOWLEDGED': 1})
+        self.assertEqual(stats['by_platform'], {'P74': 4, 'P75': 1})
+
+    def test_external_resolve_is_detected_on_dedup(self):
+        """Um alerta do índice resolvido externamente não é reaproveitado"""
+        [alert_id] = self._trigger(50.0)
+        RepositoryFactory(self.session).alert_history().resolve(alert_id)
+
+        [new_id] = self._trigger(50.0)
+
+        self.assertNotEqual(new_id, alert_id)
+        self.session.expire_all()
+        self.assertEqual(self.session.query(AlertHistory).filter_by(status='ACTIVE').count(), 1)
+
+    def test_batch_falls_through_to_insert_when_index_is_stale(self):
+        """No lote, um alerta do índice reconhecido externamente gera um alerta novo"""
+        values = {self.sensor.sensor_id: 50.0}
+        first = self.engine.evaluate_batch(latest_values=values, alert_definitions=[self.alert_def])
+        [alert_id] = first['triggered_alert_ids']
+        RepositoryFactory(self.session).alert_history().acknowledge(alert_id)
+
+        # Índice ainda dentro do refresh_interval: continua apontando para o alerta reconhecido
+        second = self.engine.evaluate_batch(latest_values=values, alert_definitions=[self.alert_def])
+
+        self.assertEqual((second['created'], second['updated']), (1, 0))
+        [new_id] = second['triggered_alert_ids']
+        self.assertNotEqual(new_id, alert_id)
+        self.assertEqual(self.engine.alert_index.find_active(
+            self.sensor.sensor_id, self.alert_def.alert_def_id), [new_id])
+        self.session.expire_all()
+        self.assertEqual(self.session.query(AlertHistory).filter_by(status='ACTIVE').count(), 1)
+        self.assertEqual(self.session.get(AlertHistory, alert_id).status, 'ACKNOWLEDGED')
+
+
+class _WebhookStub(BaseHTTPRequestHandler):
+    """Webhook HTTP local: responde com os status enfileirados em server.responses"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.received.append(json.loads(body))
+            status = self.server.responses.pop(0) if self.server.responses else 200
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b'1')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNotificationDispatcher(unittest.TestCase):
+    """Testes para a fila de notificações Teams contra um webhook local"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _WebhookStub)
+        self.server.received = []
+        self.server.responses = []
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/webhook'
+
+        self.db_manager = init_database('sqlite:///:memory:')
+        self.session = self.db_manager.get_session()
+        # Um sensor por grupo: cada alerta vira um card individual
+        self._sensor_seq = itertools.count()
+        self._add_alerts([4, 4, 3, 2], grupos=['G0', 'G1', 'G2', 'G3'])
+
+        self.dispatcher = NotificationDispatcher(
+            webhook_url=self.url, max_workers=2, rate_limit_per_min=0,
+            max_attempts=3, backoff_seconds=5
+        )
+        self.coalescer = AlertCoalescer(window_seconds=0)
+        self.notifier = TeamsNotifier(webhook_url=self.url, dispatcher=self.dispatcher,
+                                      coalescer=self.coalescer)
+
+    def _add_alerts(self, severities, grupos, modulo='10S', triggered_at=None):
+        repos = RepositoryFactory(self.session)
+        for i, (severity, grupo) in enumerate(zip(severities, grupos)):
+            sensor = repos.sensor_config().create(
+                internal_name=f'TEAMS_{grupo}_{next(self._sensor_seq)}',
+                display_name=f'Detector {grupo}-{i}', sensor_type='CH4_POINT',
+                platform='P74', unit='ppm', grupo=grupo, modulo=modulo
+            )
+            alert_def = repos.alert_definition().create(
+                sensor_id=sensor.sensor_id, condition_type='THRESHOLD',
+                severity_level=severity, threshold_value=10.0
+            )
+            self.session.add(AlertHistory(
+                alert_def_id=alert_def.alert_def_id, sensor_id=sensor.sensor_id,
+                sensor_value=50.0 + i, severity_level=severity, status='ACTIVE',
+                triggered_at=triggered_at or datetime.utcnow()
+            ))
+            self.session.commit()
+
+    def tearDown(self):
+        self.dispatcher.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.session.close()
+
+    def _statuses(self):
+        self.session.expire_all()
+        return sorted(n.status for n in self.session.query(NotificationLog))
+
+    def test_critical_alerts_are_queued_and_sent_once(self):
+        """Alertas severidade >= 3 passam pela fila e não são reenviados"""
+        self.assertEqual(self.notifier.notify_critical_alerts(), 3)
+        self.assertEqual(self.notifier.notify_critical_alerts(), 0)
+
+        self.assertEqual(len(self.server.received), 3)
+        self.assertEqual(self._statuses(), ['SENT'] * 3)
+        self.assertIn('SafePlan Alert', self.server.received[0]['sections'][0]['activityTitle'])
+
+    def test_transient_failure_is_rescheduled_without_blocking(self):
+        """Um 503 reagenda o envio com backoff em vez de dormir"""
+        self.server.responses = [503]
+        alerts = RepositoryFactory(self.session).alert_history().get_unnotified(min_severity=4)
+        self.notifier.enqueue_alerts(alerts[:1])
+
+        now = datetime.utcnow()
+        result = self.dispatcher.dispatch_pending(now=now)
+        self.assertEqual((result['sent'], result['retried']), (0, 1))
+
+        pending = self.session.query(NotificationLog).one()
+        self.assertEqual(pending.status, 'PENDING')
+        self.assertEqual(pending.attempts, 1)
+        self.assertEqual(pending.next_attempt_at, now + timedelta(seconds=5))
+
+        # Ainda não venceu: nada é enviado
+        self.assertEqual(self.dispatcher.dispatch_pending(now=now)['sent'], 0)
+
+        result = self.dispatcher.dispatch_pending(now=now + timedelta(seconds=6))
+        self.assertEqual(result['sent'], 1)
+        self.assertEqual(self._statuses(), ['SENT'])
+
+    def test_permanent_failure_and_max_attempts(self):
+        """4xx falha de imediato; 5xx repetidos esgotam max_attempts"""
+        self.server.responses = [400, 500, 500, 500]
+        alerts = RepositoryFactory(self.session).alert_history().get_unnotified(min_severity=4)
+        self.notifier.enqueue_alerts(alerts[:1])
+
+        now = datetime.utcnow()
+        self.assertEqual(self.dispatcher.dispatch_pending(now=now)['failed'], 1)
+
+        self.notifier.enqueue_alerts(alerts[1:2])
+        for minutes in range(3):
+            result = self.dispatcher.dispatch_pending(now=now + timedelta(minutes=minutes))
+        self.assertEqual(result['failed'], 1)
+        self.assertEqual(self._statuses(), ['FAILED', 'FAILED'])
+
+    def test_rate_limit_defers_excess(self):
+        """O rate limit por webhook adia o excedente para o próximo ciclo"""
+        self.dispatcher.rate_limiter.rate = 2
+        self.dispatcher.rate_limiter.burst = 2
+
+        self.assertEqual(self.notifier.notify_critical_alerts(), 2)
+        self.assertEqual(self._statuses(), ['PENDING', 'SENT', 'SENT'])
+
+    def test_storm_is_coalesced_into_digest(self):
+        """Detectores do mesmo grupo disparando juntos geram um único card digest"""
+        self.notifier.notify_critical_alerts()
+        self.server.received.clear()
+
+        self._add_alerts([3] * 20 + [4], grupos=['10S_FD'] * 21)
+        self._add_alerts([3] * 5, grupos=['20S_FD'] * 5, modulo='20S')
+
+        self.assertEqual(self.notifier.notify_critical_alerts(), 2)
+
+        digests = {card['sections'][0]['activitySubtitle']: card
+                   for card in self.server.received}
+        self.assertEqual(set(digests), {'Local: P74 / 10S / 10S_FD', 'Local: P74 / 20S / 20S_FD'})
+        facts = {f['name']: f['value']
+                 for f in digests['Local: P74 / 10S / 10S_FD']['sections'][0]['facts']}
+        self.assertEqual(facts['Alertas:'], '21')
+        self.assertEqual(facts['Pior Severidade:'], '🚨 CRÍTICO')
+        self.assertIn('e mais 11', facts['Sensores:'])
+
+        # Os alertas cobertos ficam COALESCED e não são notificados de novo
+        self.assertEqual(self._statuses().count('COALESCED'), 24)
+        self.assertEqual(self.notifier.notify_critical_alerts(), 0)
+
+    def test_window_holds_alerts_until_it_closes(self):
+        """Alertas recentes aguardam a janela; grupos antigos são liberados"""
+        self.notifier.coalescer = AlertCoalescer(window_seconds=60)
+        self.notifier.notify_critical_alerts()
+        self.assertEqual(self.server.received, [])
+
+        old = datetime.utcnow() - timedelta(minutes=5)
+        self._add_alerts([4, 4], grupos=['OLD', 'OLD'], triggered_at=old)
+
+        self.assertEqual(self.notifier.notify_critical_alerts(), 1)
+        self.assertIn('Digest (2 alertas)',
+                      self.server.received[0]['sections'][0]['activityTitle'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,14 +5,21 @@ import unittest
 import os
 import tempfile
 from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
 # Add project root to path
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from src.data.database import DatabaseManager
-from src.data.models import SensorConfig, SensorReading, AlertDefinition, AlertHistory
+from src.data.database import DatabaseManager, get_shared_db_manager
+from src.data.models import (
+    SensorConfig, SensorReading, SensorReadingRollup, AlertDefinition, AlertHistory
+)
+from src.data.partitions import migrate_legacy
 from src.data.repositories import RepositoryFactory
 
 
@@ -32,6 +39,93 @@ class TestDatabaseManager(unittest.TestCase):
         self.db_manager.create_all_tables()
         self.assertTrue(self.db_manager.health_check())
 
+    def test_create_all_tables_deduplicates_legacy_readings(self):
+        """Testa criação do índice único em banco legado com leituras duplicadas"""
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE sensor_readings (reading_id INTEGER PRIMARY KEY, "
+                "sensor_id INTEGER NOT NULL, value FLOAT NOT NULL, timestamp DATETIME NOT NULL, "
+                "unit VARCHAR(20), data_quality INTEGER, fetched_at DATETIME)"
+            ))
+            for value in (1.0, 2.0):
+                conn.execute(text(
+                    "INSERT INTO sensor_readings (sensor_id, value, timestamp) "
+                    "VALUES (1, :value, '2026-01-01 00:00:00.000000')"
+                ), {'value': value})
+
+        self.db_manager.create_all_tables()
+
+        with self.db_manager.engine.connect() as conn:
+            rows = conn.execute(text("SELECT value FROM sensor_readings")).fetchall()
+        self.assertEqual([r.value for r in rows], [1.0])
+
+    def test_sqlite_performance_profile(self):
+        """Testa PRAGMAs do perfil performance e sessões somente leitura em banco em arquivo"""
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'profile.db')}"
+            writer = DatabaseManager(url, sqlite_profile='performance')
+            writer.create_all_tables()
+            reader = DatabaseManager(url, read_only=True, sqlite_profile='performance')
+
+            with writer.engine.connect() as conn:
+                pragmas = {name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                           for name in ('journal_mode', 'synchronous', 'temp_store',
+                                        'busy_timeout', 'cache_size')}
+            self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2,
+                                       'busy_timeout': 5000, 'cache_size': -65536})
+
+            session = reader.get_session()
+            try:
+                self.assertEqual(session.query(SensorConfig).count(), 0)
+                session.add(SensorConfig(internal_name='RO', display_name='RO',
+                                         sensor_type='CH4_POINT', platform='P74', unit='ppm'))
+                with self.assertRaises(OperationalError):
+                    session.commit()
+            finally:
+                session.close()
+                writer.engine.dispose()
+                reader.engine.dispose()
+
+    def test_sqlite_default_profile(self):
+        """Testa que o perfil default mantém o journal de rollback"""
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'default.db')}",
+                                      sqlite_profile='default')
+            with manager.engine.connect() as conn:
+                self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar(), 'delete')
+            manager.engine.dispose()
+
+        with self.assertRaises(ValueError):
+            DatabaseManager('sqlite:///:memory:', sqlite_profile='turbo')
+
+    def test_session_scope_closes_and_rolls_back(self):
+        """Testa que session_scope reverte em caso de erro e devolve a conexão ao pool"""
+        self.db_manager.create_all_tables()
+
+        with self.assertRaises(RuntimeError):
+            with self.db_manager.session_scope() as session:
+                session.add(SensorConfig(internal_name='SCOPE', display_name='Scope',
+                                         sensor_type='CH4_POINT', platform='P74', unit='ppm'))
+                session.flush()
+                raise RuntimeError('falha no meio da página')
+
+        with self.db_manager.session_scope() as session:
+            self.assertEqual(session.query(SensorConfig).count(), 0)
+        self.assertFalse(session.in_transaction())
+
+    def test_shared_db_manager_is_reused(self):
+        """Testa um único DatabaseManager (engine e pool) por URL e modo no processo"""
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'shared.db')}"
+            reader = get_shared_db_manager(url, read_only=True)
+            try:
+                self.assertIs(get_shared_db_manager(url, read_only=True), reader)
+                self.assertIsNot(get_shared_db_manager(url), reader)
+                self.assertEqual(reader.engine.pool.size(), 20)
+            finally:
+                for manager in (reader, get_shared_db_manager(url)):
+                    manager.engine.dispose()
+
     def test_get_session(self):
         """Testa obtenção de nova sessão"""
         session = self.db_manager.get_session()
@@ -214,6 +308,446 @@ class TestSensorReadingRepository(unittest.TestCase):
         readings = self.reading_repo.get_by_time_range(self.sensor.sensor_id, start, end)
         self.assertEqual(len(readings), 5)
 
+    def test_bulk_create_readings(self):
+        """Testa inserção em lote de leituras"""
+        now = datetime.utcnow()
+        rows = [
+            {
+                'sensor_id': self.sensor.sensor_id,
+                'value': float(i),
+                'timestamp': now - timedelta(minutes=i),
+                'unit': 'ppm',
+                'data_quality': 0
+            }
+            for i in range(100)
+        ]
+
+        inserted = self.reading_repo.bulk_create(rows)
+        self.assertEqual(inserted, 100)
+
+        readings = self.reading_repo.get_recent(self.sensor.sensor_id, limit=1000)
+        self.assertEqual(len(readings), 100)
+        self.assertIsNotNone(readings[0].fetched_at)
+        self.assertEqual(self.reading_repo.bulk_create([]), 0)
+
+    def test_upsert_many_is_idempotent(self):
+        """Testa que reprocessar a mesma janela não duplica leituras"""
+        now = datetime.utcnow().replace(microsecond=0)
+        rows = [
+            {
+                'sensor_id': self.sensor.sensor_id,
+                'value': float(i),
+                'timestamp': now - timedelta(minutes=i),
+                'unit': 'ppm',
+                'data_quality': 0
+            }
+            for i in range(10)
+        ]
+
+        self.assertEqual(self.reading_repo.upsert_many(rows), 10)
+        self.assertEqual(self.reading_repo.upsert_many(rows), 0)
+
+        rows[0]['value'] = 99.0
+        self.reading_repo.upsert_many(rows[:1], update=True)
+
+        readings = self.reading_repo.get_recent(self.sensor.sensor_id, limit=100)
+        self.assertEqual(len(readings), 10)
+        self.assertEqual(self.reading_repo.get_latest(self.sensor.sensor_id).value, 99.0)
+
+    def test_get_latest_timestamps(self):
+        """Testa MAX(timestamp) agrupado por sensor"""
+        now = datetime.utcnow().replace(microsecond=0)
+        for i in range(3):
+            self.reading_repo.create(
+                sensor_id=self.sensor.sensor_id,
+                value=float(i),
+                timestamp=now - timedelta(minutes=i)
+            )
+
+        latest = self.reading_repo.get_latest_timestamps()
+        self.assertEqual(latest, {self.sensor.sensor_id: now})
+        self.assertEqual(self.reading_repo.get_latest_timestamps([999]), {})
+
+    def test_sensor_latest_follows_ingestion(self):
+        """Testa sensor_latest atualizada na mesma transação, sem regredir em backfill"""
+        now = datetime.utcnow().replace(microsecond=0)
+        sid = self.sensor.sensor_id
+
+        self.reading_repo.upsert_many([
+            {'sensor_id': sid, 'value': 1.0, 'timestamp': now - timedelta(minutes=1)},
+            {'sensor_id': sid, 'value': 2.0, 'timestamp': now},
+        ])
+        self.assertEqual(self.reading_repo.get_latest_values(), {sid: (now, 2.0)})
+
+        # Backfill mais antigo não substitui a última leitura
+        self.reading_repo.upsert_many([
+            {'sensor_id': sid, 'value': 9.0, 'timestamp': now - timedelta(hours=1)},
+        ])
+        self.assertEqual(self.reading_repo.get_latest_values([sid]), {sid: (now, 2.0)})
+
+        self.reading_repo.create(sensor_id=sid, value=3.0, timestamp=now + timedelta(minutes=1))
+        self.assertEqual(self.reading_repo.get_latest_values()[sid][1], 3.0)
+
+    def test_rebuild_latest(self):
+        """Testa recálculo de sensor_latest após carga fora do repositório"""
+        now = datetime.utcnow().replace(microsecond=0)
+        self.session.add_all([
+            SensorReading(sensor_id=self.sensor.sensor_id, value=float(i),
+                          timestamp=now - timedelta(minutes=i))
+            for i in range(3)
+        ])
+        self.session.commit()
+        self.assertEqual(self.reading_repo.get_latest_values(), {})
+
+        self.assertEqual(self.reading_repo.rebuild_latest(), 1)
+        self.assertEqual(self.reading_repo.get_latest_values(),
+                         {self.sensor.sensor_id: (now, 0.0)})
+
+    def _rollups(self, resolution):
+        return {r.bucket_start: r for r in self.session.query(SensorReadingRollup).filter(
+            SensorReadingRollup.resolution == resolution)}
+
+    def test_rollups_follow_ingestion(self):
+        """Agregados de 10 min e 1 h acompanham a ingestão sem contar leituras em dobro"""
+        base = datetime(2026, 1, 5, 10, 0)
+        batch = [{'sensor_id': self.sensor.sensor_id, 'value': float(i),
+                  'timestamp': base + timedelta(minutes=i)} for i in range(90)]
+        self.reading_repo.upsert_many(batch[:45])
+        self.reading_repo.upsert_many(batch[30:])
+        self.reading_repo.upsert_many(batch[:10])
+
+        ten_minutes = self._rollups(600)
+        self.assertEqual(len(ten_minutes), 9)
+        first = ten_minutes[base]
+        self.assertEqual((first.count, first.min_value, first.max_value, first.last_value),
+                         (10, 0.0, 9.0, 9.0))
+        self.assertEqual(first.avg_value, 4.5)
+
+        hours = self._rollups(3600)
+        self.assertEqual(hours[base].count, 60)
+        self.assertEqual(hours[base + timedelta(hours=1)].count, 30)
+        self.assertEqual(hours[base + timedelta(hours=1)].last_timestamp,
+                         base + timedelta(minutes=89))
+
+        self.reading_repo.upsert_many([dict(batch[0], value=-5.0)], update=True)
+        self.session.expire_all()
+        self.assertEqual(self._rollups(3600)[base].min_value, -5.0)
+
+    def test_rollup_refresh_reads_only_each_sensor_buckets(self):
+        """Um sensor recuperando 24 h não faz o lote reler 24 h dos demais sensores"""
+        base = datetime(2026, 1, 5, 10, 0)
+        other = self.sensor_repo.create(
+            internal_name='READING_TEST_2', display_name='Reading Test 2',
+            sensor_type='CH4_POINT', platform='P74', unit='ppm', pi_server_tag='READING_TEST_TAG_2'
+        )
+        sid, other_id = self.sensor.sensor_id, other.sensor_id
+        self.reading_repo.upsert_many([{'sensor_id': other_id, 'value': 1.0,
+                                        'timestamp': base - timedelta(hours=12)}])
+
+        calls = []
+        fetch_raw = self.reading_repo._fetch_raw
+        self.reading_repo._fetch_raw = lambda start, end, sensor_ids=None: (
+            calls.append((start, end, sensor_ids)) or fetch_raw(start, end, sensor_ids))
+        self.reading_repo.SENSOR_CHUNK_SIZE = self.reading_repo.rollups.SENSOR_CHUNK_SIZE = 1
+
+        catch_up = [{'sensor_id': sid, 'value': float(i),
+                     'timestamp': base - timedelta(minutes=10 * i)} for i in range(144)]
+        # Outro sensor: leitura atual e uma atrasada, em intervalos não contíguos
+        current = [{'sensor_id': other_id, 'value': 7.0, 'timestamp': base},
+                   {'sensor_id': other_id, 'value': 3.0,
+                    'timestamp': base - timedelta(hours=12, minutes=-1)}]
+        self.reading_repo.upsert_many(catch_up + current)
+
+        self.assertTrue(all(sensor_ids is not None and len(sensor_ids) == 1
+                            for _, _, sensor_ids in calls))
+        other_windows = sorted((start, end) for start, end, ids in calls if ids == [other_id])
+        self.assertEqual(other_windows, [
+            (base - timedelta(hours=12), base - timedelta(hours=11, minutes=50)),
+            (base, base + timedelta(minutes=10)),
+        ])
+
+        hours = {(r.sensor_id, r.bucket_start): r
+                 for r in self.session.query(SensorReadingRollup).filter_by(resolution=3600)}
+        late = hours[(other_id, base - timedelta(hours=12))]
+        self.assertEqual((late.count, late.min_value, late.max_value), (2, 1.0, 3.0))
+        self.assertEqual(hours[(other_id, base)].count, 1)
+        self.assertEqual(sum(r.count for (s, _), r in hours.items() if s == sid), 144)
+
+    def test_get_series_picks_resolution(self):
+        """Janelas longas leem agregados; janelas curtas, leituras brutas"""
+        end = datetime(2026, 2, 1)
+        self.reading_repo.upsert_many([
+            {'sensor_id': self.sensor.sensor_id, 'value': float(i % 7),
+             'timestamp': end - timedelta(minutes=10 * i)}
+            for i in range(30 * 144)
+        ])
+        sid = self.sensor.sensor_id
+
+        month = self.reading_repo.get_series([sid], end - timedelta(days=30), end)
+        self.assertEqual(len(month), 721)
+        self.assertEqual(month[1].count, 6)
+
+        week = self.reading_repo.get_series([sid], end - timedelta(days=7), end)
+        self.assertEqual(len(week), 7 * 144 + 1)
+        self.assertEqual(week[-1].timestamp, end)
+
+        day = self.reading_repo.get_series([sid], end - timedelta(hours=2), end)
+        self.assertEqual([p.count for p in day], [1] * 13)
+
+    def test_rebuild_rollups_and_retention(self):
+        """Recálculo completo bate com o incremental e a retenção remove agregados antigos"""
+        base = datetime(2026, 1, 5)
+        self.reading_repo.upsert_many([
+            {'sensor_id': self.sensor.sensor_id, 'value': float(i),
+             'timestamp': base + timedelta(minutes=7 * i)} for i in range(400)
+        ])
+        incremental = {(r.resolution, r.bucket_start): (r.count, r.sum_value, r.last_value)
+                       for r in self.session.query(SensorReadingRollup)}
+
+        self.session.query(SensorReadingRollup).delete()
+        self.session.commit()
+        self.assertEqual(self.reading_repo.rebuild_rollups(), len(incremental))
+        rebuilt = {(r.resolution, r.bucket_start): (r.count, r.sum_value, r.last_value)
+                   for r in self.session.query(SensorReadingRollup)}
+        self.assertEqual(rebuilt, incremental)
+
+        self.reading_repo.delete_older_than(base + timedelta(days=1))
+        self.assertTrue(all(r.bucket_start >= base + timedelta(hours=23)
+                            for r in self.session.query(SensorReadingRollup)))
+
+    def test_get_arrays_and_frame(self):
+        """Leitura colunar devolve arrays tipados, em ordem, sem objetos ORM"""
+        other = self.sensor_repo.create(
+            internal_name='READING_TEST_2', display_name='Reading Test 2',
+            sensor_type='CH4_POINT', platform='P74', unit='ppm'
+        )
+        base = datetime(2026, 1, 5)
+        sid = self.sensor.sensor_id
+        self.reading_repo.upsert_many([
+            {'sensor_id': sensor_id, 'value': float(i), 'timestamp': base + timedelta(minutes=i),
+             'data_quality': 1 if i == 3 else 0}
+            for sensor_id in (other.sensor_id, sid) for i in reversed(range(5))
+        ])
+
+        timestamps, values = self.reading_repo.get_arrays(
+            sid, base, base + timedelta(minutes=4), data_quality=0)
+        self.assertEqual(timestamps.dtype, np.dtype('datetime64[us]'))
+        self.assertEqual(values.dtype, np.float64)
+        self.assertEqual(values.tolist(), [0.0, 1.0, 2.0, 4.0])
+        self.assertEqual(timestamps[-1].item(), base + timedelta(minutes=4))
+
+        empty_ts, empty_values = self.reading_repo.get_arrays(
+            sid, base - timedelta(days=1), base - timedelta(hours=1))
+        self.assertEqual((len(empty_ts), len(empty_values)), (0, 0))
+
+        frame = self.reading_repo.get_frame([sid, other.sensor_id], base, base + timedelta(minutes=1))
+        self.assertEqual(list(frame.columns), ['sensor_id', 'timestamp', 'value'])
+        self.assertEqual(frame['sensor_id'].tolist(), sorted([sid, other.sensor_id] * 2))
+        self.assertTrue(frame.groupby('sensor_id')['timestamp'].is_monotonic_increasing.all())
+
+    def test_get_readings_for_sensors_chunked_and_wide(self):
+        """Grupos maiores que o lote são lidos em blocos; o formato largo alinha por timestamp"""
+        sensors = [self.sensor.sensor_id] + [
+            self.sensor_repo.create(
+                internal_name=f'GROUP_{i}', display_name=f'Group {i}',
+                sensor_type='CH4_POINT', platform='P74', unit='ppm'
+            ).sensor_id
+            for i in range(4)
+        ]
+        base = datetime(2026, 1, 5)
+        self.reading_repo.upsert_many([
+            {'sensor_id': sensor_id, 'value': float(n), 'timestamp': base + timedelta(minutes=i)}
+            for n, sensor_id in enumerate(sensors) for i in range(n % 3 + 1)
+        ])
+
+        self.reading_repo.SENSOR_CHUNK_SIZE = 2
+        group = list(reversed(sensors))
+        frame = self.reading_repo.get_readings_for_sensors(group, base, base + timedelta(hours=1))
+        self.assertEqual(len(frame), sum(n % 3 + 1 for n in range(len(sensors))))
+        self.assertEqual(frame['sensor_id'].tolist(), sorted(frame['sensor_id'].tolist()))
+
+        wide = self.reading_repo.get_readings_for_sensors(
+            group, base, base + timedelta(hours=1), wide=True)
+        self.assertEqual(list(wide.columns), group)
+        self.assertEqual(wide.index.tolist(), [base + timedelta(minutes=i) for i in range(3)])
+        self.assertEqual(wide[sensors[2]].tolist(), [2.0, 2.0, 2.0])
+        self.assertTrue(np.isnan(wide[sensors[0]].iloc[1]))
+
+
+class TestPartitionedReadings(unittest.TestCase):
+    """Testes para sensor_readings particionada por mês"""
+
+    def setUp(self):
+        """Banco com particionamento mensal e uma leitura legada"""
+        self.db_manager = DatabaseManager('sqlite:///:memory:', reading_partitioning='monthly')
+        self.db_manager.create_all_tables()
+        self.session = self.db_manager.get_session()
+        self.factory = RepositoryFactory(self.session)
+        self.sensor = self.factory.sensor_config().create(
+            internal_name='PART_TEST', display_name='Partition Test',
+            sensor_type='CH4_POINT', platform='P74', unit='ppm'
+        )
+        self.reading_repo = self.factory.sensor_reading()
+        self.sid = self.sensor.sensor_id
+
+        self.session.add(SensorReading(sensor_id=self.sid, value=-1.0,
+                                       timestamp=datetime(2025, 12, 31, 23, 0)))
+        self.session.commit()
+        self.reading_repo.upsert_many([
+            {'sensor_id': self.sid, 'value': float(month), 'timestamp': datetime(2026, month, 15)}
+            for month in (1, 2, 3)
+        ] + [{'sensor_id': self.sid, 'value': 3.5, 'timestamp': datetime(2026, 3, 20)}])
+
+    def tearDown(self):
+        self.session.close()
+
+    def _tables(self):
+        return sorted(name for name in inspect(self.session.connection()).get_table_names()
+                      if name.startswith('sensor_readings_p'))
+
+    def test_writes_are_routed_by_month(self):
+        """Cada leitura vai para a partição do seu mês; upsert continua idempotente"""
+        self.assertEqual(self._tables(), ['sensor_readings_p202601', 'sensor_readings_p202602',
+                                          'sensor_readings_p202603'])
+        self.assertEqual(self.session.query(SensorReading).count(), 1)
+
+        self.reading_repo.upsert_many(
+            [{'sensor_id': self.sid, 'value': 9.0, 'timestamp': datetime(2026, 2, 15)}],
+            update=True
+        )
+        readings = self.reading_repo.get_by_time_range(
+            self.sid, datetime(2026, 2, 1), datetime(2026, 2, 28))
+        self.assertEqual([r.value for r in readings], [9.0])
+        self.assertEqual(self.reading_repo.get_latest_values(),
+                         {self.sid: (datetime(2026, 3, 20), 3.5)})
+
+    def test_range_reads_only_overlapping_partitions(self):
+        """Leituras por intervalo combinam legado e partições do intervalo, em ordem"""
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.db_manager.engine, 'before_cursor_execute', capture)
+        try:
+            readings = self.reading_repo.get_by_time_range(
+                self.sid, datetime(2025, 12, 1), datetime(2026, 1, 31))
+        finally:
+            event.remove(self.db_manager.engine, 'before_cursor_execute', capture)
+
+        self.assertEqual([r.value for r in readings], [-1.0, 1.0])
+        query = [st for st in statements if 'UNION ALL' in st][0]
+        self.assertIn('sensor_readings_p202601', query)
+        self.assertNotIn('sensor_readings_p202602', query)
+
+        self.assertEqual([r.value for r in self.reading_repo.get_recent(self.sid, limit=2)],
+                         [3.5, 3.0])
+        self.assertEqual(self.reading_repo.get_latest(self.sid).value, 3.5)
+        self.assertEqual(self.reading_repo.count_in_range(self.sid, datetime(2026, 1, 1)), 4)
+
+        timestamps, values = self.reading_repo.get_arrays(
+            self.sid, datetime(2025, 12, 1), datetime(2026, 3, 31))
+        self.assertEqual(values.tolist(), [-1.0, 1.0, 2.0, 3.0, 3.5])
+        self.assertEqual(timestamps[0].item(), datetime(2025, 12, 31, 23, 0))
+
+    def test_partition_list_is_cached(self):
+        """A lista de partições não consulta o catálogo a cada leitura; DDL e rollback invalidam"""
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        self.reading_repo.get_arrays(self.sid, datetime(2026, 1, 1), datetime(2026, 3, 31))
+        event.listen(self.db_manager.engine, 'before_cursor_execute', capture)
+        try:
+            self.reading_repo.get_arrays(self.sid, datetime(2026, 1, 1), datetime(2026, 3, 31))
+            self.reading_repo.get_recent(self.sid, limit=2)
+        finally:
+            event.remove(self.db_manager.engine, 'before_cursor_execute', capture)
+        self.assertFalse([st for st in statements if 'sqlite_master' in st])
+
+        # Partição criada numa transação desfeita não fica no cache
+        manager = self.db_manager.reading_partitions
+        self.reading_repo.write_partitions(
+            [{'sensor_id': self.sid, 'value': 4.0, 'timestamp': datetime(2026, 4, 15)}])
+        partitions = manager.list_partitions(self.session.connection())
+        self.assertIn('sensor_readings_p202604', [name for name, _, _ in partitions])
+        self.session.rollback()
+        self.assertIsNone(manager._cached)
+
+        # Partição nova entra na leitura seguinte, sem esperar o cache expirar
+        self.reading_repo.upsert_many(
+            [{'sensor_id': self.sid, 'value': 5.0, 'timestamp': datetime(2026, 5, 15)}])
+        _, values = self.reading_repo.get_arrays(self.sid, datetime(2026, 5, 1), datetime(2026, 5, 31))
+        self.assertEqual(values.tolist(), [5.0])
+
+    def test_legacy_duplicates_are_merged_on_read(self):
+        """Mesma (sensor, timestamp) no legado e numa partição aparece uma vez, valor da partição"""
+        self.session.add(SensorReading(sensor_id=self.sid, value=-5.0,
+                                       timestamp=datetime(2026, 1, 15)))
+        self.session.commit()
+
+        timestamps, values = self.reading_repo.get_arrays(
+            self.sid, datetime(2025, 12, 1), datetime(2026, 1, 31))
+        self.assertEqual(values.tolist(), [-1.0, 1.0])
+
+        wide = self.reading_repo.get_readings_for_sensors(
+            [self.sid], datetime(2025, 12, 1), datetime(2026, 3, 31), wide=True)
+        self.assertEqual(wide[self.sid].tolist(), [-1.0, 1.0, 2.0, 3.0, 3.5])
+
+    def test_rollups_count_legacy_duplicates_once(self):
+        """Duplicata legado/partição entra uma vez nos agregados, com o valor da partição"""
+        self.session.add(SensorReading(sensor_id=self.sid, value=-5.0,
+                                       timestamp=datetime(2026, 1, 15)))
+        self.session.commit()
+        self.reading_repo.rebuild_rollups()
+
+        rollups = self.session.query(SensorReadingRollup).filter(
+            SensorReadingRollup.bucket_start == datetime(2026, 1, 15)).all()
+        self.assertEqual(sorted((r.resolution, r.count, r.sum_value) for r in rollups),
+                         [(600, 1, 1.0), (3600, 1, 1.0)])
+
+    def test_upsert_of_legacy_reading_is_idempotent(self):
+        """Regravar uma leitura que já está no legado não a duplica numa partição"""
+        legacy_ts = datetime(2025, 12, 31, 23, 0)
+        reading = {'sensor_id': self.sid, 'value': -1.0, 'timestamp': legacy_ts}
+        self.assertEqual(self.reading_repo.upsert_many([reading]), 0)
+        self.reading_repo.upsert_many([dict(reading, value=-2.0)], update=True)
+
+        self.assertNotIn('sensor_readings_p202512', self._tables())
+        start, end = datetime(2025, 12, 31), datetime(2026, 1, 1)
+        self.assertEqual([r.value for r in self.reading_repo.get_by_time_range(
+            self.sid, start, end)], [-2.0])
+        self.assertEqual(self.reading_repo.count_in_range(self.sid, start, end), 1)
+        self.assertEqual([p.value for p in self.reading_repo.get_series([self.sid], start, end)],
+                         [-2.0])
+        self.assertEqual([r.count for r in self.session.query(SensorReadingRollup).filter(
+            SensorReadingRollup.bucket_start == legacy_ts)], [1, 1])
+
+        # Leituras mais novas que o legado vão para as partições, sem consulta extra ao legado
+        self.reading_repo.upsert_many([dict(reading, timestamp=datetime(2026, 4, 1))])
+        self.assertIn('sensor_readings_p202604', self._tables())
+
+    def test_retention_drops_whole_partitions(self):
+        """A retenção remove partições expiradas com DROP TABLE e só apaga linhas na fronteira"""
+        dropped = self.reading_repo.drop_partitions_before(datetime(2026, 3, 1))
+        self.assertEqual(dropped, ['sensor_readings_p202601', 'sensor_readings_p202602'])
+
+        deleted = self.reading_repo.delete_older_than(datetime(2026, 3, 16))
+        self.assertEqual(deleted, 2)  # leitura legada + 15/03
+        self.assertEqual(self._tables(), ['sensor_readings_p202603'])
+        self.assertEqual(self.reading_repo.rebuild_latest(), 1)
+        self.assertEqual(self.reading_repo.get_latest_values(),
+                         {self.sid: (datetime(2026, 3, 20), 3.5)})
+
+    def test_migrate_legacy(self):
+        """Leituras da tabela original são movidas para as partições"""
+        self.assertEqual(migrate_legacy(self.session, self.db_manager.reading_partitions), 1)
+        self.assertEqual(self.session.query(SensorReading).count(), 0)
+        self.assertIn('sensor_readings_p202512', self._tables())
+        self.assertEqual(len(self.reading_repo.get_by_time_range(
+            self.sid, datetime(2025, 1, 1), datetime(2027, 1, 1))), 5)
+
 
 class TestAlertDefinitionRepository(unittest.TestCase):
     """Testes para AlertDefinitionRepository"""
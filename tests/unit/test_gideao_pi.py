@@ -0,0 +1,209 @@
+"""
+Unit tests para gideao_pi sobre uma camada .NET falsa (sem AF SDK).
+"""
+import unittest
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from tests.unit import fake_afsdk
+from tests.unit.fake_afsdk import chamadas
+
+
+SERIES_PI = {
+    f'TAG_{i}': [('01/01/2026 00:00:00', i), ('01/01/2026 00:01:00', i + 0.5)]
+    for i in range(50)
+}
+SERIES_PI['DIG_0'] = [('01/01/2026 00:00:00', 'Off'), ('01/01/2026 00:01:00', 'On')]
+
+SERIES_AF = {
+    f'\\\\SRV\\DB\\Buzios\\P74\\S{i}|Valor': [('01/01/2026 00:00:00', i), ('01/01/2026 00:01:00', i * 2)]
+    for i in range(3)
+}
+
+
+class TestBulkReads(unittest.TestCase):
+    """Testes para as leituras em lote (PIPointList / AFAttributeList)"""
+
+    def setUp(self):
+        """Carrega gideao_pi sobre a camada .NET falsa"""
+        self.gp = fake_afsdk.install()
+        self.servidor = fake_afsdk.PIServer('SRV', SERIES_PI)
+        self.db = fake_afsdk.AFDatabase('DB', SERIES_AF)
+
+    def tearDown(self):
+        fake_afsdk.uninstall()
+
+    def test_interpolated_list_is_single_call(self):
+        """Lista de tags usa FindPIPoints + uma chamada InterpolatedValues"""
+        tags = [f'TAG_{i}' for i in range(50)]
+        df = self.gp.getValoresInterpolados(self.servidor, tags, 'inicio', 'fim', '1m')
+
+        self.assertEqual(list(df.columns), ['timestamp'] + tags)
+        self.assertEqual(len(df), 2)
+        self.assertEqual(df['TAG_7'].tolist(), ['7', '7.5'])
+        self.assertEqual(chamadas['FindPIPoints'], 1)
+        self.assertEqual(chamadas['PIPointList.InterpolatedValues'], 1)
+        self.assertEqual(chamadas['FindPIPoint'], 0)
+        self.assertEqual(chamadas['PIPoint.InterpolatedValues'], 0)
+
+    def test_single_tag_keeps_long_format(self):
+        """Um tag isolado continua retornando colunas timestamp/valor"""
+        df = self.gp.getValoresInterpolados(self.servidor, 'TAG_1', 'inicio', 'fim', '1m')
+
+        self.assertEqual(list(df.columns), ['timestamp', 'valor'])
+        self.assertEqual(chamadas['FindPIPoint'], 1)
+
+    def test_missing_tags_are_omitted(self):
+        """Tags inexistentes não derrubam o lote"""
+        df = self.gp.getValoresInterpolados(
+            self.servidor, ['TAG_0', 'NAO_EXISTE'], 'inicio', 'fim', '1m'
+        )
+
+        self.assertEqual(list(df.columns), ['timestamp', 'TAG_0'])
+
+    def test_current_value_list(self):
+        """Snapshot de vários tags numa chamada PIPointList.CurrentValue"""
+        df = self.gp.getValorCorrente(self.servidor, ['TAG_3', 'DIG_0'], isNumeric=True)
+
+        self.assertEqual(list(df.columns), ['tag', 'timestamp', 'valor'])
+        self.assertEqual(dict(zip(df['tag'], df['valor'])), {'TAG_3': 3.5, 'DIG_0': 1.0})
+        self.assertEqual(chamadas['PIPointList.CurrentValue'], 1)
+        self.assertEqual(chamadas['PIPoint.CurrentValue'], 0)
+
+    def test_af_attribute_list(self):
+        """Lista de atributos AF usa AFAttributeList"""
+        caminhos = list(SERIES_AF)
+        df = self.gp.getValoresInterpolados(self.db, caminhos, 'inicio', 'fim', '1m')
+
+        self.assertEqual(list(df.columns), ['timestamp'] + caminhos)
+        self.assertEqual(df[caminhos[2]].tolist(), ['2', '4'])
+        self.assertEqual(chamadas['AFAttributeList.InterpolatedValues'], 1)
+        self.assertEqual(chamadas['AFAttribute.InterpolatedValues'], 0)
+
+        snapshot = self.gp.getValorCorrente(self.db, caminhos)
+        self.assertEqual(snapshot['valor'].tolist(), ['0', '2', '4'])
+        self.assertEqual(chamadas['AFAttributeList.GetValue'], 1)
+
+
+class TestHandleCache(unittest.TestCase):
+    """Testes para o cache de handles PIPoint / AFAttribute"""
+
+    def setUp(self):
+        """Carrega gideao_pi sobre a camada .NET falsa"""
+        self.gp = fake_afsdk.install()
+        self.servidor = fake_afsdk.PIServer('SRV', SERIES_PI)
+        self.db = fake_afsdk.AFDatabase('DB', SERIES_AF)
+
+    def tearDown(self):
+        fake_afsdk.uninstall()
+
+    def test_repeated_reads_resolve_once(self):
+        """Leituras repetidas do mesmo tag resolvem o PIPoint uma única vez"""
+        for _ in range(5):
+            self.gp.getValorCorrente(self.servidor, 'TAG_1')
+            self.gp.getValoresInterpolados(self.servidor, 'TAG_1', 'inicio', 'fim', '1m')
+
+        self.assertEqual(chamadas['FindPIPoint'], 1)
+        stats = self.gp.getEstatisticasCache()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 9)
+
+    def test_af_path_walked_once(self):
+        """O caminho AF é percorrido elemento a elemento apenas no primeiro acesso"""
+        caminho = list(SERIES_AF)[0]
+        self.gp.getValorCorrente(self.db, caminho)
+        walks = chamadas['get_Item']
+        self.gp.getValorCorrente(self.db, caminho)
+        self.gp.getValoresInterpolados(self.db, caminho, 'inicio', 'fim', '1m')
+
+        self.assertEqual(chamadas['get_Item'], walks)
+
+    def test_bulk_reuses_cached_points(self):
+        """O lote só envia a FindPIPoints os tags ainda não resolvidos"""
+        self.gp.getValorCorrente(self.servidor, ['TAG_0', 'TAG_1'])
+        self.gp.getValorCorrente(self.servidor, ['TAG_0', 'TAG_1'])
+        self.assertEqual(chamadas['FindPIPoints'], 1)
+
+        self.gp.getValorCorrente(self.servidor, 'TAG_2')
+        df = self.gp.getValorCorrente(self.servidor, ['TAG_0', 'TAG_2'])
+        self.assertEqual(chamadas['FindPIPoints'], 1)
+        self.assertEqual(len(df), 2)
+
+    def test_ttl_expiry(self):
+        """Handles expiram após o TTL"""
+        agora = [0.0]
+        self.gp.cacheHandles._clock = lambda: agora[0]
+        self.gp.cacheHandles.ttl = 60
+
+        self.gp.getValorCorrente(self.servidor, 'TAG_1')
+        agora[0] = 30.0
+        self.gp.getValorCorrente(self.servidor, 'TAG_1')
+        self.assertEqual(chamadas['FindPIPoint'], 1)
+
+        agora[0] = 100.0
+        self.gp.getValorCorrente(self.servidor, 'TAG_1')
+        self.assertEqual(chamadas['FindPIPoint'], 2)
+        self.assertEqual(self.gp.getEstatisticasCache()['expirations'], 1)
+
+    def test_lru_eviction(self):
+        """O handle usado há mais tempo é descartado quando o cache enche"""
+        self.gp.cacheHandles.maxsize = 2
+        for tag in ['TAG_0', 'TAG_1', 'TAG_0', 'TAG_2', 'TAG_0', 'TAG_1']:
+            self.gp.getValorCorrente(self.servidor, tag)
+
+        # TAG_1 foi descartado ao entrar TAG_2; TAG_0 continuou em uso
+        self.assertEqual(chamadas['FindPIPoint'], 4)
+        self.assertEqual(self.gp.getEstatisticasCache()['evictions'], 2)
+
+    def test_invalidation(self):
+        """invalidaCache remove um tag, um servidor ou tudo"""
+        self.gp.getValorCorrente(self.servidor, 'TAG_1')
+        self.gp.getValorCorrente(self.servidor, 'TAG_2')
+        self.gp.getValorCorrente(self.db, list(SERIES_AF)[0])
+
+        self.assertEqual(self.gp.invalidaCache(self.servidor, 'TAG_1'), 1)
+        self.gp.getValorCorrente(self.servidor, 'TAG_1')
+        self.assertEqual(chamadas['FindPIPoint'], 3)
+
+        self.assertEqual(self.gp.invalidaCache(self.servidor), 2)
+        self.assertEqual(self.gp.invalidaCache(), 1)
+        self.assertEqual(self.gp.getEstatisticasCache()['size'], 0)
+
+    def test_failed_bulk_read_invalidates_batch(self):
+        """Falha numa leitura em lote remove do cache os handles do lote"""
+        self.gp.getValorCorrente(self.servidor, ['TAG_0', 'TAG_1'])
+        self.gp.getValorCorrente(self.servidor, 'TAG_2')
+        self.assertEqual(self.gp.getEstatisticasCache()['size'], 3)
+
+        with mock.patch.object(fake_afsdk.PIPointList, 'InterpolatedValues',
+                               side_effect=RuntimeError('PI indisponível')):
+            df = self.gp.getValoresInterpolados(
+                self.servidor, ['TAG_0', 'TAG_1'], 'inicio', 'fim', '1m'
+            )
+        self.assertIsNone(df)
+        self.assertEqual(self.gp.getEstatisticasCache()['size'], 1)
+
+        self.gp.getValorCorrente(self.servidor, ['TAG_0', 'TAG_1'])
+        self.assertEqual(chamadas['FindPIPoints'], 2)
+
+        caminhos = list(SERIES_AF)
+        self.gp.getValorCorrente(self.db, caminhos)
+        with mock.patch.object(fake_afsdk.AFAttributeList, 'GetValue',
+                               side_effect=RuntimeError('AF indisponível')):
+            self.assertIsNone(self.gp.getValorCorrente(self.db, caminhos))
+        self.assertEqual(self.gp.getEstatisticasCache()['size'], 3)
+
+    def test_failed_lookup_not_cached(self):
+        """Tags inexistentes não ficam no cache"""
+        self.assertEqual(self.gp.getValorCorrente(self.servidor, 'NAO_EXISTE'), 'None')
+        self.gp.getValorCorrente(self.servidor, 'NAO_EXISTE')
+
+        self.assertEqual(chamadas['FindPIPoint'], 2)
+        self.assertEqual(self.gp.getEstatisticasCache()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,29 @@
 Tests for Machine Learning Module
 Testes para anomaly detection, forecasting e ML engine
 """
+import json
+import os
+import types
 import pytest
 import numpy as np
 import pandas as pd
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 
-from src.ml.anomaly_detector import AnomalyDetector, create_anomaly_detector
+from src.ml.anomaly_detector import (
+    AnomalyDetector, create_anomaly_detector, normalize_scores, parse_ensemble_weights
+)
 from src.ml.forecaster import TimeSeriesForecaster, create_forecaster
+from config.settings import Config
+from src.data.database import DatabaseManager
+from src.data.repositories import RepositoryFactory
+from src.ml import training
+from src.ml.ml_engine import MLEngine
+from src.ml.model_registry import (
+    ANOMALY_DETECTOR, FORECASTER, REGISTRY_FORMAT_VERSION, ModelRegistry
+)
+from src.ml.training import TrainingOrchestrator
 
 
 class TestAnomalyDetector:
@@ -59,6 +75,23 @@ class TestAnomalyDetector:
         assert len(scores) == len(sample_data)
         assert all(p in [-1, 1] for p in predictions)
 
+    def test_lof_is_novelty_detector(self, sample_data):
+        """LOF é treinado uma vez; scores de um ponto não dependem do lote consultado"""
+        detector = AnomalyDetector(n_neighbors=15, algorithm='ball_tree')
+        assert detector.lof.n_neighbors == 15
+        assert detector.lof.algorithm == 'ball_tree'
+        detector.fit(sample_data)
+
+        fitted_lof = detector.lof
+        _, batch_scores = detector.detect_lof(np.array([50.0, 400.0, 51.0]))
+        predictions, single_scores = detector.detect_lof(np.array([400.0]))
+
+        assert detector.lof is fitted_lof
+        assert detector.lof.n_samples_fit_ == len(sample_data)
+        assert single_scores[0] == pytest.approx(batch_scores[1])
+        assert batch_scores[1] > batch_scores[0]
+        assert predictions == [-1]
+
     def test_ensemble_detection(self, detector, sample_data):
         """Testa detecção ensemble"""
         detector.fit(sample_data)
@@ -69,6 +102,61 @@ class TestAnomalyDetector:
         assert all(p in [-1, 1] for p in predictions)
         assert all(0 <= s <= 1 for s in scores)
 
+    def test_ensemble_is_weighted_mean_of_normalized_scores(self, detector, sample_data):
+        """Ensemble padrão = média dos scores IF/LOF normalizados por min-max"""
+        detector.fit(sample_data)
+        _, if_scores = detector.detect_isolation_forest(sample_data)
+        _, lof_scores = detector.detect_lof(sample_data)
+        expected = (normalize_scores(if_scores) + normalize_scores(lof_scores)) / 2
+
+        predictions, scores = detector.detect_ensemble(sample_data, threshold=0.5)
+        assert isinstance(scores, np.ndarray)
+        np.testing.assert_allclose(scores, expected)
+        assert predictions.tolist() == [-1 if s >= 0.5 else 1 for s in expected]
+
+        _, if_only = detector.detect_ensemble(sample_data, weights={'isolation_forest': 1, 'lof': 0})
+        np.testing.assert_allclose(if_only, normalize_scores(if_scores))
+
+    def test_ensemble_scores_batch_of_windows(self, detector, sample_data):
+        """Array 2D (janelas x pontos) é pontuado numa chamada, normalizando por janela"""
+        detector.fit(sample_data)
+        windows = np.random.RandomState(1).normal(loc=50, scale=5, size=(3, 40))
+        windows[1, 7] = 300.0
+
+        predictions, scores = detector.detect_ensemble(windows, normalization='robust')
+        assert predictions.shape == scores.shape == (3, 40)
+        for window, row in zip(windows, scores):
+            _, single = detector.detect_ensemble(window, normalization='robust')
+            np.testing.assert_allclose(row, single)
+        assert predictions[1, 7] == -1
+
+    def test_ensemble_normalizations_and_extra_detectors(self, detector, sample_data):
+        """Normalizações rank/robust, detector z-score e detectores customizados"""
+        detector.fit(sample_data)
+        data = np.append(np.full(20, 50.0), 400.0)
+
+        for method in ('rank', 'robust'):
+            predictions, scores = detector.detect_ensemble(data, normalization=method)
+            assert np.all((0 <= scores) & (scores <= 1))
+            assert scores.argmax() == 20
+            assert predictions[0] == 1
+        assert normalize_scores([3.0, 3.0, 3.0], 'rank').tolist() == [0.0, 0.0, 0.0]
+
+        _, zscores = detector.detect_ensemble(data, weights={'zscore': 1})
+        assert zscores[-1] == pytest.approx(1.0)
+
+        detector.add_detector('distance', lambda x: np.abs(x[:, 0] - 1.0), weight=1.0)
+        assert set(detector._resolve_weights(detector.ensemble_weights)) == {
+            'isolation_forest', 'lof', 'distance'}
+        detector.detect_ensemble(data)
+
+        with pytest.raises(ValueError):
+            detector.detect_ensemble(data, weights={'unknown': 1})
+        with pytest.raises(ValueError):
+            detector.detect_ensemble(data, normalization='zscore')
+        assert parse_ensemble_weights('isolation_forest=0.3, zscore=0.7') == {
+            'isolation_forest': 0.3, 'zscore': 0.7}
+
     def test_anomaly_summary(self, detector, sample_data):
         """Testa resumo de anomalias"""
         detector.fit(sample_data)
@@ -88,6 +176,20 @@ class TestAnomalyDetector:
         assert isinstance(threshold, (int, float))
         assert threshold > 0
 
+    def test_score_online(self, detector):
+        """Scoring online pontua só os pontos novos, com scores estáveis entre chamadas"""
+        with pytest.raises(ValueError):
+            detector.score_online([50.0])
+
+        detector.fit(np.random.RandomState(0).normal(loc=50, scale=5, size=500))
+        predictions, scores = detector.score_online(np.array([50.0, 500.0]))
+
+        assert isinstance(scores, np.ndarray)
+        assert predictions.tolist() == [1, -1]
+        assert scores[0] < 0.5 < scores[1]
+        _, single = detector.score_online([500.0])
+        assert single[0] == pytest.approx(scores[1])
+
     def test_factory_function(self):
         """Testa função factory"""
         detector = create_anomaly_detector(contamination=0.05)
@@ -237,5 +339,323 @@ class TestAnomalyDetectorEdgeCases:
         assert len(predictions) == len(data)
 
 
+@pytest.fixture
+def db_manager():
+    """Banco em memória com 3 sensores: 2 com 100 leituras recentes e 1 com 10"""
+    db_manager = DatabaseManager('sqlite:///:memory:')
+    db_manager.create_all_tables()
+    session = db_manager.get_session()
+    factory = RepositoryFactory(session)
+    now = datetime.utcnow()
+    readings = []
+    for n, count in enumerate((100, 100, 10)):
+        sensor = factory.sensor_config().create(
+            internal_name=f'TRAIN_{n}', display_name=f'Train {n}',
+            sensor_type='CH4_POINT', platform='P74', unit='ppm'
+        )
+        readings += [
+            {'sensor_id': sensor.sensor_id, 'value': 50.0 + n + (i % 7),
+             'timestamp': now - timedelta(minutes=30 * i)}
+            for i in range(1, count + 1)
+        ]
+    factory.sensor_reading().upsert_many(readings)
+    session.close()
+    return db_manager
+
+
+class TestModelRegistry:
+    """Testes para ModelRegistry (persistência de modelos)"""
+
+    @pytest.fixture
+    def registry(self, tmp_path):
+        """Fixture com registro num diretório temporário"""
+        return ModelRegistry(str(tmp_path), max_age_hours=24)
+
+    @pytest.fixture
+    def history(self):
+        """Fixture com histórico (timestamps datetime64, valores)"""
+        timestamps = np.arange('2026-01-01T00:00', '2026-01-03T00:00',
+                               np.timedelta64(1, 'h'), dtype='datetime64[us]')
+        values = 50 + 5 * np.sin(np.arange(len(timestamps)) * 2 * np.pi / 24)
+        return timestamps, values
+
+    def test_anomaly_detector_roundtrip(self, registry, history):
+        """Detector salvo e recarregado produz os mesmos scores"""
+        timestamps, values = history
+        detector = AnomalyDetector(contamination=0.1)
+        detector.fit(values)
+
+        meta = registry.save(ANOMALY_DETECTOR, 7, detector, timestamps, values)
+        assert meta['n_samples'] == 48
+        assert meta['window_start'] == '2026-01-01T00:00:00'
+        assert registry.metadata(ANOMALY_DETECTOR, 7)['data_hash'] == meta['data_hash']
+
+        loaded = registry.load(ANOMALY_DETECTOR, 7)
+        assert loaded.is_fitted
+        assert loaded.detect_isolation_forest(values) == detector.detect_isolation_forest(values)
+        assert registry.load(ANOMALY_DETECTOR, 8) is None
+        assert [m['sensor_id'] for m in registry.list_models()] == [7]
+
+    def test_forecaster_roundtrip(self, registry, history):
+        """Prophet é salvo como JSON e volta pronto para prever"""
+        from prophet import Prophet
+
+        timestamps, values = history
+        forecaster = TimeSeriesForecaster(weekly_seasonality=False, yearly_seasonality=False)
+        forecaster.training_data = forecaster.prepare_data(timestamps, values)
+        forecaster.model = Prophet(weekly_seasonality=False, yearly_seasonality=False)
+        forecaster.model.fit(forecaster.training_data)
+        forecaster.is_fitted = True
+
+        registry.save(FORECASTER, 3, forecaster, timestamps, values)
+        loaded = registry.load(FORECASTER, 3)
+        assert loaded.is_fitted
+        assert loaded.weekly_seasonality is False
+        assert len(loaded.training_data) == 48
+        future = forecaster.model.make_future_dataframe(periods=3, freq='h')
+        assert np.allclose(loaded.model.predict(future)['yhat'],
+                           forecaster.model.predict(future)['yhat'])
+
+    def test_stale_models_are_not_loaded(self, registry, history):
+        """Modelos velhos ou de outro formato são descartados (carregáveis com allow_stale)"""
+        timestamps, values = history
+        detector = AnomalyDetector()
+        detector.fit(values)
+        meta = registry.save(ANOMALY_DETECTOR, 1, detector, timestamps, values)
+
+        assert not registry.is_stale(meta)
+        later = datetime.fromisoformat(meta['trained_at']) + timedelta(hours=25)
+        assert registry.is_stale(meta, now=later)
+        assert registry.is_stale(dict(meta, format_version=REGISTRY_FORMAT_VERSION + 1))
+        assert registry.is_stale(dict(meta, library_version='scikit-learn 0.1'))
+
+        meta_path = os.path.join(registry.base_dir, ANOMALY_DETECTOR, 'sensor_1.json')
+        with open(meta_path, 'w') as f:
+            json.dump(dict(meta, trained_at=(datetime.utcnow() - timedelta(days=2)).isoformat()), f)
+        assert registry.load(ANOMALY_DETECTOR, 1) is None
+        assert registry.load(ANOMALY_DETECTOR, 1, allow_stale=True) is not None
+        assert registry.delete(ANOMALY_DETECTOR, 1)
+        assert registry.metadata(ANOMALY_DETECTOR, 1) is None
+
+    def test_engine_warm_starts_from_disk(self, db_manager, registry, history, monkeypatch):
+        """Um MLEngine novo carrega o modelo salvo em vez de retreinar"""
+        monkeypatch.setattr(MLEngine, 'get_sensor_history', lambda self, sensor_id, hours=72: history)
+
+        first = MLEngine(db_manager=db_manager, registry=registry)
+        assert first.train_anomaly_detector(1)
+
+        fitted = []
+        monkeypatch.setattr(AnomalyDetector, 'fit', lambda self, data: fitted.append(len(data)))
+        second = MLEngine(db_manager=db_manager, registry=registry)
+        result = second.detect_anomalies(1)
+        assert 'error' not in result
+        assert result['value'] == 51.0
+        assert 1 in second.anomaly_detectors
+
+        # Retreino com os mesmos dados reaproveita o modelo salvo
+        assert second.train_anomaly_detector(1)
+        assert fitted == []
+
+
+class TestOnlineScoring:
+    """Testes para o scoring online de leituras novas no MLEngine"""
+
+    def test_score_new_readings(self, db_manager, tmp_path):
+        """Pontua só sensores com modelo salvo e grava os pontos anômalos"""
+        engine = MLEngine(db_manager=db_manager, registry=ModelRegistry(str(tmp_path)))
+        assert engine.train_anomaly_detector(1)
+        engine.anomaly_detectors.clear()
+
+        now = datetime.utcnow()
+        readings = pd.DataFrame({
+            'sensor_id': [1, 1, 1, 2],
+            'timestamp': [now + timedelta(minutes=m) for m in (1, 2, 3, 1)],
+            'value': [53.0, 500.0, 54.0, 52.0],
+            'data_quality': [0, 0, 0, 0],
+        })
+        summary = engine.score_new_readings(readings)
+
+        assert summary == {'scored': 3, 'anomalies': 1, 'sensors_without_model': 1}
+        assert engine.latest_scores[1]['value'] == 54.0
+        assert not engine.latest_scores[1]['is_anomaly']
+        with db_manager.session_scope() as session:
+            anomaly = RepositoryFactory(session).ml_prediction().get_latest_anomaly(1)
+            assert anomaly.prediction_timestamp == now + timedelta(minutes=2)
+            assert anomaly.is_anomaly
+
+        result = engine.detect_anomalies(1)
+        assert result['value'] == 51.0
+        assert result['historical_average'] == pytest.approx(53.0, abs=0.5)
+
+    def test_unsorted_batch_and_missing_models(self, db_manager, tmp_path, monkeypatch):
+        """latest_scores usa o timestamp mais recente; sensor sem modelo não relê o disco a cada ciclo"""
+        registry = ModelRegistry(str(tmp_path))
+        engine = MLEngine(db_manager=db_manager, registry=registry)
+        assert engine.train_anomaly_detector(1)
+
+        loads = []
+        load = registry.load
+        monkeypatch.setattr(registry, 'load', lambda kind, sensor_id, **kwargs: (
+            loads.append(sensor_id) or load(kind, sensor_id, **kwargs)))
+
+        now = datetime.utcnow()
+        readings = pd.DataFrame({
+            'sensor_id': [1, 2, 1, 1],
+            'timestamp': [now + timedelta(minutes=m) for m in (3, 1, 1, 2)],
+            'value': [54.0, 52.0, 53.0, 55.0],
+        })
+        for _ in range(3):
+            assert engine.score_new_readings(readings)['sensors_without_model'] == 1
+        assert loads == [2]
+        assert engine.latest_scores[1]['value'] == 54.0
+        assert engine.latest_scores[1]['timestamp'] == now + timedelta(minutes=3)
+
+        monkeypatch.setattr('src.ml.ml_engine.TrainingOrchestrator',
+                            lambda **kwargs: types.SimpleNamespace(run=lambda sensor_ids, progress: {}))
+        engine.retrain_models([1, 2])
+        engine.score_new_readings(readings)
+        assert sorted(loads) == [1, 2, 2]
+
+
+    def test_models_from_other_processes_are_picked_up(self, db_manager, tmp_path, monkeypatch):
+        """Modelos gravados por outro processo entram na checagem periódica do registro"""
+        registry = ModelRegistry(str(tmp_path))
+        engine = MLEngine(db_manager=db_manager, registry=registry)
+        assert engine.train_anomaly_detector(1)
+        readings = pd.DataFrame({
+            'sensor_id': [1, 2],
+            'timestamp': [datetime.utcnow()] * 2,
+            'value': [53.0, 52.0],
+        })
+        assert engine.score_new_readings(readings)['sensors_without_model'] == 1
+
+        # Outro processo (ex: aba de treino) treina o sensor 2 e substitui o modelo do 1
+        other = MLEngine(db_manager=db_manager, registry=ModelRegistry(str(tmp_path)))
+        assert other.train_anomaly_detector(2)
+        replacement = AnomalyDetector()
+        replacement.fit(np.arange(60, dtype=float))
+        timestamps = np.arange(60).astype('datetime64[m]').astype('datetime64[us]')
+        registry.save(ANOMALY_DETECTOR, 1, replacement, timestamps, np.arange(60, dtype=float))
+        assert engine.score_new_readings(readings)['sensors_without_model'] == 1
+
+        monkeypatch.setattr(Config, 'ML_MODEL_REFRESH_SEC', 0)
+        assert engine.score_new_readings(readings)['sensors_without_model'] == 0
+        assert engine.anomaly_detectors[1].scaler.mean_[0] == pytest.approx(29.5)
+
+
+class TestTrainingOrchestrator:
+    """Testes para TrainingOrchestrator (treino da frota em paralelo)"""
+
+    @pytest.fixture
+    def registry(self, tmp_path):
+        return ModelRegistry(str(tmp_path))
+
+    def test_load_training_data_splits_by_sensor(self, db_manager, registry):
+        """Uma leitura em bloco devolve a fatia de cada sensor, em ordem cronológica"""
+        orchestrator = TrainingOrchestrator(db_manager, registry, max_workers=1)
+        data = orchestrator.load_training_data([1, 2, 3, 99])
+
+        assert {sensor_id: len(values) for sensor_id, (_, values) in data.items()} == \
+            {1: 100, 2: 100, 3: 10, 99: 0}
+        timestamps, values = data[2]
+        assert np.all(np.diff(timestamps) > np.timedelta64(0))
+        assert values.dtype == np.float64
+
+    def test_in_process_training_and_unchanged_data(self, db_manager, registry):
+        """Treina, pula sensores sem dados e reaproveita modelos com dados inalterados"""
+        orchestrator = TrainingOrchestrator(db_manager, registry, max_workers=1)
+        progress = []
+
+        summary = orchestrator.run([1, 2, 3], kinds=(ANOMALY_DETECTOR,),
+                                   progress=lambda done, total, result: progress.append((done, total)))
+        assert summary['anomaly_trained'] == 2
+        assert summary['skipped'] == 1
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+        assert registry.load(ANOMALY_DETECTOR, 1).is_fitted
+
+        statuses = sorted(r.status for r in orchestrator.iter_train([1, 2], (ANOMALY_DETECTOR,)))
+        assert statuses == ['unchanged', 'unchanged']
+
+    def test_process_pool_training(self, db_manager, registry):
+        """Workers do pool treinam e gravam os modelos direto no registro"""
+        orchestrator = TrainingOrchestrator(db_manager, registry, max_workers=2,
+                                            task_timeout=120, memory_limit_mb=0)
+        results = list(orchestrator.iter_train([1, 2, 3], (ANOMALY_DETECTOR,)))
+
+        assert sorted((r.sensor_id, r.status) for r in results) == \
+            [(1, 'trained'), (2, 'trained'), (3, 'skipped')]
+        assert sorted(m['sensor_id'] for m in registry.list_models()) == [1, 2]
+
+    def test_process_pool_training_with_default_memory_limit(self, db_manager, registry):
+        """Workers sob o RLIMIT_AS padrão (ML_TRAINING_TASK_MEMORY_MB) ainda treinam"""
+        orchestrator = TrainingOrchestrator(db_manager, registry, max_workers=2, task_timeout=120)
+        assert orchestrator.memory_limit_mb == Config.ML_TRAINING_TASK_MEMORY_MB
+        results = list(orchestrator.iter_train([1, 2], (ANOMALY_DETECTOR,)))
+
+        assert sorted((r.sensor_id, r.status) for r in results) == [(1, 'trained'), (2, 'trained')]
+
+    def test_broken_pool_is_recreated(self, db_manager, registry, monkeypatch):
+        """Um worker morto quebra o pool: a tarefa em voo falha e as seguintes vão para um pool novo"""
+        pools = []
+
+        class FakePool:
+            def __init__(self, **kwargs):
+                self.broken = not pools
+                self.futures = []
+                pools.append(self)
+
+            def submit(self, fn, *args):
+                if self.broken and self.futures:
+                    raise BrokenProcessPool('pool quebrado')
+                future = Future()
+                if self.broken:
+                    future.set_exception(BrokenProcessPool('worker terminou abruptamente'))
+                else:
+                    future.set_result(fn(*args))
+                self.futures.append(future)
+                return future
+
+            def shutdown(self, wait=True):  # assinatura do Python 3.8
+                self.closed = True
+
+        monkeypatch.setattr(training, 'ProcessPoolExecutor', FakePool)
+        orchestrator = TrainingOrchestrator(db_manager, registry, max_workers=2)
+        results = {r.sensor_id: r for r in orchestrator.iter_train([1, 2, 3], (ANOMALY_DETECTOR,))}
+
+        assert len(pools) == 2
+        assert all(pool.closed for pool in pools)
+        assert results[1].status == 'failed'
+        assert 'abruptamente' in results[1].error
+        assert results[2].status == 'trained'
+        assert results[3].status == 'skipped'
+
+    def test_task_timeout(self, registry):
+        """Uma tarefa que excede o limite de tempo falha sem derrubar o worker"""
+        values = np.random.normal(50, 5, 20000)
+        timestamps = np.arange(len(values)).astype('datetime64[m]').astype('datetime64[us]')
+        training._init_worker(0, 0.001)
+        try:
+            result = training._train_task(ANOMALY_DETECTOR, 1, timestamps, values,
+                                          registry.base_dir, 0.1)
+        finally:
+            training._task_timeout = None
+
+        assert result.status == 'failed'
+        assert 'timeout' in result.error
+        assert registry.metadata(ANOMALY_DETECTOR, 1) is None
+
+    def test_engine_retrain_uses_orchestrator(self, db_manager, registry, monkeypatch):
+        """retrain_all_models treina via orquestrador e descarta os modelos em memória"""
+        monkeypatch.setattr(Config, 'ML_TRAINING_WORKERS', 1)
+        engine = MLEngine(db_manager=db_manager, registry=registry)
+        engine.anomaly_detectors[1] = 'antigo'
+
+        result = engine.retrain_all_models()
+        assert result['anomaly_trained'] == 2
+        assert result['total_sensors'] == 3
+        assert 1 not in engine.anomaly_detectors
+        assert engine.detect_anomalies(1)['sensor_id'] == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
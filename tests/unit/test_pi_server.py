@@ -0,0 +1,352 @@
+"""
+Unit tests para o pipeline de ingestão do PI Server (sem PI real).
+"""
+import unittest
+import os
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from config.settings import Config
+from src.data.database import init_database
+from src.data.repositories import RepositoryFactory
+from src.pi_server.data_fetcher import DataFetcher
+from src.pi_server.pi_client import PIServerClient
+
+
+class FakePIClient(PIServerClient):
+    """PIServerClient falso que devolve séries fixas por tag"""
+
+    def __init__(self, frames: dict):
+        super().__init__(host='fake-pi')
+        self.frames = frames
+        self.requests = []
+
+    def is_connected(self) -> bool:
+        return True
+
+    def connect(self) -> bool:
+        return True
+
+    def get_interpolated_data(self, tag, start_date, end_date, interval='10m',
+                              numeric_only=False):
+        return self.frames.get(tag)
+
+    def get_raw_data(self, tag, start_date, end_date):
+        self.requests.append((tag, start_date, end_date))
+        df = self.frames.get(tag)
+        if df is None:
+            return None
+        window = (df['timestamp'] > start_date) & (df['timestamp'] <= end_date)
+        return df[window]
+
+    def get_interpolated_data_bulk(self, tags, start_date, end_date, interval='10m',
+                                   numeric_only=False):
+        self.bulk_calls = getattr(self, 'bulk_calls', 0) + 1
+        wide = None
+        for tag in tags:
+            if tag in self.frames:
+                df = self.frames[tag][['timestamp', tag]]
+                wide = df if wide is None else wide.merge(df, on='timestamp', how='outer')
+        return wide
+
+
+class TestDataFetcherBatchIngestion(unittest.TestCase):
+    """Testes para a ingestão em lote do DataFetcher"""
+
+    def setUp(self):
+        """Cria BD em memória e dois sensores"""
+        self.db_manager = init_database('sqlite:///:memory:')
+        self.session = self.db_manager.get_session()
+        sensor_repo = RepositoryFactory(self.session).sensor_config()
+
+        self.sensors = []
+        for i in range(2):
+            sensor = sensor_repo.create(
+                internal_name=f'FETCH_{i}',
+                display_name=f'Fetch {i}',
+                sensor_type='CH4_POINT',
+                platform='P74',
+                unit='ppm',
+                pi_server_tag=f'TAG_{i}'
+            )
+            self.sensors.append((sensor.sensor_id, sensor.internal_name, f'TAG_{i}', 'ppm'))
+
+        now = datetime.utcnow().replace(second=0, microsecond=0)
+        timestamps = [now - timedelta(minutes=m) for m in range(10, 0, -1)]
+        self.frames = {
+            'TAG_0': pd.DataFrame({
+                'timestamp': timestamps,
+                'TAG_0': [str(v) for v in range(10)]
+            }),
+            'TAG_1': pd.DataFrame({
+                'timestamp': timestamps,
+                'TAG_1': ['1.5', 'Bad', 'nan', 'inf', '2.5', '3.5', '4.5', '5.5', '6.5', '7.5']
+            }),
+        }
+
+    def tearDown(self):
+        """Cleanup após cada teste"""
+        self.session.close()
+
+    def test_fetch_latest_readings_single_batch(self):
+        """Testa que o ciclo grava todas as leituras válidas novas de cada tag"""
+        fetcher = DataFetcher(pi_client=FakePIClient(self.frames))
+        inserted = fetcher.fetch_latest_readings(self.sensors)
+
+        # 10 leituras de TAG_0 + 7 válidas de TAG_1
+        self.assertEqual(inserted, 17)
+        self.assertEqual(fetcher.last_cycle_stats['inserted'], 17)
+        self.assertGreater(fetcher.last_cycle_stats['rows_per_sec'], 0)
+
+        reading_repo = RepositoryFactory(self.session).sensor_reading()
+        latest = reading_repo.get_latest(self.sensors[0][0])
+        self.assertEqual(latest.value, 9.0)
+
+    def test_overlapping_cycles_do_not_duplicate(self):
+        """Testa que ciclos com janelas sobrepostas não duplicam leituras"""
+        fetcher = DataFetcher(pi_client=FakePIClient(self.frames))
+        self.assertEqual(fetcher.fetch_latest_readings(self.sensors), 17)
+        self.assertEqual(fetcher.fetch_latest_readings(self.sensors), 0)
+
+        # Um fetcher novo (sem HWM em memória) também não duplica
+        fresh = DataFetcher(pi_client=FakePIClient(self.frames), bulk_size=0)
+        self.assertEqual(fresh.fetch_latest_readings(self.sensors), 0)
+
+        reading_repo = RepositoryFactory(self.session).sensor_reading()
+        self.assertEqual(len(reading_repo.get_recent(self.sensors[0][0])), 10)
+
+    def test_readings_listeners_receive_only_new_readings(self):
+        """Listeners recebem as leituras gravadas no ciclo; erros não interrompem a ingestão"""
+        fetcher = DataFetcher(pi_client=FakePIClient(self.frames))
+        received = []
+
+        def failing(readings):
+            raise RuntimeError('falha no consumidor')
+
+        fetcher.add_readings_listener(failing)
+        fetcher.add_readings_listener(received.append)
+
+        self.assertEqual(fetcher.fetch_latest_readings(self.sensors), 17)
+        self.assertEqual(fetcher.fetch_latest_readings(self.sensors), 0)
+        self.assertEqual(len(received), 1)
+        self.assertEqual(len(received[0]), 17)
+        self.assertEqual(set(received[0]['sensor_id']), {sid for sid, _, _, _ in self.sensors})
+
+    def test_high_water_mark_window(self):
+        """Testa que cada ciclo pede ao PI apenas (hwm, agora]"""
+        client = FakePIClient(self.frames)
+        fetcher = DataFetcher(pi_client=client, bulk_size=0)
+        fetcher.fetch_latest_readings(self.sensors)
+
+        last_ts = self.frames['TAG_0']['timestamp'].max()
+        self.assertEqual(fetcher.high_water_marks[self.sensors[0][0]], last_ts)
+
+        # HWM reconstruído do banco por um fetcher novo
+        client = FakePIClient(self.frames)
+        fresh = DataFetcher(pi_client=client, bulk_size=0)
+        fresh.fetch_latest_readings(self.sensors)
+        starts = {tag: start for tag, start, _ in client.requests}
+        self.assertEqual(starts['TAG_0'], last_ts)
+
+        # Uma nova leitura no PI é o único dado transferido no ciclo seguinte
+        new_ts = last_ts + timedelta(minutes=1)
+        self.frames['TAG_0'] = pd.concat([
+            self.frames['TAG_0'],
+            pd.DataFrame({'timestamp': [new_ts], 'TAG_0': ['42']})
+        ])
+        client.requests.clear()
+        client.frames = self.frames
+        self.assertEqual(fresh.fetch_latest_readings(self.sensors), 1)
+
+    def test_cycle_stats_separate_failures_from_empty_windows(self):
+        """Testa que janelas sem leituras novas não contam como falha"""
+        sensors = self.sensors + [(999, 'FETCH_X', 'TAG_INEXISTENTE', 'ppm')]
+        fetcher = DataFetcher(pi_client=FakePIClient(self.frames), bulk_size=0)
+
+        fetcher.fetch_latest_readings(sensors)
+        self.assertEqual((fetcher.last_cycle_stats['failed'],
+                          fetcher.last_cycle_stats['empty']), (1, 0))
+
+        # Segundo ciclo: o PI responde, mas não há nada depois do HWM
+        self.assertEqual(fetcher.fetch_latest_readings(sensors), 0)
+        self.assertEqual((fetcher.last_cycle_stats['failed'],
+                          fetcher.last_cycle_stats['empty']), (1, 2))
+
+    def test_backfill_is_capped(self):
+        """Testa que a recuperação após indisponibilidade respeita o limite"""
+        reading_repo = RepositoryFactory(self.session).sensor_reading()
+        old = datetime.utcnow() - timedelta(days=7)
+        for sensor in self.sensors:
+            reading_repo.create(sensor_id=sensor[0], value=1.0, timestamp=old)
+
+        client = FakePIClient(self.frames)
+        fetcher = DataFetcher(pi_client=client, bulk_size=0)
+        fetcher.fetch_latest_readings(self.sensors)
+
+        for tag, start, end in client.requests:
+            self.assertAlmostEqual((end - start).total_seconds(),
+                                   Config.PI_FETCH_MAX_BACKFILL_HOURS * 3600, delta=1)
+
+    def test_historical_backfill_is_idempotent(self):
+        """Testa que repetir o backfill histórico da mesma janela não duplica leituras"""
+        fetcher = DataFetcher(pi_client=FakePIClient(self.frames))
+        sensor_id, _, pi_tag, _ = self.sensors[0]
+        self.assertEqual(fetcher.fetch_historical_data(sensor_id, pi_tag, days_back=1), 10)
+        self.assertEqual(fetcher.fetch_historical_data(sensor_id, pi_tag, days_back=1), 0)
+
+        reading_repo = RepositoryFactory(self.session).sensor_reading()
+        self.assertEqual(len(reading_repo.get_recent(sensor_id)), 10)
+
+    def test_fetch_latest_readings_bulk_mode(self):
+        """Testa que o modo em lote busca vários tags por chamada"""
+        client = FakePIClient(self.frames)
+        fetcher = DataFetcher(pi_client=client, bulk_size=10)
+
+        self.assertEqual(fetcher.fetch_latest_readings(self.sensors), 17)
+        self.assertEqual(client.bulk_calls, 1)
+
+    def test_prepare_readings_discards_invalid_values(self):
+        """Testa validação vetorizada de valores"""
+        fetcher = DataFetcher(pi_client=FakePIClient(self.frames))
+        batch = fetcher._prepare_readings([
+            (1, 'TAG_0', 'ppm', self.frames['TAG_0']),
+            (2, 'TAG_1', 'ppm', self.frames['TAG_1']),
+        ])
+
+        self.assertEqual(len(batch), 17)
+        sensor_2 = batch[batch['sensor_id'] == 2]
+        self.assertEqual(len(sensor_2), 7)
+        self.assertListEqual(list(sensor_2['value'][:2]), [1.5, 2.5])
+
+
+class TestConcurrentFetch(unittest.TestCase):
+    """Testes para a busca concorrente de tags com gideaoPI simulado"""
+
+    LATENCY = 0.05
+
+    def setUp(self):
+        """Instala módulo gideaoPI falso com latência injetada"""
+        latency = self.LATENCY
+
+        def get_valores_interpolados(servidor, tag, inicio, fim, intervalo, is_numeric=False):
+            time.sleep(latency if tag != 'SLOW' else 1.0)
+            return pd.DataFrame({'timestamp': [datetime.utcnow()], tag: [1.0]})
+
+        stub = types.ModuleType('gideaoPI')
+        stub.getValoresInterpolados = get_valores_interpolados
+        self._previous = sys.modules.get('gideaoPI')
+        sys.modules['gideaoPI'] = stub
+
+        self.client = PIServerClient(host='stub-pi')
+        self.client._connected = True
+        self.tags = [f'TAG_{i}' for i in range(16)]
+
+    def tearDown(self):
+        """Restaura módulo original"""
+        if self._previous is None:
+            sys.modules.pop('gideaoPI', None)
+        else:
+            sys.modules['gideaoPI'] = self._previous
+
+    def _timed_fetch(self, max_workers):
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        result = self.client.get_multiple_tags(
+            self.tags, now - timedelta(hours=1), now, '1m', max_workers=max_workers
+        )
+        return result, time.perf_counter() - start
+
+    def test_cycle_time_scales_with_concurrency_limit(self):
+        """Testa que o tempo do ciclo cai com o limite de concorrência"""
+        serial_result, serial_time = self._timed_fetch(max_workers=1)
+        parallel_result, parallel_time = self._timed_fetch(max_workers=8)
+
+        self.assertEqual(len(serial_result), 16)
+        self.assertEqual(len(parallel_result), 16)
+        self.assertGreaterEqual(serial_time, 16 * self.LATENCY)
+        self.assertLess(parallel_time, serial_time / 3)
+
+    def test_slow_tag_times_out_without_blocking_others(self):
+        """Testa timeout por tag sem esperar pelo tag lento"""
+        start = time.perf_counter()
+        results = dict(self.client.iter_concurrent(
+            ['SLOW'] + self.tags[:3],
+            lambda tag: self.client.get_interpolated_data(tag, 'a', 'b', '1m'),
+            max_workers=4,
+            tag_timeout=0.2
+        ))
+        elapsed = time.perf_counter() - start
+
+        self.assertIsNone(results['SLOW'])
+        self.assertEqual(sum(r is not None for r in results.values()), 3)
+        self.assertLess(elapsed, 0.9)
+
+    def test_cycle_deadline_cancels_tags_queued_behind_hung_call(self):
+        """Testa que o prazo do ciclo libera tags que nem começaram atrás de um tag preso"""
+        start = time.perf_counter()
+        results = dict(self.client.iter_concurrent(
+            ['SLOW'] + self.tags[:3],
+            lambda tag: self.client.get_interpolated_data(tag, 'a', 'b', '1m'),
+            max_workers=1,
+            tag_timeout=0,
+            cycle_timeout=0.3
+        ))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(set(results), {'SLOW'} | set(self.tags[:3]))
+        self.assertTrue(all(r is None for r in results.values()))
+        self.assertLess(elapsed, 0.9)
+
+    def test_stuck_threads_replace_the_pool_once(self):
+        """Testa que threads presas no PI trocam o pool uma vez, sem vazar pools a cada ciclo"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def fetch(tag):
+            if tag == 'HUNG':
+                release.wait(5)
+            return tag
+
+        def cycle():
+            return dict(self.client.iter_concurrent(['HUNG', 'TAG_0'], fetch, max_workers=2,
+                                                    tag_timeout=0.1, cycle_timeout=0))
+
+        with mock.patch.object(Config, 'PI_FETCH_MAX_WORKERS', 2):
+            self.assertEqual(cycle(), {'HUNG': None, 'TAG_0': 'TAG_0'})
+            first = self.client._executor
+            cycle()
+            second = self.client._executor
+            cycle()
+
+            self.assertIsNot(second, first)
+            self.assertIs(self.client._executor, second)
+            self.assertEqual(len(self.client._abandoned), 1)
+
+            release.set()
+            time.sleep(0.1)
+            cycle_result = dict(self.client.iter_concurrent(['TAG_1'], fetch, max_workers=2))
+            self.assertEqual(cycle_result, {'TAG_1': 'TAG_1'})
+            self.assertEqual((self.client._stuck, self.client._abandoned), (set(), set()))
+        self.client.disconnect()
+
+    def test_executor_is_reused_across_cycles(self):
+        """Testa que ciclos seguidos usam o mesmo pool limitado de threads"""
+        self._timed_fetch(max_workers=4)
+        executor = self.client._executor
+        self._timed_fetch(max_workers=4)
+
+        self.assertIs(self.client._executor, executor)
+        self.client.disconnect()
+        self.assertIsNone(self.client._executor)
+
+
+if __name__ == '__main__':
+    unittest.main()
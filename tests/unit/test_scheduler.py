@@ -0,0 +1,185 @@
+"""
+Unit tests para o scheduler service (jobs periódicos).
+"""
+import unittest
+import os
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.data.database import init_database
+from src.data.models import AlertHistory, NotificationLog
+from src.data.repositories import RepositoryFactory
+from src.scheduler.jobs import SchedulerJobs
+from src.scheduler.service import SchedulerService, parse_retraining_schedule
+
+
+class TestSchedulerService(unittest.TestCase):
+    """Testes para SchedulerService"""
+
+    def setUp(self):
+        self.service = SchedulerService(jobs=SchedulerJobs())
+
+    def tearDown(self):
+        self.service.shutdown(wait=True)
+
+    def test_overlapping_runs_are_skipped(self):
+        """Uma segunda execução enquanto a primeira roda é descartada"""
+        release = threading.Event()
+        calls = []
+
+        def slow_job():
+            calls.append(1)
+            release.wait(2)
+            return 'ok'
+
+        self.service.add_interval_job('slow', slow_job, seconds=60, jitter=0)
+        worker = threading.Thread(target=self.service.run_job, args=('slow',))
+        worker.start()
+        time.sleep(0.1)
+
+        self.assertIsNone(self.service.run_job('slow'))
+        release.set()
+        worker.join()
+
+        metrics = self.service.get_metrics()['slow']
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(metrics['runs'], 1)
+        self.assertEqual(metrics['overlaps_skipped'], 1)
+        self.assertEqual(metrics['last_result'], 'ok')
+
+    def test_failures_are_recorded(self):
+        """Exceções do job não derrubam o scheduler e ficam nas métricas"""
+        def broken_job():
+            raise RuntimeError('PI indisponível')
+
+        self.service.add_interval_job('broken', broken_job, seconds=60, jitter=0)
+        self.assertIsNone(self.service.run_job('broken'))
+
+        metrics = self.service.get_metrics()['broken']
+        self.assertEqual(metrics['failures'], 1)
+        self.assertEqual(metrics['last_error'], 'PI indisponível')
+        self.assertGreaterEqual(metrics['last_duration_sec'], 0)
+
+    def test_interval_job_runs_in_background(self):
+        """Jobs agendados rodam sozinhos após start()"""
+        ran = threading.Event()
+        self.service.add_interval_job('tick', ran.set, seconds=0.1, jitter=0)
+        self.service.start()
+
+        self.assertTrue(ran.wait(2))
+        self.service.shutdown(wait=True)
+        self.assertGreaterEqual(self.service.get_metrics()['tick']['runs'], 1)
+
+    def test_default_jobs(self):
+        """Os jobs padrão são registrados a partir de Config"""
+        self.service.register_default_jobs()
+
+        job_ids = {job.id for job in self.service.scheduler.get_jobs()}
+        self.assertEqual(job_ids, {'ingestion', 'alert_evaluation', 'voting_groups',
+                                   'teams_dispatch', 'retention', 'retraining'})
+
+    def test_parse_retraining_schedule(self):
+        """Converte dia/hora de retreino em campos cron"""
+        self.assertEqual(parse_retraining_schedule('Sunday', '02:00'), ('sun', 2, 0))
+        self.assertEqual(parse_retraining_schedule('monday', '23:30'), ('mon', 23, 30))
+
+
+class TestSchedulerJobs(unittest.TestCase):
+    """Testes para os jobs do scheduler"""
+
+    def setUp(self):
+        self.db_manager = init_database('sqlite:///:memory:')
+        self.session = self.db_manager.get_session()
+        self.repos = RepositoryFactory(self.session)
+        self.sensor = self.repos.sensor_config().create(
+            internal_name='JOB_SENSOR',
+            display_name='Job Sensor',
+            sensor_type='CH4_POINT',
+            platform='P74',
+            unit='ppm'
+        )
+        self.alert_def = self.repos.alert_definition().create(
+            sensor_id=self.sensor.sensor_id,
+            condition_type='THRESHOLD',
+            severity_level=3,
+            threshold_value=10.0
+        )
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_evaluate_alerts_uses_latest_reading(self):
+        """A avaliação dispara alertas para a última leitura acima do limite"""
+        reading_repo = self.repos.sensor_reading()
+        now = datetime.utcnow()
+        reading_repo.create(sensor_id=self.sensor.sensor_id, value=5.0,
+                            timestamp=now - timedelta(minutes=1))
+        reading_repo.create(sensor_id=self.sensor.sensor_id, value=50.0, timestamp=now)
+
+        result = SchedulerJobs().evaluate_alerts()
+
+        self.assertEqual(result, {'definitions_evaluated': 1, 'alerts_triggered': 1,
+                                  'alerts_resolved': 0})
+
+    def test_evaluate_alerts_uses_online_anomaly_scores(self):
+        """Definições ANOMALY são avaliadas com os scores da última ingestão"""
+        anomaly_def = self.repos.alert_definition().create(
+            sensor_id=self.sensor.sensor_id, condition_type='ANOMALY',
+            severity_level=2, anomaly_threshold=0.8
+        )
+        self.repos.sensor_reading().create(sensor_id=self.sensor.sensor_id, value=5.0,
+                                           timestamp=datetime.utcnow())
+        score = {'anomaly_score': 0.95, 'is_anomaly': True,
+                 'scored_at': datetime.utcnow() - timedelta(hours=1)}
+        ml_engine = types.SimpleNamespace(latest_scores={self.sensor.sensor_id: score})
+        jobs = SchedulerJobs(ml_engine=ml_engine)
+
+        # Score de um sensor que parou de reportar não dispara alerta
+        self.assertEqual(jobs.evaluate_alerts()['alerts_triggered'], 0)
+
+        score['scored_at'] = datetime.utcnow()
+        result = jobs.evaluate_alerts()
+
+        self.assertEqual(result, {'definitions_evaluated': 2, 'alerts_triggered': 1,
+                                  'alerts_resolved': 0})
+        alert = self.session.query(AlertHistory).one()
+        self.assertEqual(alert.alert_def_id, anomaly_def.alert_def_id)
+
+    def test_apply_retention(self):
+        """A retenção remove leituras antigas e alertas resolvidos antigos"""
+        now = datetime.utcnow()
+        reading_repo = self.repos.sensor_reading()
+        reading_repo.create(sensor_id=self.sensor.sensor_id, value=1.0,
+                            timestamp=now - timedelta(days=1000))
+        reading_repo.create(sensor_id=self.sensor.sensor_id, value=2.0, timestamp=now)
+
+        old_alert = AlertHistory(
+            alert_def_id=self.alert_def.alert_def_id, sensor_id=self.sensor.sensor_id,
+            sensor_value=50.0, severity_level=3, status='RESOLVED',
+            triggered_at=now - timedelta(days=400), resolved_at=now - timedelta(days=400)
+        )
+        active_alert = AlertHistory(
+            alert_def_id=self.alert_def.alert_def_id, sensor_id=self.sensor.sensor_id,
+            sensor_value=50.0, severity_level=3, status='ACTIVE',
+            triggered_at=now - timedelta(days=400)
+        )
+        self.session.add_all([old_alert, active_alert])
+        self.session.flush()
+        self.session.add(NotificationLog(alert_id=old_alert.alert_id, status='SENT'))
+        self.session.commit()
+
+        result = SchedulerJobs().apply_retention(now=now)
+
+        self.assertEqual(result, {'readings_deleted': 1, 'alerts_deleted': 1})
+        self.session.expire_all()
+        self.assertEqual(self.session.query(AlertHistory).count(), 1)
+        self.assertEqual(self.session.query(NotificationLog).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+"""
+Unit tests para o VotingGroupEngine (votação MooN por grupo).
+"""
+import unittest
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.data.database import init_database
+from src.data.models import SensorConfig, VotingGroupStatus
+from src.data.repositories import RepositoryFactory
+from src.sensors.voting_group_engine import VotingGroupEngine, parse_group_votes
+
+
+class TestVotingGroupEngine(unittest.TestCase):
+    """Testes para a avaliação de grupos de votação"""
+
+    def setUp(self):
+        """Cria um grupo 2oo3, um grupo de um único detector e um sensor sem grupo"""
+        self.db_manager = init_database('sqlite:///:memory:')
+        self.session = self.db_manager.get_session()
+        self.repos = RepositoryFactory(self.session)
+        sensor_repo = self.repos.sensor_config()
+
+        self.fd = [
+            sensor_repo.create(
+                internal_name=f'10S_FD_{i}', display_name=f'FD {i}', sensor_type='CH4_POINT',
+                platform='P74', unit='%LEL', grupo='10S_FD', modulo='10S',
+                lower_ok_limit=-5.0, upper_warning_limit=20.0, upper_critical_limit=60.0
+            ).sensor_id
+            for i in range(3)
+        ]
+        self.single = sensor_repo.create(
+            internal_name='20S_H2S_0', display_name='H2S 0', sensor_type='H2S',
+            platform='P74', unit='ppm', grupo='20S_H2S', upper_warning_limit=10.0
+        ).sensor_id
+        self.loose = sensor_repo.create(
+            internal_name='LOOSE', display_name='Loose', sensor_type='CO2',
+            platform='P74', unit='ppm'
+        ).sensor_id
+
+        self.now = datetime.utcnow()
+        self.engine = VotingGroupEngine(default_votes=2, group_votes={}, stale_seconds=300,
+                                        refresh_interval=0)
+        self.engine.build_index(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def _evaluate(self, values, now=None):
+        self.engine.update_values({sid: (ts or self.now, value)
+                                   for sid, (value, ts) in values.items()})
+        return self.engine.evaluate(now or self.now)
+
+    def test_index_groups_members(self):
+        """O índice contém somente sensores com grupo, com M limitado a N"""
+        self.assertEqual(self.engine.groups, ['10S_FD', '20S_H2S'])
+        states = self._evaluate({})
+
+        self.assertEqual((states['10S_FD'].votes_required, states['10S_FD'].members), (2, 3))
+        self.assertEqual((states['20S_H2S'].votes_required, states['20S_H2S'].members), (1, 1))
+        self.assertEqual(self.engine.update_values({self.loose: (self.now, 1.0)}), 0)
+
+    def test_moon_states(self):
+        """Trips, alarmes e falhas produzem o estado esperado do grupo"""
+        a, b, c = self.fd
+        cases = [
+            ({a: (1.0, None), b: (2.0, None), c: (0.0, None)}, 'NORMAL', (0, 0, 0)),
+            ({a: (30.0, None), b: (2.0, None), c: (0.0, None)}, 'ALARM', (0, 1, 0)),
+            ({a: (70.0, None), b: (2.0, None), c: (0.0, None)}, 'ALARM', (1, 0, 0)),
+            ({a: (70.0, None), b: (65.0, None), c: (0.0, None)}, 'TRIPPED', (2, 0, 0)),
+            ({a: (1.0, None), b: (-20.0, None), c: (0.0, None)}, 'DEGRADED', (0, 0, 1)),
+            ({a: (1.0, None), b: (-20.0, None),
+              c: (0.0, self.now - timedelta(hours=1))}, 'INOPERATIVE', (0, 0, 2)),
+        ]
+
+        for values, expected, (tripped, alarm, faulted) in cases:
+            state = self._evaluate(values)['10S_FD']
+            self.assertEqual(state.state, expected, values)
+            self.assertEqual((state.tripped, state.alarm, state.faulted),
+                             (tripped, alarm, faulted), values)
+
+    def test_single_member_group_is_1oo1(self):
+        """Grupo de um detector dispara com um voto, usando o limite de aviso"""
+        state = self._evaluate({self.single: (12.0, None)})['20S_H2S']
+        self.assertEqual(state.state, 'TRIPPED')
+
+    def test_bypass_and_vote_override(self):
+        """Sensor desabilitado conta como bypass; M por grupo sobrepõe o padrão"""
+        a, b, c = self.fd
+        self.session.get(SensorConfig, c).enabled = False
+        self.session.commit()
+
+        engine = VotingGroupEngine(default_votes=2, group_votes={'10S_FD': 1},
+                                   stale_seconds=300, refresh_interval=0)
+        engine.build_index(self.session)
+        engine.update_values({a: (self.now, 70.0), b: (self.now, 1.0), c: (self.now, 99.0)})
+        state = engine.evaluate(self.now)['10S_FD']
+
+        self.assertEqual((state.state, state.bypassed, state.tripped), ('TRIPPED', 1, 1))
+        self.assertEqual(state.votes_required, 1)
+
+    def test_run_cycle_publishes_changes_only(self):
+        """O ciclo lê as últimas leituras e grava apenas grupos alterados"""
+        reading_repo = self.repos.sensor_reading()
+        for sensor_id in self.fd:
+            reading_repo.create(sensor_id=sensor_id, value=70.0, timestamp=self.now)
+        reading_repo.create(sensor_id=self.single, value=1.0, timestamp=self.now)
+
+        result = self.engine.run_cycle(now=self.now)
+        self.assertEqual(result['changed'], 2)
+        self.assertEqual(result['by_state'], {'TRIPPED': 1, 'NORMAL': 1})
+
+        published = {s.grupo: s for s in self.repos.voting_group_status().get_all()}
+        self.assertEqual(published['10S_FD'].state, 'TRIPPED')
+        self.assertEqual(published['10S_FD'].tripped, 3)
+
+        self.assertEqual(self.engine.run_cycle(now=self.now)['changed'], 0)
+
+        reading_repo.create(sensor_id=self.single, value=50.0,
+                            timestamp=self.now + timedelta(seconds=10))
+        self.assertEqual(self.engine.run_cycle(now=self.now)['changed'], 1)
+        self.session.expire_all()
+        self.assertEqual(self.session.get(VotingGroupStatus, '20S_H2S').state, 'TRIPPED')
+
+    def test_fleet_evaluation_is_fast(self):
+        """A frota inteira (18 mil sensores) é avaliada em milissegundos"""
+        groups, per_group = 6000, 3
+        self.session.execute(insert(SensorConfig), [
+            {'internal_name': f'FLEET_{g}_{i}', 'display_name': f'Fleet {g}-{i}',
+             'sensor_type': 'CH4_POINT', 'platform': 'P74', 'unit': '%LEL',
+             'grupo': f'G{g:05d}', 'upper_warning_limit': 20.0, 'upper_critical_limit': 60.0,
+             'enabled': True}
+            for g in range(groups) for i in range(per_group)
+        ])
+        self.session.commit()
+        self.engine.build_index(self.session)
+
+        latest = {sid: (self.now, float(sid % 100)) for sid in self.engine._position}
+        started = time.perf_counter()
+        self.engine.update_values(latest)
+        states = self.engine.evaluate(self.now)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(states), groups + 2)
+        self.assertLess(elapsed, 0.5)
+
+    def test_parse_group_votes(self):
+        """VOTING_GROUP_VOTES aceita JSON e ignora valores inválidos"""
+        self.assertEqual(parse_group_votes('{"10S_FD": 1}'), {'10S_FD': 1})
+        self.assertEqual(parse_group_votes(''), {})
+        self.assertEqual(parse_group_votes('[1, 2]'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()